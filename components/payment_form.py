@@ -2,10 +2,12 @@
 Componente de formulario de pagos multimoneda
 """
 import flet as ft
-from typing import Callable, List
+from typing import Callable, List, Optional
 from dataclasses import dataclass
-from models.transaccion import MetodoPago
+from models.transaccion import MetodoPago, METODOS_CON_REFERENCIA, Transaccion
 from models.configuracion import get_config
+from utils.eventos import bus, TasaCambiada
+from utils.helpers import normalizar_referencia
 
 @dataclass
 class LineaPago:
@@ -24,6 +26,7 @@ class PaymentForm(ft.Column):
         self.lineas: List[LineaPago] = []
         self.tasa_cambio = get_config().tasa_dolar_bs
         self._build()
+        bus.suscribir(TasaCambiada, self._on_tasa_cambiada)
     
     def _build(self):
         self.spacing = 10
@@ -116,6 +119,7 @@ class PaymentForm(ft.Column):
             visible=False,
             on_change=self._on_linea_change
         )
+        tf_referencia.on_blur = lambda e: self._verificar_referencia(dd_metodo, tf_referencia)
         
         # Botón eliminar
         btn_eliminar = ft.IconButton(
@@ -149,13 +153,21 @@ class PaymentForm(ft.Column):
             self.update()
             self._actualizar_totales()
     
+    def _on_tasa_cambiada(self, evento: TasaCambiada):
+        """Recalcula los montos en BS con la nueva tasa de cambio"""
+        if evento.tasa_nueva != self.tasa_cambio:
+            self.tasa_cambio = evento.tasa_nueva
+            self._on_linea_change(None)
+    
     def _on_linea_change(self, e):
         """Maneja cambios en cualquier campo de la línea"""
+        # Verifica si otra estación cambió la tasa antes de convertir
+        self.tasa_cambio = get_config().tasa_dolar_bs
+        
         # Actualizar campos visibles según método
         for linea in self.lineas_container.controls:
             metodo = MetodoPago(linea['dd_metodo'].value)
-            requiere_ref = metodo in [MetodoPago.PAGO_MOVIL, MetodoPago.TRANSFERENCIA, 
-                                       MetodoPago.ZELLE, MetodoPago.BINANCE]
+            requiere_ref = metodo in METODOS_CON_REFERENCIA
             linea['tf_referencia'].visible = requiere_ref
             
             # Calcular BS desde USD
@@ -169,6 +181,12 @@ class PaymentForm(ft.Column):
         self.update()
         self._actualizar_totales()
     
+    def _verificar_referencia(self, dd_metodo: ft.Dropdown, tf_referencia: ft.TextField):
+        """Avisa en el campo si la referencia ya se usó en otro pago del mismo método"""
+        existente = Transaccion.buscar_por_referencia(MetodoPago(dd_metodo.value), tf_referencia.value or "")
+        tf_referencia.error_text = f"Ya usada en el pago #{existente['ID']}" if existente else None
+        self.update()
+    
     def _actualizar_totales(self):
         """Calcula y muestra los totales"""
         total_usd = 0.0
@@ -225,6 +243,28 @@ class PaymentForm(ft.Column):
                 pass
         return lineas
     
+    def validar_referencias(self) -> Optional[str]:
+        """
+        Verifica antes de guardar que ninguna referencia se repita en el
+        formulario ni esté en un pago anterior del mismo método. Retorna el
+        mensaje de error o None.
+        """
+        vistas = set()
+        for linea in self.obtener_lineas():
+            if linea.metodo not in METODOS_CON_REFERENCIA or not linea.referencia:
+                continue
+            clave = (linea.metodo, normalizar_referencia(linea.referencia))
+            if clave in vistas:
+                return f"La referencia {linea.referencia} está repetida en el pago"
+            vistas.add(clave)
+            existente = Transaccion.buscar_por_referencia(linea.metodo, linea.referencia)
+            if existente:
+                return (
+                    f"La referencia {linea.referencia} ya se registró en el pago "
+                    f"#{existente['ID']} ({existente['Concepto'] or 'sin concepto'})"
+                )
+        return None
+    
     def get_total_pagado(self) -> float:
         """Retorna el total pagado en USD"""
         total = 0.0
@@ -9,9 +9,10 @@ from utils.helpers import format_money
 class RoomCard(ft.Card):
     """Tarjeta visual de una habitación para el grid principal"""
     
-    def __init__(self, habitacion: Habitacion, on_click=None):
+    def __init__(self, habitacion: Habitacion, on_click=None, registro: Registro = None):
         super().__init__()
         self.habitacion = habitacion
+        self.registro = registro
         self.on_card_click = on_click
         self._build()
     
@@ -21,8 +22,8 @@ class RoomCard(ft.Card):
         info_adicional = ""
         
         if self.habitacion.estado == EstadoHabitacion.OCUPADA:
-            # Buscar información del huésped
-            registro = Registro.buscar_activo_por_habitacion(self.habitacion.numero)
+            # Buscar información del huésped si no vino precargada
+            registro = self.registro or Registro.buscar_activo_por_habitacion(self.habitacion.numero)
             if registro:
                 info_adicional = registro.huesped_nombre
                 if registro.saldo_actual_usd > 0:
@@ -87,6 +88,11 @@ class RoomCard(ft.Card):
     
     def update_habitacion(self, habitacion: Habitacion):
         """Actualiza la información de la habitación"""
+        self.reconstruir(habitacion)
+        self.update()
+    
+    def reconstruir(self, habitacion: Habitacion, registro: Registro = None):
+        """Rearma el contenido de la tarjeta sin enviarlo a la página"""
         self.habitacion = habitacion
+        self.registro = registro
         self._build()
-        self.update()
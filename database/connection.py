@@ -3,12 +3,25 @@ Módulo de conexión y gestión de la base de datos SQLite
 """
 import sqlite3
 import os
+import threading
 from datetime import datetime
 from typing import Optional, List, Dict, Any, Tuple
 from contextlib import contextmanager
+from utils.helpers import normalizar_referencia
 
-# Ruta de la base de datos
-DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'hotel.db')
+# Ruta de la base de datos (SGH_DB_PATH permite usar otra, por ejemplo en las pruebas)
+DB_PATH = os.environ.get('SGH_DB_PATH') or os.path.join(os.path.dirname(__file__), '..', 'hotel.db')
+
+# Pagos electrónicos con referencia, que no se repite en el mismo método
+PAGOS_CON_REFERENCIA = (
+    "Referencia_Norm <> '' AND Tipo = 'Pago' "
+    "AND Metodo_Pago IN ('Pago_Movil', 'Transferencia', 'Zelle', 'Binance')"
+)
+
+# Condición de idx_transacciones_referencia_unica (deja fuera las repetidas
+# que ya existían); las consultas que deben usar ese índice parcial la
+# repiten tal cual
+REFERENCIA_UNICA = f"{PAGOS_CON_REFERENCIA} AND Referencia_Repetida = 0"
 
 class Database:
     """Clase singleton para gestionar la conexión a la base de datos"""
@@ -25,6 +38,9 @@ class Database:
         if self._initialized:
             return
         self._initialized = True
+        # Rangos (desde, hasta] de IDs de Cambios que escribió este proceso
+        self._lock = threading.Lock()
+        self._cambios_propios: List[Tuple[int, int]] = []
         self._init_database()
     
     def _init_database(self):
@@ -42,7 +58,9 @@ class Database:
                     Telefono TEXT,
                     Email TEXT,
                     RIF TEXT,
-                    Fecha_Actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    Fecha_Actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    Fecha_Negocio DATE,
+                    Version INTEGER NOT NULL DEFAULT 0
                 )
             ''')
             
@@ -76,7 +94,12 @@ class Database:
                     Placa_Vehiculo TEXT,
                     Saldo_Acumulado REAL DEFAULT 0.0,
                     Fecha_Registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    Ultima_Visita TIMESTAMP
+                    Ultima_Visita TIMESTAMP,
+                    Visitas INTEGER NOT NULL DEFAULT 0,
+                    Noches_Totales INTEGER NOT NULL DEFAULT 0,
+                    Total_Gastado_USD REAL NOT NULL DEFAULT 0.0,
+                    Ultima_Habitacion INTEGER,
+                    Version INTEGER NOT NULL DEFAULT 0
                 )
             ''')
             
@@ -90,7 +113,9 @@ class Database:
                     Capacidad INTEGER DEFAULT 2,
                     Estado TEXT DEFAULT 'Libre' CHECK(Estado IN ('Libre', 'Ocupada', 'Reservada', 'Aseo', 'Mantenimiento')),
                     Ultima_Limpieza TIMESTAMP,
-                    Notas TEXT
+                    Notas TEXT,
+                    Personal_Aseo_ID INTEGER REFERENCES Personal_Aseo(ID),
+                    Version INTEGER NOT NULL DEFAULT 0
                 )
             ''')
             
@@ -112,6 +137,9 @@ class Database:
                     Notas TEXT,
                     Usuario_Checkin_ID INTEGER,
                     Usuario_Checkout_ID INTEGER,
+                    Noches_Facturadas INTEGER NOT NULL DEFAULT 0,
+                    Sobreestadia INTEGER NOT NULL DEFAULT 0,
+                    Version INTEGER NOT NULL DEFAULT 0,
                     FOREIGN KEY (Huesped_Principal_ID) REFERENCES Huespedes(ID),
                     FOREIGN KEY (Habitacion_Numero) REFERENCES Habitaciones(Numero),
                     FOREIGN KEY (Usuario_Checkin_ID) REFERENCES Usuarios(ID),
@@ -142,6 +170,8 @@ class Database:
                     Monto_BS REAL NOT NULL,
                     Metodo_Pago TEXT NOT NULL CHECK(Metodo_Pago IN ('Efectivo_USD', 'Efectivo_BS', 'Pago_Movil', 'Transferencia', 'Tarjeta', 'Zelle', 'Binance', 'Ajuste')),
                     Referencia TEXT,
+                    Referencia_Norm TEXT,
+                    Referencia_Repetida INTEGER NOT NULL DEFAULT 0,
                     Tipo TEXT NOT NULL CHECK(Tipo IN ('Pago', 'Cargo', 'Ajuste', 'Reembolso')),
                     Concepto TEXT,
                     Fecha_Hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -191,6 +221,511 @@ class Database:
                 )
             ''')
             
+            # Columnas agregadas en versiones posteriores del esquema
+            for tabla in ('Configuracion', 'Huespedes', 'Habitaciones', 'Registros'):
+                self._agregar_columna(cursor, tabla, 'Version', 'INTEGER NOT NULL DEFAULT 0')
+            
+            # Estadísticas de fidelidad de cada huésped, acumuladas en cada check-out;
+            # el ranking lee los primeros del índice sin agregar el historial
+            for columna, definicion in (
+                ('Visitas', 'INTEGER NOT NULL DEFAULT 0'),
+                ('Noches_Totales', 'INTEGER NOT NULL DEFAULT 0'),
+                ('Total_Gastado_USD', 'REAL NOT NULL DEFAULT 0.0'),
+                ('Ultima_Habitacion', 'INTEGER'),
+            ):
+                self._agregar_columna(cursor, 'Huespedes', columna, definicion)
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_huespedes_gasto
+                ON Huespedes(Total_Gastado_USD DESC) WHERE Visitas > 0
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_huespedes_visitas
+                ON Huespedes(Visitas DESC, Noches_Totales DESC) WHERE Visitas > 0
+            ''')
+            
+            # Cuentas por cobrar: la deuda de cada huésped (saldo negativo) en
+            # tramos con la fecha de negocio en que nació cada uno. Los triggers
+            # llevan la suma de los tramos pendientes al valor de la deuda
+            # por cualquier camino que cambie Saldo_Acumulado: si crece se abre
+            # un tramo por la diferencia y si baja se cancelan primero los más
+            # antiguos
+            deudas_existia = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Deudas_Huesped'"
+            ).fetchone() is not None
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Deudas_Huesped (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Huesped_ID INTEGER NOT NULL,
+                    Fecha_Origen DATE NOT NULL,
+                    Monto_USD REAL NOT NULL,
+                    Saldo_USD REAL NOT NULL,
+                    FOREIGN KEY (Huesped_ID) REFERENCES Huespedes(ID)
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_deudas_pendientes
+                ON Deudas_Huesped(Huesped_ID, Fecha_Origen, Saldo_USD) WHERE Saldo_USD > 0
+            ''')
+            pendiente = '(SELECT TOTAL(Saldo_USD) FROM Deudas_Huesped WHERE Huesped_ID = NEW.ID AND Saldo_USD > 0)'
+            for operacion, sentencia in (('I', 'INSERT'), ('U', 'UPDATE OF Saldo_Acumulado')):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_deudas_crece_{operacion}
+                    AFTER {sentencia} ON Huespedes
+                    WHEN MAX(0, -NEW.Saldo_Acumulado) - {pendiente} > 0.005
+                    BEGIN
+                        INSERT INTO Deudas_Huesped (Huesped_ID, Fecha_Origen, Monto_USD, Saldo_USD)
+                        SELECT NEW.ID, COALESCE(
+                                   (SELECT Fecha_Negocio FROM Configuracion WHERE ID = 1),
+                                   date('now', 'localtime')
+                               ), d.Monto, d.Monto
+                        FROM (SELECT ROUND(MAX(0, -NEW.Saldo_Acumulado) - {pendiente}, 2) as Monto) d;
+                    END
+                ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_deudas_baja
+                AFTER UPDATE OF Saldo_Acumulado ON Huespedes
+                WHEN {pendiente} - MAX(0, -NEW.Saldo_Acumulado) > 0.005
+                BEGIN
+                    UPDATE Deudas_Huesped
+                    SET Saldo_USD = ROUND(MIN(Deudas_Huesped.Saldo_USD,
+                                              MAX(0, MAX(0, -NEW.Saldo_Acumulado) - p.Posteriores)), 2)
+                    FROM (
+                        SELECT ID, TOTAL(Saldo_USD) OVER (
+                                   ORDER BY Fecha_Origen DESC, ID DESC
+                                   ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                               ) as Posteriores
+                        FROM Deudas_Huesped
+                        WHERE Huesped_ID = NEW.ID AND Saldo_USD > 0
+                    ) p
+                    WHERE Deudas_Huesped.ID = p.ID;
+                END
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_deudas_huesped_eliminado
+                AFTER DELETE ON Huespedes
+                BEGIN
+                    DELETE FROM Deudas_Huesped WHERE Huesped_ID = OLD.ID;
+                END
+            ''')
+            if not deudas_existia:
+                # Las deudas anteriores no tienen fecha: se toma la última visita
+                cursor.execute('''
+                    INSERT INTO Deudas_Huesped (Huesped_ID, Fecha_Origen, Monto_USD, Saldo_USD)
+                    SELECT ID, date(COALESCE(Ultima_Visita, Fecha_Registro, 'now')),
+                           -Saldo_Acumulado, -Saldo_Acumulado
+                    FROM Huespedes WHERE Saldo_Acumulado < 0
+                ''')
+            
+            # Cualquier cambio en los tramos sube Version_Cartera: el reporte de
+            # antigüedad en caché se invalida con una sola lectura
+            self._agregar_columna(cursor, 'Configuracion', 'Version_Cartera', 'INTEGER NOT NULL DEFAULT 0')
+            for operacion, sentencia in (('I', 'INSERT'), ('U', 'UPDATE'), ('D', 'DELETE')):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_version_cartera_{operacion}
+                    AFTER {sentencia} ON Deudas_Huesped
+                    BEGIN
+                        UPDATE Configuracion SET Version_Cartera = Version_Cartera + 1;
+                    END
+                ''')
+            
+            # Conciliación bancaria: referencia normalizada de cada pago (la
+            # conciliación y la búsqueda de repetidas la leen por índice),
+            # extractos importados y el pago con que se concilió cada movimiento
+            if self._agregar_columna(cursor, 'Transacciones', 'Referencia_Norm', 'TEXT'):
+                cursor.executemany(
+                    'UPDATE Transacciones SET Referencia_Norm = ? WHERE ID = ?',
+                    [(normalizar_referencia(row[1]), row[0]) for row in cursor.execute(
+                        "SELECT ID, Referencia FROM Transacciones WHERE Referencia IS NOT NULL AND Referencia <> ''"
+                    ).fetchall()]
+                )
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_transacciones_referencia
+                ON Transacciones(Referencia_Norm) WHERE Referencia_Norm <> ''
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_transacciones_fecha ON Transacciones(Fecha_Hora)')
+            
+            # Una referencia electrónica no se repite en dos pagos del mismo
+            # método. Las repetidas que ya existían quedan marcadas y fuera del
+            # índice único
+            if self._agregar_columna(cursor, 'Transacciones', 'Referencia_Repetida', 'INTEGER NOT NULL DEFAULT 0'):
+                cursor.execute(f'''
+                    UPDATE Transacciones SET Referencia_Repetida = 1
+                    WHERE {PAGOS_CON_REFERENCIA} AND ID NOT IN (
+                        SELECT MIN(ID) FROM Transacciones
+                        WHERE {PAGOS_CON_REFERENCIA}
+                        GROUP BY Metodo_Pago, Referencia_Norm
+                    )
+                ''')
+            cursor.execute(f'''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_transacciones_referencia_unica
+                ON Transacciones(Metodo_Pago, Referencia_Norm)
+                WHERE {REFERENCIA_UNICA}
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Conciliaciones (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Cuenta TEXT NOT NULL,
+                    Archivo TEXT,
+                    Fecha_Desde DATE,
+                    Fecha_Hasta DATE,
+                    Movimientos INTEGER NOT NULL DEFAULT 0,
+                    Conciliados INTEGER NOT NULL DEFAULT 0,
+                    Usuario_ID INTEGER,
+                    Fecha_Importacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (Usuario_ID) REFERENCES Usuarios(ID)
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Movimientos_Banco (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Conciliacion_ID INTEGER NOT NULL,
+                    Linea INTEGER NOT NULL,
+                    Fecha DATE NOT NULL,
+                    Referencia TEXT NOT NULL,
+                    Referencia_Norm TEXT NOT NULL,
+                    Monto REAL NOT NULL,
+                    Moneda TEXT NOT NULL CHECK(Moneda IN ('USD', 'BS')),
+                    Descripcion TEXT,
+                    Estado TEXT NOT NULL CHECK(Estado IN ('Conciliado', 'Sin_Pago', 'Diferencia', 'Duplicado')),
+                    Transaccion_ID INTEGER,
+                    Nota TEXT,
+                    FOREIGN KEY (Conciliacion_ID) REFERENCES Conciliaciones(ID) ON DELETE CASCADE,
+                    FOREIGN KEY (Transaccion_ID) REFERENCES Transacciones(ID)
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_movimientos_banco_referencia
+                ON Movimientos_Banco(Referencia_Norm, Fecha)
+            ''')
+            # Un pago se concilia con un solo movimiento
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_movimientos_banco_transaccion
+                ON Movimientos_Banco(Transaccion_ID) WHERE Transaccion_ID IS NOT NULL
+            ''')
+            
+            # Personal de aseo y habitación asignada a cada uno mientras está en aseo
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Personal_Aseo (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Nombre TEXT UNIQUE NOT NULL,
+                    Activo INTEGER DEFAULT 1
+                )
+            ''')
+            self._agregar_columna(cursor, 'Habitaciones', 'Personal_Aseo_ID', 'INTEGER REFERENCES Personal_Aseo(ID)')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_habitaciones_aseo
+                ON Habitaciones(Numero) WHERE Estado = 'Aseo'
+            ''')
+            # La asignación termina cuando la habitación sale de aseo, por
+            # cualquier camino (vista de aseo, dashboard u otra estación)
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_habitaciones_fin_aseo
+                AFTER UPDATE OF Estado ON Habitaciones
+                WHEN NEW.Estado <> 'Aseo' AND NEW.Personal_Aseo_ID IS NOT NULL
+                BEGIN
+                    UPDATE Habitaciones SET Personal_Aseo_ID = NULL WHERE Numero = NEW.Numero;
+                END
+            ''')
+            
+            # Fecha de negocio (la mueve solo la auditoría nocturna), noches ya
+            # facturadas de cada registro y marca de sobreestadía
+            self._agregar_columna(cursor, 'Configuracion', 'Fecha_Negocio', 'DATE')
+            self._agregar_columna(cursor, 'Registros', 'Sobreestadia', 'INTEGER NOT NULL DEFAULT 0')
+            if self._agregar_columna(cursor, 'Registros', 'Noches_Facturadas', 'INTEGER NOT NULL DEFAULT 0'):
+                # Los registros anteriores cobraron todas sus noches en el check-in
+                cursor.execute('''
+                    UPDATE Registros SET Noches_Facturadas = COALESCE((
+                        SELECT MAX(1, CAST(ROUND(Registros.Total_Habitacion_USD / hb.Precio_USD) AS INTEGER))
+                        FROM Habitaciones hb
+                        WHERE hb.Numero = Registros.Habitacion_Numero AND hb.Precio_USD > 0
+                    ), 1)
+                ''')
+            
+            # Salidas del día y vencidas: solo interesan las estadías activas
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_registros_salida
+                ON Registros(Fecha_Salida_Prevista) WHERE Estado = 'Activo'
+            ''')
+            
+            # Tabla de Cargos por Noche (una fila por registro y fecha de negocio;
+            # la restricción UNIQUE hace idempotente la auditoría nocturna)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Cargos_Noche (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Registro_ID INTEGER NOT NULL,
+                    Fecha_Negocio DATE NOT NULL,
+                    Habitacion_Numero INTEGER NOT NULL,
+                    Monto_USD REAL NOT NULL,
+                    Facturado INTEGER NOT NULL DEFAULT 0,
+                    UNIQUE (Registro_ID, Fecha_Negocio),
+                    FOREIGN KEY (Registro_ID) REFERENCES Registros(ID),
+                    FOREIGN KEY (Habitacion_Numero) REFERENCES Habitaciones(Numero)
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_cargos_noche_fecha ON Cargos_Noche(Fecha_Negocio)')
+            
+            # Tabla de Folio (movimientos de cada registro con el saldo acumulado)
+            folio_existia = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Folio'"
+            ).fetchone() is not None
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Folio (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Registro_ID INTEGER NOT NULL,
+                    Tipo TEXT NOT NULL CHECK(Tipo IN ('Habitacion', 'Extra', 'Descuento', 'Pago', 'Transferencia')),
+                    Descripcion TEXT,
+                    Monto_USD REAL NOT NULL,
+                    Saldo_USD REAL NOT NULL,
+                    Fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    Usuario_ID INTEGER,
+                    Transaccion_ID INTEGER,
+                    FOREIGN KEY (Registro_ID) REFERENCES Registros(ID),
+                    FOREIGN KEY (Usuario_ID) REFERENCES Usuarios(ID),
+                    FOREIGN KEY (Transaccion_ID) REFERENCES Transacciones(ID)
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_folio_registro ON Folio(Registro_ID, ID)')
+            if not folio_existia:
+                # Abrir el folio de los registros anteriores con sus totales,
+                # en el orden en que se acumulan
+                for tipo, monto, saldo, condicion in (
+                    ('Habitacion', 'Total_Habitacion_USD', 'Total_Habitacion_USD', '1'),
+                    ('Extra', 'Total_Extras_USD',
+                     'Total_Habitacion_USD + Total_Extras_USD', 'Total_Extras_USD <> 0'),
+                    ('Descuento', '-Total_Descuentos_USD',
+                     'Total_Habitacion_USD + Total_Extras_USD - Total_Descuentos_USD',
+                     'Total_Descuentos_USD <> 0'),
+                    ('Pago', '-Total_Pagado_USD',
+                     'Total_Habitacion_USD + Total_Extras_USD - Total_Descuentos_USD - Total_Pagado_USD',
+                     'Total_Pagado_USD <> 0'),
+                ):
+                    cursor.execute(f'''
+                        INSERT INTO Folio (Registro_ID, Tipo, Descripcion, Monto_USD, Saldo_USD, Fecha)
+                        SELECT ID, '{tipo}', 'Saldo inicial', {monto}, {saldo}, Fecha_Entrada
+                        FROM Registros WHERE {condicion}
+                        ORDER BY ID
+                    ''')
+            
+            # Tabla de Catálogo de Cargos (artículos que se cargan a las habitaciones)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Catalogo_Cargos (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Codigo TEXT UNIQUE NOT NULL,
+                    Descripcion TEXT NOT NULL,
+                    Categoria TEXT NOT NULL CHECK(Categoria IN ('Minibar', 'Lavanderia', 'Restaurante', 'Otro')),
+                    Precio_USD REAL NOT NULL,
+                    Activo INTEGER DEFAULT 1
+                )
+            ''')
+            self._agregar_columna(cursor, 'Extras', 'Articulo_ID', 'INTEGER REFERENCES Catalogo_Cargos(ID)')
+            
+            # Tabla de Auditorías Nocturnas (resumen del día cerrado)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Auditorias_Nocturnas (
+                    Fecha_Negocio DATE PRIMARY KEY,
+                    Fecha_Ejecucion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    Usuario_ID INTEGER,
+                    Habitaciones_Ocupadas INTEGER NOT NULL DEFAULT 0,
+                    Total_Habitaciones INTEGER NOT NULL DEFAULT 0,
+                    Ingreso_Habitaciones_USD REAL NOT NULL DEFAULT 0.0,
+                    Noches_Adicionales INTEGER NOT NULL DEFAULT 0,
+                    Cargo_Adicional_USD REAL NOT NULL DEFAULT 0.0,
+                    Sobreestadias INTEGER NOT NULL DEFAULT 0,
+                    FOREIGN KEY (Usuario_ID) REFERENCES Usuarios(ID)
+                )
+            ''')
+            
+            # Tabla de Reservas (noches [Fecha_Llegada, Fecha_Salida) de una habitación)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Reservas (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Habitacion_Numero INTEGER NOT NULL,
+                    Huesped_ID INTEGER NOT NULL,
+                    Fecha_Llegada DATE NOT NULL,
+                    Fecha_Salida DATE NOT NULL,
+                    Estado TEXT NOT NULL DEFAULT 'Confirmada' CHECK(Estado IN ('Confirmada', 'Ingresada', 'Cancelada')),
+                    Notas TEXT,
+                    Usuario_ID INTEGER,
+                    Registro_ID INTEGER,
+                    Fecha_Creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    Version INTEGER NOT NULL DEFAULT 0,
+                    CHECK (Fecha_Salida > Fecha_Llegada),
+                    FOREIGN KEY (Habitacion_Numero) REFERENCES Habitaciones(Numero),
+                    FOREIGN KEY (Huesped_ID) REFERENCES Huespedes(ID),
+                    FOREIGN KEY (Usuario_ID) REFERENCES Usuarios(ID),
+                    FOREIGN KEY (Registro_ID) REFERENCES Registros(ID)
+                )
+            ''')
+            # Solo las reservas confirmadas ocupan noches; el índice parcial
+            # sirve a la verificación de cruces sin cargar las históricas
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_reservas_habitacion
+                ON Reservas(Habitacion_Numero, Fecha_Llegada) WHERE Estado = 'Confirmada'
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_reservas_huesped ON Reservas(Huesped_ID)')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_reservas_llegada
+                ON Reservas(Fecha_Llegada) WHERE Estado = 'Confirmada'
+            ''')
+            
+            # Órdenes de mantenimiento: la habitación queda fuera de servicio las
+            # noches [Fecha_Desde, Fecha_Hasta) mientras la orden está abierta
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Mantenimientos (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Habitacion_Numero INTEGER NOT NULL,
+                    Motivo TEXT NOT NULL,
+                    Fecha_Desde DATE NOT NULL,
+                    Fecha_Hasta DATE NOT NULL,
+                    Estado TEXT NOT NULL DEFAULT 'Abierto' CHECK(Estado IN ('Abierto', 'Cerrado')),
+                    Notas TEXT,
+                    Usuario_ID INTEGER,
+                    Fecha_Creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    Fecha_Cierre TIMESTAMP,
+                    Version INTEGER NOT NULL DEFAULT 0,
+                    CHECK (Fecha_Hasta > Fecha_Desde),
+                    FOREIGN KEY (Habitacion_Numero) REFERENCES Habitaciones(Numero),
+                    FOREIGN KEY (Usuario_ID) REFERENCES Usuarios(ID)
+                )
+            ''')
+            # El anti-join de disponibilidad solo mira las órdenes abiertas; el
+            # historial por habitación usa el índice completo
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_mantenimientos_abiertos
+                ON Mantenimientos(Habitacion_Numero, Fecha_Desde, Fecha_Hasta) WHERE Estado = 'Abierto'
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_mantenimientos_habitacion
+                ON Mantenimientos(Habitacion_Numero, Fecha_Desde)
+            ''')
+            
+            # Planes de tarifa por tipo de habitación (el plan "Estándar" implícito
+            # es el Precio_USD de la habitación)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Tarifas (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Nombre TEXT NOT NULL,
+                    Tipo_Habitacion TEXT NOT NULL,
+                    Precio_Semana_USD REAL NOT NULL,
+                    Precio_Fin_Semana_USD REAL NOT NULL,
+                    Activo INTEGER DEFAULT 1,
+                    UNIQUE (Nombre, Tipo_Habitacion)
+                )
+            ''')
+            
+            # Temporadas: ajuste porcentual de todas las tarifas en las noches [Desde, Hasta]
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Temporadas (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Nombre TEXT NOT NULL,
+                    Fecha_Desde DATE NOT NULL,
+                    Fecha_Hasta DATE NOT NULL,
+                    Ajuste_Pct REAL NOT NULL,
+                    CHECK (Fecha_Hasta >= Fecha_Desde),
+                    CHECK (Ajuste_Pct > -100)
+                )
+            ''')
+            
+            # Descuentos por duración de la estadía (aplica el de mayor mínimo alcanzado)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Descuentos_Estadia (
+                    Noches_Minimas INTEGER PRIMARY KEY CHECK(Noches_Minimas > 1),
+                    Descuento_Pct REAL NOT NULL CHECK(Descuento_Pct > 0 AND Descuento_Pct < 100)
+                )
+            ''')
+            
+            # Cualquier cambio de reglas sube Version_Tarifas, así cada estación
+            # sabe con una sola lectura si su calendario de precios quedó viejo
+            self._agregar_columna(cursor, 'Configuracion', 'Version_Tarifas', 'INTEGER NOT NULL DEFAULT 0')
+            for tabla in ('Tarifas', 'Temporadas', 'Descuentos_Estadia'):
+                for operacion, sentencia in (('I', 'INSERT'), ('U', 'UPDATE'), ('D', 'DELETE')):
+                    cursor.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS trg_version_tarifas_{tabla}_{operacion}
+                        AFTER {sentencia} ON {tabla}
+                        BEGIN
+                            UPDATE Configuracion SET Version_Tarifas = Version_Tarifas + 1;
+                        END
+                    ''')
+            
+            # Plan de tarifa con que se hizo el check-in (NULL = "Estándar"): la
+            # auditoría nocturna cobra las noches con ese plan
+            self._agregar_columna(cursor, 'Registros', 'Tarifa_ID', 'INTEGER REFERENCES Tarifas(ID)')
+
+            # Tabla de Cambios (registro de cambios alimentado por triggers; el ID es la
+            # secuencia creciente con la que los consumidores piden lo nuevo)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Cambios (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Tabla TEXT NOT NULL,
+                    Fila_ID INTEGER NOT NULL,
+                    Operacion TEXT NOT NULL CHECK(Operacion IN ('I', 'U', 'D')),
+                    Habitacion_Numero INTEGER,
+                    Fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_cambios_fila ON Cambios(Tabla, Fila_ID)')
+            for tabla, clave, habitacion in (
+                ('Habitaciones', 'Numero', '{fila}.Numero'),
+                ('Registros', 'ID', '{fila}.Habitacion_Numero'),
+                ('Transacciones', 'ID',
+                 '(SELECT Habitacion_Numero FROM Registros WHERE ID = {fila}.Registro_ID)'),
+                ('Huespedes', 'ID', 'NULL'),
+                ('Turnos', 'ID', 'NULL'),
+                ('Reservas', 'ID', '{fila}.Habitacion_Numero'),
+                ('Mantenimientos', 'ID', '{fila}.Habitacion_Numero'),
+            ):
+                for operacion, sentencia, fila in (('I', 'INSERT', 'NEW'), ('U', 'UPDATE', 'NEW'), ('D', 'DELETE', 'OLD')):
+                    cursor.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS trg_cambios_{tabla}_{operacion}
+                        AFTER {sentencia} ON {tabla}
+                        BEGIN
+                            INSERT INTO Cambios (Tabla, Fila_ID, Operacion, Habitacion_Numero)
+                            VALUES ('{tabla}', {fila}.{clave}, '{operacion}', {habitacion.format(fila=fila)});
+                        END
+                    ''')
+            
+            # Verificación de integridad de las cuentas: cada corrida guarda hasta
+            # qué cambio revisó y lo que encontró, así la siguiente revisa solo
+            # los registros tocados después y los que quedaron pendientes. Los
+            # índices sirven al cruce de pagos y folio
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Verificaciones_Integridad (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    Usuario_ID INTEGER,
+                    Completa INTEGER NOT NULL DEFAULT 0,
+                    Cursor_Cambios INTEGER NOT NULL,
+                    Registros_Revisados INTEGER NOT NULL DEFAULT 0,
+                    Discrepancias INTEGER NOT NULL DEFAULT 0,
+                    Reparadas INTEGER NOT NULL DEFAULT 0,
+                    FOREIGN KEY (Usuario_ID) REFERENCES Usuarios(ID)
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Discrepancias_Integridad (
+                    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Verificacion_ID INTEGER NOT NULL,
+                    Tipo TEXT NOT NULL,
+                    Registro_ID INTEGER,
+                    Transaccion_ID INTEGER,
+                    Registrado_USD REAL NOT NULL DEFAULT 0.0,
+                    Esperado_USD REAL NOT NULL DEFAULT 0.0,
+                    Detalle TEXT,
+                    Reparada INTEGER NOT NULL DEFAULT 0,
+                    FOREIGN KEY (Verificacion_ID) REFERENCES Verificaciones_Integridad(ID)
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_discrepancias_integridad
+                ON Discrepancias_Integridad(Verificacion_ID)
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_transacciones_registro ON Transacciones(Registro_ID)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_extras_registro ON Extras(Registro_ID)')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_folio_transaccion
+                ON Folio(Transaccion_ID) WHERE Transaccion_ID IS NOT NULL
+            ''')
+            
             # Insertar configuración inicial si no existe
             cursor.execute('SELECT COUNT(*) FROM Configuracion')
             if cursor.fetchone()[0] == 0:
@@ -231,8 +766,39 @@ class Database:
                     VALUES (?, ?, ?, ?, ?)
                 ''', habitaciones)
             
+            # Insertar catálogo de cargos de ejemplo si no existe
+            cursor.execute('SELECT COUNT(*) FROM Catalogo_Cargos')
+            if cursor.fetchone()[0] == 0:
+                cursor.executemany('''
+                    INSERT INTO Catalogo_Cargos (Codigo, Descripcion, Categoria, Precio_USD)
+                    VALUES (?, ?, ?, ?)
+                ''', [
+                    ('MB-AGUA', 'Agua mineral', 'Minibar', 1.5),
+                    ('MB-REFRESCO', 'Refresco', 'Minibar', 2.0),
+                    ('MB-CERVEZA', 'Cerveza', 'Minibar', 3.0),
+                    ('MB-SNACK', 'Snack', 'Minibar', 2.5),
+                    ('LAV-CAMISA', 'Lavado de camisa', 'Lavanderia', 3.0),
+                    ('LAV-PANTALON', 'Lavado de pantalón', 'Lavanderia', 4.0),
+                    ('LAV-KILO', 'Lavandería por kilo', 'Lavanderia', 5.0),
+                    ('REST-DESAYUNO', 'Desayuno', 'Restaurante', 8.0),
+                    ('REST-ALMUERZO', 'Almuerzo', 'Restaurante', 12.0),
+                    ('REST-CENA', 'Cena', 'Restaurante', 15.0),
+                ])
+            
             conn.commit()
     
+    @staticmethod
+    def _agregar_columna(cursor, tabla: str, columna: str, definicion: str) -> bool:
+        """
+        Agrega una columna a una tabla existente si todavía no la tiene.
+        Retorna True si la agregó, para poder completar los datos existentes.
+        """
+        columnas = {row[1] for row in cursor.execute(f'PRAGMA table_info({tabla})')}
+        if columna in columnas:
+            return False
+        cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}')
+        return True
+    
     @contextmanager
     def get_connection(self):
         """Context manager para obtener una conexión a la base de datos"""
@@ -243,20 +809,71 @@ class Database:
         finally:
             conn.close()
     
+    @contextmanager
+    def transaction(self):
+        """
+        Context manager para ejecutar varias operaciones en una sola transacción.
+        Hace commit al salir sin errores y rollback si ocurre una excepción.
+        """
+        conn = sqlite3.connect(DB_PATH, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            # IMMEDIATE toma el bloqueo de escritura al inicio y evita
+            # interbloqueos entre estaciones que leen y luego escriben; con el
+            # bloqueo tomado, los cambios que se anoten hasta el commit son
+            # todos de esta transacción
+            conn.execute('BEGIN IMMEDIATE')
+            desde = self._ultimo_cambio(conn)
+            yield conn
+            hasta = self._ultimo_cambio(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        self._anotar_cambios_propios(desde, hasta)
+    
+    @staticmethod
+    def _ultimo_cambio(conn: sqlite3.Connection) -> int:
+        return conn.execute('SELECT COALESCE(MAX(ID), 0) FROM Cambios').fetchone()[0]
+    
+    def _anotar_cambios_propios(self, desde: int, hasta: int) -> None:
+        """Recuerda que los cambios (desde, hasta] los confirmó este proceso"""
+        if hasta <= desde:
+            return
+        with self._lock:
+            if self._cambios_propios and self._cambios_propios[-1][1] == desde:
+                self._cambios_propios[-1] = (self._cambios_propios[-1][0], hasta)
+            else:
+                self._cambios_propios.append((desde, hasta))
+    
+    def tomar_cambios_propios(self, hasta: int) -> List[Tuple[int, int]]:
+        """
+        Retorna los rangos (desde, hasta] de cambios confirmados por este
+        proceso hasta la secuencia `hasta` y los olvida. El monitor de
+        cambios los usa para no volver a publicar lo que ya se publicó aquí.
+        """
+        with self._lock:
+            tomados = [(d, min(h, hasta)) for d, h in self._cambios_propios if d < hasta]
+            self._cambios_propios = [(max(d, hasta), h) for d, h in self._cambios_propios if h > hasta]
+        return tomados
+
     def execute(self, query: str, params: Tuple = ()) -> int:
         """Ejecuta una consulta y retorna el ID de la última fila insertada"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            conn.commit()
-            return cursor.lastrowid
+        with self.transaction() as conn:
+            return conn.execute(query, params).lastrowid
     
+    def execute_update(self, query: str, params: Tuple = ()) -> int:
+        """Ejecuta una actualización y retorna el número de filas afectadas"""
+        with self.transaction() as conn:
+            return conn.execute(query, params).rowcount
+
     def execute_many(self, query: str, params_list: List[Tuple]) -> None:
         """Ejecuta una consulta múltiple"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.executemany(query, params_list)
-            conn.commit()
+        with self.transaction() as conn:
+            conn.executemany(query, params_list)
     
     def fetch_one(self, query: str, params: Tuple = ()) -> Optional[Dict[str, Any]]:
         """Obtiene una sola fila como diccionario"""
@@ -274,6 +891,22 @@ class Database:
             rows = cursor.fetchall()
             return [dict(row) for row in rows]
     
+    def fetch_all_in(self, query: str, valores, lote: int = 500) -> List[Dict[str, Any]]:
+        """
+        Obtiene las filas de una consulta con `IN ({marcadores})` para una
+        lista de valores, partiéndola en lotes para no superar el límite de
+        parámetros de SQLite
+        """
+        valores = list(valores)
+        resultado = []
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            for i in range(0, len(valores), lote):
+                parte = valores[i:i + lote]
+                cursor.execute(query.format(marcadores=', '.join('?' * len(parte))), parte)
+                resultado.extend(dict(row) for row in cursor.fetchall())
+        return resultado
+    
     def fetch_scalar(self, query: str, params: Tuple = ()) -> Any:
         """Obtiene un valor escalar"""
         with self.get_connection() as conn:
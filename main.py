@@ -18,6 +18,7 @@ Versión: 1.0.0
 import flet as ft
 import os
 import sys
+from datetime import date
 
 # Asegurar que el directorio del proyecto esté en el path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -30,11 +31,27 @@ from views.checkout_view import CheckoutView
 from views.huespedes_view import HuespedesView
 from views.turno_view import TurnoView
 from views.config_view import ConfigView
+from views.grupo_view import GrupoView
+from views.reservas_view import ReservasView
+from views.calendario_view import CalendarioView
+from views.aseo_view import AseoView
+from views.mantenimiento_view import MantenimientoView
+from views.conciliacion_view import ConciliacionView
 
 # Importar modelos y utilidades
 from models.habitacion import Habitacion, EstadoHabitacion
+from models.base import ConflictoConcurrencia
 from models.registro import Registro
 from models.turno import Turno
+from models.cambios import iniciar_monitor_cambios, compactar_cambios
+from models.auditoria import ejecutar_auditoria_nocturna, obtener_fecha_negocio
+from models.integridad import verificar_integridad
+from models.reserva import get_indice_reservas
+from models.disponibilidad import get_matriz_disponibilidad
+from models.asignacion import get_asignador
+from models.movimientos import get_tablero_movimientos
+from models.aseo import get_cola_aseo
+from models.mantenimiento import Mantenimiento
 from utils.session import session
 
 class HotelApp:
@@ -43,6 +60,7 @@ class HotelApp:
     def __init__(self):
         self.page: ft.Page = None
         self.current_view = None
+        self.dashboard: DashboardView = None
     
     def main(self, page: ft.Page):
         """Punto de entrada principal de la aplicación"""
@@ -61,6 +79,23 @@ class HotelApp:
         # Tema personalizado
         page.theme = ft.Theme(color_scheme_seed=ft.Colors.BLUE)
         
+        # Recibir los cambios hechos desde otras estaciones, compactando
+        # antes el registro de cambios para que no crezca sin límite
+        compactar_cambios()
+        iniciar_monitor_cambios()
+        
+        # Índice de reservas, matriz de disponibilidad y fichas del asignador
+        # en memoria; luego se mantienen con los eventos
+        get_indice_reservas()
+        get_matriz_disponibilidad()
+        get_asignador()
+        
+        # Llegadas y salidas del día; un hilo marca las salidas vencidas
+        get_tablero_movimientos().iniciar()
+        
+        # Cola de aseo por prioridad de llegada
+        get_cola_aseo()
+        
         # Verificar autenticación inicial
         self._check_auth()
     
@@ -88,12 +123,16 @@ class HotelApp:
         self._show_dashboard()
     
     def _show_dashboard(self):
-        """Muestra el dashboard principal"""
-        dashboard = DashboardView(
-            on_room_click=self._on_room_click,
-            on_menu_click=self._on_menu_click
-        )
-        self._navigate_to(dashboard)
+        """
+        Muestra el dashboard principal. Se crea una sola vez por sesión y se
+        mantiene al día con los eventos de los modelos, sin reconstruirlo
+        """
+        if self.dashboard is None:
+            self.dashboard = DashboardView(
+                on_room_click=self._on_room_click,
+                on_menu_click=self._on_menu_click
+            )
+        self._navigate_to(self.dashboard)
     
     def _on_room_click(self, habitacion: Habitacion):
         """Maneja el clic en una habitación"""
@@ -130,13 +169,20 @@ class HotelApp:
     def _show_limpieza_dialog(self, habitacion: Habitacion):
         """Muestra diálogo para habitación en aseo"""
         def marcar_lista(e):
-            habitacion.cambiar_estado(EstadoHabitacion.LIBRE)
             dialog.open = False
-            self._show_dashboard()
+            if self._cambiar_estado_habitacion(habitacion, EstadoHabitacion.LIBRE):
+                self._show_dashboard()
+        
+        tarea = next((t for t in get_cola_aseo().tareas() if t.numero == habitacion.numero), None)
+        detalle = []
+        if tarea and tarea.personal_nombre:
+            detalle.append(ft.Text(f"Asignada a: {tarea.personal_nombre}"))
+        if tarea and tarea.llega_hoy:
+            detalle.append(ft.Text("Tiene una llegada hoy", color=ft.Colors.RED, weight=ft.FontWeight.BOLD))
         
         dialog = ft.AlertDialog(
             title=ft.Text(f"Habitación {habitacion.numero:03d} - En Aseo"),
-            content=ft.Text("¿Marcar habitación como lista?"),
+            content=ft.Column(detalle + [ft.Text("¿Marcar habitación como lista?")], tight=True),
             actions=[
                 ft.TextButton("Cancelar", on_click=lambda e: setattr(dialog, 'open', False)),
                 ft.ElevatedButton("Marcar como Lista", on_click=marcar_lista)
@@ -148,15 +194,34 @@ class HotelApp:
         self.page.update()
     
     def _show_mantenimiento_dialog(self, habitacion: Habitacion):
-        """Muestra diálogo para habitación en mantenimiento"""
+        """Muestra diálogo para habitación en mantenimiento; marcarla reparada cierra sus órdenes en curso"""
+        ordenes = [m for m in Mantenimiento.listar_abiertos(habitacion.numero) if m.fecha_desde <= date.today()]
+        
         def marcar_reparada(e):
-            habitacion.cambiar_estado(EstadoHabitacion.LIBRE)
             dialog.open = False
+            if not ordenes:
+                if self._cambiar_estado_habitacion(habitacion, EstadoHabitacion.LIBRE):
+                    self._show_dashboard()
+                return
+            try:
+                for orden in ordenes:
+                    orden.cerrar()
+            except (ConflictoConcurrencia, ValueError) as ex:
+                self.page.show_snack_bar(ft.SnackBar(content=ft.Text(str(ex)), bgcolor=ft.Colors.RED))
             self._show_dashboard()
         
+        detalle = [
+            ft.Text(
+                f"{m.motivo} - regreso previsto {m.fecha_hasta.strftime('%d/%m/%Y')}"
+                + (" (vencida)" if m.esta_vencido else ""),
+                color=ft.Colors.RED if m.esta_vencido else None
+            )
+            for m in ordenes
+        ]
+        
         dialog = ft.AlertDialog(
             title=ft.Text(f"Habitación {habitacion.numero:03d} - En Mantenimiento"),
-            content=ft.Text("¿Marcar habitación como reparada y lista?"),
+            content=ft.Column(detalle + [ft.Text("¿Marcar habitación como reparada y lista?")], tight=True),
             actions=[
                 ft.TextButton("Cancelar", on_click=lambda e: setattr(dialog, 'open', False)),
                 ft.ElevatedButton("Marcar como Reparada", on_click=marcar_reparada)
@@ -170,9 +235,9 @@ class HotelApp:
     def _show_reserva_dialog(self, habitacion: Habitacion):
         """Muestra diálogo para habitación reservada"""
         def convertir_ocupada(e):
-            habitacion.cambiar_estado(EstadoHabitacion.LIBRE)
             dialog.open = False
-            self._show_checkin(habitacion.numero)
+            if self._cambiar_estado_habitacion(habitacion, EstadoHabitacion.LIBRE):
+                self._show_checkin(habitacion.numero)
         
         dialog = ft.AlertDialog(
             title=ft.Text(f"Habitación {habitacion.numero:03d} - Reservada"),
@@ -187,6 +252,23 @@ class HotelApp:
         dialog.open = True
         self.page.update()
     
+    def _cambiar_estado_habitacion(self, habitacion: Habitacion, estado: EstadoHabitacion) -> bool:
+        """Cambia el estado de una habitación; si otra estación la modificó avisa y recarga"""
+        try:
+            habitacion.cambiar_estado(estado)
+            return True
+        except ConflictoConcurrencia:
+            self.page.show_snack_bar(
+                ft.SnackBar(
+                    content=ft.Text(f"La habitación {habitacion.numero:03d} fue modificada por otra estación"),
+                    bgcolor=ft.Colors.RED
+                )
+            )
+            if self.dashboard:
+                self.dashboard.actualizar_habitacion(habitacion.numero)
+            self._show_dashboard()
+            return False
+    
     def _show_turno_required(self):
         """Muestra mensaje de que se requiere turno abierto"""
         def ir_a_turno(e):
@@ -206,14 +288,136 @@ class HotelApp:
         dialog.open = True
         self.page.update()
     
+    def _show_auditoria_dialog(self):
+        """Confirma y ejecuta la auditoría nocturna, luego muestra el resumen del día"""
+        fecha = obtener_fecha_negocio()
+        
+        def ejecutar(e):
+            dialog.open = False
+            try:
+                resumen = ejecutar_auditoria_nocturna(session.usuario_id)
+            except ValueError as ex:
+                self.page.show_snack_bar(ft.SnackBar(content=ft.Text(str(ex)), bgcolor=ft.Colors.RED))
+                self.page.update()
+                return
+            
+            lineas = [
+                f"Ocupadas: {resumen.habitaciones_ocupadas}/{resumen.total_habitaciones} ({resumen.ocupacion:.1f}%)",
+                f"Ingreso de habitaciones: ${resumen.ingreso_habitaciones_usd:.2f}",
+                f"Tarifa promedio: ${resumen.tarifa_promedio_usd:.2f}",
+                f"Noches adicionales cargadas: {resumen.noches_adicionales} (${resumen.cargo_adicional_usd:.2f})",
+                f"Sobreestadías: {resumen.sobreestadias}",
+            ]
+            if resumen.habitaciones_sobreestadia:
+                lineas.append("Habitaciones: " + ", ".join(f"{n:03d}" for n in resumen.habitaciones_sobreestadia))
+            
+            resultado = ft.AlertDialog(
+                title=ft.Text(f"Auditoría del {resumen.fecha_negocio.strftime('%d/%m/%Y')}"),
+                content=ft.Column([ft.Text(linea) for linea in lineas], tight=True),
+                actions=[ft.ElevatedButton("Aceptar", on_click=lambda e: setattr(resultado, 'open', False))]
+            )
+            self.page.dialog = resultado
+            resultado.open = True
+            self.page.update()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text("Auditoría Nocturna"),
+            content=ft.Text(
+                f"Se cerrará el día de negocio {fecha.strftime('%d/%m/%Y')} y se cargará "
+                "una noche a cada habitación ocupada. ¿Continuar?"
+            ),
+            actions=[
+                ft.TextButton("Cancelar", on_click=lambda e: setattr(dialog, 'open', False)),
+                ft.ElevatedButton("Ejecutar", on_click=ejecutar)
+            ]
+        )
+        
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _show_integridad_dialog(self):
+        """Verifica los totales de los registros contra el folio y los pagos, y muestra lo encontrado"""
+        chk_completa = ft.Checkbox(label="Revisar todos los registros (no solo los modificados)")
+        chk_reparar = ft.Checkbox(label="Reparar totales y pagos sin línea en el folio")
+        
+        def ejecutar(e):
+            dialog.open = False
+            resultado = verificar_integridad(session.usuario_id, reparar=chk_reparar.value,
+                                             completa=chk_completa.value)
+            
+            lineas = [ft.Text(
+                f"Registros revisados: {resultado.registros_revisados} | "
+                f"Discrepancias: {len(resultado.discrepancias)} | "
+                f"Reparadas: {resultado.reparadas} ({resultado.segundos:.2f} s)",
+                weight=ft.FontWeight.BOLD
+            )]
+            for d in resultado.discrepancias[:100]:
+                lineas.append(ft.Text(
+                    f"{'✔ ' if d.reparada else ''}Registro {d.registro_id or '-'} - "
+                    f"{d.tipo.value.replace('_', ' ')}: {d.detalle}",
+                    size=12, color=ft.Colors.GREEN if d.reparada else ft.Colors.RED
+                ))
+            if not resultado.discrepancias:
+                lineas.append(ft.Text("Las cuentas cuadran"))
+            
+            reporte = ft.AlertDialog(
+                title=ft.Text("Integridad de Cuentas"),
+                content=ft.Container(
+                    content=ft.Column(lineas, scroll=ft.ScrollMode.AUTO),
+                    width=650, height=400
+                ),
+                actions=[ft.ElevatedButton("Aceptar", on_click=lambda e: setattr(reporte, 'open', False))]
+            )
+            self.page.dialog = reporte
+            reporte.open = True
+            self.page.update()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text("Integridad de Cuentas"),
+            content=ft.Column([
+                ft.Text("Se recalcularán los totales de los registros desde su folio y se "
+                        "cruzarán con los pagos y los cargos."),
+                chk_completa,
+                chk_reparar,
+            ], tight=True),
+            actions=[
+                ft.TextButton("Cancelar", on_click=lambda e: setattr(dialog, 'open', False)),
+                ft.ElevatedButton("Verificar", on_click=ejecutar)
+            ]
+        )
+        
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
     def _on_menu_click(self, option: str):
         """Maneja las opciones del menú"""
         if option == "checkin":
             self._show_checkin()
         elif option == "huespedes":
             self._show_huespedes()
+        elif option == "reservas":
+            self._show_reservas()
+        elif option == "calendario":
+            self._show_calendario()
+        elif option == "grupos":
+            if not session.tiene_turno_abierto:
+                self._show_turno_required()
+                return
+            self._show_grupos()
+        elif option == "aseo":
+            self._show_aseo()
+        elif option == "mantenimiento":
+            self._show_mantenimiento()
+        elif option == "conciliacion":
+            self._show_conciliacion()
+        elif option == "integridad":
+            self._show_integridad_dialog()
         elif option == "turno":
             self._show_turno()
+        elif option == "auditoria":
+            self._show_auditoria_dialog()
         elif option == "config":
             self._show_config()
         elif option == "logout":
@@ -237,6 +441,39 @@ class HotelApp:
         )
         self._navigate_to(checkout)
     
+    def _show_reservas(self):
+        """Muestra la vista de reservas"""
+        reservas = ReservasView(on_back=self._show_dashboard)
+        self._navigate_to(reservas)
+    
+    def _show_calendario(self):
+        """Muestra el calendario de disponibilidad"""
+        calendario = CalendarioView(on_back=self._show_dashboard)
+        self._navigate_to(calendario)
+    
+    def _show_grupos(self):
+        """Muestra la vista de check-in y check-out de grupos"""
+        grupos = GrupoView(
+            on_complete=self._show_dashboard,
+            on_cancel=self._show_dashboard
+        )
+        self._navigate_to(grupos)
+    
+    def _show_aseo(self):
+        """Muestra la cola de trabajo del personal de aseo"""
+        aseo = AseoView(on_back=self._show_dashboard)
+        self._navigate_to(aseo)
+    
+    def _show_mantenimiento(self):
+        """Muestra las órdenes de mantenimiento y su historial"""
+        mantenimiento = MantenimientoView(on_back=self._show_dashboard)
+        self._navigate_to(mantenimiento)
+    
+    def _show_conciliacion(self):
+        """Muestra la conciliación de extractos bancarios"""
+        conciliacion = ConciliacionView(on_back=self._show_dashboard)
+        self._navigate_to(conciliacion)
+    
     def _show_huespedes(self):
         """Muestra la vista de gestión de huéspedes"""
         huespedes = HuespedesView(
@@ -261,6 +498,7 @@ class HotelApp:
             def confirmar(e):
                 dialog.open = False
                 session.logout()
+                self.dashboard = None
                 self._show_login()
             
             dialog = ft.AlertDialog(
@@ -277,6 +515,7 @@ class HotelApp:
             self.page.update()
         else:
             session.logout()
+            self.dashboard = None
             self._show_login()
     
     def _navigate_to(self, view):
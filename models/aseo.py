@@ -0,0 +1,288 @@
+"""
+Cola de trabajo de aseo y reparto de habitaciones entre el personal
+
+Las habitaciones en estado Aseo se ordenan por prioridad: primero las que
+tienen una llegada más próxima y, entre ellas, las que llevan más tiempo
+sucias (Ultima_Limpieza guarda la hora del check-out que las dejó en
+aseo). La cola vive en memoria en montículos, uno por persona más uno de
+habitaciones sin asignar, y se mantiene con los eventos de habitación y
+reserva como los índices de disponibilidad.
+"""
+import heapq
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, List, Optional, Set, Tuple
+from database.connection import db
+from models.base import SeguimientoCambios
+from utils.eventos import bus, HabitacionCambiada, ReservaCambiada
+
+# Días hasta la próxima llegada que se usan cuando la habitación no tiene ninguna
+SIN_LLEGADA = 9999
+
+def piso_de(numero: int) -> int:
+    """Piso de una habitación según su número (101 -> 1, 1205 -> 12)"""
+    return numero // 100
+
+def _fecha_hora(valor) -> Optional[datetime]:
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    return datetime.fromisoformat(str(valor))
+
+@dataclass
+class PersonalAseo(SeguimientoCambios):
+    nombre: str
+    activo: bool = True
+    id: Optional[int] = None
+    
+    _tabla = 'Personal_Aseo'
+    _columnas = {
+        'nombre': 'Nombre',
+        'activo': 'Activo',
+    }
+    
+    def guardar(self) -> int:
+        """Guarda la persona; en una actualización solo escribe los campos modificados"""
+        self.nombre = self.nombre.strip()
+        if not self.nombre:
+            raise ValueError("El nombre es obligatorio")
+        if self.id:
+            self._guardar_cambios()
+            return self.id
+        self.id = db.execute('INSERT INTO Personal_Aseo (Nombre, Activo) VALUES (?, ?)',
+                             (self.nombre, 1 if self.activo else 0))
+        self._marcar_limpio()
+        return self.id
+    
+    @staticmethod
+    def listar_todos() -> List['PersonalAseo']:
+        rows = db.fetch_all('SELECT * FROM Personal_Aseo ORDER BY Nombre')
+        return [PersonalAseo._from_row(row) for row in rows]
+    
+    @staticmethod
+    def listar_activos() -> List['PersonalAseo']:
+        rows = db.fetch_all('SELECT * FROM Personal_Aseo WHERE Activo = 1 ORDER BY Nombre')
+        return [PersonalAseo._from_row(row) for row in rows]
+    
+    @staticmethod
+    def _from_row(row: dict) -> 'PersonalAseo':
+        persona = PersonalAseo(id=row['ID'], nombre=row['Nombre'], activo=bool(row['Activo']))
+        persona._marcar_limpio()
+        return persona
+
+
+@dataclass
+class TareaAseo:
+    """Una habitación en aseo con los datos que definen su prioridad"""
+    numero: int
+    tipo: str
+    sucia_desde: Optional[datetime]
+    proxima_llegada: Optional[date]
+    personal_id: Optional[int] = None
+    personal_nombre: str = ""
+    
+    @property
+    def piso(self) -> int:
+        return piso_de(self.numero)
+    
+    @property
+    def llega_hoy(self) -> bool:
+        return self.proxima_llegada is not None and self.proxima_llegada <= date.today()
+    
+    @property
+    def clave(self) -> Tuple:
+        """Orden de la cola: menor es más urgente"""
+        dias = (self.proxima_llegada - date.today()).days if self.proxima_llegada else SIN_LLEGADA
+        return (dias, self.sucia_desde or datetime.min, self.numero)
+
+
+class ColaAseo:
+    """
+    Montículos de tareas por persona asignada (None = sin asignar). Las
+    entradas viejas no se borran del montículo: al mirar el tope se
+    descartan las que ya no coinciden con la tarea vigente de la habitación.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fecha: Optional[date] = None
+        self._tareas: Dict[int, TareaAseo] = {}
+        self._monticulos: Dict[Optional[int], List[Tuple]] = {}
+        self._pendientes: Set[int] = set()
+    
+    @staticmethod
+    def _leer(numeros: Optional[List[int]] = None) -> Dict[int, TareaAseo]:
+        # La próxima llegada sale de idx_reservas_habitacion y las habitaciones
+        # en aseo de idx_habitaciones_aseo
+        query = '''
+            SELECT h.Numero, h.Tipo, h.Ultima_Limpieza, h.Personal_Aseo_ID, p.Nombre as Personal,
+                   (SELECT MIN(r.Fecha_Llegada) FROM Reservas r
+                    WHERE r.Habitacion_Numero = h.Numero AND r.Estado = 'Confirmada'
+                      AND r.Fecha_Llegada >= date('now', 'localtime')) as Proxima_Llegada
+            FROM Habitaciones h
+            LEFT JOIN Personal_Aseo p ON p.ID = h.Personal_Aseo_ID
+            WHERE h.Estado = 'Aseo'
+        '''
+        if numeros is None:
+            rows = db.fetch_all(query)
+        else:
+            rows = db.fetch_all_in(query + ' AND h.Numero IN ({marcadores})', numeros)
+        return {
+            row['Numero']: TareaAseo(
+                numero=row['Numero'],
+                tipo=row['Tipo'],
+                sucia_desde=_fecha_hora(row['Ultima_Limpieza']),
+                proxima_llegada=date.fromisoformat(row['Proxima_Llegada'][:10]) if row['Proxima_Llegada'] else None,
+                personal_id=row['Personal_Aseo_ID'],
+                personal_nombre=row['Personal'] or ""
+            )
+            for row in rows
+        }
+    
+    def _poner(self, tarea: TareaAseo) -> None:
+        heapq.heappush(self._monticulos.setdefault(tarea.personal_id, []),
+                       (tarea.clave, tarea.numero, tarea.personal_id))
+    
+    def cargar(self) -> None:
+        tareas = self._leer()
+        with self._lock:
+            self._fecha = date.today()
+            self._tareas = tareas
+            self._monticulos = {}
+            for tarea in tareas.values():
+                self._poner(tarea)
+    
+    def suscribir(self) -> None:
+        bus.suscribir(HabitacionCambiada, self._on_habitacion_cambiada)
+        bus.suscribir(ReservaCambiada, self._on_reserva_cambiada)
+    
+    def _on_habitacion_cambiada(self, evento: HabitacionCambiada) -> None:
+        with self._lock:
+            self._pendientes.add(evento.numero)
+    
+    def _on_reserva_cambiada(self, evento: ReservaCambiada) -> None:
+        with self._lock:
+            self._pendientes.add(evento.habitacion_numero)
+    
+    def _refrescar(self) -> None:
+        """Relee las habitaciones pendientes; al cambiar el día cambian todas las prioridades"""
+        if self._fecha != date.today():
+            self.cargar()
+            return
+        with self._lock:
+            if not self._pendientes:
+                return
+            numeros, self._pendientes = list(self._pendientes), set()
+        tareas = self._leer(numeros)
+        with self._lock:
+            for numero in numeros:
+                tarea = tareas.get(numero)
+                if tarea is None:
+                    self._tareas.pop(numero, None)
+                    continue
+                anterior = self._tareas.get(numero)
+                self._tareas[numero] = tarea
+                if anterior is None or anterior.clave != tarea.clave or anterior.personal_id != tarea.personal_id:
+                    self._poner(tarea)
+    
+    def _tope(self, personal_id: Optional[int]) -> Optional[TareaAseo]:
+        """Tarea vigente más urgente del montículo (con el lock tomado)"""
+        monticulo = self._monticulos.get(personal_id, [])
+        while monticulo:
+            clave, numero, asignada = monticulo[0]
+            tarea = self._tareas.get(numero)
+            if tarea is not None and tarea.personal_id == asignada and tarea.clave == clave:
+                return tarea
+            heapq.heappop(monticulo)
+        return None
+    
+    def proxima(self, personal_id: Optional[int] = None) -> Optional[TareaAseo]:
+        """
+        Próxima habitación para una persona: la más urgente de las suyas o,
+        si no le queda ninguna, la más urgente sin asignar
+        """
+        self._refrescar()
+        with self._lock:
+            return (self._tope(personal_id) if personal_id is not None else None) or self._tope(None)
+    
+    def tareas(self, personal_id: Optional[int] = None) -> List[TareaAseo]:
+        """Tareas en orden de prioridad, todas o las de una persona"""
+        self._refrescar()
+        with self._lock:
+            tareas = [t for t in self._tareas.values() if personal_id is None or t.personal_id == personal_id]
+        return sorted(tareas, key=lambda t: t.clave)
+    
+    def instantanea(self) -> Tuple:
+        """
+        Estado compacto de la cola, para que una vista lo consulte seguido y
+        solo se redibuje cuando cambie
+        """
+        return tuple((t.numero, t.personal_id, t.clave[0]) for t in self.tareas())
+
+# Instancia global de la cola (lazy loading)
+_cola: Optional[ColaAseo] = None
+
+def get_cola_aseo() -> ColaAseo:
+    """Obtiene la cola global de aseo, cargándola si hace falta"""
+    global _cola
+    if _cola is None:
+        cola = ColaAseo()
+        cola.suscribir()
+        cola.cargar()
+        _cola = cola
+    return _cola
+
+def asignar_habitaciones(asignaciones: Dict[int, Optional[int]]) -> int:
+    """
+    Guarda la persona asignada a cada habitación (None la deja sin
+    asignar). Solo cambia las que siguen en aseo; retorna cuántas cambió.
+    """
+    if not asignaciones:
+        return 0
+    with db.transaction() as conn:
+        cambiadas = [
+            numero for numero, personal_id in asignaciones.items()
+            if conn.execute('''
+                UPDATE Habitaciones SET Personal_Aseo_ID = ?, Version = Version + 1
+                WHERE Numero = ? AND Estado = 'Aseo' AND Personal_Aseo_ID IS NOT ?
+            ''', (personal_id, numero, personal_id)).rowcount
+        ]
+    for numero in cambiadas:
+        bus.publicar(HabitacionCambiada(numero, 'Aseo'))
+    return len(cambiadas)
+
+def repartir_habitaciones(personal_ids: List[int], reasignar: bool = False,
+                          tolerancia: int = 1) -> Dict[int, int]:
+    """
+    Reparte las habitaciones en aseo entre las personas indicadas, en orden
+    de prioridad, para que todas tengan una carga parecida y cada una
+    trabaje en la menor cantidad de pisos: una habitación va a quien ya
+    tiene habitaciones en ese piso si su carga no supera en más de
+    `tolerancia` a la menor; si no, a quien tenga menos carga. Sin
+    `reasignar` se respetan las asignaciones vigentes de esas personas.
+    Retorna {numero: personal_id} de las habitaciones asignadas ahora.
+    """
+    if not personal_ids:
+        raise ValueError("Seleccione al menos una persona")
+    carga = {pid: 0 for pid in personal_ids}
+    pisos = {pid: Counter() for pid in personal_ids}
+    por_asignar = []
+    for tarea in get_cola_aseo().tareas():
+        if not reasignar and tarea.personal_id in carga:
+            carga[tarea.personal_id] += 1
+            pisos[tarea.personal_id][tarea.piso] += 1
+        else:
+            por_asignar.append(tarea)
+    
+    reparto: Dict[int, int] = {}
+    for tarea in por_asignar:
+        minimo = min(carga.values())
+        en_el_piso = [pid for pid in personal_ids if pisos[pid][tarea.piso] and carga[pid] <= minimo + tolerancia]
+        elegido = min(en_el_piso or personal_ids, key=lambda pid: (carga[pid], len(pisos[pid]), pid))
+        carga[elegido] += 1
+        pisos[elegido][tarea.piso] += 1
+        reparto[tarea.numero] = elegido
+    
+    asignar_habitaciones(reparto)
+    return reparto
@@ -0,0 +1,163 @@
+"""
+Asignación automática de habitaciones para walk-ins y grupos
+
+Los candidatos salen de la matriz de disponibilidad (las habitaciones del
+tipo pedido libres en todas las noches, con operaciones de bits) y se
+filtran con una ficha en memoria de cada habitación: capacidad, estado y
+último uso. Entre los candidatos se prefiere la habitación con la
+capacidad más justa y, a igual capacidad, la que lleva más tiempo sin usarse
+para repartir el desgaste. Un grupo se ubica en el bloque de números más
+compacto, recorriendo los candidatos ordenados con una ventana deslizante.
+"""
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, List, Optional, Set
+from database.connection import db
+from models.disponibilidad import get_matriz_disponibilidad
+from models.habitacion import EstadoHabitacion
+from utils.eventos import bus, HabitacionCambiada
+
+@dataclass
+class FichaHabitacion:
+    """Datos de una habitación que usa el asignador"""
+    numero: int
+    tipo: str
+    capacidad: int
+    estado: str
+    ultimo_uso: int  # ordinal del día del último check-out (0 = nunca usada)
+
+
+def _ordinal(valor) -> int:
+    if valor is None:
+        return 0
+    if isinstance(valor, (date, datetime)):
+        return valor.toordinal()
+    return date.fromisoformat(str(valor)[:10]).toordinal()
+
+
+class AsignadorHabitaciones:
+    """
+    Mantiene las fichas de las habitaciones en memoria; igual que los
+    índices de disponibilidad, un HabitacionCambiada (propio o de otra
+    estación) marca la habitación como pendiente y se relee antes de la
+    siguiente asignación.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fichas: Dict[int, FichaHabitacion] = {}
+        self._pendientes: Set[int] = set()
+    
+    @staticmethod
+    def _leer(numeros: Optional[List[int]] = None) -> Dict[int, FichaHabitacion]:
+        query = 'SELECT Numero, Tipo, Capacidad, Estado, Ultima_Limpieza FROM Habitaciones'
+        if numeros is None:
+            rows = db.fetch_all(query)
+        else:
+            rows = db.fetch_all_in(query + ' WHERE Numero IN ({marcadores})', numeros)
+        return {
+            row['Numero']: FichaHabitacion(row['Numero'], row['Tipo'], row['Capacidad'] or 1,
+                                           row['Estado'], _ordinal(row['Ultima_Limpieza']))
+            for row in rows
+        }
+    
+    def cargar(self) -> None:
+        fichas = self._leer()
+        with self._lock:
+            self._fichas = fichas
+    
+    def suscribir(self) -> None:
+        bus.suscribir(HabitacionCambiada, self._on_habitacion_cambiada)
+    
+    def _on_habitacion_cambiada(self, evento: HabitacionCambiada) -> None:
+        with self._lock:
+            self._pendientes.add(evento.numero)
+    
+    def _refrescar(self) -> None:
+        with self._lock:
+            if not self._pendientes:
+                return
+            numeros, self._pendientes = list(self._pendientes), set()
+        fichas = self._leer(numeros)
+        with self._lock:
+            for numero in numeros:
+                if numero in fichas:
+                    self._fichas[numero] = fichas[numero]
+                else:
+                    self._fichas.pop(numero, None)
+    
+    def candidatos(self, llegada: date, salida: date, tipo: Optional[str] = None,
+                   personas: int = 1) -> List[FichaHabitacion]:
+        """
+        Habitaciones libres en todo el rango con capacidad suficiente,
+        ordenadas por número. Si la llegada es hoy solo sirven las que están
+        en estado Libre (limpias y sin mantenimiento).
+        """
+        if salida <= llegada:
+            raise ValueError("La fecha de salida debe ser posterior a la de llegada")
+        libres = get_matriz_disponibilidad().habitaciones_libres(llegada, salida, tipo)
+        self._refrescar()
+        hoy = llegada <= date.today()
+        with self._lock:
+            fichas = (self._fichas.get(numero) for numero in libres)
+            return [
+                f for f in fichas
+                if f is not None and f.capacidad >= personas
+                and (not hoy or f.estado == EstadoHabitacion.LIBRE.value)
+            ]
+    
+    def asignar(self, llegada: date, salida: date, tipo: Optional[str] = None,
+                personas: int = 1) -> Optional[int]:
+        """Mejor habitación para una estadía, o None si no hay ninguna que sirva"""
+        candidatos = self.candidatos(llegada, salida, tipo, personas)
+        if not candidatos:
+            return None
+        mejor = min(candidatos, key=lambda f: (f.capacidad - personas, f.ultimo_uso, f.numero))
+        return mejor.numero
+    
+    def asignar_grupo(self, cantidad: int, llegada: date, salida: date, tipo: Optional[str] = None,
+                      personas: int = 1) -> List[int]:
+        """
+        Bloque de `cantidad` habitaciones para un grupo. Se elige la ventana
+        de candidatos consecutivos con menor distancia entre el primer y el
+        último número; a igual distancia, la de menos camas sobrantes y
+        luego la de uso más antiguo. Lanza ValueError si no alcanzan.
+        """
+        if cantidad <= 0:
+            return []
+        candidatos = self.candidatos(llegada, salida, tipo, personas)
+        if len(candidatos) < cantidad:
+            raise ValueError(
+                f"Solo hay {len(candidatos)} habitaciones disponibles para el grupo (se pidieron {cantidad})"
+            )
+        
+        # Sumas acumuladas para evaluar cada ventana en O(1)
+        sobrantes = [0]
+        usos = [0]
+        for f in candidatos:
+            sobrantes.append(sobrantes[-1] + f.capacidad - personas)
+            usos.append(usos[-1] + f.ultimo_uso)
+        
+        mejor_inicio = min(
+            range(len(candidatos) - cantidad + 1),
+            key=lambda i: (
+                candidatos[i + cantidad - 1].numero - candidatos[i].numero,
+                sobrantes[i + cantidad] - sobrantes[i],
+                usos[i + cantidad] - usos[i],
+            )
+        )
+        return [f.numero for f in candidatos[mejor_inicio:mejor_inicio + cantidad]]
+
+# Instancia global del asignador (lazy loading)
+_asignador: Optional[AsignadorHabitaciones] = None
+
+def get_asignador() -> AsignadorHabitaciones:
+    """Obtiene el asignador global, cargándolo si hace falta"""
+    global _asignador
+    if _asignador is None:
+        asignador = AsignadorHabitaciones()
+        asignador.suscribir()
+        asignador.cargar()
+        _asignador = asignador
+    return _asignador
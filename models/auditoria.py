@@ -0,0 +1,207 @@
+"""
+Auditoría nocturna: cierre del día de negocio
+
+El check-in factura por adelantado las noches previstas. Cada noche la
+auditoría registra en Cargos_Noche una noche por cada registro activo, lo
+que permite conocer el ingreso de habitaciones de cada día; las noches que
+pasan de las ya facturadas (estadías extendidas) se suman además al total
+del registro y a su folio. Cada noche se valora en el calendario de precios
+con el plan de tarifa del check-in (o el precio de la habitación si se usó
+el plan estándar). Luego marca las sobreestadías, guarda el resumen
+del día y avanza la fecha de negocio, todo en una sola transacción.
+
+Ejecutarla dos veces para la misma fecha no duplica cargos: la segunda vez
+retorna el resumen ya guardado.
+"""
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+from database.connection import db
+from models.mantenimiento import iniciar_mantenimientos
+from models.tarifas import CalendarioPrecios, get_calendario_precios
+from utils.eventos import bus, HabitacionCambiada
+
+@dataclass
+class ResumenAuditoria:
+    fecha_negocio: date
+    habitaciones_ocupadas: int = 0
+    total_habitaciones: int = 0
+    ingreso_habitaciones_usd: float = 0.0
+    noches_adicionales: int = 0
+    cargo_adicional_usd: float = 0.0
+    sobreestadias: int = 0
+    fecha_ejecucion: Optional[datetime] = None
+    usuario_id: Optional[int] = None
+    habitaciones_sobreestadia: List[int] = field(default_factory=list)
+
+    @property
+    def ocupacion(self) -> float:
+        """Porcentaje de habitaciones ocupadas"""
+        if not self.total_habitaciones:
+            return 0.0
+        return self.habitaciones_ocupadas * 100.0 / self.total_habitaciones
+
+    @property
+    def tarifa_promedio_usd(self) -> float:
+        """Ingreso promedio por habitación ocupada (ADR)"""
+        if not self.habitaciones_ocupadas:
+            return 0.0
+        return self.ingreso_habitaciones_usd / self.habitaciones_ocupadas
+
+def obtener_fecha_negocio(conn: Optional[sqlite3.Connection] = None) -> date:
+    """Retorna la fecha de negocio actual (hoy si nunca se corrió la auditoría)"""
+    query = 'SELECT Fecha_Negocio FROM Configuracion WHERE ID = 1'
+    if conn is not None:
+        row = conn.execute(query).fetchone()
+        valor = row[0] if row else None
+    else:
+        valor = db.fetch_scalar(query)
+    if not valor:
+        return date.today()
+    return date.fromisoformat(str(valor)[:10])
+
+def _precio_noche(calendario: CalendarioPrecios, fecha: date, precio_habitacion: float,
+                  tarifa_id: Optional[int]) -> float:
+    """Precio de la noche `fecha` con el plan del registro (sin plan, el de la habitación)"""
+    tarifa = calendario.tarifa(tarifa_id) if tarifa_id else None
+    return calendario.cotizar(fecha, fecha + timedelta(days=1), precio_habitacion, tarifa).total_usd
+
+def ejecutar_auditoria_nocturna(usuario_id: Optional[int] = None) -> ResumenAuditoria:
+    """
+    Cierra la fecha de negocio actual y la avanza un día. Si otra estación
+    ya la cerró retorna ese resumen sin volver a cargar. No permite cerrar
+    un día que todavía no llegó.
+    """
+    calendario = get_calendario_precios()
+    with db.transaction() as conn:
+        fecha = obtener_fecha_negocio(conn)
+        existente = conn.execute(
+            'SELECT * FROM Auditorias_Nocturnas WHERE Fecha_Negocio = ?', (fecha.isoformat(),)
+        ).fetchone()
+        if existente:
+            return _resumen(conn, existente)
+        if fecha > date.today():
+            raise ValueError(f"El día de negocio {fecha.strftime('%d/%m/%Y')} todavía no termina")
+
+        # Registros en casa con las noches ya registradas por auditorías anteriores
+        rows = conn.execute('''
+            SELECT r.ID, r.Habitacion_Numero, r.Noches_Facturadas, r.Tarifa_ID, hb.Precio_USD,
+                   (SELECT COUNT(*) FROM Cargos_Noche c WHERE c.Registro_ID = r.ID) as Noches_Cargadas
+            FROM Registros r
+            JOIN Habitaciones hb ON r.Habitacion_Numero = hb.Numero
+            WHERE r.Estado = 'Activo'
+        ''').fetchall()
+
+        ahora = datetime.now()
+        cargos = []
+        adicionales = []
+        lineas = []
+        for row in rows:
+            precio = _precio_noche(calendario, fecha, row['Precio_USD'], row['Tarifa_ID'])
+            facturado = row['Noches_Cargadas'] + 1 > row['Noches_Facturadas']
+            cargos.append((row['ID'], fecha.isoformat(), row['Habitacion_Numero'],
+                           precio, 1 if facturado else 0))
+            if facturado:
+                adicionales.append((precio, precio, row['ID']))
+                lineas.append((f"Noche adicional {fecha.strftime('%d/%m/%Y')}", precio,
+                               ahora, usuario_id, row['ID']))
+
+        conn.executemany('''
+            INSERT OR IGNORE INTO Cargos_Noche
+                (Registro_ID, Fecha_Negocio, Habitacion_Numero, Monto_USD, Facturado)
+            VALUES (?, ?, ?, ?, ?)
+        ''', cargos)
+
+        # Estadías extendidas: sumar la noche al total, recalcular el saldo (en
+        # un UPDATE las expresiones leen los valores anteriores de la fila) y
+        # asentarla en el folio con el saldo resultante
+        conn.executemany('''
+            UPDATE Registros SET
+                Total_Habitacion_USD = Total_Habitacion_USD + ?,
+                Noches_Facturadas = Noches_Facturadas + 1,
+                Saldo_Pendiente_USD = Total_Habitacion_USD + ? + Total_Extras_USD
+                                      - Total_Descuentos_USD - Total_Pagado_USD,
+                Version = Version + 1
+            WHERE ID = ?
+        ''', adicionales)
+        conn.executemany('''
+            INSERT INTO Folio (Registro_ID, Tipo, Descripcion, Monto_USD, Saldo_USD, Fecha, Usuario_ID)
+            SELECT ID, 'Habitacion', ?, ?, Saldo_Pendiente_USD, ?, ?
+            FROM Registros WHERE ID = ?
+        ''', lineas)
+
+        # Huéspedes que siguen en casa después de su salida prevista
+        conn.execute('''
+            UPDATE Registros SET Sobreestadia = 1, Version = Version + 1
+            WHERE Estado = 'Activo' AND Sobreestadia = 0 AND date(Fecha_Salida_Prevista) <= ?
+        ''', (fecha.isoformat(),))
+
+        total_habitaciones = conn.execute('SELECT COUNT(*) FROM Habitaciones').fetchone()[0]
+        sobreestadias = conn.execute('''
+            SELECT COUNT(*) FROM Registros
+            WHERE Estado = 'Activo' AND Sobreestadia = 1
+        ''').fetchone()[0]
+        conn.execute('''
+            INSERT INTO Auditorias_Nocturnas (
+                Fecha_Negocio, Fecha_Ejecucion, Usuario_ID, Habitaciones_Ocupadas,
+                Total_Habitaciones, Ingreso_Habitaciones_USD, Noches_Adicionales,
+                Cargo_Adicional_USD, Sobreestadias
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            fecha.isoformat(), ahora, usuario_id, len(cargos), total_habitaciones,
+            sum(c[3] for c in cargos), len(adicionales), sum(a[0] for a in adicionales),
+            sobreestadias
+        ))
+
+        # Avanzar la fecha de negocio y sacar de servicio las habitaciones
+        # cuyas órdenes de mantenimiento empiezan el nuevo día
+        conn.execute(
+            'UPDATE Configuracion SET Fecha_Negocio = ? WHERE ID = 1',
+            ((fecha + timedelta(days=1)).isoformat(),)
+        )
+        en_mantenimiento = iniciar_mantenimientos(conn, fecha + timedelta(days=1))
+
+        row = conn.execute(
+            'SELECT * FROM Auditorias_Nocturnas WHERE Fecha_Negocio = ?', (fecha.isoformat(),)
+        ).fetchone()
+        resumen = _resumen(conn, row)
+
+    for numero in en_mantenimiento:
+        bus.publicar(HabitacionCambiada(numero, 'Mantenimiento'))
+    return resumen
+
+def listar_auditorias(limite: int = 30) -> List[ResumenAuditoria]:
+    """Lista los resúmenes de las últimas auditorías, de la más reciente a la más antigua"""
+    with db.get_connection() as conn:
+        rows = conn.execute('''
+            SELECT * FROM Auditorias_Nocturnas
+            ORDER BY Fecha_Negocio DESC
+            LIMIT ?
+        ''', (limite,)).fetchall()
+        return [_resumen(conn, row, con_habitaciones=False) for row in rows]
+
+def _resumen(conn: sqlite3.Connection, row: sqlite3.Row,
+             con_habitaciones: bool = True) -> ResumenAuditoria:
+    """Crea el resumen desde una fila de Auditorias_Nocturnas"""
+    resumen = ResumenAuditoria(
+        fecha_negocio=date.fromisoformat(row['Fecha_Negocio']),
+        habitaciones_ocupadas=row['Habitaciones_Ocupadas'],
+        total_habitaciones=row['Total_Habitaciones'],
+        ingreso_habitaciones_usd=row['Ingreso_Habitaciones_USD'],
+        noches_adicionales=row['Noches_Adicionales'],
+        cargo_adicional_usd=row['Cargo_Adicional_USD'],
+        sobreestadias=row['Sobreestadias'],
+        fecha_ejecucion=row['Fecha_Ejecucion'],
+        usuario_id=row['Usuario_ID'],
+    )
+    if con_habitaciones:
+        # Habitaciones cargadas esa noche cuya salida prevista ya había pasado
+        resumen.habitaciones_sobreestadia = [r[0] for r in conn.execute('''
+            SELECT c.Habitacion_Numero
+            FROM Cargos_Noche c
+            JOIN Registros r ON c.Registro_ID = r.ID
+            WHERE c.Fecha_Negocio = ? AND date(r.Fecha_Salida_Prevista) <= c.Fecha_Negocio
+            ORDER BY c.Habitacion_Numero
+        ''', (row['Fecha_Negocio'],)).fetchall()]
+    return resumen
@@ -0,0 +1,99 @@
+"""
+Utilidades comunes a los modelos persistentes
+"""
+from enum import Enum
+from typing import Any, Dict, Optional
+from database.connection import db
+
+class ConflictoConcurrencia(Exception):
+    """Otra estación modificó la fila desde que fue leída"""
+
+def valor_columna(valor: Any) -> Any:
+    """Convierte un valor de Python al tipo que se guarda en SQLite"""
+    if isinstance(valor, Enum):
+        return valor.value
+    if isinstance(valor, bool):
+        return 1 if valor else 0
+    return valor
+
+class SeguimientoCambios:
+    """
+    Mixin para los dataclasses persistentes que recuerda los valores leídos
+    de la base de datos, de modo que al guardar solo se escriban las columnas
+    que cambiaron.
+
+    Las subclases definen `_tabla`, `_columna_id`, `_atributo_id` y
+    `_columnas` (atributo -> columna de la tabla). Si la tabla tiene columna
+    de versión, `_columna_version` la indica y el dataclass expone `version`.
+    """
+
+    _tabla = ''
+    _columna_id = 'ID'
+    _atributo_id = 'id'
+    _columna_version: Optional[str] = None
+    _columnas: Dict[str, str] = {}
+
+    def _marcar_limpio(self) -> None:
+        """Toma los valores actuales como los persistidos"""
+        self._originales = {atributo: getattr(self, atributo) for atributo in self._columnas}
+
+    def campos_modificados(self) -> Dict[str, Any]:
+        """Retorna los atributos que cambiaron desde la última lectura o escritura"""
+        originales = getattr(self, '_originales', None)
+        if originales is None:
+            return {atributo: getattr(self, atributo) for atributo in self._columnas}
+        return {
+            atributo: getattr(self, atributo)
+            for atributo in self._columnas
+            if getattr(self, atributo) != originales[atributo]
+        }
+
+    @property
+    def tiene_cambios(self) -> bool:
+        return bool(self.campos_modificados())
+
+    def _guardar_cambios(self, conn=None) -> bool:
+        """
+        Escribe solo las columnas modificadas, usando `conn` si se ejecuta
+        dentro de una transacción. Como control de concurrencia optimista la
+        fila solo se actualiza si su versión (o, en tablas sin versión, las
+        columnas modificadas) conserva el valor que se leyó; si otra estación
+        la cambió se lanza ConflictoConcurrencia. Retorna False si no había
+        nada que escribir.
+        """
+        cambios = self.campos_modificados()
+        if not cambios:
+            return False
+
+        asignaciones = ', '.join(f'{self._columnas[a]} = ?' for a in cambios)
+        params = [valor_columna(v) for v in cambios.values()]
+        originales = getattr(self, '_originales', None)
+
+        if self._columna_version:
+            asignaciones += f', {self._columna_version} = {self._columna_version} + 1'
+            condicion = f' AND {self._columna_version} = ?'
+            params.append(getattr(self, self._atributo_id))
+            params.append(self.version)
+        else:
+            condicion = ''
+            params.append(getattr(self, self._atributo_id))
+            if originales is not None:
+                condicion = ''.join(f' AND {self._columnas[a]} IS ?' for a in cambios)
+                params.extend(valor_columna(originales[a]) for a in cambios)
+
+        query = f'UPDATE {self._tabla} SET {asignaciones} WHERE {self._columna_id} = ?{condicion}'
+        if conn is not None:
+            filas = conn.execute(query, tuple(params)).rowcount
+        else:
+            filas = db.execute_update(query, tuple(params))
+
+        if filas == 0:
+            raise ConflictoConcurrencia(
+                f"El registro {getattr(self, self._atributo_id)} de {self._tabla} "
+                "fue modificado por otra estación"
+            )
+
+        if self._columna_version:
+            self.version += 1
+        self._marcar_limpio()
+        return True
@@ -0,0 +1,171 @@
+"""
+Registro de cambios (CDC) y notificación entre estaciones
+
+Los triggers de la base de datos anotan en la tabla Cambios cada fila
+insertada, modificada o eliminada de Habitaciones, Registros,
+Transacciones, Huespedes, Turnos y Reservas. El ID de Cambios es una
+secuencia creciente: un consumidor guarda el último valor que procesó (su
+cursor) y con `cambios_desde` obtiene solo lo que cambió después.
+
+Cada instancia de la aplicación consulta además `PRAGMA data_version` en
+una conexión propia (una lectura sin acceso a tablas) y solo cuando otra
+conexión confirmó cambios lee los nuevos y, salvo los que confirmó el mismo
+proceso (Database anota sus rangos de IDs), publica un evento por
+habitación afectada, así las vistas actualizan solo esas tarjetas, y uno
+por huésped, con el que se mantiene al día el índice de documentos.
+"""
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from database.connection import DB_PATH, db
+from utils.eventos import bus, HabitacionCambiada, HuespedCambiado
+
+# Segundos entre dos consultas de data_version
+INTERVALO_MONITOR = 0.5
+
+# Días que se conservan las eliminaciones al compactar el registro
+DIAS_RETENCION_ELIMINACIONES = 30
+
+@dataclass
+class Cambio:
+    secuencia: int
+    tabla: str
+    fila_id: int
+    operacion: str  # 'I', 'U' o 'D'
+    habitacion_numero: Optional[int] = None
+
+def cambios_desde(cursor: int, tablas: Optional[Iterable[str]] = None,
+                  conn: Optional[sqlite3.Connection] = None) -> Tuple[List[Cambio], int]:
+    """
+    Retorna los cambios posteriores al cursor y el nuevo cursor. Cada fila
+    aparece una sola vez con su última operación: 'D' si fue eliminada y
+    'I' o 'U' si hay que (re)leerla. Como SQLite serializa las escrituras,
+    las secuencias se confirman en orden y ningún cambio queda atrás del
+    cursor devuelto.
+    """
+    def consultar(query: str, params: tuple = ()) -> List[tuple]:
+        if conn is not None:
+            return [tuple(row) for row in conn.execute(query, params).fetchall()]
+        return [tuple(row.values()) for row in db.fetch_all(query, params)]
+
+    # Fijar primero el tope para que el filtro por tabla no salte cambios
+    # confirmados entre las dos consultas
+    hasta = consultar('SELECT COALESCE(MAX(ID), 0) FROM Cambios')[0][0]
+    if hasta <= cursor:
+        return [], cursor
+
+    filtro = ''
+    params: list = [cursor, hasta]
+    if tablas is not None:
+        tablas = list(tablas)
+        filtro = f" AND Tabla IN ({', '.join('?' * len(tablas))})"
+        params.extend(tablas)
+    rows = consultar(f'''
+        SELECT c.ID, c.Tabla, c.Fila_ID, c.Operacion, c.Habitacion_Numero
+        FROM (
+            SELECT MAX(ID) as Secuencia
+            FROM Cambios
+            WHERE ID > ? AND ID <= ?{filtro}
+            GROUP BY Tabla, Fila_ID
+        ) u
+        JOIN Cambios c ON c.ID = u.Secuencia
+        ORDER BY c.ID
+    ''', tuple(params))
+    return [Cambio(*row) for row in rows], hasta
+
+def cursor_actual() -> int:
+    """Retorna la secuencia del último cambio registrado"""
+    return db.fetch_scalar('SELECT COALESCE(MAX(ID), 0) FROM Cambios')
+
+def compactar_cambios(dias_retencion: int = DIAS_RETENCION_ELIMINACIONES) -> int:
+    """
+    Compacta el registro conservando solo el último cambio de cada fila y
+    descartando las eliminaciones más antiguas que `dias_retencion`. Un
+    consumidor con un cursor anterior sigue obteniendo el estado correcto
+    de cada fila. Retorna la cantidad de cambios eliminados.
+    """
+    with db.transaction() as conn:
+        eliminados = conn.execute('''
+            DELETE FROM Cambios
+            WHERE ID NOT IN (SELECT MAX(ID) FROM Cambios GROUP BY Tabla, Fila_ID)
+        ''').rowcount
+        eliminados += conn.execute('''
+            DELETE FROM Cambios
+            WHERE Operacion = 'D' AND Fecha < datetime('now', ?)
+        ''', (f'-{dias_retencion} days',)).rowcount
+    return eliminados
+
+class MonitorCambios:
+    """Hilo que detecta cambios confirmados por otras conexiones"""
+
+    def __init__(self, intervalo: float = INTERVALO_MONITOR):
+        self.intervalo = intervalo
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._ultimo_id = 0
+
+    def iniciar(self) -> None:
+        """Arranca el monitor en un hilo de fondo"""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name='MonitorCambios', daemon=True)
+        self._hilo.start()
+
+    def detener(self) -> None:
+        """Detiene el monitor y espera a que termine el hilo"""
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+            self._hilo = None
+
+    def _ejecutar(self) -> None:
+        # La conexión debe ser la misma entre consultas: data_version solo
+        # cambia cuando otra conexión confirma una escritura
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            self._ultimo_id = conn.execute('SELECT COALESCE(MAX(ID), 0) FROM Cambios').fetchone()[0]
+            data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+            while not self._detener.wait(self.intervalo):
+                actual = conn.execute('PRAGMA data_version').fetchone()[0]
+                if actual == data_version:
+                    continue
+                data_version = actual
+                self._procesar(conn)
+        finally:
+            conn.close()
+
+    def _procesar(self, conn: sqlite3.Connection) -> None:
+        """
+        Lee los cambios nuevos y publica un evento por habitación y por
+        huésped afectados. Se saltan los que confirmó este mismo proceso:
+        sus eventos ya se publicaron al guardarlos.
+        """
+        cambios, self._ultimo_id = cambios_desde(self._ultimo_id, conn=conn)
+        propios = db.tomar_cambios_propios(self._ultimo_id)
+        cambios = [c for c in cambios if not any(d < c.secuencia <= h for d, h in propios)]
+        for cambio in cambios:
+            if cambio.tabla == 'Huespedes':
+                bus.publicar(HuespedCambiado(cambio.fila_id))
+        numeros = {c.habitacion_numero for c in cambios if c.habitacion_numero is not None}
+        if not numeros:
+            return
+        marcadores = ', '.join('?' * len(numeros))
+        estados: Dict[int, str] = dict(conn.execute(
+            f'SELECT Numero, Estado FROM Habitaciones WHERE Numero IN ({marcadores})',
+            tuple(numeros)
+        ).fetchall())
+        for numero in sorted(numeros):
+            bus.publicar(HabitacionCambiada(numero, estados.get(numero, '')))
+
+# Instancia global del monitor (lazy loading)
+_monitor: Optional[MonitorCambios] = None
+
+def iniciar_monitor_cambios() -> MonitorCambios:
+    """Inicia, si no lo está, el monitor global de cambios"""
+    global _monitor
+    if _monitor is None:
+        _monitor = MonitorCambios()
+    _monitor.iniciar()
+    return _monitor
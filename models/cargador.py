@@ -0,0 +1,82 @@
+"""
+Carga por lotes de objetos relacionados (huéspedes, usuarios, registros)
+
+Durante una acción de la interfaz se piden los IDs que hacen falta y se
+resuelven todos juntos con una sola consulta `WHERE ID IN (...)` por
+entidad. Los objetos quedan en caché mientras dure la acción.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+class CargadorLotes:
+    """
+    Acumula IDs pedidos y los resuelve con una función de búsqueda por
+    lotes (`buscar_por_ids`), guardando el resultado en caché.
+    """
+
+    def __init__(self, buscar_lote: Callable[[Iterable[int]], Dict[int, Any]]):
+        self._buscar_lote = buscar_lote
+        self._cache: Dict[int, Any] = {}
+        self._pendientes = set()
+
+    def solicitar(self, *ids: Optional[int]) -> None:
+        """Anota IDs para resolverlos en la próxima consulta"""
+        for id_ in ids:
+            if id_ is not None and id_ not in self._cache:
+                self._pendientes.add(id_)
+
+    def obtener(self, id_: Optional[int]) -> Any:
+        """Retorna el objeto con ese ID, resolviendo junto con él todo lo pendiente"""
+        self.solicitar(id_)
+        self._resolver()
+        return self._cache.get(id_)
+
+    def obtener_varios(self, ids: Iterable[Optional[int]]) -> Dict[int, Any]:
+        """Retorna los objetos encontrados para los IDs indicados, por ID"""
+        ids = [id_ for id_ in ids if id_ is not None]
+        self.solicitar(*ids)
+        self._resolver()
+        return {id_: self._cache[id_] for id_ in ids if self._cache.get(id_) is not None}
+
+    def sembrar(self, objetos: Iterable[Any], atributo_id: str = 'id') -> None:
+        """Agrega a la caché objetos ya leídos para no volver a consultarlos"""
+        for objeto in objetos:
+            self._cache[getattr(objeto, atributo_id)] = objeto
+
+    def limpiar(self) -> None:
+        """Descarta la caché y los pedidos pendientes"""
+        self._cache.clear()
+        self._pendientes.clear()
+
+    def _resolver(self) -> None:
+        if not self._pendientes:
+            return
+        pendientes, self._pendientes = self._pendientes, set()
+        encontrados = self._buscar_lote(pendientes)
+        for id_ in pendientes:
+            # Los IDs inexistentes también se cachean para no repetir la consulta
+            self._cache[id_] = encontrados.get(id_)
+
+
+class Cargadores:
+    """Cargadores por entidad para una acción de la interfaz"""
+
+    def __init__(self):
+        from models.huesped import Huesped
+        from models.usuario import Usuario
+        from models.registro import Registro
+        self.huespedes = CargadorLotes(Huesped.buscar_por_ids)
+        self.usuarios = CargadorLotes(Usuario.buscar_por_ids)
+        self.registros = CargadorLotes(Registro.buscar_por_ids)
+
+    def nombres_usuario(self, objetos: List[Any]) -> None:
+        """Completa `usuario_nombre` en objetos que tienen `usuario_id`"""
+        usuarios = self.usuarios.obtener_varios(o.usuario_id for o in objetos)
+        for objeto in objetos:
+            usuario = usuarios.get(objeto.usuario_id)
+            objeto.usuario_nombre = usuario.nombre_completo if usuario else ""
+
+    def limpiar(self) -> None:
+        """Descarta las cachés al terminar la acción"""
+        self.huespedes.limpiar()
+        self.usuarios.limpiar()
+        self.registros.limpiar()
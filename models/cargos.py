@@ -0,0 +1,150 @@
+"""
+Registro de cargos por lotes
+
+Asienta muchos cargos sobre muchos registros en una sola transacción (por
+ejemplo el cierre diario del restaurante): los extras se insertan con
+`executemany` y los totales de cada registro se actualizan una sola vez,
+sin importar cuántos cargos reciba.
+"""
+import csv
+import io
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from database.connection import db
+from models.catalogo import ArticuloCargo
+from models.folio import LineaFolio, TipoLinea, asentar_lote
+from utils.eventos import bus, CargoRegistrado
+
+# Motivo de rechazo de un cargo a un registro cerrado o inexistente
+MOTIVO_INACTIVO = "El registro no está activo"
+
+@dataclass
+class CargoLote:
+    registro_id: int
+    descripcion: str
+    monto_usd: float
+    cantidad: int = 1
+    articulo_id: Optional[int] = None
+
+    @property
+    def total_usd(self) -> float:
+        return self.monto_usd * self.cantidad
+
+    @property
+    def detalle(self) -> str:
+        """Descripción con la que el cargo aparece en el folio"""
+        return self.descripcion if self.cantidad == 1 else f"{self.descripcion} x{self.cantidad}"
+
+@dataclass
+class ResultadoCargos:
+    aplicados: int = 0
+    total_usd: float = 0.0
+    registros: int = 0
+    # (identificación del cargo o de la línea, motivo)
+    rechazados: List[Tuple[str, str]] = field(default_factory=list)
+
+def registrar_cargos(cargos: Iterable[CargoLote], usuario_id: int) -> ResultadoCargos:
+    """
+    Asienta los cargos en una sola transacción. Los cargos de registros que
+    no existen o ya no están activos, o con monto o cantidad inválidos, se
+    rechazan sin afectar a los demás.
+    """
+    cargos = list(cargos)
+    resultado = ResultadoCargos()
+    validos: List[CargoLote] = []
+    habitaciones: Dict[int, int] = {}
+
+    with db.transaction() as conn:
+        ids = list({c.registro_id for c in cargos})
+        for i in range(0, len(ids), 500):
+            parte = ids[i:i + 500]
+            habitaciones.update(conn.execute(f'''
+                SELECT ID, Habitacion_Numero FROM Registros
+                WHERE Estado = 'Activo' AND ID IN ({', '.join('?' * len(parte))})
+            ''', parte).fetchall())
+
+        for cargo in cargos:
+            identificacion = f"Registro {cargo.registro_id}: {cargo.descripcion}"
+            if cargo.registro_id not in habitaciones:
+                resultado.rechazados.append((identificacion, MOTIVO_INACTIVO))
+            elif cargo.cantidad <= 0 or cargo.monto_usd <= 0:
+                resultado.rechazados.append((identificacion, "Monto o cantidad inválidos"))
+            else:
+                validos.append(cargo)
+
+        if not validos:
+            return resultado
+
+        conn.executemany('''
+            INSERT INTO Extras (Registro_ID, Descripcion, Monto_USD, Cantidad, Usuario_ID, Articulo_ID)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(c.registro_id, c.descripcion, c.monto_usd, c.cantidad, usuario_id, c.articulo_id)
+              for c in validos])
+        saldos = asentar_lote(conn, [
+            LineaFolio(c.registro_id, TipoLinea.EXTRA, c.total_usd, descripcion=c.detalle,
+                       usuario_id=usuario_id)
+            for c in validos
+        ])
+
+    por_registro: Dict[int, float] = defaultdict(float)
+    for cargo in validos:
+        por_registro[cargo.registro_id] += cargo.total_usd
+    resultado.aplicados = len(validos)
+    resultado.total_usd = sum(por_registro.values())
+    resultado.registros = len(por_registro)
+
+    for registro_id, monto in por_registro.items():
+        bus.publicar(CargoRegistrado(registro_id, habitaciones[registro_id], monto, saldos[registro_id]))
+    return resultado
+
+def importar_cargos_csv(origen: Union[str, io.TextIOBase], usuario_id: int) -> ResultadoCargos:
+    """
+    Importa cargos desde un CSV con encabezado. Columnas: Habitacion y
+    Codigo (del catálogo) obligatorias; Cantidad (1 por omisión), Monto_USD
+    (precio del catálogo por omisión) y Descripcion opcionales. Cada cargo
+    se asienta al registro activo de la habitación.
+    """
+    if isinstance(origen, str):
+        with open(origen, newline='', encoding='utf-8-sig') as archivo:
+            filas = list(csv.DictReader(archivo))
+    else:
+        filas = list(csv.DictReader(origen))
+
+    # Normalizar encabezados para aceptar mayúsculas o minúsculas
+    filas = [{(k or '').strip().lower(): (v or '').strip() for k, v in fila.items()} for fila in filas]
+    articulos = ArticuloCargo.buscar_por_codigos(f.get('codigo', '') for f in filas)
+    activos = {
+        row['Habitacion_Numero']: row['ID']
+        for row in db.fetch_all("SELECT ID, Habitacion_Numero FROM Registros WHERE Estado = 'Activo'")
+    }
+
+    cargos: List[CargoLote] = []
+    rechazados: List[Tuple[str, str]] = []
+    for numero_linea, fila in enumerate(filas, start=2):
+        linea = f"Línea {numero_linea}"
+        try:
+            habitacion = int(fila.get('habitacion', ''))
+            cantidad = int(fila.get('cantidad') or 1)
+            monto = float(fila['monto_usd']) if fila.get('monto_usd') else None
+        except ValueError:
+            rechazados.append((linea, "Habitación, cantidad o monto inválidos"))
+            continue
+        articulo = articulos.get(fila.get('codigo', '').upper())
+        if articulo is None:
+            rechazados.append((linea, f"Código '{fila.get('codigo', '')}' no está en el catálogo"))
+            continue
+        if habitacion not in activos:
+            rechazados.append((linea, f"La habitación {habitacion:03d} no está ocupada"))
+            continue
+        cargos.append(CargoLote(
+            registro_id=activos[habitacion],
+            descripcion=fila.get('descripcion') or articulo.descripcion,
+            monto_usd=monto if monto is not None else articulo.precio_usd,
+            cantidad=cantidad,
+            articulo_id=articulo.id
+        ))
+
+    resultado = registrar_cargos(cargos, usuario_id)
+    resultado.rechazados = rechazados + resultado.rechazados
+    return resultado
@@ -0,0 +1,91 @@
+"""
+Modelo y lógica de negocio para el Catálogo de Cargos (minibar, lavandería, restaurante)
+"""
+from dataclasses import dataclass
+from typing import Optional, List, Dict
+from enum import Enum
+from database.connection import db
+from models.base import SeguimientoCambios
+
+class CategoriaCargo(str, Enum):
+    MINIBAR = 'Minibar'
+    LAVANDERIA = 'Lavanderia'
+    RESTAURANTE = 'Restaurante'
+    OTRO = 'Otro'
+
+@dataclass
+class ArticuloCargo(SeguimientoCambios):
+    codigo: str
+    descripcion: str
+    categoria: CategoriaCargo
+    precio_usd: float
+    activo: bool = True
+    id: Optional[int] = None
+
+    _tabla = 'Catalogo_Cargos'
+    _columnas = {
+        'codigo': 'Codigo',
+        'descripcion': 'Descripcion',
+        'categoria': 'Categoria',
+        'precio_usd': 'Precio_USD',
+        'activo': 'Activo',
+    }
+
+    def guardar(self) -> int:
+        """Guarda el artículo; en una actualización solo escribe los campos modificados"""
+        self.codigo = self.codigo.strip().upper()
+        if self.id:
+            self._guardar_cambios()
+            return self.id
+        self.id = db.execute('''
+            INSERT INTO Catalogo_Cargos (Codigo, Descripcion, Categoria, Precio_USD, Activo)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (self.codigo, self.descripcion, self.categoria.value, self.precio_usd,
+              1 if self.activo else 0))
+        self._marcar_limpio()
+        return self.id
+
+    @staticmethod
+    def buscar_por_id(articulo_id: int) -> Optional['ArticuloCargo']:
+        """Busca un artículo por su ID"""
+        row = db.fetch_one('SELECT * FROM Catalogo_Cargos WHERE ID = ?', (articulo_id,))
+        return ArticuloCargo._from_row(row) if row else None
+
+    @staticmethod
+    def buscar_por_codigos(codigos) -> Dict[str, 'ArticuloCargo']:
+        """Busca varios artículos activos con una sola consulta y los retorna por código"""
+        rows = db.fetch_all_in('''
+            SELECT * FROM Catalogo_Cargos
+            WHERE Activo = 1 AND Codigo IN ({marcadores})
+        ''', {c.strip().upper() for c in codigos})
+        return {row['Codigo']: ArticuloCargo._from_row(row) for row in rows}
+
+    @staticmethod
+    def listar_todos() -> List['ArticuloCargo']:
+        """Lista todos los artículos del catálogo"""
+        rows = db.fetch_all('SELECT * FROM Catalogo_Cargos ORDER BY Categoria, Descripcion')
+        return [ArticuloCargo._from_row(row) for row in rows]
+
+    @staticmethod
+    def listar_activos() -> List['ArticuloCargo']:
+        """Lista los artículos que se pueden cargar"""
+        rows = db.fetch_all('''
+            SELECT * FROM Catalogo_Cargos
+            WHERE Activo = 1
+            ORDER BY Categoria, Descripcion
+        ''')
+        return [ArticuloCargo._from_row(row) for row in rows]
+
+    @staticmethod
+    def _from_row(row: dict) -> 'ArticuloCargo':
+        """Crea un objeto ArticuloCargo desde una fila de la base de datos"""
+        articulo = ArticuloCargo(
+            id=row['ID'],
+            codigo=row['Codigo'],
+            descripcion=row['Descripcion'],
+            categoria=CategoriaCargo(row['Categoria']),
+            precio_usd=row['Precio_USD'],
+            activo=bool(row['Activo'])
+        )
+        articulo._marcar_limpio()
+        return articulo
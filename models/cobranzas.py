@@ -0,0 +1,189 @@
+"""
+Cuentas por cobrar y antigüedad de la deuda de los huéspedes
+
+La deuda de un huésped (Saldo_Acumulado negativo) se lleva en tramos en
+Deudas_Huesped, cada uno con la fecha de negocio en que nació. Los
+triggers de Huespedes mantienen los tramos con cualquier cambio de saldo
+y los pagos cancelan primero los más antiguos. El reporte reparte los
+tramos pendientes por días de antigüedad en SQL, leyendo solo el índice
+parcial de saldos pendientes, y queda en caché hasta que cambie la fecha
+de negocio o Version_Cartera (que suben los triggers de los tramos).
+"""
+import threading
+from dataclasses import dataclass, field
+from datetime import date
+from typing import List, Optional, Tuple
+from database.connection import db
+
+# Rangos de antigüedad en días: (etiqueta, último día del rango)
+RANGOS_ANTIGUEDAD: Tuple[Tuple[str, Optional[int]], ...] = (
+    ('0-30', 30),
+    ('31-60', 60),
+    ('61-90', 90),
+    ('90+', None),
+)
+
+def _columnas_rangos(saldo: str, dias: str) -> str:
+    """Una suma por rango de antigüedad, en el orden de RANGOS_ANTIGUEDAD"""
+    columnas = []
+    desde = None
+    for _, hasta in RANGOS_ANTIGUEDAD:
+        condiciones = []
+        if desde is not None:
+            condiciones.append(f'{dias} > {desde}')
+        if hasta is not None:
+            condiciones.append(f'{dias} <= {hasta}')
+        columnas.append(f"TOTAL(CASE WHEN {' AND '.join(condiciones)} THEN {saldo} END)")
+        desde = hasta
+    return ',\n               '.join(columnas)
+
+_DIAS = 'julianday(?) - julianday(Fecha_Origen)'
+
+@dataclass
+class AntiguedadCartera:
+    """Deuda total de los huéspedes repartida por antigüedad a una fecha de corte"""
+    fecha_corte: date
+    montos: List[float] = field(default_factory=list)
+    deudores: int = 0
+    
+    @property
+    def total(self) -> float:
+        return round(sum(self.montos), 2)
+    
+    def por_rango(self) -> List[Tuple[str, float]]:
+        return [(etiqueta, monto) for (etiqueta, _), monto in zip(RANGOS_ANTIGUEDAD, self.montos)]
+
+@dataclass
+class DeudorCartera:
+    """Deuda de un huésped por rango de antigüedad"""
+    huesped_id: int
+    documento: str
+    nombre: str
+    montos: List[float]
+    fecha_mas_antigua: date
+    
+    @property
+    def total(self) -> float:
+        return round(sum(self.montos), 2)
+
+@dataclass
+class TramoDeuda:
+    id: int
+    fecha_origen: date
+    monto_usd: float
+    saldo_usd: float
+
+def calcular_antiguedad(fecha_corte: date) -> AntiguedadCartera:
+    """Reparte los tramos pendientes por antigüedad en una sola pasada del índice parcial"""
+    row = db.fetch_one(f'''
+        SELECT COUNT(DISTINCT Huesped_ID) as Deudores,
+               {_columnas_rangos('Saldo_USD', 'Dias')}
+        FROM (
+            SELECT Huesped_ID, Saldo_USD, {_DIAS} as Dias
+            FROM Deudas_Huesped
+            WHERE Saldo_USD > 0
+        )
+    ''', (fecha_corte.isoformat(),))
+    valores = list(row.values())
+    return AntiguedadCartera(
+        fecha_corte=fecha_corte,
+        montos=[round(v, 2) for v in valores[1:]],
+        deudores=valores[0]
+    )
+
+def listar_deudores(fecha_corte: date, limite: int = 50) -> List[DeudorCartera]:
+    """Huéspedes con deuda pendiente, de mayor a menor, con su reparto por antigüedad"""
+    rows = db.fetch_all(f'''
+        SELECT d.Huesped_ID, h.Documento, h.Nombres, h.Apellidos,
+               MIN(d.Fecha_Origen) as Fecha_Mas_Antigua,
+               {_columnas_rangos('d.Saldo_USD', 'd.Dias')}
+        FROM (
+            SELECT Huesped_ID, Fecha_Origen, Saldo_USD, {_DIAS} as Dias
+            FROM Deudas_Huesped
+            WHERE Saldo_USD > 0
+        ) d
+        JOIN Huespedes h ON h.ID = d.Huesped_ID
+        GROUP BY d.Huesped_ID
+        ORDER BY TOTAL(d.Saldo_USD) DESC
+        LIMIT ?
+    ''', (fecha_corte.isoformat(), limite))
+    deudores = []
+    for row in rows:
+        valores = list(row.values())
+        deudores.append(DeudorCartera(
+            huesped_id=row['Huesped_ID'],
+            documento=row['Documento'],
+            nombre=f"{row['Nombres']} {row['Apellidos']}".strip(),
+            montos=[round(v, 2) for v in valores[5:]],
+            fecha_mas_antigua=date.fromisoformat(str(row['Fecha_Mas_Antigua'])[:10])
+        ))
+    return deudores
+
+def tramos_pendientes(huesped_id: int) -> List[TramoDeuda]:
+    """Tramos de deuda pendientes de un huésped, del más antiguo al más reciente"""
+    rows = db.fetch_all('''
+        SELECT ID, Fecha_Origen, Monto_USD, Saldo_USD
+        FROM Deudas_Huesped
+        WHERE Huesped_ID = ? AND Saldo_USD > 0
+        ORDER BY Fecha_Origen, ID
+    ''', (huesped_id,))
+    return [
+        TramoDeuda(
+            id=row['ID'],
+            fecha_origen=date.fromisoformat(str(row['Fecha_Origen'])[:10]),
+            monto_usd=row['Monto_USD'],
+            saldo_usd=row['Saldo_USD']
+        )
+        for row in rows
+    ]
+
+class CarteraPorCobrar:
+    """
+    Antigüedad de la cartera calculada una vez por día de negocio. Antes de
+    responder se lee la fecha de negocio y Version_Cartera en una sola
+    consulta: si ninguna cambió se devuelve el reporte en caché, así el
+    tablero de gerencia no vuelve a agregar los tramos en cada apertura.
+    """
+    
+    def __init__(self, limite_deudores: int = 50):
+        self.limite_deudores = limite_deudores
+        self._lock = threading.Lock()
+        self._clave: Optional[Tuple[date, int]] = None
+        self._resumen: Optional[AntiguedadCartera] = None
+        self._deudores: List[DeudorCartera] = []
+    
+    @staticmethod
+    def _leer_clave() -> Tuple[date, int]:
+        row = db.fetch_one('SELECT Fecha_Negocio, Version_Cartera FROM Configuracion WHERE ID = 1')
+        if not row:
+            return date.today(), 0
+        fecha = date.fromisoformat(str(row['Fecha_Negocio'])[:10]) if row['Fecha_Negocio'] else date.today()
+        return fecha, row['Version_Cartera']
+    
+    def obtener(self) -> Tuple[AntiguedadCartera, List[DeudorCartera]]:
+        """Retorna el resumen por antigüedad y los mayores deudores"""
+        # La clave se lee antes que los tramos: si cambian en medio, la
+        # próxima consulta vuelve a calcular
+        clave = self._leer_clave()
+        with self._lock:
+            if clave == self._clave:
+                return self._resumen, list(self._deudores)
+        
+        fecha_corte = clave[0]
+        resumen = calcular_antiguedad(fecha_corte)
+        deudores = listar_deudores(fecha_corte, self.limite_deudores)
+        with self._lock:
+            self._clave = clave
+            self._resumen = resumen
+            self._deudores = deudores
+        return resumen, list(deudores)
+
+# Instancia global de la cartera (lazy loading)
+_cartera: Optional[CarteraPorCobrar] = None
+
+def get_cartera() -> CarteraPorCobrar:
+    """Obtiene la cartera por cobrar global"""
+    global _cartera
+    if _cartera is None:
+        _cartera = CarteraPorCobrar()
+    return _cartera
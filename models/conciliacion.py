@@ -0,0 +1,271 @@
+"""
+Conciliación de pagos electrónicos contra extractos bancarios
+
+Cada extracto (CSV del banco, de Zelle o de Binance) se importa para una
+cuenta y sus movimientos se cruzan con los pagos por referencia
+normalizada: una sola consulta por lote de referencias sobre
+idx_transacciones_referencia trae los pagos candidatos, que se agrupan en
+un diccionario por referencia (hash join), y cada movimiento toma el pago
+con su monto dentro de la tolerancia y la fecha más cercana dentro de la
+ventana. Los movimientos y el pago con el que se concilió cada uno quedan
+guardados, así un pago no se concilia dos veces ni un extracto repetido
+vuelve a contar.
+"""
+import csv
+import io
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from database.connection import db
+from models.transaccion import MetodoPago, Transaccion
+from utils.helpers import normalizar_referencia, parse_date
+
+# Días de diferencia aceptados entre el pago y el movimiento del banco
+VENTANA_DIAS = 3
+
+# Diferencia de monto aceptada, en la moneda del extracto
+TOLERANCIA_MONTO = 0.01
+
+# Cuentas que se concilian: métodos de pago que llegan a cada una y moneda
+# del extracto
+CUENTAS: Dict[str, Tuple[Tuple[MetodoPago, ...], str]] = {
+    'Banco': ((MetodoPago.PAGO_MOVIL, MetodoPago.TRANSFERENCIA), 'BS'),
+    'Zelle': ((MetodoPago.ZELLE,), 'USD'),
+    'Binance': ((MetodoPago.BINANCE,), 'USD'),
+}
+
+class EstadoMovimiento(str, Enum):
+    CONCILIADO = 'Conciliado'
+    SIN_PAGO = 'Sin_Pago'
+    DIFERENCIA = 'Diferencia'
+    DUPLICADO = 'Duplicado'
+
+@dataclass
+class MovimientoBanco:
+    linea: int
+    fecha: date
+    referencia: str
+    monto: float
+    moneda: str
+    descripcion: str = ""
+    estado: EstadoMovimiento = EstadoMovimiento.SIN_PAGO
+    transaccion_id: Optional[int] = None
+    nota: str = ""
+    
+    @property
+    def referencia_norm(self) -> str:
+        return normalizar_referencia(self.referencia)
+
+@dataclass
+class ResultadoConciliacion:
+    cuenta: str
+    conciliacion_id: Optional[int] = None
+    movimientos: List[MovimientoBanco] = field(default_factory=list)
+    # Pagos de la cuenta en el período del extracto que no aparecen en él
+    pagos_sin_movimiento: List[Transaccion] = field(default_factory=list)
+    # (línea, motivo) de las filas del CSV que no se pudieron leer
+    rechazados: List[Tuple[str, str]] = field(default_factory=list)
+    segundos: float = 0.0
+    
+    def _con_estado(self, estado: EstadoMovimiento) -> List[MovimientoBanco]:
+        return [m for m in self.movimientos if m.estado == estado]
+    
+    @property
+    def conciliados(self) -> List[MovimientoBanco]:
+        return self._con_estado(EstadoMovimiento.CONCILIADO)
+    
+    @property
+    def sin_pago(self) -> List[MovimientoBanco]:
+        return self._con_estado(EstadoMovimiento.SIN_PAGO)
+    
+    @property
+    def diferencias(self) -> List[MovimientoBanco]:
+        return self._con_estado(EstadoMovimiento.DIFERENCIA)
+    
+    @property
+    def duplicados(self) -> List[MovimientoBanco]:
+        return self._con_estado(EstadoMovimiento.DUPLICADO)
+
+def _leer_monto(texto: str) -> float:
+    """Lee '1.234,56', '1,234.56' o '1234.56': el último separador es el decimal"""
+    texto = texto.replace(' ', '').replace('$', '')
+    if ',' in texto and '.' in texto:
+        miles, decimal = (',', '.') if texto.rfind('.') > texto.rfind(',') else ('.', ',')
+        texto = texto.replace(miles, '').replace(decimal, '.')
+    elif ',' in texto:
+        texto = texto.replace(',', '.')
+    return abs(float(texto))
+
+def leer_extracto_csv(origen: Union[str, io.TextIOBase],
+                      moneda: str) -> Tuple[List[MovimientoBanco], List[Tuple[str, str]]]:
+    """
+    Lee un extracto CSV con encabezado. Columnas: Fecha (DD/MM/AAAA o
+    AAAA-MM-DD), Referencia y Monto obligatorias; Moneda (USD o BS, la de
+    la cuenta por omisión) y Descripcion opcionales. Retorna los
+    movimientos y las líneas rechazadas.
+    """
+    if isinstance(origen, str):
+        with open(origen, newline='', encoding='utf-8-sig') as archivo:
+            filas = list(csv.DictReader(archivo))
+    else:
+        filas = list(csv.DictReader(origen))
+    
+    filas = [{(k or '').strip().lower(): (v or '').strip() for k, v in fila.items()} for fila in filas]
+    movimientos: List[MovimientoBanco] = []
+    rechazados: List[Tuple[str, str]] = []
+    for numero_linea, fila in enumerate(filas, start=2):
+        linea = f"Línea {numero_linea}"
+        fecha = parse_date(fila.get('fecha', ''))
+        if fecha is None:
+            rechazados.append((linea, "Fecha inválida"))
+            continue
+        if not normalizar_referencia(fila.get('referencia', '')):
+            rechazados.append((linea, "Sin referencia"))
+            continue
+        try:
+            monto = _leer_monto(fila.get('monto', ''))
+        except ValueError:
+            rechazados.append((linea, "Monto inválido"))
+            continue
+        moneda_fila = (fila.get('moneda') or moneda).upper()
+        if moneda_fila not in ('USD', 'BS'):
+            rechazados.append((linea, f"Moneda '{fila.get('moneda')}' desconocida"))
+            continue
+        movimientos.append(MovimientoBanco(
+            linea=numero_linea,
+            fecha=fecha,
+            referencia=fila['referencia'],
+            monto=monto,
+            moneda=moneda_fila,
+            descripcion=fila.get('descripcion', '')
+        ))
+    return movimientos, rechazados
+
+def _fecha(valor) -> date:
+    if isinstance(valor, datetime):
+        return valor.date()
+    return date.fromisoformat(str(valor)[:10])
+
+def conciliar(movimientos: Iterable[MovimientoBanco], cuenta: str, usuario_id: Optional[int] = None,
+              archivo: str = "") -> ResultadoConciliacion:
+    """
+    Concilia los movimientos de un extracto de la cuenta y los guarda en
+    una sola transacción. Cada movimiento queda Conciliado (con su pago),
+    Diferencia (la referencia existe pero el monto o la fecha no cuadran),
+    Duplicado (repetido en el extracto o ya conciliado en uno anterior) o
+    Sin_Pago. Los movimientos que quedaron sin pago en un extracto anterior
+    se vuelven a intentar si se importan de nuevo.
+    """
+    inicio = time.perf_counter()
+    metodos, _ = CUENTAS[cuenta]
+    resultado = ResultadoConciliacion(
+        cuenta=cuenta,
+        movimientos=sorted(movimientos, key=lambda m: (m.fecha, m.linea))
+    )
+    if not resultado.movimientos:
+        return resultado
+    
+    referencias = list({m.referencia_norm for m in resultado.movimientos})
+    marcadores_metodo = ', '.join('?' * len(metodos))
+    with db.transaction() as conn:
+        importados = set()
+        candidatos: Dict[str, List[dict]] = defaultdict(list)
+        for i in range(0, len(referencias), 500):
+            parte = referencias[i:i + 500]
+            marcadores = ', '.join('?' * len(parte))
+            importados.update(
+                (row[0], row[1], round(row[2], 2)) for row in conn.execute(f'''
+                    SELECT Referencia_Norm, Fecha, Monto FROM Movimientos_Banco
+                    WHERE Referencia_Norm IN ({marcadores}) AND Estado = 'Conciliado'
+                ''', parte)
+            )
+            for row in conn.execute(f'''
+                SELECT t.ID, t.Referencia_Norm, t.Monto_USD, t.Monto_BS, t.Fecha_Hora
+                FROM Transacciones t
+                WHERE t.Referencia_Norm IN ({marcadores}) AND t.Referencia_Norm <> ''
+                    AND t.Tipo = 'Pago' AND t.Metodo_Pago IN ({marcadores_metodo})
+                    AND NOT EXISTS (SELECT 1 FROM Movimientos_Banco m WHERE m.Transaccion_ID = t.ID)
+            ''', [*parte, *(m.value for m in metodos)]):
+                candidatos[row['Referencia_Norm']].append(dict(row))
+        
+        vistos = set()
+        usados = set()
+        for movimiento in resultado.movimientos:
+            clave = (movimiento.referencia_norm, movimiento.fecha.isoformat(), round(movimiento.monto, 2))
+            if clave in importados or clave in vistos:
+                movimiento.estado = EstadoMovimiento.DUPLICADO
+                movimiento.nota = (
+                    "Ya conciliado en un extracto anterior" if clave in importados
+                    else "Repetido en el extracto"
+                )
+                continue
+            vistos.add(clave)
+            
+            columna = 'Monto_USD' if movimiento.moneda == 'USD' else 'Monto_BS'
+            libres = [c for c in candidatos.get(movimiento.referencia_norm, []) if c['ID'] not in usados]
+            coinciden = [
+                c for c in libres
+                if abs(c[columna] - movimiento.monto) <= TOLERANCIA_MONTO
+                and abs((_fecha(c['Fecha_Hora']) - movimiento.fecha).days) <= VENTANA_DIAS
+            ]
+            if coinciden:
+                pago = min(coinciden, key=lambda c: abs((_fecha(c['Fecha_Hora']) - movimiento.fecha).days))
+                usados.add(pago['ID'])
+                movimiento.estado = EstadoMovimiento.CONCILIADO
+                movimiento.transaccion_id = pago['ID']
+            elif libres:
+                pago = libres[0]
+                movimiento.estado = EstadoMovimiento.DIFERENCIA
+                simbolo = '$' if movimiento.moneda == 'USD' else 'Bs '
+                movimiento.nota = (
+                    f"Pago #{pago['ID']} por {simbolo}{pago[columna]:,.2f} "
+                    f"del {_fecha(pago['Fecha_Hora']).strftime('%d/%m/%Y')}"
+                )
+            else:
+                movimiento.estado = EstadoMovimiento.SIN_PAGO
+        
+        desde = resultado.movimientos[0].fecha
+        hasta = resultado.movimientos[-1].fecha
+        resultado.conciliacion_id = conn.execute('''
+            INSERT INTO Conciliaciones (Cuenta, Archivo, Fecha_Desde, Fecha_Hasta, Movimientos, Conciliados, Usuario_ID)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (cuenta, archivo, desde, hasta, len(resultado.movimientos), len(usados), usuario_id)).lastrowid
+        conn.executemany('''
+            INSERT INTO Movimientos_Banco (
+                Conciliacion_ID, Linea, Fecha, Referencia, Referencia_Norm, Monto, Moneda,
+                Descripcion, Estado, Transaccion_ID, Nota
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (resultado.conciliacion_id, m.linea, m.fecha, m.referencia, m.referencia_norm, m.monto,
+             m.moneda, m.descripcion, m.estado.value, m.transaccion_id, m.nota)
+            for m in resultado.movimientos
+        ])
+    
+    resultado.pagos_sin_movimiento = pagos_sin_conciliar(cuenta, desde, hasta)
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+def importar_extracto_csv(origen: Union[str, io.TextIOBase], cuenta: str,
+                          usuario_id: Optional[int] = None) -> ResultadoConciliacion:
+    """Lee un extracto CSV de la cuenta y lo concilia"""
+    _, moneda = CUENTAS[cuenta]
+    movimientos, rechazados = leer_extracto_csv(origen, moneda)
+    archivo = origen if isinstance(origen, str) else ""
+    resultado = conciliar(movimientos, cuenta, usuario_id, archivo)
+    resultado.rechazados = rechazados
+    return resultado
+
+def pagos_sin_conciliar(cuenta: str, desde: date, hasta: date) -> List[Transaccion]:
+    """Pagos de la cuenta entre las fechas que ningún movimiento concilió"""
+    metodos, _ = CUENTAS[cuenta]
+    rows = db.fetch_all(f'''
+        SELECT * FROM Transacciones t
+        WHERE t.Fecha_Hora >= ? AND t.Fecha_Hora < date(?, '+1 day')
+            AND t.Tipo = 'Pago' AND t.Metodo_Pago IN ({', '.join('?' * len(metodos))})
+            AND NOT EXISTS (SELECT 1 FROM Movimientos_Banco m WHERE m.Transaccion_ID = t.ID)
+        ORDER BY t.Fecha_Hora
+    ''', (desde.isoformat(), hasta.isoformat(), *(m.value for m in metodos)))
+    return [Transaccion._from_row(row) for row in rows]
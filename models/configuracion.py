@@ -1,10 +1,16 @@
 """
 Modelo y lógica de negocio para Configuración del Sistema
 """
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import dataclass, fields
 from datetime import datetime
 from typing import Optional
 from database.connection import db
+from utils.eventos import bus, TasaCambiada
+
+# Segundos mínimos entre dos consultas del token de cambio
+INTERVALO_VERIFICACION = 1.0
 
 @dataclass
 class Configuracion:
@@ -16,6 +22,7 @@ class Configuracion:
     rif: str = ""
     fecha_actualizacion: Optional[datetime] = None
     id: int = 1
+    version: int = 0
     
     @staticmethod
     def obtener() -> 'Configuracion':
@@ -29,16 +36,34 @@ class Configuracion:
         return config
     
     def guardar(self) -> None:
-        """Guarda la configuración"""
+        """
+        Guarda la configuración e incrementa su versión, que las demás
+        estaciones usan para saber que deben recargarla
+        """
         self.fecha_actualizacion = datetime.now()
-        db.execute('''
-            INSERT OR REPLACE INTO Configuracion 
-            (ID, Tasa_Dolar_BS, Nombre_Hotel, Direccion, Telefono, Email, RIF, Fecha_Actualizacion)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            self.id, self.tasa_dolar_bs, self.nombre_hotel, self.direccion,
-            self.telefono, self.email, self.rif, self.fecha_actualizacion
-        ))
+        with db.transaction() as conn:
+            actualizada = conn.execute('''
+                UPDATE Configuracion SET
+                    Tasa_Dolar_BS = ?, Nombre_Hotel = ?, Direccion = ?, Telefono = ?,
+                    Email = ?, RIF = ?, Fecha_Actualizacion = ?, Version = Version + 1
+                WHERE ID = ?
+            ''', (
+                self.tasa_dolar_bs, self.nombre_hotel, self.direccion, self.telefono,
+                self.email, self.rif, self.fecha_actualizacion, self.id
+            ))
+            if actualizada.rowcount == 0:
+                conn.execute('''
+                    INSERT INTO Configuracion 
+                    (ID, Tasa_Dolar_BS, Nombre_Hotel, Direccion, Telefono, Email, RIF, Fecha_Actualizacion)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    self.id, self.tasa_dolar_bs, self.nombre_hotel, self.direccion,
+                    self.telefono, self.email, self.rif, self.fecha_actualizacion
+                ))
+            self.version = conn.execute(
+                'SELECT Version FROM Configuracion WHERE ID = ?', (self.id,)
+            ).fetchone()['Version']
+        _config_guardada(self)
     
     def actualizar_tasa(self, nueva_tasa: float) -> None:
         """Actualiza la tasa de cambio"""
@@ -66,21 +91,71 @@ class Configuracion:
             telefono=row['Telefono'] or "",
             email=row['Email'] or "",
             rif=row['RIF'] or "",
-            fecha_actualizacion=row['Fecha_Actualizacion']
+            fecha_actualizacion=row['Fecha_Actualizacion'],
+            version=row['Version']
         )
 
-# Instancia global de configuración (lazy loading)
+# Instancia global de configuración (lazy loading). Al recargarse se
+# actualiza en el mismo objeto, así quien guardó la referencia ve los cambios
 _config: Optional[Configuracion] = None
+_tasa_publicada: Optional[float] = None
+_ultima_verificacion = 0.0
+_lock = threading.RLock()
 
 def get_config() -> Configuracion:
-    """Obtiene la instancia global de configuración"""
-    global _config
-    if _config is None:
-        _config = Configuracion.obtener()
+    """
+    Obtiene la instancia global de configuración. Antes de usarla compara
+    su versión con la de la base de datos (como mucho una vez por
+    INTERVALO_VERIFICACION) y la recarga si otra estación la cambió.
+    """
+    global _config, _ultima_verificacion
+    with _lock:
+        if _config is None:
+            _establecer(Configuracion.obtener())
+            _ultima_verificacion = time.monotonic()
+            return _config
+        ahora = time.monotonic()
+        if ahora - _ultima_verificacion < INTERVALO_VERIFICACION:
+            return _config
+        _ultima_verificacion = ahora
+        version = db.fetch_scalar('SELECT Version FROM Configuracion WHERE ID = ?', (_config.id,))
+        if version == _config.version:
+            return _config
+        _copiar_en(_config, Configuracion.obtener())
+    _publicar_si_cambio_tasa()
     return _config
 
 def refresh_config() -> Configuracion:
     """Refresca y retorna la configuración actual"""
-    global _config
-    _config = Configuracion.obtener()
+    global _ultima_verificacion
+    with _lock:
+        _establecer(Configuracion.obtener())
+        _ultima_verificacion = time.monotonic()
+    _publicar_si_cambio_tasa()
     return _config
+
+def _config_guardada(config: Configuracion) -> None:
+    """Refleja en la instancia global una configuración guardada en esta estación"""
+    with _lock:
+        _establecer(config)
+    _publicar_si_cambio_tasa()
+
+def _establecer(config: Configuracion) -> None:
+    global _config, _tasa_publicada
+    if _config is None:
+        _config = config
+        _tasa_publicada = config.tasa_dolar_bs
+    elif _config is not config:
+        _copiar_en(_config, config)
+
+def _copiar_en(destino: Configuracion, origen: Configuracion) -> None:
+    for campo in fields(Configuracion):
+        setattr(destino, campo.name, getattr(origen, campo.name))
+
+def _publicar_si_cambio_tasa() -> None:
+    global _tasa_publicada
+    with _lock:
+        anterior, nueva = _tasa_publicada, _config.tasa_dolar_bs
+        _tasa_publicada = nueva
+    if nueva != anterior:
+        bus.publicar(TasaCambiada(tasa_anterior=anterior, tasa_nueva=nueva))
@@ -0,0 +1,165 @@
+"""
+Matriz de disponibilidad para calendarios
+
+Precalcula las noches ocupadas de todas las habitaciones para los próximos
+días: cada noche es un entero usado como conjunto de bits (un bit por
+habitación, 1 = ocupada por una estadía, una reserva confirmada o una
+orden de mantenimiento). Contar las habitaciones libres de una noche es un
+AND con la máscara del tipo y un conteo de bits, y las libres de un rango
+salen del OR de sus noches.
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from models.mantenimiento import fin_fuera_de_servicio
+from models.reserva import IndicePorHabitacion, fin_ocupacion
+
+# Noches hacia adelante que cubre la matriz
+DIAS_HORIZONTE = 365
+
+@dataclass
+class FilaCalendario:
+    """Noches de una habitación en el calendario (True = libre)"""
+    numero: int
+    tipo: str
+    libres: List[bool]
+
+
+class MatrizDisponibilidad(IndicePorHabitacion):
+    """
+    Una máscara de bits por noche desde hoy hasta el horizonte. Cada
+    habitación tiene una posición fija de bit; al releer una habitación
+    pendiente solo se borra y se vuelve a marcar su bit en cada noche. Al
+    cambiar el día la matriz se reconstruye con el nuevo inicio.
+    """
+    
+    def __init__(self, dias: int = DIAS_HORIZONTE):
+        super().__init__()
+        self.dias = dias
+        self._inicio = date.today()
+        self._noches: List[int] = [0] * dias
+        self._bits: Dict[int, int] = {}
+        self._numeros: List[int] = []
+        self._tipos: Dict[int, str] = {}
+        self._mascaras_tipo: Dict[str, int] = {}
+        self._todas = 0
+    
+    def _aplicar(self, numeros, tipos, intervalos, ocupada_hasta, fuera_de_servicio) -> None:
+        if numeros is None:
+            self._inicio = date.today()
+            self._noches = [0] * self.dias
+            self._tipos = {}
+            numeros = sorted(tipos)
+        else:
+            # Borrar las habitaciones releídas de todas las noches en una pasada
+            limpiar = ~sum(self._bits.get(numero, 0) for numero in numeros)
+            self._noches = [noche & limpiar for noche in self._noches]
+        
+        for numero in numeros:
+            if numero not in tipos:
+                self._tipos.pop(numero, None)
+                continue
+            bit = self._bits.get(numero)
+            if bit is None:
+                bit = self._bits[numero] = 1 << len(self._numeros)
+                self._numeros.append(numero)
+            self._tipos[numero] = tipos[numero]
+            rangos = [(llegada, salida) for llegada, salida, _ in intervalos.get(numero, [])]
+            if numero in ocupada_hasta:
+                rangos.append((self._inicio, fin_ocupacion(ocupada_hasta[numero])))
+            rangos.extend((desde, fin_fuera_de_servicio(hasta)) for desde, hasta in fuera_de_servicio.get(numero, []))
+            for llegada, salida in rangos:
+                for i in range(max(0, (llegada - self._inicio).days), min(self.dias, (salida - self._inicio).days)):
+                    self._noches[i] |= bit
+        
+        self._mascaras_tipo = {}
+        for numero, tipo in self._tipos.items():
+            self._mascaras_tipo[tipo] = self._mascaras_tipo.get(tipo, 0) | self._bits[numero]
+        self._todas = sum(self._mascaras_tipo.values())
+    
+    def _preparar(self) -> None:
+        """Reconstruye la matriz si cambió el día y relee las habitaciones pendientes"""
+        if self._inicio != date.today():
+            self.cargar()
+        self._refrescar()
+    
+    def _rango(self, desde: date, dias: int) -> Tuple[int, int]:
+        """Posiciones [i, j) de la matriz para el rango pedido, recortadas al horizonte"""
+        i = max(0, (desde - self._inicio).days)
+        j = min(self.dias, (desde - self._inicio).days + dias)
+        return i, max(i, j)
+    
+    def _mascara(self, tipo: Optional[str]) -> int:
+        return self._todas if tipo is None else self._mascaras_tipo.get(tipo, 0)
+    
+    def _numeros_de(self, mascara: int) -> List[int]:
+        """Números de habitación de los bits encendidos, recorriendo solo esos bits"""
+        numeros = []
+        while mascara:
+            bajo = mascara & -mascara
+            numeros.append(self._numeros[bajo.bit_length() - 1])
+            mascara ^= bajo
+        return sorted(numeros)
+    
+    @property
+    def inicio(self) -> date:
+        return self._inicio
+    
+    def tipos(self) -> List[str]:
+        """Tipos de habitación presentes en la matriz"""
+        self._preparar()
+        with self._lock:
+            return sorted(self._mascaras_tipo)
+    
+    def libres_por_noche(self, desde: date, dias: int, tipo: Optional[str] = None) -> List[int]:
+        """Cantidad de habitaciones (opcionalmente de un tipo) libres en cada noche del rango"""
+        self._preparar()
+        with self._lock:
+            mascara = self._mascara(tipo)
+            i, j = self._rango(desde, dias)
+            return [(mascara & ~noche).bit_count() for noche in self._noches[i:j]]
+    
+    def libres_por_tipo(self, fecha: date) -> Dict[str, int]:
+        """Cantidad de habitaciones libres de cada tipo en una noche"""
+        self._preparar()
+        with self._lock:
+            i, j = self._rango(fecha, 1)
+            if i == j:
+                return {}
+            noche = self._noches[i]
+            return {tipo: (mascara & ~noche).bit_count() for tipo, mascara in sorted(self._mascaras_tipo.items())}
+    
+    def habitaciones_libres(self, llegada: date, salida: date, tipo: Optional[str] = None) -> List[int]:
+        """Habitaciones libres en todas las noches del rango"""
+        self._preparar()
+        with self._lock:
+            i, j = self._rango(llegada, (salida - llegada).days)
+            ocupadas = 0
+            for noche in self._noches[i:j]:
+                ocupadas |= noche
+            return self._numeros_de(self._mascara(tipo) & ~ocupadas)
+    
+    def grilla(self, desde: date, dias: int, tipo: Optional[str] = None) -> List[FilaCalendario]:
+        """Filas del calendario, una por habitación, con la disponibilidad de cada noche"""
+        self._preparar()
+        with self._lock:
+            i, j = self._rango(desde, dias)
+            noches = self._noches[i:j]
+            return [
+                FilaCalendario(numero, self._tipos[numero], [not (noche & self._bits[numero]) for noche in noches])
+                for numero in sorted(self._tipos)
+                if tipo is None or self._tipos[numero] == tipo
+            ]
+
+# Instancia global de la matriz (lazy loading)
+_matriz: Optional[MatrizDisponibilidad] = None
+
+def get_matriz_disponibilidad() -> MatrizDisponibilidad:
+    """Obtiene la matriz global de disponibilidad, cargándola si hace falta"""
+    global _matriz
+    if _matriz is None:
+        matriz = MatrizDisponibilidad()
+        matriz.suscribir()
+        matriz.cargar()
+        _matriz = matriz
+    return _matriz
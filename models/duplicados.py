@@ -0,0 +1,60 @@
+"""
+Detección de huéspedes duplicados (documentos mal tipeados, variantes de nombre)
+"""
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from database.connection import db
+from utils.similitud import (
+    MAX_TAMANO_BLOQUE, claves_bloqueo, comparar_bloques, preparar_registro
+)
+
+# A partir de esta cantidad de huéspedes la comparación se reparte en procesos
+UMBRAL_PARALELO = 20000
+
+@dataclass
+class CandidatoDuplicado:
+    huesped_id_a: int
+    huesped_id_b: int
+    puntaje: float
+    motivo: str = ""
+
+def detectar_duplicados(umbral: float = 0.85, procesos: Optional[int] = None) -> List[CandidatoDuplicado]:
+    """
+    Busca pares de huéspedes que probablemente son la misma persona.
+
+    Los huéspedes se agrupan por claves de bloqueo (inicio y final del
+    documento normalizado) y solo se comparan dentro de cada bloque,
+    evitando la comparación de todos contra todos.
+    """
+    rows = db.fetch_all('SELECT ID, Documento, Nombres, Apellidos FROM Huespedes')
+
+    bloques: Dict[str, list] = defaultdict(list)
+    for row in rows:
+        registro = preparar_registro(row['ID'], row['Documento'], row['Nombres'], row['Apellidos'])
+        for clave in claves_bloqueo(registro[1]):
+            bloques[clave].append(registro)
+
+    lista_bloques = [b for b in bloques.values() if 1 < len(b) <= MAX_TAMANO_BLOQUE]
+
+    if len(rows) >= UMBRAL_PARALELO and len(lista_bloques) > 1:
+        procesos = procesos or os.cpu_count() or 1
+        tamano = max(1, len(lista_bloques) // (procesos * 4))
+        lotes = [lista_bloques[i:i + tamano] for i in range(0, len(lista_bloques), tamano)]
+        pares = []
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            for resultado in pool.map(comparar_bloques, lotes, [umbral] * len(lotes)):
+                pares.extend(resultado)
+    else:
+        pares = comparar_bloques(lista_bloques, umbral)
+
+    # Un mismo par puede aparecer en varios bloques: conservar el mejor puntaje
+    mejores: Dict[tuple, CandidatoDuplicado] = {}
+    for id_a, id_b, puntaje, motivo in pares:
+        actual = mejores.get((id_a, id_b))
+        if actual is None or puntaje > actual.puntaje:
+            mejores[(id_a, id_b)] = CandidatoDuplicado(id_a, id_b, puntaje, motivo)
+
+    return sorted(mejores.values(), key=lambda c: c.puntaje, reverse=True)
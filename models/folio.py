@@ -0,0 +1,180 @@
+"""
+Folio detallado de un registro
+
+Cada movimiento de dinero de una estadía (noches, extras, descuentos,
+pagos y transferencias de saldo) queda como una línea del folio con el
+saldo acumulado después de ella. Al asentar una línea se actualizan en la
+misma transacción los totales de Registros, de modo que el saldo actual se
+lee de una sola fila y el detalle completo se recorre solo cuando se pide.
+"""
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Iterator, List, Optional
+from database.connection import db
+
+class TipoLinea(str, Enum):
+    HABITACION = 'Habitacion'
+    EXTRA = 'Extra'
+    DESCUENTO = 'Descuento'
+    PAGO = 'Pago'
+    TRANSFERENCIA = 'Transferencia'
+
+# Total de Registros que mueve cada tipo de línea y signo con que lo hace
+# (el monto de la línea es su efecto sobre el saldo)
+TOTALES_POR_TIPO = {
+    TipoLinea.HABITACION: ('Total_Habitacion_USD', 1),
+    TipoLinea.EXTRA: ('Total_Extras_USD', 1),
+    TipoLinea.DESCUENTO: ('Total_Descuentos_USD', -1),
+    TipoLinea.PAGO: ('Total_Pagado_USD', -1),
+    # El saldo que pasa a la cuenta del huésped sale de lo pagado
+    TipoLinea.TRANSFERENCIA: ('Total_Pagado_USD', -1),
+}
+
+@dataclass
+class LineaFolio:
+    registro_id: int
+    tipo: TipoLinea
+    monto_usd: float
+    saldo_usd: float = 0.0
+    descripcion: str = ""
+    fecha: Optional[datetime] = None
+    usuario_id: Optional[int] = None
+    transaccion_id: Optional[int] = None
+    id: Optional[int] = None
+
+    @property
+    def es_cargo(self) -> bool:
+        return self.monto_usd > 0
+
+    @staticmethod
+    def _from_row(row) -> 'LineaFolio':
+        """Crea una línea desde una fila de la base de datos"""
+        return LineaFolio(
+            id=row['ID'],
+            registro_id=row['Registro_ID'],
+            tipo=TipoLinea(row['Tipo']),
+            monto_usd=row['Monto_USD'],
+            saldo_usd=row['Saldo_USD'],
+            descripcion=row['Descripcion'],
+            fecha=datetime.fromisoformat(row['Fecha']) if row['Fecha'] else None,
+            usuario_id=row['Usuario_ID'],
+            transaccion_id=row['Transaccion_ID'],
+        )
+
+def asentar(conn: sqlite3.Connection, registro_id: int, tipo: TipoLinea, monto_usd: float,
+            descripcion: str, usuario_id: Optional[int] = None,
+            transaccion_id: Optional[int] = None, actualizar_totales: bool = True) -> float:
+    """
+    Asienta una línea en el folio dentro de la transacción recibida y
+    retorna el saldo resultante. Con `actualizar_totales` suma el monto al
+    total correspondiente de Registros, recalcula su saldo e incrementa su
+    versión; sin él solo documenta un total que ya se guardó.
+    """
+    if actualizar_totales:
+        columna, signo = TOTALES_POR_TIPO[tipo]
+        conn.execute(f'''
+            UPDATE Registros SET {columna} = {columna} + ?, Version = Version + 1
+            WHERE ID = ?
+        ''', (monto_usd * signo, registro_id))
+        conn.execute('''
+            UPDATE Registros SET Saldo_Pendiente_USD =
+                Total_Habitacion_USD + Total_Extras_USD - Total_Descuentos_USD - Total_Pagado_USD
+            WHERE ID = ?
+        ''', (registro_id,))
+        saldo = conn.execute(
+            'SELECT Saldo_Pendiente_USD FROM Registros WHERE ID = ?', (registro_id,)
+        ).fetchone()[0]
+    else:
+        saldo = saldo_folio(registro_id, conn) + monto_usd
+
+    conn.execute('''
+        INSERT INTO Folio (Registro_ID, Tipo, Descripcion, Monto_USD, Saldo_USD,
+                           Fecha, Usuario_ID, Transaccion_ID)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (registro_id, tipo.value, descripcion, monto_usd, saldo,
+          datetime.now(), usuario_id, transaccion_id))
+    return saldo
+
+def saldo_folio(registro_id: int, conn: Optional[sqlite3.Connection] = None) -> float:
+    """Retorna el saldo de la última línea del folio (0 si no tiene líneas)"""
+    query = '''
+        SELECT Saldo_USD FROM Folio
+        WHERE Registro_ID = ?
+        ORDER BY ID DESC LIMIT 1
+    '''
+    if conn is not None:
+        row = conn.execute(query, (registro_id,)).fetchone()
+        return row[0] if row else 0.0
+    return db.fetch_scalar(query, (registro_id,)) or 0.0
+
+def listar_folio(registro_id: int, despues_de: int = 0, limite: int = 100) -> List[LineaFolio]:
+    """
+    Lista las líneas del folio posteriores a la línea `despues_de`, en orden.
+    Para la página siguiente se pasa el ID de la última línea recibida.
+    """
+    rows = db.fetch_all('''
+        SELECT * FROM Folio
+        WHERE Registro_ID = ? AND ID > ?
+        ORDER BY ID
+        LIMIT ?
+    ''', (registro_id, despues_de, limite))
+    return [LineaFolio._from_row(row) for row in rows]
+
+def iterar_folio(registro_id: int, lote: int = 100) -> Iterator[LineaFolio]:
+    """Recorre todas las líneas del folio leyéndolas por páginas"""
+    despues_de = 0
+    while True:
+        lineas = listar_folio(registro_id, despues_de, lote)
+        yield from lineas
+        if len(lineas) < lote:
+            return
+        despues_de = lineas[-1].id
+
+def asentar_lote(conn: sqlite3.Connection, lineas: List[LineaFolio], lote: int = 500) -> Dict[int, float]:
+    """
+    Asienta muchas líneas en una sola transacción y retorna el saldo final
+    de cada registro. Los saldos acumulados se calculan en memoria a partir
+    de una lectura por lote de registros, y los totales se actualizan con
+    un UPDATE por registro en lugar de uno por línea.
+    """
+    ids = list(dict.fromkeys(linea.registro_id for linea in lineas))
+    saldos: Dict[int, float] = {}
+    for i in range(0, len(ids), lote):
+        parte = ids[i:i + lote]
+        saldos.update(conn.execute(
+            f"SELECT ID, Saldo_Pendiente_USD FROM Registros WHERE ID IN ({', '.join('?' * len(parte))})",
+            parte
+        ).fetchall())
+
+    columnas = ('Total_Habitacion_USD', 'Total_Extras_USD', 'Total_Descuentos_USD', 'Total_Pagado_USD')
+    incrementos = {registro_id: dict.fromkeys(columnas, 0.0) for registro_id in ids}
+    ahora = datetime.now()
+    for linea in lineas:
+        saldos[linea.registro_id] += linea.monto_usd
+        linea.saldo_usd = saldos[linea.registro_id]
+        linea.fecha = linea.fecha or ahora
+        columna, signo = TOTALES_POR_TIPO[linea.tipo]
+        incrementos[linea.registro_id][columna] += linea.monto_usd * signo
+
+    conn.executemany('''
+        INSERT INTO Folio (Registro_ID, Tipo, Descripcion, Monto_USD, Saldo_USD,
+                           Fecha, Usuario_ID, Transaccion_ID)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(l.registro_id, l.tipo.value, l.descripcion, l.monto_usd, l.saldo_usd,
+           l.fecha, l.usuario_id, l.transaccion_id) for l in lineas])
+
+    # En un UPDATE las expresiones leen los valores anteriores de la fila
+    conn.executemany('''
+        UPDATE Registros SET
+            Total_Habitacion_USD = Total_Habitacion_USD + ?,
+            Total_Extras_USD = Total_Extras_USD + ?,
+            Total_Descuentos_USD = Total_Descuentos_USD + ?,
+            Total_Pagado_USD = Total_Pagado_USD + ?,
+            Saldo_Pendiente_USD = (Total_Habitacion_USD + ?) + (Total_Extras_USD + ?)
+                                  - (Total_Descuentos_USD + ?) - (Total_Pagado_USD + ?),
+            Version = Version + 1
+        WHERE ID = ?
+    ''', [(*inc.values(), *inc.values(), registro_id) for registro_id, inc in incrementos.items()])
+    return saldos
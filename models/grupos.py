@@ -0,0 +1,264 @@
+"""
+Check-in y check-out de grupos
+
+Registra o cierra muchas habitaciones en una sola transacción: crea los
+huéspedes que faltan, ocupa o libera todas las habitaciones, abre o cierra
+los registros y reparte un único pago maestro entre los folios. Si alguna
+habitación no está disponible no se aplica nada.
+"""
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from database.connection import db
+from models.base import ConflictoConcurrencia
+from models.folio import LineaFolio, TipoLinea, asentar_lote
+from models.huesped import Huesped, indexar_huespedes, acumular_estadias
+from models.reserva import tomar_reservas, marcar_ingresadas
+from models.tarifas import get_calendario_precios
+from models.transaccion import MetodoPago, verificar_referencia
+from utils.eventos import bus, HabitacionCambiada
+from utils.helpers import normalizar_referencia
+
+@dataclass
+class AsignacionGrupo:
+    habitacion_numero: int
+    huesped: Huesped
+
+@dataclass
+class PagoGrupo:
+    """Pago maestro que cubre los folios del grupo"""
+    monto_usd: float
+    metodo_pago: MetodoPago
+    tasa_cambio: float
+    monto_bs: float = 0.0
+    referencia: str = ""
+    turno_id: Optional[int] = None
+
+@dataclass
+class ResultadoGrupo:
+    registro_ids: List[int] = field(default_factory=list)
+    habitaciones: List[int] = field(default_factory=list)
+    huespedes_creados: int = 0
+    total_usd: float = 0.0
+    pagado_usd: float = 0.0
+    segundos: float = 0.0
+    
+    @property
+    def habitaciones_por_segundo(self) -> float:
+        if not self.segundos:
+            return 0.0
+        return len(self.habitaciones) / self.segundos
+
+def repartir_pago(monto_usd: float, saldos: Dict[int, float]) -> Dict[int, float]:
+    """
+    Reparte un pago entre registros en proporción a sus saldos, redondeando
+    a centavos; el último absorbe la diferencia de redondeo
+    """
+    total = sum(saldos.values())
+    partes: Dict[int, float] = {}
+    restante = round(monto_usd, 2)
+    ids = list(saldos)
+    for registro_id in ids[:-1]:
+        parte = round(monto_usd * saldos[registro_id] / total, 2) if total > 0 else 0.0
+        parte = min(parte, restante)
+        partes[registro_id] = parte
+        restante = round(restante - parte, 2)
+    if ids:
+        partes[ids[-1]] = restante
+    return partes
+
+def checkin_grupo(asignaciones: List[AsignacionGrupo], fecha_salida: datetime, usuario_id: int,
+                  pago: Optional[PagoGrupo] = None, nombre_grupo: str = "") -> ResultadoGrupo:
+    """
+    Registra todas las habitaciones del grupo en una transacción. Lanza
+    ConflictoConcurrencia, sin aplicar nada, si alguna ya no está libre o
+    tiene reservas de otro huésped en esas noches, y ReferenciaEnUso si la
+    referencia del pago ya se usó.
+    """
+    inicio = time.perf_counter()
+    numeros = [a.habitacion_numero for a in asignaciones]
+    if len(set(numeros)) != len(numeros):
+        raise ValueError("Una habitación está asignada más de una vez")
+    ahora = datetime.now()
+    noches = max(1, (fecha_salida - ahora).days)
+    calendario = get_calendario_precios()
+    nota = f"Grupo: {nombre_grupo}" if nombre_grupo else ""
+    resultado = ResultadoGrupo(habitaciones=sorted(numeros))
+    
+    with db.transaction() as conn:
+        marcadores = ', '.join('?' * len(numeros))
+        libres = {row[0] for row in conn.execute(f'''
+            SELECT Numero FROM Habitaciones
+            WHERE Numero IN ({marcadores}) AND Estado = 'Libre'
+        ''', numeros)}
+        no_libres = sorted(set(numeros) - libres)
+        if no_libres:
+            raise ConflictoConcurrencia(
+                "Habitaciones no disponibles: " + ", ".join(f"{n:03d}" for n in no_libres)
+            )
+        conn.execute(f'''
+            UPDATE Habitaciones SET Estado = 'Ocupada', Version = Version + 1
+            WHERE Numero IN ({marcadores})
+        ''', numeros)
+        
+        nuevos = Huesped.guardar_lote(conn, [a.huesped for a in asignaciones])
+        reservas = tomar_reservas(
+            conn, [(a.habitacion_numero, a.huesped.id) for a in asignaciones],
+            ahora.date(), max(fecha_salida.date(), ahora.date() + timedelta(days=1))
+        )
+        precios = dict(conn.execute(
+            f'SELECT Numero, Precio_USD FROM Habitaciones WHERE Numero IN ({marcadores})', numeros
+        ).fetchall())
+        
+        conn.executemany('''
+            INSERT INTO Registros (
+                Huesped_Principal_ID, Habitacion_Numero, Fecha_Entrada, Fecha_Salida_Prevista,
+                Estado, Notas, Usuario_Checkin_ID, Noches_Facturadas
+            ) VALUES (?, ?, ?, ?, 'Activo', ?, ?, ?)
+        ''', [(a.huesped.id, a.habitacion_numero, ahora, fecha_salida, nota, usuario_id, noches)
+              for a in asignaciones])
+        registro_ids = dict(conn.execute(f'''
+            SELECT Habitacion_Numero, ID FROM Registros
+            WHERE Estado = 'Activo' AND Habitacion_Numero IN ({marcadores})
+        ''', numeros).fetchall())
+        resultado.registro_ids = [registro_ids[n] for n in numeros]
+        marcar_ingresadas(conn, {reserva_id: registro_ids[n] for n, reserva_id in reservas.items()})
+        
+        descripcion = f"{noches} {'noche' if noches == 1 else 'noches'}"
+        llegada = ahora.date()
+        cargos = {
+            registro_ids[n]: calendario.cotizar(llegada, llegada + timedelta(days=noches), precios[n]).total_usd
+            for n in numeros
+        }
+        lineas = [
+            LineaFolio(registro_id, TipoLinea.HABITACION, monto, descripcion=descripcion,
+                       usuario_id=usuario_id)
+            for registro_id, monto in cargos.items()
+        ]
+        if pago and pago.monto_usd > 0:
+            verificar_referencia(pago.metodo_pago, pago.referencia, conn)
+            lider = asignaciones[0]
+            transaccion_id = conn.execute('''
+                INSERT INTO Transacciones (
+                    Registro_ID, Huesped_ID, Monto_USD, Tasa_Cambio, Monto_BS,
+                    Metodo_Pago, Referencia, Referencia_Norm, Tipo, Concepto, Fecha_Hora, Usuario_ID, Turno_ID
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'Pago', ?, ?, ?, ?)
+            ''', (
+                registro_ids[lider.habitacion_numero], lider.huesped.id, pago.monto_usd,
+                pago.tasa_cambio, pago.monto_bs, pago.metodo_pago.value, pago.referencia,
+                normalizar_referencia(pago.referencia),
+                f"Check-in {nota or 'de grupo'} ({len(numeros)} habitaciones)",
+                ahora, usuario_id, pago.turno_id
+            )).lastrowid
+            for registro_id, parte in repartir_pago(pago.monto_usd, cargos).items():
+                if parte:
+                    lineas.append(LineaFolio(registro_id, TipoLinea.PAGO, -parte,
+                                             descripcion="Pago de grupo", usuario_id=usuario_id,
+                                             transaccion_id=transaccion_id))
+            resultado.pagado_usd = pago.monto_usd
+        asentar_lote(conn, lineas)
+        
+        conn.executemany(
+            'UPDATE Huespedes SET Ultima_Visita = ? WHERE ID = ?',
+            [(ahora, a.huesped.id) for a in asignaciones]
+        )
+    
+    indexar_huespedes(nuevos)
+    resultado.huespedes_creados = len(nuevos)
+    resultado.total_usd = sum(cargos.values())
+    resultado.segundos = time.perf_counter() - inicio
+    for numero in resultado.habitaciones:
+        bus.publicar(HabitacionCambiada(numero, 'Ocupada'))
+    return resultado
+
+def checkout_grupo(registro_ids: List[int], usuario_id: int,
+                   pago: Optional[PagoGrupo] = None) -> ResultadoGrupo:
+    """
+    Cierra todos los registros en una transacción, repartiendo el pago
+    entre los saldos pendientes. Los saldos a favor pasan a la cuenta de
+    cada huésped. Lanza ConflictoConcurrencia si algún registro ya no está
+    activo y ValueError si el pago no cubre los saldos o su referencia ya
+    se usó (ReferenciaEnUso).
+    """
+    inicio = time.perf_counter()
+    ahora = datetime.now()
+    resultado = ResultadoGrupo(registro_ids=list(registro_ids))
+    
+    with db.transaction() as conn:
+        marcadores = ', '.join('?' * len(registro_ids))
+        rows = conn.execute(f'''
+            SELECT ID, Habitacion_Numero, Huesped_Principal_ID, Saldo_Pendiente_USD
+            FROM Registros
+            WHERE Estado = 'Activo' AND ID IN ({marcadores})
+        ''', registro_ids).fetchall()
+        if len(rows) != len(set(registro_ids)):
+            raise ConflictoConcurrencia("Algunos registros del grupo ya no están activos")
+        
+        pendientes = {row['ID']: row['Saldo_Pendiente_USD'] for row in rows
+                      if row['Saldo_Pendiente_USD'] > 0}
+        total_pendiente = round(sum(pendientes.values()), 2)
+        monto_pago = pago.monto_usd if pago else 0.0
+        if monto_pago < total_pendiente:
+            raise ValueError(f"Pago insuficiente. Faltan ${total_pendiente - monto_pago:.2f}")
+        
+        lineas = []
+        saldos = {row['ID']: row['Saldo_Pendiente_USD'] for row in rows}
+        if pago and monto_pago > 0:
+            verificar_referencia(pago.metodo_pago, pago.referencia, conn)
+            primero = rows[0]
+            transaccion_id = conn.execute('''
+                INSERT INTO Transacciones (
+                    Registro_ID, Huesped_ID, Monto_USD, Tasa_Cambio, Monto_BS,
+                    Metodo_Pago, Referencia, Referencia_Norm, Tipo, Concepto, Fecha_Hora, Usuario_ID, Turno_ID
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'Pago', ?, ?, ?, ?)
+            ''', (
+                primero['ID'], primero['Huesped_Principal_ID'], monto_pago, pago.tasa_cambio,
+                pago.monto_bs, pago.metodo_pago.value, pago.referencia, normalizar_referencia(pago.referencia),
+                f"Check-out grupo ({len(rows)} habitaciones)", ahora, usuario_id, pago.turno_id
+            )).lastrowid
+            # Cada saldo se cubre exacto; el excedente queda en el último registro
+            partes = dict(pendientes) or {primero['ID']: 0.0}
+            ultimo = list(partes)[-1]
+            partes[ultimo] = round(partes[ultimo] + monto_pago - total_pendiente, 2)
+            for registro_id, parte in partes.items():
+                if parte:
+                    lineas.append(LineaFolio(registro_id, TipoLinea.PAGO, -parte,
+                                             descripcion="Pago de grupo", usuario_id=usuario_id,
+                                             transaccion_id=transaccion_id))
+                    saldos[registro_id] -= parte
+            resultado.pagado_usd = monto_pago
+        
+        # Saldos a favor a la cuenta de cada huésped
+        huespedes = {row['ID']: row['Huesped_Principal_ID'] for row in rows}
+        creditos = {registro_id: -saldo for registro_id, saldo in saldos.items() if saldo < -0.005}
+        lineas.extend(
+            LineaFolio(registro_id, TipoLinea.TRANSFERENCIA, credito,
+                       descripcion="Saldo a favor transferido al huésped", usuario_id=usuario_id)
+            for registro_id, credito in creditos.items()
+        )
+        if lineas:
+            asentar_lote(conn, lineas)
+        conn.executemany('''
+            UPDATE Huespedes SET Saldo_Acumulado = Saldo_Acumulado + ?, Version = Version + 1
+            WHERE ID = ?
+        ''', [(credito, huespedes[registro_id]) for registro_id, credito in creditos.items()])
+        
+        conn.execute(f'''
+            UPDATE Registros SET Estado = 'Cerrado', Fecha_Salida_Real = ?,
+                Usuario_Checkout_ID = ?, Version = Version + 1
+            WHERE ID IN ({marcadores})
+        ''', [ahora, usuario_id, *registro_ids])
+        acumular_estadias(conn, [row['ID'] for row in rows])
+        numeros = [row['Habitacion_Numero'] for row in rows]
+        conn.execute(f'''
+            UPDATE Habitaciones SET Estado = 'Aseo', Ultima_Limpieza = ?, Version = Version + 1
+            WHERE Numero IN ({', '.join('?' * len(numeros))})
+        ''', [ahora, *numeros])
+    
+    resultado.habitaciones = sorted(numeros)
+    resultado.total_usd = total_pendiente
+    resultado.segundos = time.perf_counter() - inicio
+    for numero in resultado.habitaciones:
+        bus.publicar(HabitacionCambiada(numero, 'Aseo'))
+    return resultado
@@ -1,11 +1,15 @@
 """
 Modelo y lógica de negocio para Habitaciones
 """
+import sqlite3
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from typing import Optional, List
 from enum import Enum
 from database.connection import db
+from models.base import SeguimientoCambios, ConflictoConcurrencia
+from models.mantenimiento import filtro_en_servicio
+from utils.eventos import bus, HabitacionCambiada
 
 class EstadoHabitacion(str, Enum):
     LIBRE = 'Libre'
@@ -15,7 +19,7 @@ class EstadoHabitacion(str, Enum):
     MANTENIMIENTO = 'Mantenimiento'
 
 @dataclass
-class Habitacion:
+class Habitacion(SeguimientoCambios):
     numero: int
     tipo: str = ""
     descripcion: str = ""
@@ -24,6 +28,21 @@ class Habitacion:
     estado: EstadoHabitacion = EstadoHabitacion.LIBRE
     ultima_limpieza: Optional[datetime] = None
     notas: str = ""
+    version: int = 0
+    
+    _tabla = 'Habitaciones'
+    _columna_id = 'Numero'
+    _atributo_id = 'numero'
+    _columna_version = 'Version'
+    _columnas = {
+        'tipo': 'Tipo',
+        'descripcion': 'Descripcion',
+        'precio_usd': 'Precio_USD',
+        'capacidad': 'Capacidad',
+        'estado': 'Estado',
+        'ultima_limpieza': 'Ultima_Limpieza',
+        'notas': 'Notas',
+    }
     
     @property
     def color_estado(self) -> str:
@@ -55,25 +74,36 @@ class Habitacion:
         return self.estado == EstadoHabitacion.LIBRE
     
     def cambiar_estado(self, nuevo_estado: EstadoHabitacion) -> None:
-        """Cambia el estado de la habitación"""
+        """
+        Cambia el estado de la habitación. Lanza ConflictoConcurrencia si otra
+        estación la modificó desde que fue leída.
+        """
         self.estado = nuevo_estado
         if nuevo_estado == EstadoHabitacion.ASEO:
             self.ultima_limpieza = datetime.now()
-        db.execute(
-            'UPDATE Habitaciones SET Estado = ?, Ultima_Limpieza = ? WHERE Numero = ?',
-            (self.estado.value, self.ultima_limpieza, self.numero)
-        )
+        if self._guardar_cambios():
+            bus.publicar(HabitacionCambiada(self.numero, self.estado.value))
     
     def guardar(self) -> None:
-        """Guarda o actualiza la habitación"""
-        db.execute('''
-            INSERT OR REPLACE INTO Habitaciones 
-            (Numero, Tipo, Descripcion, Precio_USD, Capacidad, Estado, Ultima_Limpieza, Notas)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            self.numero, self.tipo, self.descripcion, self.precio_usd,
-            self.capacidad, self.estado.value, self.ultima_limpieza, self.notas
-        ))
+        """Guarda la habitación; si ya existe solo escribe los campos modificados"""
+        if getattr(self, '_originales', None) is not None:
+            if self._guardar_cambios():
+                bus.publicar(HabitacionCambiada(self.numero, self.estado.value))
+            return
+        try:
+            db.execute('''
+                INSERT INTO Habitaciones 
+                (Numero, Tipo, Descripcion, Precio_USD, Capacidad, Estado, Ultima_Limpieza, Notas)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                self.numero, self.tipo, self.descripcion, self.precio_usd,
+                self.capacidad, self.estado.value, self.ultima_limpieza, self.notas
+            ))
+        except sqlite3.IntegrityError:
+            raise ConflictoConcurrencia(f"La habitación {self.numero} ya existe")
+        self.version = 0
+        self._marcar_limpio()
+        bus.publicar(HabitacionCambiada(self.numero, self.estado.value))
     
     @staticmethod
     def buscar_por_numero(numero: int) -> Optional['Habitacion']:
@@ -97,9 +127,20 @@ class Habitacion:
         return [Habitacion._from_row(row) for row in rows]
     
     @staticmethod
-    def listar_disponibles() -> List['Habitacion']:
-        """Lista habitaciones disponibles (Libres)"""
-        return Habitacion.listar_por_estado(EstadoHabitacion.LIBRE)
+    def listar_disponibles(salida: Optional[date] = None) -> List['Habitacion']:
+        """
+        Lista las habitaciones libres para un check-in hoy, sin las que tienen
+        una orden de mantenimiento en alguna noche hasta `salida` (por
+        defecto solo esta noche)
+        """
+        hoy = date.today()
+        en_servicio, params = filtro_en_servicio('h.Numero', hoy, salida or hoy + timedelta(days=1))
+        rows = db.fetch_all(f'''
+            SELECT h.* FROM Habitaciones h
+            WHERE h.Estado = ? AND {en_servicio}
+            ORDER BY h.Numero
+        ''', (EstadoHabitacion.LIBRE.value, *params))
+        return [Habitacion._from_row(row) for row in rows]
     
     @staticmethod
     def contar_por_estado() -> dict:
@@ -114,7 +155,7 @@ class Habitacion:
     @staticmethod
     def _from_row(row: dict) -> 'Habitacion':
         """Crea un objeto Habitacion desde una fila de la base de datos"""
-        return Habitacion(
+        habitacion = Habitacion(
             numero=row['Numero'],
             tipo=row['Tipo'],
             descripcion=row['Descripcion'],
@@ -122,5 +163,8 @@ class Habitacion:
             capacidad=row['Capacidad'],
             estado=EstadoHabitacion(row['Estado']),
             ultima_limpieza=row['Ultima_Limpieza'],
-            notas=row['Notas']
+            notas=row['Notas'],
+            version=row['Version']
         )
+        habitacion._marcar_limpio()
+        return habitacion
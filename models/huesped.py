@@ -1,13 +1,18 @@
 """
 Modelo y lógica de negocio para Huéspedes
 """
+import threading
+from bisect import bisect_left
 from dataclasses import dataclass
 from datetime import datetime, date
-from typing import Optional, List
+from typing import Optional, List, Dict, Set
 from database.connection import db
+from models.base import SeguimientoCambios, ConflictoConcurrencia
+from utils.eventos import bus, HuespedCambiado
+from utils.helpers import normalizar_documento
 
 @dataclass
-class Huesped:
+class Huesped(SeguimientoCambios):
     id: Optional[int] = None
     documento: str = ""
     nombres: str = ""
@@ -22,6 +27,30 @@ class Huesped:
     saldo_acumulado: float = 0.0
     fecha_registro: Optional[datetime] = None
     ultima_visita: Optional[datetime] = None
+    version: int = 0
+    
+    # Estadísticas de fidelidad: las acumula el check-out, no se editan
+    visitas: int = 0
+    noches_totales: int = 0
+    total_gastado_usd: float = 0.0
+    ultima_habitacion: Optional[int] = None
+    
+    _tabla = 'Huespedes'
+    _columna_version = 'Version'
+    _columnas = {
+        'documento': 'Documento',
+        'nombres': 'Nombres',
+        'apellidos': 'Apellidos',
+        'telefono': 'Telefono',
+        'email': 'Email',
+        'fecha_nacimiento': 'Fecha_Nacimiento',
+        'nacionalidad': 'Nacionalidad',
+        'profesion': 'Profesion',
+        'vehiculo': 'Vehiculo',
+        'placa_vehiculo': 'Placa_Vehiculo',
+        'saldo_acumulado': 'Saldo_Acumulado',
+        'ultima_visita': 'Ultima_Visita',
+    }
     
     @property
     def nombre_completo(self) -> str:
@@ -35,32 +64,20 @@ class Huesped:
     def tiene_deuda(self) -> bool:
         return self.saldo_acumulado < 0
     
+    @property
+    def gasto_promedio_usd(self) -> float:
+        return self.total_gastado_usd / self.visitas if self.visitas else 0.0
+    
     def guardar(self) -> int:
-        """Guarda o actualiza el huésped en la base de datos"""
+        """Guarda el huésped; en una actualización solo escribe los campos modificados"""
         if self.id:
-            db.execute('''
-                UPDATE Huespedes SET
-                    Documento = ?,
-                    Nombres = ?,
-                    Apellidos = ?,
-                    Telefono = ?,
-                    Email = ?,
-                    Fecha_Nacimiento = ?,
-                    Nacionalidad = ?,
-                    Profesion = ?,
-                    Vehiculo = ?,
-                    Placa_Vehiculo = ?,
-                    Saldo_Acumulado = ?,
-                    Ultima_Visita = ?
-                WHERE ID = ?
-            ''', (
-                self.documento, self.nombres, self.apellidos, self.telefono,
-                self.email, self.fecha_nacimiento, self.nacionalidad,
-                self.profesion, self.vehiculo, self.placa_vehiculo,
-                self.saldo_acumulado, datetime.now(), self.id
-            ))
+            cambios = self.campos_modificados()
+            self._guardar_cambios()
+            if cambios.keys() & {'documento', 'nombres', 'apellidos'}:
+                _actualizar_indice(self)
             return self.id
         else:
+            self.fecha_registro = datetime.now()
             self.id = db.execute('''
                 INSERT INTO Huespedes (
                     Documento, Nombres, Apellidos, Telefono, Email,
@@ -71,16 +88,68 @@ class Huesped:
                 self.documento, self.nombres, self.apellidos, self.telefono,
                 self.email, self.fecha_nacimiento, self.nacionalidad,
                 self.profesion, self.vehiculo, self.placa_vehiculo,
-                self.saldo_acumulado, datetime.now()
+                self.saldo_acumulado, self.fecha_registro
             ))
+            self._marcar_limpio()
+            _actualizar_indice(self)
             return self.id
     
+    @staticmethod
+    def guardar_lote(conn, huespedes: List['Huesped'], lote: int = 500) -> List['Huesped']:
+        """
+        Inserta dentro de la transacción recibida los huéspedes cuyo documento
+        no existe todavía y asigna a todos su ID. Retorna los que se crearon;
+        el llamador los agrega al índice de documentos después del commit.
+        """
+        ahora = datetime.now()
+        existentes = set()
+        documentos = list({h.documento for h in huespedes})
+        for i in range(0, len(documentos), lote):
+            parte = documentos[i:i + lote]
+            existentes.update(row[0] for row in conn.execute(
+                f"SELECT Documento FROM Huespedes WHERE Documento IN ({', '.join('?' * len(parte))})",
+                parte
+            ))
+        
+        nuevos = []
+        for huesped in huespedes:
+            if huesped.documento not in existentes:
+                existentes.add(huesped.documento)
+                huesped.fecha_registro = ahora
+                nuevos.append(huesped)
+        conn.executemany('''
+            INSERT INTO Huespedes (
+                Documento, Nombres, Apellidos, Telefono, Email, Nacionalidad, Fecha_Registro
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(Documento) DO NOTHING
+        ''', [(h.documento, h.nombres, h.apellidos, h.telefono, h.email, h.nacionalidad,
+               h.fecha_registro) for h in nuevos])
+        
+        ids: Dict[str, int] = {}
+        for i in range(0, len(documentos), lote):
+            parte = documentos[i:i + lote]
+            ids.update(conn.execute(
+                f"SELECT Documento, ID FROM Huespedes WHERE Documento IN ({', '.join('?' * len(parte))})",
+                parte
+            ).fetchall())
+        for huesped in huespedes:
+            huesped.id = ids[huesped.documento]
+        for huesped in nuevos:
+            huesped._marcar_limpio()
+        return nuevos
+    
     @staticmethod
     def buscar_por_id(huesped_id: int) -> Optional['Huesped']:
         """Busca un huésped por su ID"""
         row = db.fetch_one('SELECT * FROM Huespedes WHERE ID = ?', (huesped_id,))
         return Huesped._from_row(row) if row else None
     
+    @staticmethod
+    def buscar_por_ids(ids) -> Dict[int, 'Huesped']:
+        """Busca varios huéspedes con una sola consulta y los retorna por ID"""
+        rows = db.fetch_all_in('SELECT * FROM Huespedes WHERE ID IN ({marcadores})', set(ids))
+        return {row['ID']: Huesped._from_row(row) for row in rows}
+    
     @staticmethod
     def buscar_por_documento(documento: str) -> Optional['Huesped']:
         """Busca un huésped por su documento (cédula/pasaporte)"""
@@ -113,6 +182,26 @@ class Huesped:
         ''')
         return [Huesped._from_row(row) for row in rows]
     
+    @staticmethod
+    def listar_mejores(limite: int = 20, por: str = 'gasto') -> List['Huesped']:
+        """
+        Ranking de huéspedes por gasto acumulado o por visitas (y noches).
+        Lee solo los primeros `limite` del índice parcial correspondiente.
+        """
+        orden = {
+            'gasto': 'Total_Gastado_USD DESC',
+            'visitas': 'Visitas DESC, Noches_Totales DESC',
+        }.get(por)
+        if orden is None:
+            raise ValueError(f"Criterio de ranking desconocido: {por}")
+        rows = db.fetch_all(f'''
+            SELECT * FROM Huespedes
+            WHERE Visitas > 0
+            ORDER BY {orden}
+            LIMIT ?
+        ''', (limite,))
+        return [Huesped._from_row(row) for row in rows]
+    
     def ajustar_saldo(self, monto: float, tipo: str = 'Ajuste') -> None:
         """
         Ajusta el saldo del huésped
@@ -121,11 +210,85 @@ class Huesped:
         """
         self.saldo_acumulado += monto
         self.guardar()
-    
+
+    def fusionar(self, duplicado: 'Huesped') -> None:
+        """
+        Fusiona un huésped duplicado en este: reasigna sus registros,
+        transacciones, acompañamientos, reservas y tramos de deuda (con su
+        fecha de origen), suma los saldos, completa los datos vacíos y
+        elimina el duplicado, todo en una sola transacción.
+        """
+        if not self.id or not duplicado.id or self.id == duplicado.id:
+            raise ValueError("Se requieren dos huéspedes distintos ya guardados")
+
+        with db.transaction() as conn:
+            for tabla, columna in (
+                ('Registros', 'Huesped_Principal_ID'),
+                ('Transacciones', 'Huesped_ID'),
+                ('Acompanantes', 'Huesped_ID'),
+                ('Deudas_Huesped', 'Huesped_ID'),
+                ('Reservas', 'Huesped_ID'),
+            ):
+                conn.execute(
+                    f'UPDATE {tabla} SET {columna} = ? WHERE {columna} = ?',
+                    (self.id, duplicado.id)
+                )
+
+            # Leer ambos saldos dentro de la transacción para no perder cambios
+            saldos = {
+                row['ID']: row['Saldo_Acumulado'] or 0.0
+                for row in conn.execute(
+                    'SELECT ID, Saldo_Acumulado FROM Huespedes WHERE ID IN (?, ?)',
+                    (self.id, duplicado.id)
+                )
+            }
+            self.saldo_acumulado = saldos.get(self.id, 0.0) + saldos.get(duplicado.id, 0.0)
+
+            for campo in ('telefono', 'email', 'fecha_nacimiento', 'profesion',
+                          'vehiculo', 'placa_vehiculo'):
+                if not getattr(self, campo) and getattr(duplicado, campo):
+                    setattr(self, campo, getattr(duplicado, campo))
+            if duplicado.ultima_visita and (
+                not self.ultima_visita or str(duplicado.ultima_visita) > str(self.ultima_visita)
+            ):
+                self.ultima_visita = duplicado.ultima_visita
+
+            eliminado = conn.execute(
+                'DELETE FROM Huespedes WHERE ID = ? AND Version = ?',
+                (duplicado.id, duplicado.version)
+            )
+            actualizado = conn.execute('''
+                UPDATE Huespedes SET
+                    Telefono = ?,
+                    Email = ?,
+                    Fecha_Nacimiento = ?,
+                    Profesion = ?,
+                    Vehiculo = ?,
+                    Placa_Vehiculo = ?,
+                    Saldo_Acumulado = ?,
+                    Ultima_Visita = ?,
+                    Version = Version + 1
+                WHERE ID = ? AND Version = ?
+            ''', (
+                self.telefono, self.email, self.fecha_nacimiento, self.profesion,
+                self.vehiculo, self.placa_vehiculo, self.saldo_acumulado,
+                self.ultima_visita, self.id, self.version
+            ))
+            if eliminado.rowcount == 0 or actualizado.rowcount == 0:
+                raise ConflictoConcurrencia(
+                    "Uno de los huéspedes fue modificado por otra estación"
+                )
+            recalcular_estadisticas([self.id], conn)
+
+        self.version += 1
+        self._marcar_limpio()
+        if _indice is not None:
+            _indice.quitar(duplicado.id)
+
     @staticmethod
     def _from_row(row: dict) -> 'Huesped':
         """Crea un objeto Huesped desde una fila de la base de datos"""
-        return Huesped(
+        huesped = Huesped(
             id=row['ID'],
             documento=row['Documento'],
             nombres=row['Nombres'],
@@ -139,5 +302,223 @@ class Huesped:
             placa_vehiculo=row['Placa_Vehiculo'],
             saldo_acumulado=row['Saldo_Acumulado'],
             fecha_registro=row['Fecha_Registro'],
-            ultima_visita=row['Ultima_Visita']
+            ultima_visita=row['Ultima_Visita'],
+            version=row['Version'],
+            visitas=row['Visitas'],
+            noches_totales=row['Noches_Totales'],
+            total_gastado_usd=row['Total_Gastado_USD'],
+            ultima_habitacion=row['Ultima_Habitacion']
+        )
+        huesped._marcar_limpio()
+        return huesped
+
+# Visitas, noches, gasto y última habitación de los registros cerrados que
+# cumplen {filtro}, agrupados por huésped principal. Con MAX() SQLite toma
+# Habitacion_Numero de la fila con la salida más reciente.
+_ESTADIAS = '''
+    SELECT Huesped_Principal_ID as Huesped_ID,
+           COUNT(*) as Visitas,
+           SUM(MAX(1, CAST(julianday(Fecha_Salida_Real) - julianday(Fecha_Entrada) AS INTEGER))) as Noches,
+           SUM(Total_Habitacion_USD + Total_Extras_USD - Total_Descuentos_USD) as Gastado,
+           MAX(Fecha_Salida_Real) as Ultima_Salida,
+           Habitacion_Numero
+    FROM Registros
+    WHERE Estado = 'Cerrado' AND {filtro}
+    GROUP BY Huesped_Principal_ID
+'''
+
+def acumular_estadias(conn, registro_ids: List[int]) -> None:
+    """
+    Suma a las estadísticas de sus huéspedes los registros recién cerrados,
+    dentro de la transacción del check-out. No es una edición de los datos
+    del huésped, por eso no incrementa su versión.
+    """
+    if not registro_ids:
+        return
+    filtro = f"ID IN ({', '.join('?' * len(registro_ids))})"
+    conn.execute(f'''
+        UPDATE Huespedes SET
+            Visitas = Huespedes.Visitas + e.Visitas,
+            Noches_Totales = Huespedes.Noches_Totales + e.Noches,
+            Total_Gastado_USD = Huespedes.Total_Gastado_USD + e.Gastado,
+            Ultima_Habitacion = e.Habitacion_Numero
+        FROM ({_ESTADIAS.format(filtro=filtro)}) e
+        WHERE Huespedes.ID = e.Huesped_ID
+    ''', list(registro_ids))
+
+def recalcular_estadisticas(huesped_ids: Optional[List[int]] = None, conn=None) -> int:
+    """
+    Recalcula desde el historial las estadísticas de los huéspedes indicados
+    (o de todos) con un solo UPDATE agregado. Se usa para completarlas en
+    una base con historial previo y al fusionar huéspedes. Retorna cuántos
+    huéspedes tienen estadías.
+    """
+    if conn is None:
+        with db.transaction() as conn:
+            return recalcular_estadisticas(huesped_ids, conn)
+    
+    if huesped_ids is None:
+        filtro_huespedes, filtro, params = 'Visitas > 0', '1', []
+    else:
+        marcadores = ', '.join('?' * len(huesped_ids))
+        filtro_huespedes = f'ID IN ({marcadores})'
+        filtro = f'Huesped_Principal_ID IN ({marcadores})'
+        params = list(huesped_ids)
+    conn.execute(f'''
+        UPDATE Huespedes SET Visitas = 0, Noches_Totales = 0, Total_Gastado_USD = 0.0,
+            Ultima_Habitacion = NULL
+        WHERE {filtro_huespedes}
+    ''', params)
+    return conn.execute(f'''
+        UPDATE Huespedes SET
+            Visitas = e.Visitas,
+            Noches_Totales = e.Noches,
+            Total_Gastado_USD = e.Gastado,
+            Ultima_Habitacion = e.Habitacion_Numero
+        FROM ({_ESTADIAS.format(filtro=filtro)}) e
+        WHERE Huespedes.ID = e.Huesped_ID
+    ''', params).rowcount
+
+
+@dataclass
+class SugerenciaHuesped:
+    """Entrada liviana del índice de documentos usada para autocompletar"""
+    id: int
+    documento: str
+    nombre_completo: str
+
+
+class IndiceDocumentos:
+    """
+    Índice en memoria de documentos normalizados, ordenado para búsquedas
+    por prefijo con bisect. Se carga una sola vez desde la base de datos y
+    luego se mantiene de forma incremental: los huéspedes guardados en esta
+    estación se reflejan al guardarlos y los de otras estaciones llegan como
+    HuespedCambiado (vía el monitor de cambios), se marcan pendientes y se
+    releen juntos antes de la siguiente búsqueda.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._claves: List[str] = []
+        self._entradas: List[SugerenciaHuesped] = []
+        self._clave_por_id: Dict[int, str] = {}
+        self._pendientes: Set[int] = set()
+    
+    def cargar(self) -> None:
+        """Reconstruye el índice completo desde la tabla Huespedes"""
+        rows = db.fetch_all('SELECT ID, Documento, Nombres, Apellidos FROM Huespedes')
+        # Solo por clave: dos huéspedes pueden tener el mismo documento normalizado
+        pares = sorted(
+            ((normalizar_documento(row['Documento']), _sugerencia(row)) for row in rows),
+            key=lambda par: par[0]
+        )
+        with self._lock:
+            self._claves = [clave for clave, _ in pares]
+            self._entradas = [entrada for _, entrada in pares]
+            self._clave_por_id = {entrada.id: clave for clave, entrada in pares}
+    
+    def suscribir(self) -> None:
+        """Se suscribe a los cambios de huéspedes hechos en otras estaciones"""
+        bus.suscribir(HuespedCambiado, self._on_huesped_cambiado)
+    
+    def _on_huesped_cambiado(self, evento: HuespedCambiado) -> None:
+        with self._lock:
+            self._pendientes.add(evento.huesped_id)
+    
+    def _refrescar(self) -> None:
+        """Relee en una sola consulta los huéspedes pendientes"""
+        with self._lock:
+            if not self._pendientes:
+                return
+            ids, self._pendientes = list(self._pendientes), set()
+        rows = db.fetch_all_in(
+            'SELECT ID, Documento, Nombres, Apellidos FROM Huespedes WHERE ID IN ({marcadores})', ids
         )
+        with self._lock:
+            for huesped_id in ids:
+                self._quitar_sin_lock(huesped_id)
+            for row in rows:
+                self._agregar_sin_lock(_sugerencia(row))
+    
+    def buscar_prefijo(self, prefijo: str, limite: int = 8) -> List[SugerenciaHuesped]:
+        """Retorna hasta `limite` huéspedes cuyo documento empieza por el prefijo"""
+        clave = normalizar_documento(prefijo)
+        if not clave:
+            return []
+        self._refrescar()
+        resultado = []
+        with self._lock:
+            i = bisect_left(self._claves, clave)
+            while i < len(self._claves) and len(resultado) < limite:
+                if not self._claves[i].startswith(clave):
+                    break
+                resultado.append(self._entradas[i])
+                i += 1
+        return resultado
+    
+    def agregar(self, huesped: Huesped) -> None:
+        """Inserta o reemplaza la entrada de un huésped"""
+        entrada = SugerenciaHuesped(
+            id=huesped.id,
+            documento=huesped.documento,
+            nombre_completo=huesped.nombre_completo
+        )
+        with self._lock:
+            self._quitar_sin_lock(huesped.id)
+            self._agregar_sin_lock(entrada)
+    
+    def quitar(self, huesped_id: int) -> None:
+        """Elimina la entrada de un huésped del índice"""
+        with self._lock:
+            self._quitar_sin_lock(huesped_id)
+    
+    def _agregar_sin_lock(self, entrada: SugerenciaHuesped) -> None:
+        clave = normalizar_documento(entrada.documento)
+        i = bisect_left(self._claves, clave)
+        self._claves.insert(i, clave)
+        self._entradas.insert(i, entrada)
+        self._clave_por_id[entrada.id] = clave
+    
+    def _quitar_sin_lock(self, huesped_id: int) -> None:
+        clave = self._clave_por_id.pop(huesped_id, None)
+        if clave is None:
+            return
+        i = bisect_left(self._claves, clave)
+        while i < len(self._claves) and self._claves[i] == clave:
+            if self._entradas[i].id == huesped_id:
+                del self._claves[i]
+                del self._entradas[i]
+                return
+            i += 1
+
+def _sugerencia(row: dict) -> SugerenciaHuesped:
+    """Crea la entrada del índice desde una fila de Huespedes"""
+    return SugerenciaHuesped(
+        id=row['ID'],
+        documento=row['Documento'],
+        nombre_completo=f"{row['Nombres']} {row['Apellidos']}".strip()
+    )
+
+# Instancia global del índice (lazy loading)
+_indice: Optional[IndiceDocumentos] = None
+
+def get_indice_documentos() -> IndiceDocumentos:
+    """Obtiene el índice global de documentos, cargándolo si hace falta"""
+    global _indice
+    if _indice is None:
+        indice = IndiceDocumentos()
+        indice.suscribir()
+        indice.cargar()
+        _indice = indice
+    return _indice
+
+def _actualizar_indice(huesped: Huesped) -> None:
+    """Refleja un huésped guardado en el índice si ya está cargado"""
+    if _indice is not None:
+        _indice.agregar(huesped)
+
+def indexar_huespedes(huespedes: List[Huesped]) -> None:
+    """Refleja en el índice huéspedes creados por lotes"""
+    for huesped in huespedes:
+        _actualizar_indice(huesped)
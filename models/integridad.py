@@ -0,0 +1,358 @@
+"""
+Verificación de integridad de las cuentas de los registros
+
+Los totales de Registros se actualizan junto con cada línea del folio y
+un pago se guarda en Transacciones y se asienta en el folio en la misma
+transacción. Aun así pueden quedar cuentas descuadradas por pagos
+guardados antes de ese cambio, por estaciones con una versión anterior o
+por ediciones hechas fuera de la aplicación; un pago sin línea deja al
+registro sin el monto pagado. La verificación vuelve
+a sumar en SQL, por conjuntos, los totales de cada registro desde su folio
+y cruza el folio con Transacciones y Extras. Reporta cada diferencia y,
+si se pide, repara las que tienen una sola corrección posible: los
+totales se recalculan del folio y el pago sin línea se asienta.
+
+Cada corrida guarda el cursor de Cambios hasta el que revisó; la
+siguiente revisa solo los registros modificados después, directamente o
+a través de sus pagos.
+"""
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional, Set, Tuple
+from database.connection import db
+from models.cambios import cambios_desde
+from models.folio import LineaFolio, TipoLinea, TOTALES_POR_TIPO, asentar_lote
+
+# Diferencia en USD a partir de la cual dos montos no cuadran
+TOLERANCIA = 0.005
+
+# Líneas de apertura del folio que no corresponden a filas de Extras: la
+# deuda anterior del huésped (Registro._abrir_folio) y el saldo inicial de
+# los registros anteriores al folio, que ya resumía sus extras
+DEUDA_ANTERIOR = 'Deuda anterior'
+SALDO_INICIAL = 'Saldo inicial'
+
+class TipoDiscrepancia(str, Enum):
+    TOTALES = 'Totales'
+    PAGO_SIN_FOLIO = 'Pago_Sin_Folio'
+    PAGO_DESCUADRADO = 'Pago_Descuadrado'
+    LINEA_HUERFANA = 'Linea_Huerfana'
+    EXTRAS = 'Extras'
+    SIN_PAGOS = 'Sin_Pagos'
+
+@dataclass
+class Discrepancia:
+    """
+    Una diferencia encontrada. `registrado` es lo que guarda el registro
+    (o su folio) y `esperado` lo que indica la fuente contra la que se
+    cruzó: el folio para los totales, el monto de la transacción para los
+    pagos y Extras para los cargos.
+    """
+    tipo: TipoDiscrepancia
+    registro_id: Optional[int]
+    registrado: float = 0.0
+    esperado: float = 0.0
+    detalle: str = ""
+    transaccion_id: Optional[int] = None
+    reparada: bool = False
+    
+    @property
+    def diferencia(self) -> float:
+        return round(self.registrado - self.esperado, 2)
+
+@dataclass
+class ResultadoVerificacion:
+    completa: bool
+    cursor: int
+    verificacion_id: Optional[int] = None
+    registros_revisados: int = 0
+    discrepancias: List[Discrepancia] = field(default_factory=list)
+    segundos: float = 0.0
+    
+    @property
+    def reparadas(self) -> int:
+        return sum(1 for d in self.discrepancias if d.reparada)
+    
+    @property
+    def pendientes(self) -> List[Discrepancia]:
+        return [d for d in self.discrepancias if not d.reparada]
+    
+    def por_tipo(self, tipo: TipoDiscrepancia) -> List[Discrepancia]:
+        return [d for d in self.discrepancias if d.tipo == tipo]
+
+# Registros a revisar en la corrida; las consultas los cruzan por conjunto.
+# La tabla temporal no tiene estadísticas, por eso se une con CROSS JOIN:
+# así SQLite la recorre primero y busca cada registro por índice, en lugar
+# de recorrer índices completos cuando se revisan pocos registros
+_REVISAR = 'temp.Integridad_Registros'
+
+# Columnas de Registros que se recalculan del folio: cada total suma las
+# líneas de sus tipos con el signo de TOTALES_POR_TIPO y el saldo suma
+# todas las líneas (el monto de cada una es su efecto sobre el saldo)
+_COLUMNAS = tuple(dict.fromkeys(columna for columna, _ in TOTALES_POR_TIPO.values())) + ('Saldo_Pendiente_USD',)
+
+def _suma_columna(columna: str) -> str:
+    if columna == 'Saldo_Pendiente_USD':
+        return 'TOTAL(f.Monto_USD)'
+    signos = ' '.join(
+        f"WHEN '{tipo.value}' THEN {signo}"
+        for tipo, (destino, signo) in TOTALES_POR_TIPO.items() if destino == columna
+    )
+    return f'TOTAL(CASE f.Tipo {signos} END * f.Monto_USD)'
+
+_FOLIO = f'''
+    SELECT v.ID as Registro_ID,
+           {', '.join(f'{_suma_columna(c)} as {c}' for c in _COLUMNAS)}
+    FROM {_REVISAR} v
+    LEFT JOIN Folio f ON f.Registro_ID = v.ID
+    GROUP BY v.ID
+'''
+
+_DESCUADRE = ' OR '.join(f'ABS(r.{c} - fo.{c}) > {TOLERANCIA}' for c in _COLUMNAS)
+
+def _totales_descuadrados(conn: sqlite3.Connection) -> List[Discrepancia]:
+    """Totales de Registros que no coinciden con la suma de su folio"""
+    rows = conn.execute(f'''
+        WITH sumas AS ({_FOLIO})
+        SELECT r.ID, {', '.join(f'r.{c}, fo.{c} as Folio_{c}' for c in _COLUMNAS)}
+        FROM sumas fo
+        JOIN Registros r ON r.ID = fo.Registro_ID
+        WHERE {_DESCUADRE}
+        ORDER BY r.ID
+    ''').fetchall()
+    discrepancias = []
+    for row in rows:
+        for columna in _COLUMNAS:
+            registrado, esperado = row[columna], row[f'Folio_{columna}']
+            if abs(registrado - esperado) > TOLERANCIA:
+                discrepancias.append(Discrepancia(
+                    TipoDiscrepancia.TOTALES, row['ID'], registrado, esperado,
+                    detalle=f"{columna}: ${registrado:.2f} en el registro, ${esperado:.2f} según el folio"
+                ))
+    return discrepancias
+
+def _pagos_descuadrados(conn: sqlite3.Connection) -> List[Discrepancia]:
+    """
+    Pagos de los registros revisados cuyas líneas del folio no suman su
+    monto. Un pago de grupo se reparte en líneas de varios registros, por
+    eso se cruza por Transaccion_ID y no por el registro del pago.
+    """
+    rows = conn.execute(f'''
+        SELECT t.ID, t.Registro_ID, t.Monto_USD, COUNT(f.ID) as Lineas, -TOTAL(f.Monto_USD) as Asentado
+        FROM Transacciones t
+        LEFT JOIN Folio f ON f.Transaccion_ID = t.ID
+        WHERE t.Tipo = 'Pago' AND t.ID IN (
+            SELECT t2.ID FROM {_REVISAR} v CROSS JOIN Transacciones t2 ON t2.Registro_ID = v.ID
+            UNION
+            SELECT f2.Transaccion_ID FROM {_REVISAR} v CROSS JOIN Folio f2 ON f2.Registro_ID = v.ID
+            WHERE f2.Transaccion_ID IS NOT NULL
+        )
+        GROUP BY t.ID
+        HAVING ABS(t.Monto_USD - Asentado) > {TOLERANCIA}
+        ORDER BY t.ID
+    ''').fetchall()
+    discrepancias = []
+    for row in rows:
+        if row['Lineas'] == 0:
+            discrepancia = Discrepancia(
+                TipoDiscrepancia.PAGO_SIN_FOLIO, row['Registro_ID'], 0.0, row['Monto_USD'],
+                detalle=f"Pago #{row['ID']} de ${row['Monto_USD']:.2f} sin línea en el folio",
+                transaccion_id=row['ID']
+            )
+        else:
+            discrepancia = Discrepancia(
+                TipoDiscrepancia.PAGO_DESCUADRADO, row['Registro_ID'], row['Asentado'], row['Monto_USD'],
+                detalle=f"Pago #{row['ID']} de ${row['Monto_USD']:.2f} asentado por ${row['Asentado']:.2f}",
+                transaccion_id=row['ID']
+            )
+        discrepancias.append(discrepancia)
+    return discrepancias
+
+def _lineas_huerfanas(conn: sqlite3.Connection) -> List[Discrepancia]:
+    """Líneas de pago del folio cuya transacción ya no existe"""
+    rows = conn.execute(f'''
+        SELECT f.Registro_ID, f.Transaccion_ID, -f.Monto_USD as Monto
+        FROM {_REVISAR} v
+        CROSS JOIN Folio f ON f.Registro_ID = v.ID
+        WHERE f.Transaccion_ID IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM Transacciones t WHERE t.ID = f.Transaccion_ID)
+        ORDER BY f.ID
+    ''').fetchall()
+    return [
+        Discrepancia(
+            TipoDiscrepancia.LINEA_HUERFANA, row['Registro_ID'], row['Monto'], 0.0,
+            detalle=f"Línea de pago por ${row['Monto']:.2f} de la transacción #{row['Transaccion_ID']}, que no existe",
+            transaccion_id=row['Transaccion_ID']
+        )
+        for row in rows
+    ]
+
+def _extras_descuadrados(conn: sqlite3.Connection) -> List[Discrepancia]:
+    """Registros cuyos cargos en Extras no suman lo mismo que sus líneas de extras"""
+    rows = conn.execute(f'''
+        SELECT ID, Folio, Extras FROM (
+            SELECT v.ID,
+                   (SELECT TOTAL(f.Monto_USD) FROM Folio f
+                    WHERE f.Registro_ID = v.ID AND f.Tipo = 'Extra' AND f.Descripcion <> ?) as Folio,
+                   (SELECT TOTAL(e.Monto_USD * e.Cantidad) FROM Extras e
+                    WHERE e.Registro_ID = v.ID) as Extras
+            FROM {_REVISAR} v
+            WHERE NOT EXISTS (
+                SELECT 1 FROM Folio f WHERE f.Registro_ID = v.ID AND f.Descripcion = ?
+            )
+        )
+        WHERE ABS(Folio - Extras) > {TOLERANCIA}
+        ORDER BY ID
+    ''', (DEUDA_ANTERIOR, SALDO_INICIAL)).fetchall()
+    return [
+        Discrepancia(
+            TipoDiscrepancia.EXTRAS, row['ID'], row['Folio'], row['Extras'],
+            detalle=f"Extras por ${row['Extras']:.2f}, asentados en el folio ${row['Folio']:.2f}"
+        )
+        for row in rows
+    ]
+
+def _registros_sin_pagos(conn: sqlite3.Connection) -> List[Discrepancia]:
+    """Registros con cargos que no tienen ningún pago, ni en el folio ni en Transacciones"""
+    rows = conn.execute(f'''
+        SELECT r.ID, r.Total_Habitacion_USD + r.Total_Extras_USD - r.Total_Descuentos_USD as Cargos
+        FROM {_REVISAR} v
+        CROSS JOIN Registros r ON r.ID = v.ID
+        WHERE r.Estado <> 'Cancelado'
+            AND r.Total_Habitacion_USD + r.Total_Extras_USD - r.Total_Descuentos_USD > {TOLERANCIA}
+            AND NOT EXISTS (SELECT 1 FROM Folio f WHERE f.Registro_ID = r.ID AND f.Tipo = 'Pago')
+            AND NOT EXISTS (SELECT 1 FROM Transacciones t WHERE t.Registro_ID = r.ID AND t.Tipo = 'Pago')
+        ORDER BY r.ID
+    ''').fetchall()
+    return [
+        Discrepancia(
+            TipoDiscrepancia.SIN_PAGOS, row['ID'], 0.0, row['Cargos'],
+            detalle=f"Cargos por ${row['Cargos']:.2f} sin ningún pago registrado"
+        )
+        for row in rows
+    ]
+
+def _registros_modificados(conn: sqlite3.Connection, cursor: int) -> Tuple[Set[int], int]:
+    """
+    Registros modificados después del cursor, directamente o por un pago
+    (también uno eliminado, que se ubica por sus líneas del folio), y el
+    nuevo cursor
+    """
+    cambios, hasta = cambios_desde(cursor, ('Registros', 'Transacciones'), conn)
+    registros = {c.fila_id for c in cambios if c.tabla == 'Registros' and c.operacion != 'D'}
+    transacciones = [c.fila_id for c in cambios if c.tabla == 'Transacciones']
+    for i in range(0, len(transacciones), 500):
+        parte = transacciones[i:i + 500]
+        marcadores = ', '.join('?' * len(parte))
+        registros.update(row[0] for row in conn.execute(f'''
+            SELECT Registro_ID FROM Transacciones
+            WHERE ID IN ({marcadores}) AND Registro_ID IS NOT NULL
+            UNION
+            SELECT Registro_ID FROM Folio WHERE Transaccion_ID IN ({marcadores})
+        ''', parte + parte).fetchall())
+    return registros, hasta
+
+def _reparar(conn: sqlite3.Connection, discrepancias: List[Discrepancia]) -> None:
+    """
+    Recalcula desde el folio los totales descuadrados y asienta los pagos
+    que no tienen línea. Primero los totales, para que las líneas nuevas
+    acumulen sobre el saldo correcto.
+    """
+    totales = [d for d in discrepancias if d.tipo == TipoDiscrepancia.TOTALES]
+    if totales:
+        conn.execute(f'''
+            WITH sumas AS ({_FOLIO})
+            UPDATE Registros AS r SET
+                {', '.join(f'{c} = fo.{c}' for c in _COLUMNAS)},
+                Version = r.Version + 1
+            FROM sumas fo
+            WHERE r.ID = fo.Registro_ID AND ({_DESCUADRE})
+        ''')
+        for discrepancia in totales:
+            discrepancia.reparada = True
+    
+    sin_folio = {d.transaccion_id: d for d in discrepancias if d.tipo == TipoDiscrepancia.PAGO_SIN_FOLIO}
+    if not sin_folio:
+        return
+    # Solo se asientan los pagos cuyo registro existe
+    rows = conn.execute(f'''
+        SELECT t.ID, t.Registro_ID, t.Monto_USD, t.Concepto, t.Usuario_ID, t.Fecha_Hora
+        FROM Transacciones t
+        JOIN Registros r ON r.ID = t.Registro_ID
+        WHERE t.ID IN ({', '.join('?' * len(sin_folio))})
+        ORDER BY t.ID
+    ''', list(sin_folio)).fetchall()
+    if not rows:
+        return
+    asentar_lote(conn, [
+        LineaFolio(
+            row['Registro_ID'], TipoLinea.PAGO, -row['Monto_USD'],
+            descripcion=row['Concepto'] or "Pago",
+            fecha=datetime.fromisoformat(str(row['Fecha_Hora'])) if row['Fecha_Hora'] else None,
+            usuario_id=row['Usuario_ID'], transaccion_id=row['ID']
+        )
+        for row in rows
+    ])
+    for row in rows:
+        sin_folio[row['ID']].reparada = True
+
+def verificar_integridad(usuario_id: Optional[int] = None, reparar: bool = False,
+                         completa: bool = False) -> ResultadoVerificacion:
+    """
+    Verifica las cuentas de los registros modificados desde la corrida
+    anterior y de los que quedaron con discrepancias pendientes (o de
+    todos, con `completa` o si es la primera) y guarda la corrida con lo
+    encontrado. Con `reparar` corrige en la misma transacción los totales
+    descuadrados y los pagos sin línea en el folio; el resto solo se
+    reporta porque requiere revisar cuál de los dos lados está mal.
+    """
+    inicio = time.perf_counter()
+    with db.transaction() as conn:
+        anterior = conn.execute(
+            'SELECT ID, Cursor_Cambios FROM Verificaciones_Integridad ORDER BY ID DESC LIMIT 1'
+        ).fetchone()
+        completa = completa or anterior is None
+        
+        conn.execute(f'DROP TABLE IF EXISTS {_REVISAR}')
+        conn.execute(f'CREATE TABLE {_REVISAR} (ID INTEGER PRIMARY KEY)')
+        if completa:
+            cursor = conn.execute('SELECT COALESCE(MAX(ID), 0) FROM Cambios').fetchone()[0]
+            conn.execute(f'INSERT INTO {_REVISAR} (ID) SELECT ID FROM Registros')
+        else:
+            registros, cursor = _registros_modificados(conn, anterior['Cursor_Cambios'])
+            conn.executemany(f'INSERT INTO {_REVISAR} (ID) VALUES (?)', [(i,) for i in registros])
+            conn.execute(f'''
+                INSERT OR IGNORE INTO {_REVISAR} (ID)
+                SELECT Registro_ID FROM Discrepancias_Integridad
+                WHERE Verificacion_ID = ? AND Reparada = 0 AND Registro_ID IS NOT NULL
+            ''', (anterior['ID'],))
+        
+        resultado = ResultadoVerificacion(completa=completa, cursor=cursor)
+        resultado.registros_revisados = conn.execute(f'SELECT COUNT(*) FROM {_REVISAR}').fetchone()[0]
+        if resultado.registros_revisados:
+            resultado.discrepancias = (
+                _totales_descuadrados(conn) + _pagos_descuadrados(conn) + _lineas_huerfanas(conn)
+                + _extras_descuadrados(conn) + _registros_sin_pagos(conn)
+            )
+            if reparar:
+                _reparar(conn, resultado.discrepancias)
+        conn.execute(f'DROP TABLE {_REVISAR}')
+        
+        resultado.verificacion_id = conn.execute('''
+            INSERT INTO Verificaciones_Integridad (
+                Usuario_ID, Completa, Cursor_Cambios, Registros_Revisados, Discrepancias, Reparadas
+            ) VALUES (?, ?, ?, ?, ?, ?)
+        ''', (usuario_id, int(completa), cursor, resultado.registros_revisados,
+              len(resultado.discrepancias), resultado.reparadas)).lastrowid
+        conn.executemany('''
+            INSERT INTO Discrepancias_Integridad (
+                Verificacion_ID, Tipo, Registro_ID, Transaccion_ID,
+                Registrado_USD, Esperado_USD, Detalle, Reparada
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(resultado.verificacion_id, d.tipo.value, d.registro_id, d.transaccion_id,
+               d.registrado, d.esperado, d.detalle, int(d.reparada)) for d in resultado.discrepancias])
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
@@ -0,0 +1,322 @@
+"""
+Órdenes de mantenimiento (habitaciones fuera de servicio)
+
+Una orden abierta deja la habitación fuera de servicio las noches
+[desde, hasta). Si llega la fecha prevista de regreso sin cerrar la orden,
+la habitación sigue fuera de servicio hasta mañana, igual que una estadía
+con la salida vencida. Las verificaciones de disponibilidad en SQL
+excluyen estas noches con un NOT EXISTS sobre idx_mantenimientos_abiertos
+y los índices en memoria las leen junto con las reservas.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from enum import Enum
+from typing import List, Optional, Tuple
+from database.connection import db
+from models.base import SeguimientoCambios, ConflictoConcurrencia
+from utils.eventos import bus, HabitacionCambiada
+
+class EstadoMantenimiento(str, Enum):
+    ABIERTO = 'Abierto'
+    CERRADO = 'Cerrado'
+
+def _fecha(valor) -> Optional[date]:
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+def fin_fuera_de_servicio(fecha_hasta: date) -> date:
+    """Primera noche en servicio de una orden abierta (la de mañana si ya venció)"""
+    return max(fecha_hasta, date.today() + timedelta(days=1))
+
+def filtro_en_servicio(columna_numero: str, llegada: date, salida: date) -> Tuple[str, tuple]:
+    """
+    Condición (y sus parámetros) que descarta las habitaciones con una orden
+    abierta en alguna noche de [llegada, salida). `columna_numero` es la
+    columna con el número de habitación de la consulta externa.
+    """
+    condicion = f'''NOT EXISTS (
+        SELECT 1 FROM Mantenimientos m
+        WHERE m.Habitacion_Numero = {columna_numero} AND m.Estado = 'Abierto'
+            AND m.Fecha_Desde < ? AND MAX(m.Fecha_Hasta, ?) > ?
+    )'''
+    manana = date.today() + timedelta(days=1)
+    return condicion, (salida.isoformat(), manana.isoformat(), llegada.isoformat())
+
+def _formato_rango(desde: date, hasta: date) -> str:
+    return f"del {desde.strftime('%d/%m/%Y')} al {fin_fuera_de_servicio(hasta).strftime('%d/%m/%Y')}"
+
+def verificar_en_servicio(conn, habitacion_numero: int, llegada: date, salida: date) -> None:
+    """
+    Verifica dentro de la transacción recibida que la habitación no tenga
+    una orden de mantenimiento abierta en el rango. Lanza
+    ConflictoConcurrencia si está fuera de servicio.
+    """
+    manana = date.today() + timedelta(days=1)
+    orden = conn.execute('''
+        SELECT Fecha_Desde, Fecha_Hasta FROM Mantenimientos
+        WHERE Habitacion_Numero = ? AND Estado = 'Abierto'
+            AND Fecha_Desde < ? AND MAX(Fecha_Hasta, ?) > ?
+        LIMIT 1
+    ''', (habitacion_numero, salida.isoformat(), manana.isoformat(), llegada.isoformat())).fetchone()
+    if orden:
+        raise ConflictoConcurrencia(
+            f"La habitación {habitacion_numero:03d} está fuera de servicio "
+            f"{_formato_rango(_fecha(orden[0]), _fecha(orden[1]))}"
+        )
+
+def iniciar_mantenimientos(conn, fecha: date) -> List[int]:
+    """
+    Pasa a Mantenimiento las habitaciones libres o en aseo cuya orden
+    abierta empieza a más tardar en `fecha`. Retorna sus números.
+    """
+    numeros = [row[0] for row in conn.execute('''
+        SELECT h.Numero FROM Habitaciones h
+        WHERE h.Estado IN ('Libre', 'Aseo') AND EXISTS (
+            SELECT 1 FROM Mantenimientos m
+            WHERE m.Habitacion_Numero = h.Numero AND m.Estado = 'Abierto' AND m.Fecha_Desde <= ?
+        )
+    ''', (fecha.isoformat(),)).fetchall()]
+    conn.executemany('''
+        UPDATE Habitaciones SET Estado = 'Mantenimiento', Version = Version + 1 WHERE Numero = ?
+    ''', [(numero,) for numero in numeros])
+    return numeros
+
+@dataclass
+class Mantenimiento(SeguimientoCambios):
+    habitacion_numero: int
+    motivo: str
+    fecha_desde: date
+    fecha_hasta: date
+    estado: EstadoMantenimiento = EstadoMantenimiento.ABIERTO
+    notas: str = ""
+    usuario_id: Optional[int] = None
+    fecha_creacion: Optional[datetime] = None
+    fecha_cierre: Optional[datetime] = None
+    id: Optional[int] = None
+    version: int = 0
+    
+    # Campos relacionados (no persistidos directamente)
+    habitacion_tipo: str = ""
+    
+    _tabla = 'Mantenimientos'
+    _columna_version = 'Version'
+    _columnas = {
+        'motivo': 'Motivo',
+        'fecha_desde': 'Fecha_Desde',
+        'fecha_hasta': 'Fecha_Hasta',
+        'estado': 'Estado',
+        'notas': 'Notas',
+        'fecha_cierre': 'Fecha_Cierre',
+    }
+    
+    @property
+    def esta_abierto(self) -> bool:
+        return self.estado == EstadoMantenimiento.ABIERTO
+    
+    @property
+    def esta_vencido(self) -> bool:
+        """Orden abierta cuya fecha prevista de regreso ya llegó"""
+        return self.esta_abierto and self.fecha_hasta <= date.today()
+    
+    @property
+    def noches_previstas(self) -> int:
+        return (self.fecha_hasta - self.fecha_desde).days
+    
+    def guardar(self) -> int:
+        """
+        Guarda la orden. Si ya empezó, la habitación pasa a Mantenimiento en
+        la misma transacción; no se puede sacar de servicio una habitación
+        ocupada desde hoy.
+        """
+        self.motivo = (self.motivo or "").strip()
+        if not self.motivo:
+            raise ValueError("Indique el motivo del mantenimiento")
+        if self.fecha_hasta <= self.fecha_desde:
+            raise ValueError("La fecha de regreso debe ser posterior a la de inicio")
+        
+        en_curso = self.esta_abierto and self.fecha_desde <= date.today()
+        with db.transaction() as conn:
+            estado = conn.execute(
+                'SELECT Estado FROM Habitaciones WHERE Numero = ?', (self.habitacion_numero,)
+            ).fetchone()[0]
+            if en_curso and estado == 'Ocupada':
+                raise ValueError(
+                    f"La habitación {self.habitacion_numero:03d} está ocupada; "
+                    "programe el mantenimiento desde la salida del huésped"
+                )
+            if self.id:
+                self._guardar_cambios(conn)
+            else:
+                if self.fecha_desde < date.today():
+                    raise ValueError("La fecha de inicio ya pasó")
+                self.fecha_creacion = datetime.now()
+                self.id = conn.execute('''
+                    INSERT INTO Mantenimientos (
+                        Habitacion_Numero, Motivo, Fecha_Desde, Fecha_Hasta, Estado,
+                        Notas, Usuario_ID, Fecha_Creacion
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    self.habitacion_numero, self.motivo, self.fecha_desde.isoformat(),
+                    self.fecha_hasta.isoformat(), self.estado.value, self.notas,
+                    self.usuario_id, self.fecha_creacion
+                )).lastrowid
+                self.version = 0
+                self._marcar_limpio()
+            
+            if en_curso and estado in ('Libre', 'Aseo'):
+                conn.execute('''
+                    UPDATE Habitaciones SET Estado = 'Mantenimiento', Version = Version + 1
+                    WHERE Numero = ?
+                ''', (self.habitacion_numero,))
+                estado = 'Mantenimiento'
+        
+        bus.publicar(HabitacionCambiada(self.habitacion_numero, estado))
+        return self.id
+    
+    def cerrar(self) -> None:
+        """
+        Cierra la orden. Si la habitación estaba en Mantenimiento y no le
+        queda otra orden en curso, vuelve a quedar Libre.
+        """
+        if not self.esta_abierto:
+            raise ValueError("La orden ya está cerrada")
+        self.estado = EstadoMantenimiento.CERRADO
+        self.fecha_cierre = datetime.now()
+        with db.transaction() as conn:
+            self._guardar_cambios(conn)
+            conn.execute('''
+                UPDATE Habitaciones SET Estado = 'Libre', Version = Version + 1
+                WHERE Numero = ? AND Estado = 'Mantenimiento' AND NOT EXISTS (
+                    SELECT 1 FROM Mantenimientos
+                    WHERE Habitacion_Numero = ? AND Estado = 'Abierto' AND Fecha_Desde <= ?
+                )
+            ''', (self.habitacion_numero, self.habitacion_numero, date.today().isoformat()))
+            estado = conn.execute(
+                'SELECT Estado FROM Habitaciones WHERE Numero = ?', (self.habitacion_numero,)
+            ).fetchone()[0]
+        bus.publicar(HabitacionCambiada(self.habitacion_numero, estado))
+    
+    def reservas_afectadas(self) -> List[dict]:
+        """Reservas confirmadas que caen en las noches fuera de servicio de la orden"""
+        return db.fetch_all('''
+            SELECT r.ID, r.Fecha_Llegada, r.Fecha_Salida, h.Nombres || ' ' || h.Apellidos as Huesped
+            FROM Reservas r
+            JOIN Huespedes h ON h.ID = r.Huesped_ID
+            WHERE r.Habitacion_Numero = ? AND r.Estado = 'Confirmada'
+                AND r.Fecha_Llegada < ? AND r.Fecha_Salida > ?
+            ORDER BY r.Fecha_Llegada
+        ''', (self.habitacion_numero, fin_fuera_de_servicio(self.fecha_hasta).isoformat(),
+              self.fecha_desde.isoformat()))
+    
+    @staticmethod
+    def buscar_por_id(mantenimiento_id: int) -> Optional['Mantenimiento']:
+        row = db.fetch_one(f'{_CONSULTA} WHERE m.ID = ?', (mantenimiento_id,))
+        return Mantenimiento._from_row(row) if row else None
+    
+    @staticmethod
+    def listar_abiertos(habitacion_numero: Optional[int] = None) -> List['Mantenimiento']:
+        """Órdenes abiertas (de todas las habitaciones o de una) por fecha de inicio"""
+        if habitacion_numero is None:
+            rows = db.fetch_all(f"{_CONSULTA} WHERE m.Estado = 'Abierto' ORDER BY m.Fecha_Desde, m.Habitacion_Numero")
+        else:
+            rows = db.fetch_all(f'''
+                {_CONSULTA}
+                WHERE m.Habitacion_Numero = ? AND m.Estado = 'Abierto'
+                ORDER BY m.Fecha_Desde
+            ''', (habitacion_numero,))
+        return [Mantenimiento._from_row(row) for row in rows]
+    
+    @staticmethod
+    def listar_por_habitacion(habitacion_numero: int) -> List['Mantenimiento']:
+        """Historial de órdenes de una habitación, las más recientes primero"""
+        rows = db.fetch_all(f'''
+            {_CONSULTA}
+            WHERE m.Habitacion_Numero = ?
+            ORDER BY m.Fecha_Desde DESC
+        ''', (habitacion_numero,))
+        return [Mantenimiento._from_row(row) for row in rows]
+    
+    @staticmethod
+    def _from_row(row: dict) -> 'Mantenimiento':
+        mantenimiento = Mantenimiento(
+            id=row['ID'],
+            habitacion_numero=row['Habitacion_Numero'],
+            motivo=row['Motivo'],
+            fecha_desde=_fecha(row['Fecha_Desde']),
+            fecha_hasta=_fecha(row['Fecha_Hasta']),
+            estado=EstadoMantenimiento(row['Estado']),
+            notas=row['Notas'] or "",
+            usuario_id=row['Usuario_ID'],
+            fecha_creacion=row['Fecha_Creacion'],
+            fecha_cierre=row['Fecha_Cierre'],
+            version=row['Version'],
+            habitacion_tipo=row.get('Habitacion_Tipo', '')
+        )
+        mantenimiento._marcar_limpio()
+        return mantenimiento
+
+_CONSULTA = '''
+    SELECT m.*, hab.Tipo as Habitacion_Tipo
+    FROM Mantenimientos m
+    JOIN Habitaciones hab ON m.Habitacion_Numero = hab.Numero
+'''
+
+@dataclass
+class ResumenMantenimiento:
+    """Historial de mantenimiento de una habitación en un período"""
+    habitacion_numero: int
+    habitacion_tipo: str
+    ordenes: int
+    noches_fuera_de_servicio: int
+    ordenes_atrasadas: int
+    abiertas: int
+    ultimo_motivo: str
+
+def historial_mantenimiento(desde: date, hasta: date) -> List[ResumenMantenimiento]:
+    """
+    Resumen por habitación de las órdenes que tocan el período [desde,
+    hasta): cantidad, noches que estuvo realmente fuera de servicio dentro
+    del período (hasta el cierre, o hasta mañana si sigue abierta), órdenes
+    cerradas después de la fecha prevista y órdenes abiertas. Ordenado por
+    noches fuera de servicio.
+    """
+    manana = (date.today() + timedelta(days=1)).isoformat()
+    rows = db.fetch_all('''
+        WITH ordenes AS (
+            SELECT m.ID, m.Habitacion_Numero, m.Motivo, m.Fecha_Desde, m.Fecha_Hasta, m.Estado,
+                   CASE WHEN m.Estado = 'Cerrado' THEN MAX(date(m.Fecha_Cierre), m.Fecha_Desde)
+                        ELSE MAX(m.Fecha_Hasta, ?) END as Fin_Real
+            FROM Mantenimientos m
+            WHERE m.Fecha_Desde < ?
+        )
+        SELECT o.Habitacion_Numero, hab.Tipo,
+               COUNT(*) as Ordenes,
+               CAST(SUM(MAX(0, julianday(MIN(o.Fin_Real, ?)) - julianday(MAX(o.Fecha_Desde, ?))))
+                    AS INTEGER) as Noches,
+               SUM(o.Estado = 'Cerrado' AND o.Fin_Real > o.Fecha_Hasta) as Atrasadas,
+               SUM(o.Estado = 'Abierto') as Abiertas,
+               (SELECT u.Motivo FROM Mantenimientos u WHERE u.Habitacion_Numero = o.Habitacion_Numero
+                ORDER BY u.Fecha_Desde DESC, u.ID DESC LIMIT 1) as Ultimo_Motivo
+        FROM ordenes o
+        JOIN Habitaciones hab ON hab.Numero = o.Habitacion_Numero
+        WHERE o.Fin_Real > ?
+        GROUP BY o.Habitacion_Numero
+        ORDER BY Noches DESC, o.Habitacion_Numero
+    ''', (manana, hasta.isoformat(), hasta.isoformat(), desde.isoformat(), desde.isoformat()))
+    return [
+        ResumenMantenimiento(
+            habitacion_numero=row['Habitacion_Numero'],
+            habitacion_tipo=row['Tipo'],
+            ordenes=row['Ordenes'],
+            noches_fuera_de_servicio=row['Noches'] or 0,
+            ordenes_atrasadas=row['Atrasadas'] or 0,
+            abiertas=row['Abiertas'] or 0,
+            ultimo_motivo=row['Ultimo_Motivo'] or ""
+        )
+        for row in rows
+    ]
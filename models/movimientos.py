@@ -0,0 +1,215 @@
+"""
+Tablero de llegadas y salidas del día
+
+Mantiene en memoria las reservas que llegan hoy y las estadías activas
+cuya salida prevista es hoy o ya pasó. Se cargan una vez con consultas
+sobre los índices de Fecha_Llegada y Fecha_Salida_Prevista, y después
+cada evento de habitación o reserva marca la habitación como pendiente
+para releer solo sus filas. Un hilo de fondo marca como tardías las
+salidas que pasan la hora límite sin check-out y avisa con SalidasVencidas.
+"""
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Set
+from database.connection import db
+from utils.eventos import (
+    bus, HabitacionCambiada, ReservaCambiada, PagoRegistrado, CargoRegistrado, SalidasVencidas
+)
+
+# Hora hasta la que el huésped puede dejar la habitación el día de salida
+HORA_LIMITE_SALIDA = time(12, 0)
+
+# Segundos entre verificaciones de salidas vencidas
+INTERVALO_VERIFICACION = 60.0
+
+@dataclass
+class Llegada:
+    reserva_id: int
+    habitacion_numero: int
+    huesped_nombre: str
+    fecha_salida: date
+    notas: str = ""
+
+
+@dataclass
+class Salida:
+    registro_id: int
+    habitacion_numero: int
+    huesped_nombre: str
+    salida_prevista: datetime
+    saldo_pendiente_usd: float
+    tarde: bool = False
+
+
+def _fecha_hora(valor) -> datetime:
+    if isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime.combine(valor, time())
+    return datetime.fromisoformat(str(valor))
+
+def esta_vencida(salida_prevista: datetime, ahora: Optional[datetime] = None) -> bool:
+    """True si ya pasó la hora límite del día de salida"""
+    ahora = ahora or datetime.now()
+    return ahora >= datetime.combine(salida_prevista.date(), HORA_LIMITE_SALIDA)
+
+
+class TableroMovimientos:
+    """Listas de llegadas y salidas del día mantenidas por habitación"""
+    
+    def __init__(self, intervalo: float = INTERVALO_VERIFICACION):
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._fecha: Optional[date] = None
+        self._llegadas: Dict[int, Llegada] = {}
+        self._salidas: Dict[int, Salida] = {}
+        self._pendientes: Set[int] = set()
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+    
+    @staticmethod
+    def _leer(fecha: date, numeros: Optional[List[int]] = None, lote: int = 500):
+        """Lee las llegadas y salidas de `fecha` (de todas las habitaciones o de las indicadas)"""
+        if numeros is None:
+            partes = [None]
+        else:
+            partes = [numeros[i:i + lote] for i in range(0, len(numeros), lote)]
+        # El límite de salida se pasa como texto: Fecha_Salida_Prevista se
+        # guarda como 'AAAA-MM-DD HH:MM:SS' y así la comparación usa idx_registros_salida
+        limite = (fecha + timedelta(days=1)).isoformat()
+        filas_llegadas, filas_salidas = [], []
+        for parte in partes:
+            if parte is None:
+                filtro, params = '', ()
+            else:
+                filtro = f"AND Habitacion_Numero IN ({', '.join('?' * len(parte))})"
+                params = tuple(parte)
+            filas_llegadas += db.fetch_all(f'''
+                SELECT r.ID, r.Habitacion_Numero, r.Fecha_Salida, r.Notas,
+                       h.Nombres || ' ' || h.Apellidos as Huesped
+                FROM Reservas r
+                JOIN Huespedes h ON h.ID = r.Huesped_ID
+                WHERE r.Estado = 'Confirmada' AND r.Fecha_Llegada = ? {filtro}
+            ''', (fecha.isoformat(), *params))
+            filas_salidas += db.fetch_all(f'''
+                SELECT g.ID, g.Habitacion_Numero, g.Fecha_Salida_Prevista, g.Saldo_Pendiente_USD,
+                       h.Nombres || ' ' || h.Apellidos as Huesped
+                FROM Registros g
+                JOIN Huespedes h ON h.ID = g.Huesped_Principal_ID
+                WHERE g.Estado = 'Activo' AND g.Fecha_Salida_Prevista < ? {filtro}
+            ''', (limite, *params))
+        
+        ahora = datetime.now()
+        llegadas = [
+            Llegada(row['ID'], row['Habitacion_Numero'], row['Huesped'],
+                    date.fromisoformat(str(row['Fecha_Salida'])[:10]), row['Notas'] or "")
+            for row in filas_llegadas
+        ]
+        salidas = []
+        for row in filas_salidas:
+            prevista = _fecha_hora(row['Fecha_Salida_Prevista'])
+            salidas.append(Salida(row['ID'], row['Habitacion_Numero'], row['Huesped'], prevista,
+                                  row['Saldo_Pendiente_USD'] or 0.0, esta_vencida(prevista, ahora)))
+        return llegadas, salidas
+    
+    def cargar(self) -> None:
+        """Reconstruye las listas del día actual"""
+        fecha = date.today()
+        llegadas, salidas = self._leer(fecha)
+        with self._lock:
+            self._fecha = fecha
+            self._llegadas = {l.reserva_id: l for l in llegadas}
+            self._salidas = {s.registro_id: s for s in salidas}
+    
+    def suscribir(self) -> None:
+        bus.suscribir(HabitacionCambiada, self._on_habitacion_cambiada)
+        bus.suscribir(ReservaCambiada, self._on_movimiento)
+        bus.suscribir(PagoRegistrado, self._on_movimiento)
+        bus.suscribir(CargoRegistrado, self._on_movimiento)
+    
+    def _on_habitacion_cambiada(self, evento: HabitacionCambiada) -> None:
+        with self._lock:
+            self._pendientes.add(evento.numero)
+    
+    def _on_movimiento(self, evento) -> None:
+        """Reserva, pago o cargo de una habitación: puede cambiar su llegada o su saldo"""
+        with self._lock:
+            self._pendientes.add(evento.habitacion_numero)
+    
+    def _refrescar(self) -> None:
+        """Relee las habitaciones pendientes, o todo si cambió el día"""
+        if self._fecha != date.today():
+            self.cargar()
+            return
+        with self._lock:
+            if not self._pendientes:
+                return
+            numeros, self._pendientes = list(self._pendientes), set()
+        llegadas, salidas = self._leer(self._fecha, numeros)
+        with self._lock:
+            afectadas = set(numeros)
+            self._llegadas = {k: l for k, l in self._llegadas.items() if l.habitacion_numero not in afectadas}
+            self._salidas = {k: s for k, s in self._salidas.items() if s.habitacion_numero not in afectadas}
+            self._llegadas.update((l.reserva_id, l) for l in llegadas)
+            self._salidas.update((s.registro_id, s) for s in salidas)
+    
+    def llegadas(self) -> List[Llegada]:
+        """Reservas confirmadas que llegan hoy, por habitación"""
+        self._refrescar()
+        with self._lock:
+            return sorted(self._llegadas.values(), key=lambda l: l.habitacion_numero)
+    
+    def salidas(self) -> List[Salida]:
+        """Estadías activas que salen hoy o ya debían haber salido; las tardías primero"""
+        self._refrescar()
+        with self._lock:
+            return sorted(self._salidas.values(), key=lambda s: (not s.tarde, s.habitacion_numero))
+    
+    def marcar_vencidas(self) -> List[int]:
+        """Marca las salidas que pasaron la hora límite y retorna sus habitaciones"""
+        nuevo_dia = self._fecha != date.today()
+        self._refrescar()
+        ahora = datetime.now()
+        with self._lock:
+            vencidas = [
+                s for s in self._salidas.values()
+                if not s.tarde and esta_vencida(s.salida_prevista, ahora)
+            ]
+            for s in vencidas:
+                s.tarde = True
+            numeros = sorted({s.habitacion_numero for s in vencidas})
+        if numeros or nuevo_dia:
+            bus.publicar(SalidasVencidas(tuple(numeros)))
+        return numeros
+    
+    def iniciar(self) -> None:
+        """Arranca la verificación periódica de salidas vencidas en un hilo de fondo"""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name='TableroMovimientos', daemon=True)
+        self._hilo.start()
+    
+    def detener(self) -> None:
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+            self._hilo = None
+    
+    def _ejecutar(self) -> None:
+        while not self._detener.wait(self.intervalo):
+            self.marcar_vencidas()
+
+# Instancia global del tablero (lazy loading)
+_tablero: Optional[TableroMovimientos] = None
+
+def get_tablero_movimientos() -> TableroMovimientos:
+    """Obtiene el tablero global de llegadas y salidas, cargándolo si hace falta"""
+    global _tablero
+    if _tablero is None:
+        tablero = TableroMovimientos()
+        tablero.suscribir()
+        tablero.cargar()
+        _tablero = tablero
+    return _tablero
@@ -3,9 +3,15 @@ Modelo y lógica de negocio para Registros (Check-ins/Check-outs)
 """
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Dict, Sequence
 from enum import Enum
 from database.connection import db
+from models.base import SeguimientoCambios, ConflictoConcurrencia
+from models.folio import asentar, TipoLinea
+from models.huesped import acumular_estadias
+from models.reserva import tomar_reservas, marcar_ingresadas
+from models.transaccion import Transaccion
+from utils.eventos import bus, HabitacionCambiada, PagoRegistrado, CargoRegistrado
 
 class EstadoRegistro(str, Enum):
     ACTIVO = 'Activo'
@@ -13,7 +19,7 @@ class EstadoRegistro(str, Enum):
     CANCELADO = 'Cancelado'
 
 @dataclass
-class Registro:
+class Registro(SeguimientoCambios):
     huesped_principal_id: int
     habitacion_numero: int
     fecha_entrada: datetime = field(default_factory=datetime.now)
@@ -28,12 +34,38 @@ class Registro:
     notas: str = ""
     usuario_checkin_id: Optional[int] = None
     usuario_checkout_id: Optional[int] = None
+    noches_facturadas: int = 0
+    sobreestadia: bool = False
+    tarifa_id: Optional[int] = None
     id: Optional[int] = None
+    version: int = 0
     
     # Campos relacionados (no persistidos directamente)
     huesped_nombre: str = ""
     habitacion_tipo: str = ""
     
+    _tabla = 'Registros'
+    _columna_version = 'Version'
+    _columnas = {
+        'huesped_principal_id': 'Huesped_Principal_ID',
+        'habitacion_numero': 'Habitacion_Numero',
+        'fecha_entrada': 'Fecha_Entrada',
+        'fecha_salida_prevista': 'Fecha_Salida_Prevista',
+        'fecha_salida_real': 'Fecha_Salida_Real',
+        'estado': 'Estado',
+        'total_habitacion_usd': 'Total_Habitacion_USD',
+        'total_extras_usd': 'Total_Extras_USD',
+        'total_descuentos_usd': 'Total_Descuentos_USD',
+        'total_pagado_usd': 'Total_Pagado_USD',
+        'saldo_pendiente_usd': 'Saldo_Pendiente_USD',
+        'notas': 'Notas',
+        'usuario_checkin_id': 'Usuario_Checkin_ID',
+        'usuario_checkout_id': 'Usuario_Checkout_ID',
+        'noches_facturadas': 'Noches_Facturadas',
+        'sobreestadia': 'Sobreestadia',
+        'tarifa_id': 'Tarifa_ID',
+    }
+    
     @property
     def noches_estadia(self) -> int:
         """Calcula el número de noches de estadía"""
@@ -68,125 +100,262 @@ class Registro:
         self.total_habitacion_usd = self.noches_estadia * precio_noche
         return self.total_habitacion_usd
     
-    def agregar_extra(self, descripcion: str, monto_usd: float, cantidad: int = 1) -> None:
-        """Agrega un cargo extra al registro"""
-        monto_total = monto_usd * cantidad
-        self.total_extras_usd += monto_total
-        self._actualizar_totales()
+    def agregar_extra(self, descripcion: str, monto_usd: float, cantidad: int = 1,
+                      usuario_id: Optional[int] = None, articulo_id: Optional[int] = None) -> None:
+        """
+        Agrega un cargo extra al registro. En un registro guardado se requiere
+        el usuario que hace el cargo; para cargar muchos a la vez usar
+        `models.cargos.registrar_cargos`.
+        """
+        if not self.id:
+            self.total_extras_usd += monto_usd * cantidad
+            self._actualizar_totales()
+            return
+        if usuario_id is None:
+            raise ValueError("Se requiere el usuario que registra el cargo")
         
-        # Guardar en tabla Extras
-        db.execute('''
-            INSERT INTO Extras (Registro_ID, Descripcion, Monto_USD, Cantidad, Usuario_ID)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (self.id, descripcion, monto_usd, cantidad, self.usuario_checkin_id or 1))
+        from models.cargos import registrar_cargos, CargoLote, MOTIVO_INACTIVO
+        resultado = registrar_cargos(
+            [CargoLote(self.id, descripcion, monto_usd, cantidad, articulo_id)], usuario_id
+        )
+        if resultado.rechazados:
+            motivo = resultado.rechazados[0][1]
+            if motivo == MOTIVO_INACTIVO:
+                raise ConflictoConcurrencia(f"El registro {self.id} ya no está activo")
+            raise ValueError(motivo)
+        with db.get_connection() as conn:
+            self._leer_totales(conn)
     
-    def aplicar_descuento(self, monto_usd: float) -> None:
+    def aplicar_descuento(self, monto_usd: float, descripcion: str = "Descuento",
+                          usuario_id: Optional[int] = None) -> None:
         """Aplica un descuento al registro"""
-        self.total_descuentos_usd += monto_usd
-        self._actualizar_totales()
+        if not self.id:
+            self.total_descuentos_usd += monto_usd
+            self._actualizar_totales()
+            return
+        with db.transaction() as conn:
+            asentar(conn, self.id, TipoLinea.DESCUENTO, -monto_usd, descripcion, usuario_id)
+            self._leer_totales(conn)
+        bus.publicar(CargoRegistrado(self.id, self.habitacion_numero, -monto_usd, self.saldo_pendiente_usd))
     
-    def registrar_pago(self, monto_usd: float) -> None:
+    def registrar_pago(self, monto_usd: float, descripcion: str = "Pago",
+                       usuario_id: Optional[int] = None, transaccion_id: Optional[int] = None) -> None:
         """Registra un pago en el registro"""
-        self.total_pagado_usd += monto_usd
-        self._actualizar_totales()
+        if not self.id:
+            self.total_pagado_usd += monto_usd
+            self._actualizar_totales()
+            return
+        with db.transaction() as conn:
+            asentar(conn, self.id, TipoLinea.PAGO, -monto_usd, descripcion, usuario_id, transaccion_id)
+            self._leer_totales(conn)
+        bus.publicar(PagoRegistrado(self.id, self.habitacion_numero, monto_usd, self.saldo_pendiente_usd))
+    
+    def transferir_saldo_a_huesped(self, monto_usd: float, usuario_id: Optional[int] = None,
+                                   conn=None) -> None:
+        """
+        Pasa un saldo a favor del registro a la cuenta del huésped: asienta
+        la transferencia en el folio y suma el monto al saldo del huésped en
+        la misma transacción
+        """
+        if conn is None:
+            with db.transaction() as conn:
+                self.transferir_saldo_a_huesped(monto_usd, usuario_id, conn)
+            return
+        asentar(conn, self.id, TipoLinea.TRANSFERENCIA, monto_usd,
+                "Saldo a favor transferido al huésped", usuario_id)
+        conn.execute('''
+            UPDATE Huespedes SET Saldo_Acumulado = Saldo_Acumulado + ?, Version = Version + 1
+            WHERE ID = ?
+        ''', (monto_usd, self.huesped_principal_id))
+        self._leer_totales(conn)
     
     def _actualizar_totales(self) -> None:
-        """Actualiza los totales en la base de datos"""
+        """Actualiza en la base de datos los totales que hayan cambiado"""
+        self.saldo_pendiente_usd = self.saldo_actual_usd
         if self.id:
-            db.execute('''
-                UPDATE Registros SET
-                    Total_Habitacion_USD = ?,
-                    Total_Extras_USD = ?,
-                    Total_Descuentos_USD = ?,
-                    Total_Pagado_USD = ?,
-                    Saldo_Pendiente_USD = ?
-                WHERE ID = ?
-            ''', (
-                self.total_habitacion_usd, self.total_extras_usd,
-                self.total_descuentos_usd, self.total_pagado_usd,
-                self.saldo_actual_usd, self.id
-            ))
+            self._guardar_cambios()
     
-    def realizar_checkout(self, usuario_id: int) -> None:
-        """Realiza el checkout del huésped"""
-        self.fecha_salida_real = datetime.now()
-        self.estado = EstadoRegistro.CERRADO
-        self.usuario_checkout_id = usuario_id
+    def _leer_totales(self, conn) -> None:
+        """
+        Refresca los totales y la versión en memoria después de asentar
+        líneas del folio. Solo los totales pasan a estar sincronizados; otros
+        campos modificados en memoria siguen pendientes de guardar.
+        """
+        row = conn.execute('''
+            SELECT Total_Habitacion_USD, Total_Extras_USD, Total_Descuentos_USD,
+                   Total_Pagado_USD, Saldo_Pendiente_USD, Noches_Facturadas, Version
+            FROM Registros WHERE ID = ?
+        ''', (self.id,)).fetchone()
         
-        # Liberar habitación
-        from models.habitacion import Habitacion, EstadoHabitacion
-        habitacion = Habitacion.buscar_por_numero(self.habitacion_numero)
-        if habitacion:
-            habitacion.cambiar_estado(EstadoHabitacion.ASEO)
+        originales = getattr(self, '_originales', None)
+        for atributo in ('total_habitacion_usd', 'total_extras_usd', 'total_descuentos_usd',
+                         'total_pagado_usd', 'saldo_pendiente_usd', 'noches_facturadas'):
+            valor = row[self._columnas[atributo]]
+            setattr(self, atributo, valor)
+            if originales is not None:
+                originales[atributo] = valor
+        self.version = row['Version']
+    
+    def realizar_checkout(self, usuario_id: int, pagos: Sequence[Transaccion] = ()) -> None:
+        """
+        Realiza el checkout del huésped y pasa la habitación a aseo en una
+        sola transacción; un saldo a favor pasa a la cuenta del huésped y la
+        estadía se suma a sus estadísticas de fidelidad. Los `pagos` que
+        saldan la cuenta se guardan en la misma transacción: si el checkout
+        falla no queda ninguno.
+        Lanza ConflictoConcurrencia si otra estación modificó o cerró el
+        registro desde que fue leído.
+        """
+        if not self.esta_activo:
+            raise ConflictoConcurrencia(f"El registro {self.id} ya no está activo")
         
-        db.execute('''
-            UPDATE Registros SET
-                Fecha_Salida_Real = ?,
-                Estado = ?,
-                Usuario_Checkout_ID = ?,
-                Saldo_Pendiente_USD = ?
-            WHERE ID = ?
-        ''', (self.fecha_salida_real, self.estado.value, usuario_id, 
-              self.saldo_actual_usd, self.id))
+        ahora = datetime.now()
+        try:
+            with db.transaction() as conn:
+                # Verificar la versión antes de asentar los pagos y transferir el saldo
+                vigente = conn.execute(
+                    'SELECT 1 FROM Registros WHERE ID = ? AND Version = ? AND Estado = ?',
+                    (self.id, self.version, EstadoRegistro.ACTIVO.value)
+                ).fetchone()
+                if not vigente:
+                    raise ConflictoConcurrencia(f"El registro {self.id} fue modificado por otra estación")
+                eventos = []
+                for pago in pagos:
+                    pago.registro_id = self.id
+                    eventos.append(pago.insertar(conn))
+                if pagos:
+                    self._leer_totales(conn)
+                if self.saldo_pendiente_usd < 0:
+                    self.transferir_saldo_a_huesped(-self.saldo_pendiente_usd, usuario_id, conn)
+                
+                self.fecha_salida_real = ahora
+                self.estado = EstadoRegistro.CERRADO
+                self.usuario_checkout_id = usuario_id
+                self._guardar_cambios(conn)
+                acumular_estadias(conn, [self.id])
+                # Liberar habitación
+                conn.execute('''
+                    UPDATE Habitaciones SET Estado = 'Aseo', Ultima_Limpieza = ?, Version = Version + 1
+                    WHERE Numero = ?
+                ''', (ahora, self.habitacion_numero))
+        except Exception:
+            # Los pagos no quedaron guardados
+            for pago in pagos:
+                pago.id = None
+            raise
+        for evento in eventos:
+            if evento:
+                bus.publicar(evento)
+        bus.publicar(HabitacionCambiada(self.habitacion_numero, 'Aseo'))
     
-    def guardar(self) -> int:
-        """Guarda o actualiza el registro"""
+    def guardar(self, pagos: Sequence[Transaccion] = ()) -> int:
+        """
+        Guarda el registro; en una actualización solo escribe los campos
+        modificados. Al crearlo ocupa la habitación solo si sigue libre, de
+        modo que dos estaciones no puedan registrar la misma habitación, y
+        si no hay reservas de otro huésped en esas noches; la reserva del
+        propio huésped queda ingresada. La deuda (`total_extras_usd`) o el
+        saldo a favor (`total_descuentos_usd`) con que se crea pasa de la
+        cuenta del huésped al folio. Los `pagos` del check-in se guardan
+        en la misma transacción: si uno falla (por ejemplo con
+        ReferenciaEnUso) no queda ni el registro ni ningún pago.
+        """
         if self.id:
-            db.execute('''
-                UPDATE Registros SET
-                    Huesped_Principal_ID = ?,
-                    Habitacion_Numero = ?,
-                    Fecha_Entrada = ?,
-                    Fecha_Salida_Prevista = ?,
-                    Estado = ?,
-                    Total_Habitacion_USD = ?,
-                    Total_Extras_USD = ?,
-                    Total_Descuentos_USD = ?,
-                    Total_Pagado_USD = ?,
-                    Saldo_Pendiente_USD = ?,
-                    Notas = ?,
-                    Usuario_Checkin_ID = ?
-                WHERE ID = ?
-            ''', (
-                self.huesped_principal_id, self.habitacion_numero,
-                self.fecha_entrada, self.fecha_salida_prevista,
-                self.estado.value, self.total_habitacion_usd,
-                self.total_extras_usd, self.total_descuentos_usd,
-                self.total_pagado_usd, self.saldo_pendiente_usd,
-                self.notas, self.usuario_checkin_id, self.id
-            ))
+            self._guardar_cambios()
             return self.id
         else:
-            self.id = db.execute('''
-                INSERT INTO Registros (
-                    Huesped_Principal_ID, Habitacion_Numero, Fecha_Entrada,
-                    Fecha_Salida_Prevista, Estado, Total_Habitacion_USD,
-                    Total_Extras_USD, Total_Descuentos_USD, Total_Pagado_USD,
-                    Saldo_Pendiente_USD, Notas, Usuario_Checkin_ID
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                self.huesped_principal_id, self.habitacion_numero,
-                self.fecha_entrada, self.fecha_salida_prevista,
-                self.estado.value, self.total_habitacion_usd,
-                self.total_extras_usd, self.total_descuentos_usd,
-                self.total_pagado_usd, self.saldo_pendiente_usd,
-                self.notas, self.usuario_checkin_id
-            ))
-            
-            # Actualizar estado de habitación a Ocupada
-            from models.habitacion import Habitacion, EstadoHabitacion
-            habitacion = Habitacion.buscar_por_numero(self.habitacion_numero)
-            if habitacion:
-                habitacion.cambiar_estado(EstadoHabitacion.OCUPADA)
-            
-            # Actualizar última visita del huésped
-            db.execute(
-                'UPDATE Huespedes SET Ultima_Visita = ? WHERE ID = ?',
-                (datetime.now(), self.huesped_principal_id)
-            )
+            try:
+                with db.transaction() as conn:
+                    ocupada = conn.execute('''
+                        UPDATE Habitaciones SET Estado = 'Ocupada', Version = Version + 1
+                        WHERE Numero = ? AND Estado = 'Libre'
+                    ''', (self.habitacion_numero,))
+                    if ocupada.rowcount == 0:
+                        raise ConflictoConcurrencia(
+                            f"La habitación {self.habitacion_numero:03d} ya no está disponible"
+                        )
+                    llegada = self.fecha_entrada.date()
+                    reservas = tomar_reservas(
+                        conn, [(self.habitacion_numero, self.huesped_principal_id)],
+                        llegada, max(self.fecha_salida_prevista.date(), llegada + timedelta(days=1))
+                    )
+                    
+                    self.id = conn.execute('''
+                        INSERT INTO Registros (
+                            Huesped_Principal_ID, Habitacion_Numero, Fecha_Entrada,
+                            Fecha_Salida_Prevista, Estado, Total_Habitacion_USD,
+                            Total_Extras_USD, Total_Descuentos_USD, Total_Pagado_USD,
+                            Saldo_Pendiente_USD, Notas, Usuario_Checkin_ID, Noches_Facturadas,
+                            Tarifa_ID
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (
+                        self.huesped_principal_id, self.habitacion_numero,
+                        self.fecha_entrada, self.fecha_salida_prevista,
+                        self.estado.value, self.total_habitacion_usd,
+                        self.total_extras_usd, self.total_descuentos_usd,
+                        self.total_pagado_usd, self.saldo_pendiente_usd,
+                        self.notas, self.usuario_checkin_id, self.noches_facturadas,
+                        self.tarifa_id
+                    )).lastrowid
+                    # El saldo guardado es el del folio recién abierto
+                    self.saldo_pendiente_usd = self._abrir_folio(conn)
+                    conn.execute('UPDATE Registros SET Saldo_Pendiente_USD = ? WHERE ID = ?',
+                                 (self.saldo_pendiente_usd, self.id))
+                    marcar_ingresadas(conn, {reserva_id: self.id for reserva_id in reservas.values()})
+                    
+                    # Actualizar última visita del huésped (no es una edición de
+                    # sus datos, por eso no incrementa su versión)
+                    conn.execute(
+                        'UPDATE Huespedes SET Ultima_Visita = ? WHERE ID = ?',
+                        (datetime.now(), self.huesped_principal_id)
+                    )
+                    # La deuda o el saldo a favor que pasó al folio ("Deuda
+                    # anterior" / "Saldo a favor anterior") sale de la cuenta
+                    # del huésped; el ajuste es relativo para no pisar lo que
+                    # otra estación haya cambiado en su saldo
+                    traspaso = self.total_extras_usd - self.total_descuentos_usd
+                    if traspaso:
+                        conn.execute('''
+                            UPDATE Huespedes SET Saldo_Acumulado = Saldo_Acumulado + ?, Version = Version + 1
+                            WHERE ID = ?
+                        ''', (traspaso, self.huesped_principal_id))
+                    
+                    self.version = 0
+                    eventos = []
+                    for pago in pagos:
+                        pago.registro_id = self.id
+                        eventos.append(pago.insertar(conn))
+                    if pagos:
+                        self._leer_totales(conn)
+            except Exception:
+                # Nada quedó guardado: el registro y los pagos vuelven a ser nuevos
+                self.id = None
+                for pago in pagos:
+                    pago.id = pago.registro_id = None
+                raise
             
+            self._marcar_limpio()
+            bus.publicar(HabitacionCambiada(self.habitacion_numero, 'Ocupada'))
+            for evento in eventos:
+                if evento:
+                    bus.publicar(evento)
             return self.id
     
+    def _abrir_folio(self, conn) -> float:
+        """Asienta en el folio los totales con que se creó el registro y retorna el saldo"""
+        saldo = 0.0
+        for tipo, monto, descripcion in (
+            (TipoLinea.HABITACION, self.total_habitacion_usd,
+             f"{self.noches_facturadas} {'noche' if self.noches_facturadas == 1 else 'noches'}"),
+            (TipoLinea.EXTRA, self.total_extras_usd, "Deuda anterior"),
+            (TipoLinea.DESCUENTO, -self.total_descuentos_usd, "Saldo a favor anterior"),
+            (TipoLinea.PAGO, -self.total_pagado_usd, "Pago"),
+        ):
+            if monto or tipo == TipoLinea.HABITACION:
+                saldo = asentar(conn, self.id, tipo, monto, descripcion, self.usuario_checkin_id,
+                                actualizar_totales=False)
+        return saldo
+    
     @staticmethod
     def buscar_por_id(registro_id: int) -> Optional['Registro']:
         """Busca un registro por su ID con información relacionada"""
@@ -200,6 +369,19 @@ class Registro:
         ''', (registro_id,))
         return Registro._from_row(row) if row else None
     
+    @staticmethod
+    def buscar_por_ids(ids) -> Dict[int, 'Registro']:
+        """Busca varios registros con una sola consulta y los retorna por ID"""
+        rows = db.fetch_all_in('''
+            SELECT r.*, h.Nombres || ' ' || h.Apellidos as Huesped_Nombre,
+                   hb.Tipo as Habitacion_Tipo
+            FROM Registros r
+            JOIN Huespedes h ON r.Huesped_Principal_ID = h.ID
+            JOIN Habitaciones hb ON r.Habitacion_Numero = hb.Numero
+            WHERE r.ID IN ({marcadores})
+        ''', set(ids))
+        return {row['ID']: Registro._from_row(row) for row in rows}
+    
     @staticmethod
     def buscar_activo_por_habitacion(numero_habitacion: int) -> Optional['Registro']:
         """Busca el registro activo de una habitación"""
@@ -269,7 +451,7 @@ class Registro:
     @staticmethod
     def _from_row(row: dict) -> 'Registro':
         """Crea un objeto Registro desde una fila de la base de datos"""
-        return Registro(
+        registro = Registro(
             id=row['ID'],
             huesped_principal_id=row['Huesped_Principal_ID'],
             habitacion_numero=row['Habitacion_Numero'],
@@ -285,6 +467,12 @@ class Registro:
             notas=row['Notas'],
             usuario_checkin_id=row['Usuario_Checkin_ID'],
             usuario_checkout_id=row['Usuario_Checkout_ID'],
+            noches_facturadas=row['Noches_Facturadas'],
+            sobreestadia=bool(row['Sobreestadia']),
+            tarifa_id=row['Tarifa_ID'],
+            version=row['Version'],
             huesped_nombre=row.get('Huesped_Nombre', ''),
             habitacion_tipo=row.get('Habitacion_Tipo', '')
         )
+        registro._marcar_limpio()
+        return registro
@@ -0,0 +1,474 @@
+"""
+Modelo y lógica de negocio para Reservas
+
+Una reserva ocupa una habitación las noches del rango [llegada, salida).
+Además de la tabla se mantiene un índice en memoria con los intervalos
+reservados de cada habitación, para responder sin consultar la base de
+datos si una habitación está libre en un rango y qué habitaciones de un
+tipo lo están. La verificación definitiva se hace siempre en SQL dentro de
+la transacción que escribe.
+"""
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from database.connection import db
+from models.base import SeguimientoCambios, ConflictoConcurrencia
+from models.mantenimiento import verificar_en_servicio, fin_fuera_de_servicio
+from utils.eventos import bus, HabitacionCambiada, ReservaCambiada
+
+class EstadoReserva(str, Enum):
+    CONFIRMADA = 'Confirmada'
+    INGRESADA = 'Ingresada'
+    CANCELADA = 'Cancelada'
+
+def _fecha(valor) -> Optional[date]:
+    """Convierte el valor leído de SQLite a date"""
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+@dataclass
+class Reserva(SeguimientoCambios):
+    habitacion_numero: int
+    huesped_id: int
+    fecha_llegada: date
+    fecha_salida: date
+    estado: EstadoReserva = EstadoReserva.CONFIRMADA
+    notas: str = ""
+    usuario_id: Optional[int] = None
+    registro_id: Optional[int] = None
+    fecha_creacion: Optional[datetime] = None
+    id: Optional[int] = None
+    version: int = 0
+    
+    # Campos relacionados (no persistidos directamente)
+    huesped_nombre: str = ""
+    habitacion_tipo: str = ""
+    
+    _tabla = 'Reservas'
+    _columna_version = 'Version'
+    _columnas = {
+        'habitacion_numero': 'Habitacion_Numero',
+        'huesped_id': 'Huesped_ID',
+        'fecha_llegada': 'Fecha_Llegada',
+        'fecha_salida': 'Fecha_Salida',
+        'estado': 'Estado',
+        'notas': 'Notas',
+        'registro_id': 'Registro_ID',
+    }
+    
+    @property
+    def noches(self) -> int:
+        return (self.fecha_salida - self.fecha_llegada).days
+    
+    @property
+    def esta_confirmada(self) -> bool:
+        return self.estado == EstadoReserva.CONFIRMADA
+    
+    def guardar(self) -> int:
+        """
+        Guarda la reserva verificando en la misma transacción que la
+        habitación no tenga otra reserva confirmada ni una estadía activa en
+        esas noches. Lanza ConflictoConcurrencia si se cruza con alguna.
+        """
+        if self.fecha_salida <= self.fecha_llegada:
+            raise ValueError("La fecha de salida debe ser posterior a la de llegada")
+        anterior = None
+        with db.transaction() as conn:
+            if self.esta_confirmada:
+                verificar_disponible(conn, self.habitacion_numero, self.fecha_llegada,
+                                     self.fecha_salida, excluir_reserva=self.id)
+            if self.id:
+                anterior = self._originales['habitacion_numero']
+                self._guardar_cambios(conn)
+            else:
+                if self.fecha_llegada < date.today():
+                    raise ValueError("La fecha de llegada ya pasó")
+                self.fecha_creacion = datetime.now()
+                self.id = conn.execute('''
+                    INSERT INTO Reservas (
+                        Habitacion_Numero, Huesped_ID, Fecha_Llegada, Fecha_Salida,
+                        Estado, Notas, Usuario_ID, Fecha_Creacion
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    self.habitacion_numero, self.huesped_id, self.fecha_llegada,
+                    self.fecha_salida, self.estado.value, self.notas, self.usuario_id,
+                    self.fecha_creacion
+                )).lastrowid
+                self.version = 0
+                self._marcar_limpio()
+        
+        if anterior is not None and anterior != self.habitacion_numero:
+            bus.publicar(ReservaCambiada(self.id, anterior, self.estado.value))
+        bus.publicar(ReservaCambiada(self.id, self.habitacion_numero, self.estado.value))
+        return self.id
+    
+    def cancelar(self) -> None:
+        """Cancela la reserva y libera sus noches"""
+        if not self.esta_confirmada:
+            raise ValueError("Solo se pueden cancelar reservas confirmadas")
+        self.estado = EstadoReserva.CANCELADA
+        self.guardar()
+    
+    @staticmethod
+    def buscar_por_id(reserva_id: int) -> Optional['Reserva']:
+        """Busca una reserva por su ID"""
+        row = db.fetch_one(f'{_CONSULTA} WHERE r.ID = ?', (reserva_id,))
+        return Reserva._from_row(row) if row else None
+    
+    @staticmethod
+    def listar_confirmadas(desde: Optional[date] = None, hasta: Optional[date] = None) -> List['Reserva']:
+        """Lista las reservas confirmadas que ocupan alguna noche entre `desde` y `hasta`"""
+        desde = desde or date.today()
+        hasta = hasta or date.max
+        rows = db.fetch_all(f'''
+            {_CONSULTA}
+            WHERE r.Estado = 'Confirmada' AND r.Fecha_Salida > ? AND r.Fecha_Llegada < ?
+            ORDER BY r.Fecha_Llegada, r.Habitacion_Numero
+        ''', (desde, hasta))
+        return [Reserva._from_row(row) for row in rows]
+    
+    @staticmethod
+    def listar_por_huesped(huesped_id: int) -> List['Reserva']:
+        """Lista las reservas de un huésped, las más recientes primero"""
+        rows = db.fetch_all(f'''
+            {_CONSULTA}
+            WHERE r.Huesped_ID = ?
+            ORDER BY r.Fecha_Llegada DESC
+        ''', (huesped_id,))
+        return [Reserva._from_row(row) for row in rows]
+    
+    @staticmethod
+    def _from_row(row: dict) -> 'Reserva':
+        """Crea un objeto Reserva desde una fila de la base de datos"""
+        reserva = Reserva(
+            id=row['ID'],
+            habitacion_numero=row['Habitacion_Numero'],
+            huesped_id=row['Huesped_ID'],
+            fecha_llegada=_fecha(row['Fecha_Llegada']),
+            fecha_salida=_fecha(row['Fecha_Salida']),
+            estado=EstadoReserva(row['Estado']),
+            notas=row['Notas'] or "",
+            usuario_id=row['Usuario_ID'],
+            registro_id=row['Registro_ID'],
+            fecha_creacion=row['Fecha_Creacion'],
+            version=row['Version'],
+            huesped_nombre=row.get('Huesped_Nombre', ''),
+            habitacion_tipo=row.get('Habitacion_Tipo', '')
+        )
+        reserva._marcar_limpio()
+        return reserva
+
+_CONSULTA = '''
+    SELECT r.*, h.Nombres || ' ' || h.Apellidos as Huesped_Nombre, hab.Tipo as Habitacion_Tipo
+    FROM Reservas r
+    JOIN Huespedes h ON r.Huesped_ID = h.ID
+    JOIN Habitaciones hab ON r.Habitacion_Numero = hab.Numero
+'''
+
+def _formato_rango(llegada, salida) -> str:
+    return f"del {_fecha(llegada).strftime('%d/%m/%Y')} al {_fecha(salida).strftime('%d/%m/%Y')}"
+
+def verificar_disponible(conn, habitacion_numero: int, llegada: date, salida: date,
+                         excluir_reserva: Optional[int] = None) -> None:
+    """
+    Verifica dentro de la transacción recibida que la habitación no tenga
+    otra reserva confirmada, una estadía activa ni una orden de
+    mantenimiento en el rango. Lanza ConflictoConcurrencia si no está libre.
+    """
+    choque = conn.execute('''
+        SELECT Fecha_Llegada, Fecha_Salida FROM Reservas
+        WHERE Habitacion_Numero = ? AND Estado = 'Confirmada'
+            AND Fecha_Llegada < ? AND Fecha_Salida > ? AND ID IS NOT ?
+        LIMIT 1
+    ''', (habitacion_numero, salida, llegada, excluir_reserva)).fetchone()
+    if choque:
+        raise ConflictoConcurrencia(
+            f"La habitación {habitacion_numero:03d} ya está reservada "
+            f"{_formato_rango(choque[0], choque[1])}"
+        )
+    ocupada = conn.execute('''
+        SELECT date(Fecha_Salida_Prevista) FROM Registros
+        WHERE Habitacion_Numero = ? AND Estado = 'Activo'
+    ''', (habitacion_numero,)).fetchone()
+    if ocupada and fin_ocupacion(_fecha(ocupada[0])) > llegada:
+        raise ConflictoConcurrencia(
+            f"La habitación {habitacion_numero:03d} está ocupada hasta el "
+            f"{fin_ocupacion(_fecha(ocupada[0])).strftime('%d/%m/%Y')}"
+        )
+    verificar_en_servicio(conn, habitacion_numero, llegada, salida)
+
+def tomar_reservas(conn, estadias: Iterable[Tuple[int, int]], llegada: date,
+                   salida: date) -> Dict[int, int]:
+    """
+    Verifica dentro de la transacción de un check-in que ninguna reserva
+    confirmada de otro huésped ni orden de mantenimiento se cruce con las
+    estadías (habitación, huésped). Lanza ConflictoConcurrencia con las
+    habitaciones en conflicto.
+    Retorna, por habitación, la reserva del mismo huésped que el check-in
+    cumple, para marcarla con `marcar_ingresadas`.
+    """
+    huespedes = dict(estadias)
+    numeros = list(huespedes)
+    propias: Dict[int, int] = {}
+    conflictos: List[str] = []
+    manana = date.today() + timedelta(days=1)
+    for i in range(0, len(numeros), 500):
+        parte = numeros[i:i + 500]
+        for row in conn.execute(f'''
+            SELECT Habitacion_Numero, Fecha_Desde, Fecha_Hasta FROM Mantenimientos
+            WHERE Habitacion_Numero IN ({', '.join('?' * len(parte))}) AND Estado = 'Abierto'
+                AND Fecha_Desde < ? AND MAX(Fecha_Hasta, ?) > ?
+        ''', [*parte, salida.isoformat(), manana.isoformat(), llegada.isoformat()]).fetchall():
+            conflictos.append(
+                f"{row['Habitacion_Numero']:03d} (fuera de servicio "
+                f"{_formato_rango(row['Fecha_Desde'], fin_fuera_de_servicio(_fecha(row['Fecha_Hasta'])))})"
+            )
+        rows = conn.execute(f'''
+            SELECT ID, Habitacion_Numero, Huesped_ID, Fecha_Llegada, Fecha_Salida
+            FROM Reservas
+            WHERE Habitacion_Numero IN ({', '.join('?' * len(parte))}) AND Estado = 'Confirmada'
+                AND Fecha_Llegada < ? AND Fecha_Salida > ?
+            ORDER BY Fecha_Llegada
+        ''', [*parte, salida, llegada]).fetchall()
+        for row in rows:
+            numero = row['Habitacion_Numero']
+            if row['Huesped_ID'] == huespedes[numero] and numero not in propias:
+                propias[numero] = row['ID']
+            else:
+                conflictos.append(
+                    f"{numero:03d} ({_formato_rango(row['Fecha_Llegada'], row['Fecha_Salida'])})"
+                )
+    if conflictos:
+        raise ConflictoConcurrencia("Habitaciones no disponibles: " + ", ".join(conflictos))
+    return propias
+
+def marcar_ingresadas(conn, reservas: Dict[int, int]) -> None:
+    """Marca como ingresadas las reservas (ID de reserva -> ID de registro)"""
+    conn.executemany('''
+        UPDATE Reservas SET Estado = 'Ingresada', Registro_ID = ?, Version = Version + 1
+        WHERE ID = ?
+    ''', [(registro_id, reserva_id) for reserva_id, registro_id in reservas.items()])
+
+def fin_ocupacion(salida_prevista: date) -> date:
+    """Primera noche libre tras una estadía activa (la de mañana si ya pasó su salida)"""
+    return max(salida_prevista, date.today() + timedelta(days=1))
+
+def leer_noches_ocupadas(numeros: Optional[List[int]] = None, lote: int = 500
+                         ) -> Tuple[Dict[int, str], Dict[int, List[Tuple[date, date, int]]], Dict[int, date],
+                                    Dict[int, List[Tuple[date, date]]]]:
+    """
+    Lee de la base de datos, para las habitaciones indicadas (o todas), su
+    tipo, sus reservas confirmadas vigentes como (llegada, salida, ID)
+    ordenadas por llegada, la salida prevista de su estadía activa y sus
+    órdenes de mantenimiento abiertas como (desde, hasta)
+    """
+    if numeros is None:
+        partes = [None]
+    else:
+        numeros = list(numeros)
+        partes = [numeros[i:i + lote] for i in range(0, len(numeros), lote)]
+    tipos: Dict[int, str] = {}
+    intervalos: Dict[int, List[Tuple[date, date, int]]] = {}
+    ocupada_hasta: Dict[int, date] = {}
+    fuera_de_servicio: Dict[int, List[Tuple[date, date]]] = {}
+    for parte in partes:
+        if parte is None:
+            filtro_habitaciones, filtro, params = '', '', ()
+        else:
+            marcadores = ', '.join('?' * len(parte))
+            filtro_habitaciones = f'WHERE Numero IN ({marcadores})'
+            filtro = f'AND Habitacion_Numero IN ({marcadores})'
+            params = tuple(parte)
+        tipos.update(
+            (row['Numero'], row['Tipo'])
+            for row in db.fetch_all(f'SELECT Numero, Tipo FROM Habitaciones {filtro_habitaciones}', params)
+        )
+        for row in db.fetch_all(f'''
+            SELECT ID, Habitacion_Numero, Fecha_Llegada, Fecha_Salida FROM Reservas
+            WHERE Estado = 'Confirmada' AND Fecha_Salida > ? {filtro}
+            ORDER BY Habitacion_Numero, Fecha_Llegada
+        ''', (date.today(), *params)):
+            intervalos.setdefault(row['Habitacion_Numero'], []).append(
+                (_fecha(row['Fecha_Llegada']), _fecha(row['Fecha_Salida']), row['ID'])
+            )
+        ocupada_hasta.update(
+            (row['Habitacion_Numero'], _fecha(row['Salida']))
+            for row in db.fetch_all(f'''
+                SELECT Habitacion_Numero, date(Fecha_Salida_Prevista) as Salida FROM Registros
+                WHERE Estado = 'Activo' {filtro}
+            ''', params)
+        )
+        for row in db.fetch_all(f'''
+            SELECT Habitacion_Numero, Fecha_Desde, Fecha_Hasta FROM Mantenimientos
+            WHERE Estado = 'Abierto' {filtro}
+            ORDER BY Habitacion_Numero, Fecha_Desde
+        ''', params):
+            fuera_de_servicio.setdefault(row['Habitacion_Numero'], []).append(
+                (_fecha(row['Fecha_Desde']), _fecha(row['Fecha_Hasta']))
+            )
+    return tipos, intervalos, ocupada_hasta, fuera_de_servicio
+
+
+class IndicePorHabitacion(ABC):
+    """
+    Base de los índices en memoria de noches ocupadas. Se cargan una vez
+    desde la base de datos y luego se mantienen por habitación: cada evento
+    de habitación o reserva (propio o de otra estación, vía el monitor de
+    cambios) marca la habitación como pendiente y antes de la siguiente
+    consulta se releen todas las pendientes juntas. Las subclases guardan
+    los datos leídos con `_aplicar`.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pendientes: Set[int] = set()
+    
+    def cargar(self) -> None:
+        """
+        Reconstruye el índice completo. Las habitaciones pendientes se
+        conservan: pudieron cambiar mientras se leía.
+        """
+        datos = leer_noches_ocupadas()
+        with self._lock:
+            self._aplicar(None, *datos)
+    
+    @abstractmethod
+    def _aplicar(self, numeros: Optional[List[int]], tipos: Dict[int, str],
+                 intervalos: Dict[int, List[Tuple[date, date, int]]],
+                 ocupada_hasta: Dict[int, date],
+                 fuera_de_servicio: Dict[int, List[Tuple[date, date]]]) -> None:
+        """Reemplaza los datos de las habitaciones (todas si `numeros` es None); se llama con el lock tomado"""
+    
+    def suscribir(self) -> None:
+        """Se suscribe a los eventos que pueden cambiar las noches ocupadas"""
+        bus.suscribir(HabitacionCambiada, self._on_habitacion_cambiada)
+        bus.suscribir(ReservaCambiada, self._on_reserva_cambiada)
+    
+    def marcar_pendiente(self, numero: int) -> None:
+        """Marca una habitación para releerla antes de la próxima consulta"""
+        with self._lock:
+            self._pendientes.add(numero)
+    
+    def _on_habitacion_cambiada(self, evento: HabitacionCambiada) -> None:
+        self.marcar_pendiente(evento.numero)
+    
+    def _on_reserva_cambiada(self, evento: ReservaCambiada) -> None:
+        self.marcar_pendiente(evento.habitacion_numero)
+    
+    def _refrescar(self) -> None:
+        """Relee en una sola pasada las habitaciones pendientes"""
+        with self._lock:
+            if not self._pendientes:
+                return
+            numeros, self._pendientes = list(self._pendientes), set()
+        datos = leer_noches_ocupadas(numeros)
+        with self._lock:
+            self._aplicar(numeros, *datos)
+
+
+class IndiceReservas(IndicePorHabitacion):
+    """
+    Índice en memoria de las noches ocupadas de cada habitación. Las
+    reservas confirmadas de una habitación nunca se cruzan entre sí, así
+    que basta una lista ordenada por llegada: con bisect se ubica la última
+    reserva que empieza antes del fin del rango y, como los intervalos son
+    disjuntos, solo ella puede cruzarse con su inicio. La consulta es
+    O(log n) por habitación, igual que con un árbol de intervalos. Las
+    órdenes de mantenimiento pueden cruzarse con reservas y se guardan
+    aparte; una habitación casi nunca tiene más de una abierta.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._llegadas: Dict[int, List[date]] = {}
+        self._intervalos: Dict[int, List[Tuple[date, date, int]]] = {}
+        self._ocupada_hasta: Dict[int, date] = {}
+        self._fuera_de_servicio: Dict[int, List[Tuple[date, date]]] = {}
+        self._tipos: Dict[int, str] = {}
+    
+    def _aplicar(self, numeros, tipos, intervalos, ocupada_hasta, fuera_de_servicio) -> None:
+        if numeros is None:
+            self._tipos, self._intervalos, self._ocupada_hasta = tipos, intervalos, ocupada_hasta
+            self._fuera_de_servicio = fuera_de_servicio
+            self._llegadas = {n: [i[0] for i in lista] for n, lista in intervalos.items()}
+            return
+        for numero in numeros:
+            if numero in tipos:
+                self._tipos[numero] = tipos[numero]
+            else:
+                self._tipos.pop(numero, None)
+            self._intervalos[numero] = intervalos.get(numero, [])
+            self._llegadas[numero] = [i[0] for i in self._intervalos[numero]]
+            if numero in ocupada_hasta:
+                self._ocupada_hasta[numero] = ocupada_hasta[numero]
+            else:
+                self._ocupada_hasta.pop(numero, None)
+            if numero in fuera_de_servicio:
+                self._fuera_de_servicio[numero] = fuera_de_servicio[numero]
+            else:
+                self._fuera_de_servicio.pop(numero, None)
+    
+    def _libre_sin_lock(self, numero: int, llegada: date, salida: date,
+                        excluir_reserva: Optional[int] = None) -> bool:
+        ocupada_hasta = self._ocupada_hasta.get(numero)
+        if ocupada_hasta is not None and fin_ocupacion(ocupada_hasta) > llegada:
+            return False
+        for desde, hasta in self._fuera_de_servicio.get(numero, ()):
+            if desde < salida and fin_fuera_de_servicio(hasta) > llegada:
+                return False
+        intervalos = self._intervalos.get(numero)
+        if not intervalos:
+            return True
+        i = bisect_left(self._llegadas[numero], salida) - 1
+        while i >= 0 and intervalos[i][2] == excluir_reserva:
+            i -= 1
+        return i < 0 or intervalos[i][1] <= llegada
+    
+    def esta_libre(self, numero: int, llegada: date, salida: date,
+                   excluir_reserva: Optional[int] = None) -> bool:
+        """Retorna True si la habitación no tiene reservas ni estadías en el rango"""
+        if salida <= llegada:
+            raise ValueError("La fecha de salida debe ser posterior a la de llegada")
+        self._refrescar()
+        with self._lock:
+            return numero in self._tipos and self._libre_sin_lock(numero, llegada, salida, excluir_reserva)
+    
+    def habitaciones_libres(self, llegada: date, salida: date, tipo: Optional[str] = None) -> List[int]:
+        """Lista las habitaciones (opcionalmente de un tipo) libres en todo el rango"""
+        if salida <= llegada:
+            raise ValueError("La fecha de salida debe ser posterior a la de llegada")
+        self._refrescar()
+        with self._lock:
+            return [
+                numero for numero in sorted(self._tipos)
+                if (tipo is None or self._tipos[numero] == tipo)
+                and self._libre_sin_lock(numero, llegada, salida)
+            ]
+    
+    def reservas_de(self, numero: int) -> List[Tuple[date, date, int]]:
+        """Retorna los intervalos (llegada, salida, ID de reserva) vigentes de una habitación"""
+        self._refrescar()
+        with self._lock:
+            return list(self._intervalos.get(numero, []))
+
+# Instancia global del índice (lazy loading)
+_indice: Optional[IndiceReservas] = None
+
+def get_indice_reservas() -> IndiceReservas:
+    """Obtiene el índice global de reservas, cargándolo si hace falta"""
+    global _indice
+    if _indice is None:
+        indice = IndiceReservas()
+        indice.suscribir()
+        indice.cargar()
+        _indice = indice
+    return _indice
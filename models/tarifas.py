@@ -0,0 +1,322 @@
+"""
+Planes de tarifa y calendario de precios por noche
+
+Las reglas (precio de semana y de fin de semana por plan, temporadas con
+ajuste porcentual y descuentos por duración) se materializan en un
+calendario: un factor de temporada por noche desde hoy hasta el horizonte y,
+por cada par de precios consultado, un arreglo de sumas acumuladas. El total
+de cualquier estadía dentro del horizonte es entonces una resta de dos
+posiciones, sin volver a evaluar las reglas noche por noche.
+"""
+import threading
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+from database.connection import db
+from models.base import SeguimientoCambios
+
+# Noches hacia adelante que cubre el calendario
+DIAS_HORIZONTE = 400
+
+# Noches de viernes y sábado (date.weekday())
+DIAS_FIN_SEMANA = (4, 5)
+
+# Nombre del plan implícito que usa el Precio_USD de la habitación
+PLAN_ESTANDAR = 'Estándar'
+
+def _fecha(valor) -> date:
+    return valor if isinstance(valor, date) else date.fromisoformat(str(valor)[:10])
+
+@dataclass
+class Tarifa(SeguimientoCambios):
+    nombre: str
+    tipo_habitacion: str
+    precio_semana_usd: float
+    precio_fin_semana_usd: float
+    activo: bool = True
+    id: Optional[int] = None
+    
+    _tabla = 'Tarifas'
+    _columnas = {
+        'nombre': 'Nombre',
+        'tipo_habitacion': 'Tipo_Habitacion',
+        'precio_semana_usd': 'Precio_Semana_USD',
+        'precio_fin_semana_usd': 'Precio_Fin_Semana_USD',
+        'activo': 'Activo',
+    }
+    
+    def guardar(self) -> int:
+        """Guarda el plan; en una actualización solo escribe los campos modificados"""
+        self.nombre = self.nombre.strip()
+        if self.precio_semana_usd < 0 or self.precio_fin_semana_usd < 0:
+            raise ValueError("Los precios no pueden ser negativos")
+        if self.id:
+            self._guardar_cambios()
+            return self.id
+        self.id = db.execute('''
+            INSERT INTO Tarifas (Nombre, Tipo_Habitacion, Precio_Semana_USD, Precio_Fin_Semana_USD, Activo)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (self.nombre, self.tipo_habitacion, self.precio_semana_usd,
+              self.precio_fin_semana_usd, 1 if self.activo else 0))
+        self._marcar_limpio()
+        return self.id
+    
+    @staticmethod
+    def listar_todas() -> List['Tarifa']:
+        """Lista todos los planes de tarifa"""
+        rows = db.fetch_all('SELECT * FROM Tarifas ORDER BY Tipo_Habitacion, Nombre')
+        return [Tarifa._from_row(row) for row in rows]
+    
+    @staticmethod
+    def _from_row(row: dict) -> 'Tarifa':
+        """Crea un objeto Tarifa desde una fila de la base de datos"""
+        tarifa = Tarifa(
+            id=row['ID'],
+            nombre=row['Nombre'],
+            tipo_habitacion=row['Tipo_Habitacion'],
+            precio_semana_usd=row['Precio_Semana_USD'],
+            precio_fin_semana_usd=row['Precio_Fin_Semana_USD'],
+            activo=bool(row['Activo'])
+        )
+        tarifa._marcar_limpio()
+        return tarifa
+
+
+@dataclass
+class Temporada:
+    nombre: str
+    fecha_desde: date
+    fecha_hasta: date
+    ajuste_pct: float
+    id: Optional[int] = None
+    
+    @property
+    def factor(self) -> float:
+        return 1 + self.ajuste_pct / 100
+    
+    def guardar(self) -> int:
+        """Guarda la temporada (las noches de Fecha_Desde a Fecha_Hasta inclusive)"""
+        if self.fecha_hasta < self.fecha_desde:
+            raise ValueError("La fecha final de la temporada es anterior a la inicial")
+        if self.ajuste_pct <= -100:
+            raise ValueError("El ajuste debe ser mayor a -100%")
+        if self.id:
+            db.execute_update('''
+                UPDATE Temporadas SET Nombre = ?, Fecha_Desde = ?, Fecha_Hasta = ?, Ajuste_Pct = ?
+                WHERE ID = ?
+            ''', (self.nombre, self.fecha_desde, self.fecha_hasta, self.ajuste_pct, self.id))
+            return self.id
+        self.id = db.execute('''
+            INSERT INTO Temporadas (Nombre, Fecha_Desde, Fecha_Hasta, Ajuste_Pct)
+            VALUES (?, ?, ?, ?)
+        ''', (self.nombre, self.fecha_desde, self.fecha_hasta, self.ajuste_pct))
+        return self.id
+    
+    def eliminar(self) -> None:
+        db.execute_update('DELETE FROM Temporadas WHERE ID = ?', (self.id,))
+    
+    @staticmethod
+    def listar_todas() -> List['Temporada']:
+        """Lista las temporadas en orden de creación (la última definida manda si se cruzan)"""
+        rows = db.fetch_all('SELECT * FROM Temporadas ORDER BY ID')
+        return [
+            Temporada(
+                id=row['ID'],
+                nombre=row['Nombre'],
+                fecha_desde=_fecha(row['Fecha_Desde']),
+                fecha_hasta=_fecha(row['Fecha_Hasta']),
+                ajuste_pct=row['Ajuste_Pct']
+            )
+            for row in rows
+        ]
+
+
+@dataclass
+class DescuentoEstadia:
+    noches_minimas: int
+    descuento_pct: float
+    
+    def guardar(self) -> None:
+        """Crea o reemplaza el descuento para ese mínimo de noches"""
+        if self.noches_minimas < 2:
+            raise ValueError("El descuento debe aplicar desde 2 noches")
+        if not 0 < self.descuento_pct < 100:
+            raise ValueError("El descuento debe estar entre 0 y 100%")
+        db.execute('''
+            INSERT INTO Descuentos_Estadia (Noches_Minimas, Descuento_Pct) VALUES (?, ?)
+            ON CONFLICT(Noches_Minimas) DO UPDATE SET Descuento_Pct = excluded.Descuento_Pct
+        ''', (self.noches_minimas, self.descuento_pct))
+    
+    def eliminar(self) -> None:
+        db.execute_update('DELETE FROM Descuentos_Estadia WHERE Noches_Minimas = ?', (self.noches_minimas,))
+    
+    @staticmethod
+    def listar_todos() -> List['DescuentoEstadia']:
+        rows = db.fetch_all('SELECT * FROM Descuentos_Estadia ORDER BY Noches_Minimas')
+        return [DescuentoEstadia(row['Noches_Minimas'], row['Descuento_Pct']) for row in rows]
+
+
+@dataclass
+class Cotizacion:
+    """Precio de una estadía según un plan"""
+    noches: int
+    subtotal_usd: float
+    descuento_pct: float = 0.0
+    descuento_usd: float = 0.0
+    total_usd: float = 0.0
+    precios_noche: List[float] = field(default_factory=list)
+    
+    @property
+    def promedio_noche_usd(self) -> float:
+        return round(self.total_usd / self.noches, 2) if self.noches else 0.0
+
+
+class CalendarioPrecios:
+    """
+    Reglas de tarifa precalculadas por noche. Las sumas acumuladas se arman
+    la primera vez que se cotiza un par de precios y se reutilizan hasta que
+    cambie el día o Version_Tarifas (que suben los triggers de las tablas de
+    reglas), así un cambio hecho en otra estación se detecta con una lectura.
+    """
+    
+    def __init__(self, dias: int = DIAS_HORIZONTE):
+        self.dias = dias
+        self._lock = threading.Lock()
+        self._inicio: Optional[date] = None
+        self._version: Optional[int] = None
+        self._factores: List[float] = []
+        self._fin_semana: List[bool] = []
+        self._temporadas: List[Temporada] = []
+        self._minimos: List[int] = []
+        self._descuentos: List[float] = []
+        self._tarifas: Dict[int, Tarifa] = {}
+        self._acumulados: Dict[Tuple[float, float], List[float]] = {}
+    
+    def cargar(self) -> None:
+        """Lee las reglas y recalcula los factores de cada noche del horizonte"""
+        # La versión se lee antes que las reglas: si cambian en medio, la
+        # próxima verificación vuelve a cargar
+        version = db.fetch_scalar('SELECT Version_Tarifas FROM Configuracion WHERE ID = 1')
+        temporadas = Temporada.listar_todas()
+        descuentos = DescuentoEstadia.listar_todos()
+        tarifas = {t.id: t for t in Tarifa.listar_todas()}
+        
+        inicio = date.today()
+        factores = [1.0] * self.dias
+        for temporada in temporadas:
+            i = max(0, (temporada.fecha_desde - inicio).days)
+            j = min(self.dias, (temporada.fecha_hasta - inicio).days + 1)
+            factores[i:j] = [temporada.factor] * max(0, j - i)
+        fin_semana = [(inicio + timedelta(days=i)).weekday() in DIAS_FIN_SEMANA for i in range(self.dias)]
+        
+        with self._lock:
+            self._inicio = inicio
+            self._version = version
+            self._factores = factores
+            self._fin_semana = fin_semana
+            self._temporadas = temporadas
+            self._minimos = [d.noches_minimas for d in descuentos]
+            self._descuentos = [d.descuento_pct for d in descuentos]
+            self._tarifas = tarifas
+            self._acumulados = {}
+    
+    def verificar(self) -> None:
+        """Recarga si cambió el día o si alguna estación modificó las reglas"""
+        version = db.fetch_scalar('SELECT Version_Tarifas FROM Configuracion WHERE ID = 1')
+        if version != self._version or self._inicio != date.today():
+            self.cargar()
+    
+    def tarifas_para(self, tipo_habitacion: str) -> List[Tarifa]:
+        """Planes activos de un tipo de habitación"""
+        with self._lock:
+            return sorted(
+                (t for t in self._tarifas.values() if t.activo and t.tipo_habitacion == tipo_habitacion),
+                key=lambda t: t.nombre
+            )
+    
+    def tarifa(self, tarifa_id: int) -> Optional[Tarifa]:
+        with self._lock:
+            return self._tarifas.get(tarifa_id)
+    
+    def _precio_regla(self, fecha: date, precio_semana: float, precio_fin_semana: float) -> float:
+        """Evalúa las reglas para una noche (fuera del horizonte precalculado)"""
+        factor = 1.0
+        for temporada in self._temporadas:
+            if temporada.fecha_desde <= fecha <= temporada.fecha_hasta:
+                factor = temporada.factor
+        base = precio_fin_semana if fecha.weekday() in DIAS_FIN_SEMANA else precio_semana
+        return round(base * factor, 2)
+    
+    def _acumulado(self, precio_semana: float, precio_fin_semana: float) -> List[float]:
+        """Sumas acumuladas de los precios por noche del par pedido (con el lock tomado)"""
+        clave = (precio_semana, precio_fin_semana)
+        acumulado = self._acumulados.get(clave)
+        if acumulado is None:
+            acumulado = [0.0] * (self.dias + 1)
+            total = 0.0
+            for i, (factor, fin_semana) in enumerate(zip(self._factores, self._fin_semana)):
+                total += round((precio_fin_semana if fin_semana else precio_semana) * factor, 2)
+                acumulado[i + 1] = total
+            self._acumulados[clave] = acumulado
+        return acumulado
+    
+    def cotizar(self, llegada: date, salida: date, precio_base: float,
+                tarifa: Optional[Tarifa] = None, detalle: bool = False) -> Cotizacion:
+        """
+        Cotiza las noches [llegada, salida) con el plan indicado; sin plan se
+        usa el precio de la habitación todas las noches. Con detalle=True
+        se incluye el precio de cada noche.
+        """
+        if self._inicio is None:
+            self.cargar()
+        noches = (salida - llegada).days
+        if noches <= 0:
+            raise ValueError("La fecha de salida debe ser posterior a la de llegada")
+        if tarifa is None:
+            precio_semana = precio_fin_semana = precio_base
+        else:
+            precio_semana, precio_fin_semana = tarifa.precio_semana_usd, tarifa.precio_fin_semana_usd
+        
+        with self._lock:
+            i = (llegada - self._inicio).days
+            j = i + noches
+            if 0 <= i and j <= self.dias:
+                acumulado = self._acumulado(precio_semana, precio_fin_semana)
+                subtotal = acumulado[j] - acumulado[i]
+                precios = [round(acumulado[k + 1] - acumulado[k], 2) for k in range(i, j)] if detalle else []
+            else:
+                precios = [
+                    self._precio_regla(llegada + timedelta(days=k), precio_semana, precio_fin_semana)
+                    for k in range(noches)
+                ]
+                subtotal = sum(precios)
+                if not detalle:
+                    precios = []
+            posicion = bisect_right(self._minimos, noches)
+            descuento_pct = self._descuentos[posicion - 1] if posicion else 0.0
+        
+        subtotal = round(subtotal, 2)
+        descuento = round(subtotal * descuento_pct / 100, 2)
+        return Cotizacion(
+            noches=noches,
+            subtotal_usd=subtotal,
+            descuento_pct=descuento_pct,
+            descuento_usd=descuento,
+            total_usd=round(subtotal - descuento, 2),
+            precios_noche=precios
+        )
+
+# Instancia global del calendario (lazy loading)
+_calendario: Optional[CalendarioPrecios] = None
+
+def get_calendario_precios() -> CalendarioPrecios:
+    """Obtiene el calendario global de precios, verificando que las reglas estén al día"""
+    global _calendario
+    if _calendario is None:
+        calendario = CalendarioPrecios()
+        calendario.cargar()
+        _calendario = calendario
+    else:
+        _calendario.verificar()
+    return _calendario
@@ -1,11 +1,15 @@
 """
 Modelo y lógica de negocio para Transacciones (Pagos/Cargos/Ajustes)
 """
-from dataclasses import dataclass
+import sqlite3
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional, List
 from enum import Enum
-from database.connection import db
+from database.connection import db, PAGOS_CON_REFERENCIA, REFERENCIA_UNICA
+from models.folio import asentar, TipoLinea
+from utils.eventos import bus, PagoRegistrado
+from utils.helpers import normalizar_referencia
 
 class MetodoPago(str, Enum):
     EFECTIVO_USD = 'Efectivo_USD'
@@ -23,6 +27,46 @@ class TipoTransaccion(str, Enum):
     AJUSTE = 'Ajuste'
     REEMBOLSO = 'Reembolso'
 
+# Métodos de pago que llevan referencia (única por método)
+METODOS_CON_REFERENCIA = (
+    MetodoPago.PAGO_MOVIL,
+    MetodoPago.TRANSFERENCIA,
+    MetodoPago.ZELLE,
+    MetodoPago.BINANCE
+)
+
+class ReferenciaEnUso(ValueError):
+    """La referencia ya se registró en otro pago del mismo método"""
+    
+    def __init__(self, metodo: MetodoPago, referencia: str, existente: dict):
+        self.metodo = metodo
+        self.referencia = referencia
+        self.existente = existente
+        fecha = datetime.fromisoformat(str(existente['Fecha_Hora'])).strftime('%d/%m/%Y %H:%M')
+        super().__init__(
+            f"La referencia {referencia} de {metodo.value.replace('_', ' ')} ya se registró "
+            f"el {fecha} (pago #{existente['ID']}: {existente['Concepto'] or 'sin concepto'})"
+        )
+
+def verificar_referencia(metodo: MetodoPago, referencia: str, conn=None) -> None:
+    """
+    Lanza ReferenciaEnUso si la referencia ya está en otro pago del mismo
+    método. Con `conn` la búsqueda se hace dentro de esa transacción.
+    """
+    existente = Transaccion.buscar_por_referencia(metodo, referencia, conn)
+    if existente:
+        raise ReferenciaEnUso(metodo, referencia, existente)
+
+@dataclass
+class ReferenciaDuplicada:
+    """Referencia usada en más de un pago del mismo método"""
+    metodo: MetodoPago
+    referencia_norm: str
+    transaccion_ids: List[int] = field(default_factory=list)
+    total_usd: float = 0.0
+    primera: Optional[datetime] = None
+    ultima: Optional[datetime] = None
+
 @dataclass
 class Transaccion:
     monto_usd: float
@@ -39,15 +83,13 @@ class Transaccion:
     fecha_hora: Optional[datetime] = None
     id: Optional[int] = None
     
+    # Campo relacionado (no persistido directamente)
+    usuario_nombre: str = ""
+    
     @property
     def requiere_referencia(self) -> bool:
         """Determina si el método de pago requiere referencia"""
-        return self.metodo_pago in [
-            MetodoPago.PAGO_MOVIL,
-            MetodoPago.TRANSFERENCIA,
-            MetodoPago.ZELLE,
-            MetodoPago.BINANCE
-        ]
+        return self.metodo_pago in METODOS_CON_REFERENCIA
     
     @property
     def es_efectivo(self) -> bool:
@@ -55,27 +97,15 @@ class Transaccion:
         return self.metodo_pago in [MetodoPago.EFECTIVO_USD, MetodoPago.EFECTIVO_BS]
     
     def guardar(self) -> int:
-        """Guarda la transacción en la base de datos"""
-        if not self.fecha_hora:
-            self.fecha_hora = datetime.now()
-        
-        self.id = db.execute('''
-            INSERT INTO Transacciones (
-                Registro_ID, Huesped_ID, Monto_USD, Tasa_Cambio, Monto_BS,
-                Metodo_Pago, Referencia, Tipo, Concepto, Fecha_Hora, Usuario_ID, Turno_ID
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            self.registro_id, self.huesped_id, self.monto_usd, self.tasa_cambio,
-            self.monto_bs, self.metodo_pago.value, self.referencia,
-            self.tipo.value, self.concepto, self.fecha_hora, self.usuario_id, self.turno_id
-        ))
-        
-        # Si es un pago, actualizar el registro
-        if self.tipo == TipoTransaccion.PAGO and self.registro_id:
-            from models.registro import Registro
-            registro = Registro.buscar_por_id(self.registro_id)
-            if registro:
-                registro.registrar_pago(self.monto_usd)
+        """
+        Guarda la transacción en la base de datos. Un pago de un registro se
+        asienta en su folio en la misma transacción. Un pago con una
+        referencia ya usada en el mismo método lanza ReferenciaEnUso.
+        """
+        with db.transaction() as conn:
+            evento = self.insertar(conn)
+        if evento:
+            bus.publicar(evento)
         
         # Si es un ajuste de saldo de huésped
         if self.tipo == TipoTransaccion.AJUSTE and self.huesped_id:
@@ -86,6 +116,45 @@ class Transaccion:
         
         return self.id
     
+    def insertar(self, conn: sqlite3.Connection) -> Optional[PagoRegistrado]:
+        """
+        Inserta la transacción dentro de la transacción recibida y, si es un
+        pago de un registro, lo asienta en su folio. Retorna el evento del
+        pago para que el llamador lo publique después del commit.
+        """
+        if not self.fecha_hora:
+            self.fecha_hora = datetime.now()
+        if self.tipo == TipoTransaccion.PAGO:
+            verificar_referencia(self.metodo_pago, self.referencia, conn)
+        
+        try:
+            self.id = conn.execute('''
+                INSERT INTO Transacciones (
+                    Registro_ID, Huesped_ID, Monto_USD, Tasa_Cambio, Monto_BS, Metodo_Pago, Referencia,
+                    Referencia_Norm, Tipo, Concepto, Fecha_Hora, Usuario_ID, Turno_ID
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                self.registro_id, self.huesped_id, self.monto_usd, self.tasa_cambio,
+                self.monto_bs, self.metodo_pago.value, self.referencia,
+                normalizar_referencia(self.referencia), self.tipo.value, self.concepto,
+                self.fecha_hora, self.usuario_id, self.turno_id
+            )).lastrowid
+        except sqlite3.IntegrityError:
+            # Otra estación registró la misma referencia después de la verificación
+            verificar_referencia(self.metodo_pago, self.referencia, conn)
+            raise
+        
+        if self.tipo != TipoTransaccion.PAGO or not self.registro_id:
+            return None
+        row = conn.execute(
+            'SELECT Habitacion_Numero FROM Registros WHERE ID = ?', (self.registro_id,)
+        ).fetchone()
+        if not row:
+            return None
+        saldo = asentar(conn, self.registro_id, TipoLinea.PAGO, -self.monto_usd,
+                        self.concepto or "Pago", self.usuario_id, self.id)
+        return PagoRegistrado(self.registro_id, row['Habitacion_Numero'], self.monto_usd, saldo)
+    
     @staticmethod
     def buscar_por_id(transaccion_id: int) -> Optional['Transaccion']:
         """Busca una transacción por su ID"""
@@ -93,44 +162,92 @@ class Transaccion:
         return Transaccion._from_row(row) if row else None
     
     @staticmethod
-    def listar_por_registro(registro_id: int) -> List['Transaccion']:
+    def buscar_por_referencia(metodo: MetodoPago, referencia: str, conn=None) -> Optional[dict]:
+        """
+        Pago anterior con la misma referencia normalizada y método: una sola
+        búsqueda en el índice único. Retorna ID, Fecha_Hora, Monto_USD,
+        Concepto y Registro_ID, o None.
+        """
+        referencia_norm = normalizar_referencia(referencia)
+        if metodo not in METODOS_CON_REFERENCIA or not referencia_norm:
+            return None
+        query = f'''
+            SELECT ID, Fecha_Hora, Monto_USD, Concepto, Registro_ID FROM Transacciones
+            WHERE Metodo_Pago = ? AND Referencia_Norm = ?
+                AND {REFERENCIA_UNICA}
+        '''
+        params = (metodo.value, referencia_norm)
+        if conn is not None:
+            row = conn.execute(query, params).fetchone()
+            return dict(row) if row else None
+        return db.fetch_one(query, params)
+    
+    @staticmethod
+    def listar_referencias_duplicadas() -> List[ReferenciaDuplicada]:
+        """
+        Referencias usadas en más de un pago del mismo método: las que ya
+        existían antes del índice único
+        """
+        rows = db.fetch_all(f'''
+            SELECT Metodo_Pago, Referencia_Norm, GROUP_CONCAT(ID) as IDs,
+                   SUM(Monto_USD) as Total_USD, MIN(Fecha_Hora) as Primera, MAX(Fecha_Hora) as Ultima
+            FROM Transacciones
+            WHERE {PAGOS_CON_REFERENCIA}
+            GROUP BY Metodo_Pago, Referencia_Norm
+            HAVING COUNT(*) > 1
+            ORDER BY Ultima DESC
+        ''')
+        return [
+            ReferenciaDuplicada(
+                metodo=MetodoPago(row['Metodo_Pago']),
+                referencia_norm=row['Referencia_Norm'],
+                transaccion_ids=sorted(int(i) for i in row['IDs'].split(',')),
+                total_usd=row['Total_USD'],
+                primera=datetime.fromisoformat(str(row['Primera'])),
+                ultima=datetime.fromisoformat(str(row['Ultima']))
+            )
+            for row in rows
+        ]
+    
+    @staticmethod
+    def listar_por_registro(registro_id: int, cargadores=None) -> List['Transaccion']:
         """Lista todas las transacciones de un registro"""
         rows = db.fetch_all('''
             SELECT * FROM Transacciones 
             WHERE Registro_ID = ?
             ORDER BY Fecha_Hora DESC
         ''', (registro_id,))
-        return [Transaccion._from_row(row) for row in rows]
+        return Transaccion._con_usuarios(rows, cargadores)
     
     @staticmethod
-    def listar_por_huesped(huesped_id: int) -> List['Transaccion']:
+    def listar_por_huesped(huesped_id: int, cargadores=None) -> List['Transaccion']:
         """Lista todas las transacciones de un huésped"""
         rows = db.fetch_all('''
             SELECT * FROM Transacciones 
             WHERE Huesped_ID = ?
             ORDER BY Fecha_Hora DESC
         ''', (huesped_id,))
-        return [Transaccion._from_row(row) for row in rows]
+        return Transaccion._con_usuarios(rows, cargadores)
     
     @staticmethod
-    def listar_por_turno(turno_id: int) -> List['Transaccion']:
+    def listar_por_turno(turno_id: int, cargadores=None) -> List['Transaccion']:
         """Lista todas las transacciones de un turno"""
         rows = db.fetch_all('''
             SELECT * FROM Transacciones 
             WHERE Turno_ID = ?
             ORDER BY Fecha_Hora DESC
         ''', (turno_id,))
-        return [Transaccion._from_row(row) for row in rows]
+        return Transaccion._con_usuarios(rows, cargadores)
     
     @staticmethod
-    def listar_por_fecha(fecha_desde: datetime, fecha_hasta: datetime) -> List['Transaccion']:
+    def listar_por_fecha(fecha_desde: datetime, fecha_hasta: datetime, cargadores=None) -> List['Transaccion']:
         """Lista transacciones por rango de fechas"""
         rows = db.fetch_all('''
             SELECT * FROM Transacciones 
             WHERE Fecha_Hora BETWEEN ? AND ?
             ORDER BY Fecha_Hora DESC
         ''', (fecha_desde, fecha_hasta))
-        return [Transaccion._from_row(row) for row in rows]
+        return Transaccion._con_usuarios(rows, cargadores)
     
     @staticmethod
     def resumen_por_metodo(turno_id: int) -> dict:
@@ -159,6 +276,18 @@ class Transaccion:
         
         return resumen
     
+    @staticmethod
+    def _con_usuarios(rows: List[dict], cargadores=None) -> List['Transaccion']:
+        """
+        Crea las transacciones y completa el nombre del usuario con una sola
+        consulta para todos (`cargadores` permite reutilizar la caché de la
+        acción en curso)
+        """
+        from models.cargador import Cargadores
+        transacciones = [Transaccion._from_row(row) for row in rows]
+        (cargadores or Cargadores()).nombres_usuario(transacciones)
+        return transacciones
+    
     @staticmethod
     def _from_row(row: dict) -> 'Transaccion':
         """Crea un objeto Transaccion desde una fila de la base de datos"""
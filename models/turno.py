@@ -6,6 +6,7 @@ from datetime import datetime
 from typing import Optional, List
 from enum import Enum
 from database.connection import db
+from utils.eventos import bus, TurnoAbierto, TurnoCerrado
 
 class EstadoTurno(str, Enum):
     ABIERTO = 'Abierto'
@@ -105,6 +106,7 @@ class Turno:
             self.total_pagos_usd, self.total_pagos_bs,
             self.estado.value, observaciones, self.id
         ))
+        bus.publicar(TurnoCerrado(self.id, self.usuario_id))
     
     def guardar(self) -> int:
         """Guarda el turno"""
@@ -130,6 +132,7 @@ class Turno:
                 self.efectivo_usd_apertura, self.efectivo_bs_apertura,
                 self.estado.value, self.observaciones
             ))
+            bus.publicar(TurnoAbierto(self.id, self.usuario_id))
             return self.id
     
     @staticmethod
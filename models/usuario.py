@@ -4,9 +4,10 @@ Modelo y lógica de negocio para Usuarios y Autenticación
 import hashlib
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict
 from enum import Enum
 from database.connection import db
+from models.base import SeguimientoCambios
 
 class RolUsuario(str, Enum):
     ADMIN = 'admin'
@@ -14,7 +15,7 @@ class RolUsuario(str, Enum):
     GERENTE = 'gerente'
 
 @dataclass
-class Usuario:
+class Usuario(SeguimientoCambios):
     username: str
     nombre_completo: str
     rol: RolUsuario
@@ -24,6 +25,16 @@ class Usuario:
     fecha_creacion: Optional[datetime] = None
     id: Optional[int] = None
     
+    _tabla = 'Usuarios'
+    _columnas = {
+        'username': 'Username',
+        'password_hash': 'Password_Hash',
+        'nombre_completo': 'Nombre_Completo',
+        'rol': 'Rol',
+        'activo': 'Activo',
+        'ultimo_acceso': 'Ultimo_Acceso',
+    }
+    
     @property
     def es_admin(self) -> bool:
         return self.rol == RolUsuario.ADMIN
@@ -48,44 +59,32 @@ class Usuario:
     def cambiar_password(self, nueva_password: str) -> None:
         """Cambia la contraseña del usuario"""
         self.password_hash = self.hash_password(nueva_password)
-        db.execute(
-            'UPDATE Usuarios SET Password_Hash = ? WHERE ID = ?',
-            (self.password_hash, self.id)
-        )
+        self._guardar_cambios()
     
     def guardar(self) -> int:
-        """Guarda o actualiza el usuario"""
+        """Guarda el usuario; en una actualización solo escribe los campos modificados"""
         if self.id:
-            db.execute('''
-                UPDATE Usuarios SET
-                    Username = ?,
-                    Nombre_Completo = ?,
-                    Rol = ?,
-                    Activo = ?
-                WHERE ID = ?
-            ''', (self.username, self.nombre_completo, self.rol.value, 
-                  1 if self.activo else 0, self.id))
+            self._guardar_cambios()
             return self.id
         else:
+            self.fecha_creacion = datetime.now()
             self.id = db.execute('''
                 INSERT INTO Usuarios (Username, Password_Hash, Nombre_Completo, Rol, Activo, Fecha_Creacion)
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (self.username, self.password_hash, self.nombre_completo, 
-                  self.rol.value, 1 if self.activo else 0, datetime.now()))
+                  self.rol.value, 1 if self.activo else 0, self.fecha_creacion))
+            self._marcar_limpio()
             return self.id
     
     def registrar_acceso(self) -> None:
         """Registra el último acceso del usuario"""
         self.ultimo_acceso = datetime.now()
-        db.execute(
-            'UPDATE Usuarios SET Ultimo_Acceso = ? WHERE ID = ?',
-            (self.ultimo_acceso, self.id)
-        )
+        self._guardar_cambios()
     
     def desactivar(self) -> None:
         """Desactiva el usuario"""
         self.activo = False
-        db.execute('UPDATE Usuarios SET Activo = 0 WHERE ID = ?', (self.id,))
+        self._guardar_cambios()
     
     @staticmethod
     def autenticar(username: str, password: str) -> Optional['Usuario']:
@@ -102,6 +101,12 @@ class Usuario:
         row = db.fetch_one('SELECT * FROM Usuarios WHERE ID = ?', (usuario_id,))
         return Usuario._from_row(row) if row else None
     
+    @staticmethod
+    def buscar_por_ids(ids) -> Dict[int, 'Usuario']:
+        """Busca varios usuarios con una sola consulta y los retorna por ID"""
+        rows = db.fetch_all_in('SELECT * FROM Usuarios WHERE ID IN ({marcadores})', set(ids))
+        return {row['ID']: Usuario._from_row(row) for row in rows}
+    
     @staticmethod
     def buscar_por_username(username: str) -> Optional['Usuario']:
         """Busca un usuario por su nombre de usuario"""
@@ -123,7 +128,7 @@ class Usuario:
     @staticmethod
     def _from_row(row: dict) -> 'Usuario':
         """Crea un objeto Usuario desde una fila de la base de datos"""
-        return Usuario(
+        usuario = Usuario(
             id=row['ID'],
             username=row['Username'],
             password_hash=row['Password_Hash'],
@@ -133,3 +138,5 @@ class Usuario:
             ultimo_acceso=row['Ultimo_Acceso'],
             fecha_creacion=row['Fecha_Creacion']
         )
+        usuario._marcar_limpio()
+        return usuario
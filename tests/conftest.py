@@ -0,0 +1,33 @@
+"""
+Configuración común de las pruebas: una base de datos temporal para toda
+la sesión. La ruta se fija antes de importar los módulos del proyecto,
+porque la base se abre al importar database.connection.
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+_directorio = tempfile.mkdtemp(prefix='sgh_pruebas_')
+os.environ['SGH_DB_PATH'] = os.path.join(_directorio, 'hotel.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from database.connection import db
+from models.huesped import Huesped
+
+_documentos = itertools.count(10000000)
+
+@pytest.fixture
+def huesped() -> Huesped:
+    """Un huésped nuevo con documento único"""
+    nuevo = Huesped(documento=f"V{next(_documentos)}", nombres="Prueba", apellidos="Huésped")
+    nuevo.guardar()
+    return nuevo
+
+@pytest.fixture
+def habitacion_libre() -> int:
+    """Número de una habitación libre"""
+    numero = db.fetch_scalar("SELECT MIN(Numero) FROM Habitaciones WHERE Estado = 'Libre'")
+    assert numero is not None, "No quedan habitaciones libres para la prueba"
+    return numero
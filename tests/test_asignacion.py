@@ -0,0 +1,45 @@
+"""
+Pruebas del asignador automático de habitaciones
+"""
+from datetime import date, timedelta
+import pytest
+from models.asignacion import AsignadorHabitaciones, FichaHabitacion
+
+def _asignador(fichas):
+    """Asignador con candidatos fijos, sin depender de la matriz de disponibilidad"""
+    asignador = AsignadorHabitaciones()
+    asignador.candidatos = lambda llegada, salida, tipo=None, personas=1: [
+        f for f in fichas if f.capacidad >= personas
+    ]
+    return asignador
+
+LLEGADA = date.today() + timedelta(days=5)
+SALIDA = LLEGADA + timedelta(days=2)
+
+def test_grupo_en_el_bloque_mas_compacto():
+    asignador = _asignador([
+        FichaHabitacion(101, 'Doble', 2, 'Libre', 0),
+        FichaHabitacion(104, 'Doble', 2, 'Libre', 0),
+        FichaHabitacion(201, 'Doble', 2, 'Libre', 0),
+        FichaHabitacion(202, 'Doble', 2, 'Libre', 0),
+        FichaHabitacion(203, 'Doble', 2, 'Libre', 0),
+        FichaHabitacion(301, 'Doble', 2, 'Libre', 0),
+    ])
+    
+    assert asignador.asignar_grupo(3, LLEGADA, SALIDA) == [201, 202, 203]
+    assert asignador.asignar_grupo(2, LLEGADA, SALIDA) == [201, 202]
+    with pytest.raises(ValueError):
+        asignador.asignar_grupo(7, LLEGADA, SALIDA)
+
+def test_a_igual_distancia_prefiere_menos_camas_sobrantes_y_uso_antiguo():
+    asignador = _asignador([
+        FichaHabitacion(101, 'Doble', 4, 'Libre', 10),
+        FichaHabitacion(102, 'Doble', 2, 'Libre', 10),
+        FichaHabitacion(103, 'Doble', 2, 'Libre', 5),
+        FichaHabitacion(104, 'Doble', 2, 'Libre', 1),
+    ])
+    
+    # En 101-102 sobran dos camas; 102-103 y 103-104 empatan y gana el uso más antiguo
+    assert asignador.asignar_grupo(2, LLEGADA, SALIDA, personas=2) == [103, 104]
+    assert asignador.asignar(LLEGADA, SALIDA, personas=2) == 104
+    assert asignador.asignar(LLEGADA, SALIDA, personas=3) == 101
@@ -0,0 +1,32 @@
+"""
+Pruebas de la auditoría nocturna (avanza la fecha de negocio: se corre una
+sola vez por sesión)
+"""
+from datetime import datetime, timedelta
+from database.connection import db
+from models.auditoria import ejecutar_auditoria_nocturna
+from models.registro import Registro
+from models.tarifas import Tarifa
+
+def test_noches_adicionales_con_el_plan_del_checkin(huesped, habitacion_libre):
+    habitacion = db.fetch_one('SELECT Tipo, Precio_USD FROM Habitaciones WHERE Numero = ?',
+                              (habitacion_libre,))
+    precio_habitacion = habitacion['Precio_USD']
+    tarifa = Tarifa(nombre="Corporativa prueba", tipo_habitacion=habitacion['Tipo'],
+                    precio_semana_usd=precio_habitacion + 7, precio_fin_semana_usd=precio_habitacion + 7)
+    tarifa.guardar()
+    # Sin noches facturadas: la auditoría cobra la de hoy como adicional
+    registro = Registro(huesped_principal_id=huesped.id, habitacion_numero=habitacion_libre,
+                        fecha_salida_prevista=datetime.now() + timedelta(days=3),
+                        usuario_checkin_id=1, tarifa_id=tarifa.id)
+    registro.guardar()
+    
+    resumen = ejecutar_auditoria_nocturna(usuario_id=1)
+    
+    cargo = db.fetch_one('SELECT Monto_USD, Facturado FROM Cargos_Noche WHERE Registro_ID = ?',
+                         (registro.id,))
+    assert cargo == {'Monto_USD': precio_habitacion + 7, 'Facturado': 1}
+    guardado = Registro.buscar_por_id(registro.id)
+    assert guardado.total_habitacion_usd == precio_habitacion + 7
+    assert guardado.noches_facturadas == 1
+    assert resumen.cargo_adicional_usd >= precio_habitacion + 7
@@ -0,0 +1,30 @@
+"""
+Pruebas del monitor de cambios entre estaciones
+"""
+import sqlite3
+from database.connection import DB_PATH, db
+from models.cambios import MonitorCambios, cursor_actual
+from utils.eventos import bus, HabitacionCambiada
+
+def test_monitor_no_republica_los_cambios_propios(habitacion_libre):
+    publicados = []
+    def recibir(evento: HabitacionCambiada):
+        publicados.append(evento.numero)
+    bus.suscribir(HabitacionCambiada, recibir)
+    monitor = MonitorCambios()
+    monitor._ultimo_id = cursor_actual()
+    conn = sqlite3.connect(DB_PATH)
+    
+    # Cambio de esta estación: ya se publicó al guardarlo
+    db.execute_update('UPDATE Habitaciones SET Notas = ? WHERE Numero = ?', ('propia', habitacion_libre))
+    monitor._procesar(conn)
+    assert habitacion_libre not in publicados
+    
+    # Cambio de otra estación: se publica una vez
+    otra = sqlite3.connect(DB_PATH)
+    otra.execute('UPDATE Habitaciones SET Notas = ? WHERE Numero = ?', ('otra', habitacion_libre))
+    otra.commit()
+    otra.close()
+    monitor._procesar(conn)
+    conn.close()
+    assert publicados.count(habitacion_libre) == 1
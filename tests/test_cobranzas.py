@@ -0,0 +1,42 @@
+"""
+Pruebas de la antigüedad de la cartera por cobrar
+"""
+from datetime import date, timedelta
+from database.connection import db
+from models.cobranzas import calcular_antiguedad, listar_deudores, tramos_pendientes
+
+def _fecha_negocio() -> date:
+    valor = db.fetch_scalar('SELECT Fecha_Negocio FROM Configuracion WHERE ID = 1')
+    return date.fromisoformat(str(valor)[:10]) if valor else date.today()
+
+def test_antiguedad_reparte_los_tramos_por_dias(huesped):
+    corte = _fecha_negocio()
+    antes = calcular_antiguedad(corte)
+    
+    huesped.ajustar_saldo(-100.0)
+    db.execute_update('UPDATE Deudas_Huesped SET Fecha_Origen = ? WHERE Huesped_ID = ?',
+                      ((corte - timedelta(days=45)).isoformat(), huesped.id))
+    huesped.ajustar_saldo(-30.0)
+    
+    despues = calcular_antiguedad(corte)
+    diferencias = [round(d - a, 2) for a, d in zip(antes.montos, despues.montos)]
+    assert diferencias == [30.0, 100.0, 0.0, 0.0]
+    assert despues.deudores == antes.deudores + 1
+    
+    deudor = next(d for d in listar_deudores(corte, limite=1000) if d.huesped_id == huesped.id)
+    assert deudor.montos == [30.0, 100.0, 0.0, 0.0]
+    assert deudor.fecha_mas_antigua == corte - timedelta(days=45)
+
+def test_pago_cancela_primero_el_tramo_mas_antiguo(huesped):
+    corte = _fecha_negocio()
+    huesped.ajustar_saldo(-100.0)
+    db.execute_update('UPDATE Deudas_Huesped SET Fecha_Origen = ? WHERE Huesped_ID = ?',
+                      ((corte - timedelta(days=95)).isoformat(), huesped.id))
+    huesped.ajustar_saldo(-30.0)
+    
+    huesped.ajustar_saldo(60.0)
+    
+    assert [(t.fecha_origen, t.saldo_usd) for t in tramos_pendientes(huesped.id)] == [
+        (corte - timedelta(days=95), 40.0),
+        (corte, 30.0),
+    ]
@@ -0,0 +1,59 @@
+"""
+Pruebas de la conciliación de pagos contra extractos bancarios
+"""
+import io
+import itertools
+from datetime import date
+from models.conciliacion import EstadoMovimiento, importar_extracto_csv
+from models.transaccion import Transaccion, MetodoPago, TipoTransaccion
+
+_referencias = itertools.count(700000)
+
+def _pago_zelle(referencia: str, monto: float) -> int:
+    return Transaccion(
+        monto_usd=monto, tasa_cambio=36.0, monto_bs=monto * 36.0, metodo_pago=MetodoPago.ZELLE,
+        tipo=TipoTransaccion.PAGO, usuario_id=1, referencia=referencia, concepto="Prueba"
+    ).guardar()
+
+def _extracto(*filas) -> io.StringIO:
+    hoy = date.today().strftime('%d/%m/%Y')
+    return io.StringIO('Fecha,Referencia,Monto\n' + ''.join(f'{hoy},{ref},{monto}\n' for ref, monto in filas))
+
+def test_extracto_reimportado_queda_duplicado():
+    exacto, distinto, ajeno = (str(next(_referencias)) for _ in range(3))
+    pago_id = _pago_zelle(exacto, 25.0)
+    _pago_zelle(distinto, 10.0)
+    filas = [(exacto, '25.00'), (distinto, '15.00'), (ajeno, '5.00'), (exacto, '25.00')]
+    
+    primero = importar_extracto_csv(_extracto(*filas), 'Zelle')
+    assert [m.estado for m in primero.movimientos] == [
+        EstadoMovimiento.CONCILIADO, EstadoMovimiento.DIFERENCIA,
+        EstadoMovimiento.SIN_PAGO, EstadoMovimiento.DUPLICADO,
+    ]
+    assert primero.movimientos[0].transaccion_id == pago_id
+    assert primero.movimientos[3].nota == "Repetido en el extracto"
+    assert pago_id not in [p.id for p in primero.pagos_sin_movimiento]
+    
+    # El mismo extracto otra vez no vuelve a contar el pago ya conciliado
+    segundo = importar_extracto_csv(_extracto(*filas), 'Zelle')
+    assert [m.estado for m in segundo.movimientos] == [
+        EstadoMovimiento.DUPLICADO, EstadoMovimiento.DIFERENCIA,
+        EstadoMovimiento.SIN_PAGO, EstadoMovimiento.DUPLICADO,
+    ]
+    assert segundo.movimientos[0].nota == "Ya conciliado en un extracto anterior"
+    assert segundo.conciliados == []
+
+def test_lineas_invalidas_se_rechazan():
+    resultado = importar_extracto_csv(io.StringIO(
+        'Fecha,Referencia,Monto\n'
+        'ayer,123,10\n'
+        f'{date.today().isoformat()},,10\n'
+        f'{date.today().isoformat()},{next(_referencias)},diez\n'
+    ), 'Zelle')
+    
+    assert resultado.movimientos == []
+    assert resultado.rechazados == [
+        ("Línea 2", "Fecha inválida"),
+        ("Línea 3", "Sin referencia"),
+        ("Línea 4", "Monto inválido"),
+    ]
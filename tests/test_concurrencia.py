@@ -0,0 +1,82 @@
+"""
+Prueba de carga con varios procesos, cada uno como una estación distinta
+sobre la misma base temporal (los procesos heredan SGH_DB_PATH)
+"""
+import multiprocessing
+from datetime import datetime, timedelta
+from database.connection import db
+from models.base import ConflictoConcurrencia
+from models.folio import saldo_folio
+from models.huesped import Huesped
+from models.registro import Registro
+
+ESTACIONES = 8
+OPERACIONES = 20
+
+def _ejecutar(funcion, argumentos):
+    """Corre `funcion` en un proceso por estación y retorna sus resultados"""
+    with multiprocessing.get_context('spawn').Pool(ESTACIONES) as pool:
+        return pool.starmap(funcion, argumentos)
+
+def _checkin(huesped_id: int, habitacion: int) -> str:
+    registro = Registro(
+        huesped_principal_id=huesped_id, habitacion_numero=habitacion,
+        fecha_salida_prevista=datetime.now() + timedelta(days=1),
+        total_habitacion_usd=30.0, noches_facturadas=1, usuario_checkin_id=1
+    )
+    try:
+        registro.guardar()
+    except ConflictoConcurrencia:
+        return 'conflicto'
+    return 'ocupada'
+
+def _pagar(registro_id: int) -> str:
+    try:
+        for _ in range(OPERACIONES):
+            Registro.buscar_por_id(registro_id).registrar_pago(1.0, "Prueba", 1)
+    except Exception as ex:
+        return type(ex).__name__
+    return 'ok'
+
+def _abonar(huesped_id: int) -> str:
+    """Abona al saldo del huésped releyéndolo cuando otra estación se adelanta"""
+    try:
+        for _ in range(OPERACIONES):
+            while True:
+                try:
+                    Huesped.buscar_por_id(huesped_id).ajustar_saldo(1.0)
+                    break
+                except ConflictoConcurrencia:
+                    pass
+    except Exception as ex:
+        return type(ex).__name__
+    return 'ok'
+
+def test_una_sola_estacion_ocupa_la_habitacion(huesped, habitacion_libre):
+    resultados = _ejecutar(_checkin, [(huesped.id, habitacion_libre)] * ESTACIONES)
+    
+    assert sorted(resultados) == ['conflicto'] * (ESTACIONES - 1) + ['ocupada']
+    assert db.fetch_scalar('SELECT COUNT(*) FROM Registros WHERE Habitacion_Numero = ? AND Estado = ?',
+                           (habitacion_libre, 'Activo')) == 1
+
+def test_pagos_simultaneos_no_se_pierden(huesped, habitacion_libre):
+    registro = Registro(
+        huesped_principal_id=huesped.id, habitacion_numero=habitacion_libre,
+        fecha_salida_prevista=datetime.now() + timedelta(days=1),
+        total_habitacion_usd=500.0, noches_facturadas=1, usuario_checkin_id=1
+    )
+    registro.guardar()
+    
+    resultados = _ejecutar(_pagar, [(registro.id,)] * ESTACIONES)
+    
+    # Ningún ConflictoConcurrencia llega a la estación que paga
+    assert resultados == ['ok'] * ESTACIONES
+    guardado = Registro.buscar_por_id(registro.id)
+    assert guardado.total_pagado_usd == ESTACIONES * OPERACIONES
+    assert guardado.saldo_pendiente_usd == saldo_folio(registro.id) == 500.0 - ESTACIONES * OPERACIONES
+
+def test_ediciones_con_version_no_pierden_cambios(huesped):
+    resultados = _ejecutar(_abonar, [(huesped.id,)] * ESTACIONES)
+    
+    assert resultados == ['ok'] * ESTACIONES
+    assert Huesped.buscar_por_id(huesped.id).saldo_acumulado == ESTACIONES * OPERACIONES
@@ -0,0 +1,45 @@
+"""
+Pruebas de la matriz de disponibilidad
+"""
+from datetime import date, timedelta
+from models.disponibilidad import MatrizDisponibilidad
+from models.reserva import Reserva
+
+def _reservar(huesped, habitacion: int, desde: int, hasta: int) -> Reserva:
+    """Reserva la habitación entre dos días contados desde hoy"""
+    reserva = Reserva(habitacion_numero=habitacion, huesped_id=huesped.id,
+                      fecha_llegada=date.today() + timedelta(days=desde),
+                      fecha_salida=date.today() + timedelta(days=hasta))
+    reserva.guardar()
+    return reserva
+
+def test_reserva_ocupa_solo_sus_noches(huesped, habitacion_libre):
+    matriz = MatrizDisponibilidad(dias=30)
+    matriz.cargar()
+    antes = matriz.libres_por_noche(date.today() + timedelta(days=9), 5)
+    
+    _reservar(huesped, habitacion_libre, 10, 13)
+    matriz.cargar()
+    
+    llegada = date.today() + timedelta(days=10)
+    assert habitacion_libre not in matriz.habitaciones_libres(llegada, llegada + timedelta(days=3))
+    assert habitacion_libre in matriz.habitaciones_libres(llegada + timedelta(days=3), llegada + timedelta(days=5))
+    # La noche de salida vuelve a quedar libre
+    assert matriz.libres_por_noche(date.today() + timedelta(days=9), 5) == [
+        antes[0], antes[1] - 1, antes[2] - 1, antes[3] - 1, antes[4]
+    ]
+    fila = next(f for f in matriz.grilla(llegada - timedelta(days=1), 5) if f.numero == habitacion_libre)
+    assert fila.libres == [True, False, False, False, True]
+    assert matriz.libres_por_tipo(llegada)[fila.tipo] == matriz.libres_por_noche(llegada, 1, fila.tipo)[0]
+
+def test_cancelar_reserva_libera_las_noches_sin_recargar(huesped, habitacion_libre):
+    matriz = MatrizDisponibilidad(dias=30)
+    matriz.suscribir()
+    matriz.cargar()
+    reserva = _reservar(huesped, habitacion_libre, 20, 22)
+    llegada = date.today() + timedelta(days=20)
+    
+    # El evento de la reserva deja la habitación pendiente de releer
+    assert habitacion_libre not in matriz.habitaciones_libres(llegada, llegada + timedelta(days=2))
+    reserva.cancelar()
+    assert habitacion_libre in matriz.habitaciones_libres(llegada, llegada + timedelta(days=2))
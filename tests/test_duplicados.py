@@ -0,0 +1,28 @@
+"""
+Pruebas de la detección de huéspedes duplicados
+"""
+from models.duplicados import detectar_duplicados
+from models.huesped import Huesped
+from utils.similitud import claves_bloqueo, difieren_en_un_caracter
+
+def _huesped(documento: str, nombres: str, apellidos: str) -> int:
+    return Huesped(documento=documento, nombres=nombres, apellidos=apellidos).guardar()
+
+def test_un_error_de_tipeo_conserva_una_clave_de_bloqueo():
+    assert set(claves_bloqueo('4718293')) & set(claves_bloqueo('4718239'))
+    assert set(claves_bloqueo('4718293')) & set(claves_bloqueo('5718293'))
+    assert difieren_en_un_caracter('4718293', '4718239')
+    assert not difieren_en_un_caracter('4718293', '4781239')
+
+def test_detecta_documentos_iguales_o_con_un_error():
+    original = _huesped("V-4.718.293", "José", "Pérez")
+    tipeado = _huesped("4718239", "Jose", "Perez")
+    mismo = _huesped("V4718293", "JOSE", "PEREZ")
+    otro = _huesped("9182736", "Ana", "Gómez")
+    
+    pares = {(c.huesped_id_a, c.huesped_id_b): c for c in detectar_duplicados()}
+    
+    assert pares[(original, tipeado)].motivo == 'Documento y nombre similares'
+    assert pares[(original, mismo)].motivo == 'Mismo documento'
+    assert pares[(original, mismo)].puntaje == 1.0
+    assert not [par for par in pares if otro in par]
@@ -0,0 +1,82 @@
+"""
+Pruebas de la fusión de huéspedes duplicados y del índice de documentos
+"""
+import itertools
+import sqlite3
+from datetime import date, timedelta
+from database.connection import DB_PATH, db
+from models.cambios import MonitorCambios, cursor_actual
+from models.huesped import Huesped, IndiceDocumentos, get_indice_documentos
+from models.registro import Registro
+from models.reserva import Reserva
+
+_documentos = itertools.count(20000000)
+
+def _huesped(**datos) -> Huesped:
+    nuevo = Huesped(documento=f"V{next(_documentos)}", nombres="Duplicado", apellidos="Prueba", **datos)
+    nuevo.guardar()
+    return nuevo
+
+def test_fusion_suma_saldos_y_reasigna_registros(huesped, habitacion_libre):
+    duplicado = _huesped(telefono="0414-5550000")
+    registro = Registro(huesped_principal_id=duplicado.id, habitacion_numero=habitacion_libre,
+                        usuario_checkin_id=1)
+    registro.guardar()
+    duplicado.ajustar_saldo(-20.0)
+    huesped.ajustar_saldo(5.0)
+    
+    huesped.fusionar(duplicado)
+    
+    fusionado = Huesped.buscar_por_id(huesped.id)
+    assert fusionado.saldo_acumulado == -15.0
+    assert fusionado.telefono == "0414-5550000"
+    assert Registro.buscar_por_id(registro.id).huesped_principal_id == huesped.id
+    assert db.fetch_scalar('SELECT TOTAL(Saldo_USD) FROM Deudas_Huesped WHERE Huesped_ID = ?',
+                           (huesped.id,)) == 15.0
+
+def test_fusion_reasigna_las_reservas(huesped, habitacion_libre):
+    duplicado = _huesped()
+    llegada = date.today() + timedelta(days=300)
+    reserva = Reserva(habitacion_numero=habitacion_libre, huesped_id=duplicado.id,
+                      fecha_llegada=llegada, fecha_salida=llegada + timedelta(days=2))
+    reserva.guardar()
+    
+    huesped.fusionar(duplicado)
+    
+    assert Huesped.buscar_por_id(duplicado.id) is None
+    assert Reserva.buscar_por_id(reserva.id).huesped_id == huesped.id
+    assert reserva.id in [r.id for r in Reserva.listar_por_huesped(huesped.id)]
+    assert reserva.id in [r.id for r in Reserva.listar_confirmadas(llegada, llegada + timedelta(days=1))]
+
+def test_indice_ve_los_huespedes_de_otra_estacion():
+    indice = get_indice_documentos()
+    documento = f"E{next(_documentos)}"
+    monitor = MonitorCambios()
+    monitor._ultimo_id = cursor_actual()
+    conn = sqlite3.connect(DB_PATH)
+    
+    # Otra estación crea y luego renombra un huésped con su propia conexión
+    otra = sqlite3.connect(DB_PATH)
+    huesped_id = otra.execute(
+        "INSERT INTO Huespedes (Documento, Nombres, Apellidos) VALUES (?, 'Otra', 'Estación')",
+        (documento,)
+    ).lastrowid
+    otra.commit()
+    monitor._procesar(conn)
+    assert [s.id for s in indice.buscar_prefijo(documento)] == [huesped_id]
+    
+    otra.execute("UPDATE Huespedes SET Nombres = 'Renombrado' WHERE ID = ?", (huesped_id,))
+    otra.commit()
+    otra.close()
+    monitor._procesar(conn)
+    conn.close()
+    assert indice.buscar_prefijo(documento)[0].nombre_completo == "Renombrado Estación"
+
+def test_indice_con_documentos_normalizados_iguales():
+    documento = str(next(_documentos))
+    ids = {Huesped(documento=f"V-{documento}", nombres="Igual").guardar(),
+           Huesped(documento=f"V{documento}", nombres="Igual").guardar()}
+    indice = IndiceDocumentos()
+    indice.cargar()
+    
+    assert {s.id for s in indice.buscar_prefijo(documento)} == ids
@@ -0,0 +1,58 @@
+"""
+Pruebas de la verificación de integridad de las cuentas
+"""
+from datetime import datetime, timedelta
+from database.connection import db
+from models.folio import saldo_folio
+from models.integridad import TipoDiscrepancia, verificar_integridad
+from models.registro import Registro
+
+def _registro(huesped, habitacion) -> Registro:
+    registro = Registro(
+        huesped_principal_id=huesped.id, habitacion_numero=habitacion,
+        fecha_salida_prevista=datetime.now() + timedelta(days=1),
+        total_habitacion_usd=30.0, noches_facturadas=1, usuario_checkin_id=1
+    )
+    registro.guardar()
+    return registro
+
+def test_repara_pago_sin_linea_en_el_folio(huesped, habitacion_libre):
+    registro = _registro(huesped, habitacion_libre)
+    # Pago guardado por fuera de la aplicación, sin asentar en el folio
+    pago_id = db.execute('''
+        INSERT INTO Transacciones (Registro_ID, Huesped_ID, Monto_USD, Tasa_Cambio, Monto_BS,
+                                   Metodo_Pago, Tipo, Concepto, Fecha_Hora, Usuario_ID)
+        VALUES (?, ?, 10.0, 36.0, 360.0, 'Efectivo_USD', 'Pago', 'Pago externo', ?, 1)
+    ''', (registro.id, huesped.id, datetime.now()))
+    
+    resultado = verificar_integridad(reparar=True)
+    
+    discrepancia = next(d for d in resultado.discrepancias if d.transaccion_id == pago_id)
+    assert discrepancia.tipo == TipoDiscrepancia.PAGO_SIN_FOLIO
+    assert discrepancia.registro_id == registro.id
+    assert discrepancia.reparada
+    guardado = Registro.buscar_por_id(registro.id)
+    assert guardado.total_pagado_usd == 10.0
+    assert guardado.saldo_pendiente_usd == saldo_folio(registro.id) == 20.0
+    
+    # La corrida siguiente ya no lo encuentra
+    siguiente = verificar_integridad()
+    assert not [d for d in siguiente.discrepancias if d.registro_id == registro.id]
+
+def test_repara_totales_desde_el_folio(huesped, habitacion_libre):
+    registro = _registro(huesped, habitacion_libre)
+    registro.registrar_pago(5.0, "Prueba", 1)
+    db.execute_update('UPDATE Registros SET Total_Pagado_USD = 50.0 WHERE ID = ?', (registro.id,))
+    
+    verificar_integridad(reparar=True)
+    db.execute_update('UPDATE Registros SET Total_Pagado_USD = 50.0 WHERE ID = ?', (registro.id,))
+    resultado = verificar_integridad()
+    
+    # Solo se revisan los modificados desde la corrida anterior y los que quedaron pendientes
+    assert not resultado.completa
+    assert resultado.registros_revisados < db.fetch_scalar('SELECT COUNT(*) FROM Registros')
+    totales = [d for d in resultado.por_tipo(TipoDiscrepancia.TOTALES) if d.registro_id == registro.id]
+    assert [(d.registrado, d.esperado) for d in totales] == [(50.0, 5.0)]
+    
+    verificar_integridad(reparar=True)
+    assert Registro.buscar_por_id(registro.id).total_pagado_usd == 5.0
@@ -0,0 +1,54 @@
+"""
+Pruebas de la creación de registros y la apertura de su folio
+"""
+from datetime import datetime, timedelta
+from database.connection import db
+from models.folio import saldo_folio
+from models.huesped import Huesped
+from models.registro import Registro
+
+def _crear_registro(huesped, habitacion, **totales) -> Registro:
+    registro = Registro(
+        huesped_principal_id=huesped.id,
+        habitacion_numero=habitacion,
+        fecha_salida_prevista=datetime.now() + timedelta(days=2),
+        noches_facturadas=2,
+        usuario_checkin_id=1,
+        **totales
+    )
+    registro.guardar()
+    return registro
+
+def test_saldo_de_registro_nuevo_es_el_del_folio(huesped, habitacion_libre):
+    registro = _crear_registro(huesped, habitacion_libre, total_habitacion_usd=50.0)
+    
+    guardado = db.fetch_scalar('SELECT Saldo_Pendiente_USD FROM Registros WHERE ID = ?', (registro.id,))
+    assert saldo_folio(registro.id) == 50.0
+    assert guardado == saldo_folio(registro.id)
+    assert registro.saldo_pendiente_usd == guardado
+
+def test_saldo_de_registro_nuevo_con_deuda_y_pago(huesped, habitacion_libre):
+    registro = _crear_registro(huesped, habitacion_libre, total_habitacion_usd=80.0,
+                               total_extras_usd=15.0, total_pagado_usd=40.0)
+    
+    guardado = Registro.buscar_por_id(registro.id).saldo_pendiente_usd
+    assert guardado == saldo_folio(registro.id) == 55.0
+
+def test_deuda_anterior_pasa_al_folio_sin_pisar_otra_estacion(huesped, habitacion_libre):
+    huesped.ajustar_saldo(-25.0)
+    # Otra estación suma deuda después de que se leyó el huésped
+    Huesped.buscar_por_id(huesped.id).ajustar_saldo(-10.0)
+    
+    _crear_registro(huesped, habitacion_libre, total_habitacion_usd=50.0,
+                    total_extras_usd=abs(huesped.saldo_acumulado))
+    
+    assert Huesped.buscar_por_id(huesped.id).saldo_acumulado == -10.0
+
+def test_saldo_a_favor_pasa_al_folio(huesped, habitacion_libre):
+    huesped.ajustar_saldo(70.0)
+    
+    registro = _crear_registro(huesped, habitacion_libre, total_habitacion_usd=50.0,
+                               total_descuentos_usd=huesped.saldo_acumulado)
+    
+    assert Huesped.buscar_por_id(huesped.id).saldo_acumulado == 0.0
+    assert saldo_folio(registro.id) == -20.0
@@ -0,0 +1,51 @@
+"""
+Pruebas del calendario de precios
+"""
+from datetime import date, timedelta
+from models.tarifas import CalendarioPrecios, DescuentoEstadia, Tarifa, Temporada, DIAS_FIN_SEMANA
+
+def test_cotiza_fin_de_semana_y_temporada():
+    tarifa = Tarifa(nombre="Fin de semana prueba", tipo_habitacion="Prueba",
+                    precio_semana_usd=100.0, precio_fin_semana_usd=150.0)
+    tarifa.guardar()
+    desde = date.today() + timedelta(days=200)
+    temporada = Temporada(nombre="Alta prueba", fecha_desde=desde + timedelta(days=2),
+                          fecha_hasta=desde + timedelta(days=4), ajuste_pct=20.0)
+    temporada.guardar()
+    try:
+        calendario = CalendarioPrecios()
+        calendario.cargar()
+        cotizacion = calendario.cotizar(desde, desde + timedelta(days=7), 0.0, tarifa, detalle=True)
+        
+        esperados = []
+        for k in range(7):
+            noche = desde + timedelta(days=k)
+            base = 150.0 if noche.weekday() in DIAS_FIN_SEMANA else 100.0
+            esperados.append(round(base * (1.2 if 2 <= k <= 4 else 1.0), 2))
+        assert cotizacion.precios_noche == esperados
+        assert cotizacion.total_usd == round(sum(esperados), 2)
+        
+        # Fuera del horizonte se evalúan las reglas noche por noche con el mismo resultado
+        corto = CalendarioPrecios(dias=10)
+        corto.cargar()
+        assert corto.cotizar(desde, desde + timedelta(days=7), 0.0, tarifa, detalle=True) == cotizacion
+    finally:
+        temporada.eliminar()
+
+def test_descuento_por_duracion_se_detecta_por_version():
+    calendario = CalendarioPrecios()
+    calendario.cargar()
+    llegada = date.today() + timedelta(days=30)
+    assert calendario.cotizar(llegada, llegada + timedelta(days=6), 50.0).descuento_pct == 0.0
+    
+    descuento = DescuentoEstadia(noches_minimas=5, descuento_pct=10.0)
+    descuento.guardar()
+    try:
+        calendario.verificar()
+        cotizacion = calendario.cotizar(llegada, llegada + timedelta(days=6), 50.0)
+        assert cotizacion.subtotal_usd == 300.0
+        assert cotizacion.descuento_pct == 10.0
+        assert cotizacion.total_usd == 270.0
+        assert calendario.cotizar(llegada, llegada + timedelta(days=4), 50.0).descuento_pct == 0.0
+    finally:
+        descuento.eliminar()
@@ -0,0 +1,111 @@
+"""
+Pruebas de los pagos: referencias únicas de los pagos electrónicos y
+pagos guardados junto con el check-in o el checkout
+"""
+import itertools
+from datetime import datetime, timedelta
+import pytest
+from database.connection import db, REFERENCIA_UNICA
+from models.base import ConflictoConcurrencia
+from models.folio import saldo_folio
+from models.registro import Registro, EstadoRegistro
+from models.transaccion import Transaccion, MetodoPago, TipoTransaccion, ReferenciaEnUso
+
+_referencias = itertools.count(900000)
+
+def _pago(referencia: str, metodo: MetodoPago = MetodoPago.PAGO_MOVIL) -> Transaccion:
+    return Transaccion(
+        monto_usd=10.0, tasa_cambio=36.0, monto_bs=360.0, metodo_pago=metodo,
+        tipo=TipoTransaccion.PAGO, usuario_id=1, referencia=referencia, concepto="Prueba"
+    )
+
+def _registro(huesped, habitacion) -> Registro:
+    return Registro(
+        huesped_principal_id=huesped.id, habitacion_numero=habitacion,
+        fecha_salida_prevista=datetime.now() + timedelta(days=1),
+        total_habitacion_usd=30.0, noches_facturadas=1, usuario_checkin_id=1
+    )
+
+def test_indice_unico_usa_la_condicion_compartida():
+    sql = db.fetch_scalar(
+        "SELECT sql FROM sqlite_master WHERE name = 'idx_transacciones_referencia_unica'"
+    )
+    assert sql.strip().endswith(REFERENCIA_UNICA)
+
+def test_referencia_repetida_se_rechaza():
+    referencia = str(next(_referencias))
+    _pago(f"000{referencia}").guardar()
+    
+    with pytest.raises(ReferenciaEnUso):
+        _pago(f"REF-{referencia}").guardar()
+    # La misma referencia en otro método no choca
+    assert _pago(referencia, MetodoPago.ZELLE).guardar()
+
+def test_busqueda_por_referencia_usa_el_indice_unico():
+    plan = db.fetch_all(f'''
+        EXPLAIN QUERY PLAN
+        SELECT ID FROM Transacciones
+        WHERE Metodo_Pago = ? AND Referencia_Norm = ? AND {REFERENCIA_UNICA}
+    ''', ('Pago_Movil', '1'))
+    assert 'idx_transacciones_referencia_unica' in plan[0]['detail']
+
+def test_checkin_con_referencia_usada_no_guarda_nada(huesped, habitacion_libre):
+    referencia = str(next(_referencias))
+    _pago(referencia).guardar()
+    registro = _registro(huesped, habitacion_libre)
+    pagos = [_pago(str(next(_referencias)), MetodoPago.ZELLE), _pago(referencia)]
+    
+    with pytest.raises(ReferenciaEnUso):
+        registro.guardar(pagos)
+    assert registro.id is None
+    assert not db.fetch_scalar('SELECT COUNT(*) FROM Registros WHERE Huesped_Principal_ID = ?',
+                               (huesped.id,))
+    assert db.fetch_scalar('SELECT Estado FROM Habitaciones WHERE Numero = ?',
+                           (habitacion_libre,)) == 'Libre'
+    assert not db.fetch_scalar('SELECT COUNT(*) FROM Transacciones WHERE Referencia = ?',
+                               (pagos[0].referencia,))
+
+def test_checkin_asienta_los_pagos_en_el_folio(huesped, habitacion_libre):
+    registro = _registro(huesped, habitacion_libre)
+    registro.guardar([_pago(str(next(_referencias))), _pago(str(next(_referencias)))])
+    
+    guardado = Registro.buscar_por_id(registro.id)
+    assert guardado.total_pagado_usd == registro.total_pagado_usd == 20.0
+    assert guardado.saldo_pendiente_usd == saldo_folio(registro.id) == 10.0
+
+def test_checkout_con_conflicto_no_guarda_los_pagos(huesped, habitacion_libre):
+    registro = _registro(huesped, habitacion_libre)
+    registro.guardar()
+    # Otra estación aplica un descuento después de que se leyó el registro
+    Registro.buscar_por_id(registro.id).aplicar_descuento(5.0, usuario_id=1)
+    pagos = [_pago(str(next(_referencias)))]
+    
+    with pytest.raises(ConflictoConcurrencia):
+        registro.realizar_checkout(1, pagos)
+    assert pagos[0].id is None
+    assert not db.fetch_scalar('SELECT COUNT(*) FROM Transacciones WHERE Registro_ID = ?',
+                               (registro.id,))
+
+def test_checkout_guarda_pagos_y_cierra(huesped, habitacion_libre):
+    registro = _registro(huesped, habitacion_libre)
+    registro.guardar()
+    
+    registro.realizar_checkout(1, [_pago(str(next(_referencias))), _pago(str(next(_referencias)))])
+    
+    guardado = Registro.buscar_por_id(registro.id)
+    assert guardado.estado == EstadoRegistro.CERRADO
+    assert guardado.total_pagado_usd == 20.0
+    assert saldo_folio(registro.id) == 10.0
+
+def test_checkout_con_referencia_usada_no_cierra(huesped, habitacion_libre):
+    registro = _registro(huesped, habitacion_libre)
+    registro.guardar()
+    referencia = str(next(_referencias))
+    _pago(referencia).guardar()
+    
+    with pytest.raises(ReferenciaEnUso):
+        registro.realizar_checkout(1, [_pago(str(next(_referencias))), _pago(referencia)])
+    guardado = Registro.buscar_por_id(registro.id)
+    assert guardado.estado == EstadoRegistro.ACTIVO
+    assert guardado.total_pagado_usd == 0.0
+    assert saldo_folio(registro.id) == 30.0
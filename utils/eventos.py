@@ -0,0 +1,116 @@
+"""
+Bus de eventos de dominio dentro del proceso
+
+Los modelos publican eventos después de confirmar sus cambios en la base de
+datos y las vistas se suscriben para actualizar solo los controles
+afectados, en lugar de reconstruirse completas.
+"""
+import logging
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class HabitacionCambiada:
+    """Una habitación cambió de estado"""
+    numero: int
+    estado: str
+
+@dataclass(frozen=True)
+class PagoRegistrado:
+    """Se registró un pago en un registro"""
+    registro_id: int
+    habitacion_numero: int
+    monto_usd: float
+    saldo_pendiente_usd: float
+
+@dataclass(frozen=True)
+class CargoRegistrado:
+    """Cambió el total de un registro por un extra o un descuento"""
+    registro_id: int
+    habitacion_numero: int
+    monto_usd: float
+    saldo_pendiente_usd: float
+
+@dataclass(frozen=True)
+class ReservaCambiada:
+    """Se creó, modificó o canceló una reserva"""
+    reserva_id: int
+    habitacion_numero: int
+    estado: str
+
+@dataclass(frozen=True)
+class HuespedCambiado:
+    """Otra estación creó, modificó o eliminó un huésped (lo publica el monitor de cambios)"""
+    huesped_id: int
+
+@dataclass(frozen=True)
+class SalidasVencidas:
+    """Pasó la hora límite de salida de estas habitaciones o empezó un nuevo día"""
+    habitaciones: Tuple[int, ...]
+
+@dataclass(frozen=True)
+class TurnoAbierto:
+    turno_id: int
+    usuario_id: int
+
+@dataclass(frozen=True)
+class TurnoCerrado:
+    turno_id: int
+    usuario_id: int
+
+@dataclass(frozen=True)
+class TasaCambiada:
+    """La tasa de cambio de la configuración cambió"""
+    tasa_anterior: Optional[float]
+    tasa_nueva: float
+
+
+class BusEventos:
+    """
+    Distribuye eventos a los suscriptores de su tipo. Los métodos se
+    guardan como referencia débil, así una vista descartada deja de
+    recibir eventos sin tener que desuscribirse.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscriptores: Dict[Type, List[weakref.ref]] = {}
+
+    def suscribir(self, tipo: Type, callback: Callable[[Any], None]) -> None:
+        """Registra una función a llamar cada vez que se publique un evento del tipo"""
+        if hasattr(callback, '__self__'):
+            ref = weakref.WeakMethod(callback)
+        else:
+            ref = weakref.ref(callback)
+        with self._lock:
+            self._suscriptores.setdefault(tipo, []).append(ref)
+
+    def desuscribir(self, tipo: Type, callback: Callable[[Any], None]) -> None:
+        """Quita una función registrada para un tipo de evento"""
+        with self._lock:
+            refs = self._suscriptores.get(tipo, [])
+            refs[:] = [r for r in refs if r() is not None and r() != callback]
+
+    def publicar(self, evento: Any) -> None:
+        """
+        Entrega el evento a sus suscriptores. Debe llamarse después del
+        commit; un error en un suscriptor no afecta a los demás.
+        """
+        with self._lock:
+            refs = self._suscriptores.get(type(evento), [])
+            refs[:] = [r for r in refs if r() is not None]
+            callbacks = [r() for r in refs]
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback(evento)
+            except Exception:
+                logger.exception("Error al procesar el evento %s", type(evento).__name__)
+
+# Instancia global del bus
+bus = BusEventos()
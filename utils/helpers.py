@@ -55,6 +55,34 @@ def validar_cedula(documento: str) -> bool:
     pattern = r'^[VEP]?-?\d{6,9}$'
     return bool(re.match(pattern, documento.upper()))
 
+def normalizar_documento(documento: str) -> str:
+    """
+    Normaliza un documento para comparaciones y búsquedas:
+    'v-12.345.678', 'V12345678' y '12345678' producen '12345678'
+    """
+    if not documento:
+        return ""
+    limpio = re.sub(r'[^0-9A-Z]', '', documento.upper())
+    # Quitar el prefijo de nacionalidad si el resto es numérico
+    if len(limpio) > 1 and limpio[0] in 'VEP' and limpio[1:].isdigit():
+        limpio = limpio[1:]
+    return limpio
+
+def normalizar_referencia(referencia: str) -> str:
+    """
+    Normaliza una referencia de pago para conciliar y buscar repetidas:
+    'Ref. 0012-3456', 'REF00123456' y '123456' producen '123456'
+    """
+    if not referencia:
+        return ""
+    limpio = re.sub(r'[^0-9A-Z]', '', referencia.upper())
+    if limpio.startswith('REF') and limpio[3:].isdigit():
+        limpio = limpio[3:]
+    # Los bancos rellenan con ceros a la izquierda a distinto largo
+    if limpio.isdigit():
+        limpio = limpio.lstrip('0') or '0'
+    return limpio
+
 def validar_telefono(telefono: str) -> bool:
     """Valida formato básico de teléfono venezolano"""
     if not telefono:
@@ -0,0 +1,114 @@
+"""
+Funciones de normalización y similitud de texto para detectar duplicados
+"""
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import List, Tuple
+
+from utils.helpers import normalizar_documento
+
+# (id, documento normalizado, nombre normalizado)
+RegistroComparable = Tuple[int, str, str]
+
+# (id_a, id_b, puntaje, motivo)
+ParCandidato = Tuple[int, int, float, str]
+
+# Bloques más grandes que esto se descartan para mantener el costo acotado
+MAX_TAMANO_BLOQUE = 200
+
+def normalizar_nombre(texto: str) -> str:
+    """Quita acentos, signos y espacios repetidos y pasa a mayúsculas"""
+    if not texto:
+        return ""
+    sin_acentos = unicodedata.normalize('NFKD', texto)
+    sin_acentos = ''.join(c for c in sin_acentos if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^A-Z ]', ' ', sin_acentos.upper()).split())
+
+def similitud(a: str, b: str) -> float:
+    """Retorna la similitud entre dos textos en el rango [0, 1]"""
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+def difieren_en_un_caracter(a: str, b: str) -> bool:
+    """
+    True si los textos difieren en una sola sustitución, inserción,
+    eliminación o transposición de caracteres adyacentes
+    """
+    if a == b or abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diferencias = []
+        for i, (x, y) in enumerate(zip(a, b)):
+            if x != y:
+                diferencias.append(i)
+                if len(diferencias) > 2:
+                    return False
+        if len(diferencias) == 1:
+            return True
+        return (len(diferencias) == 2 and diferencias[1] == diferencias[0] + 1
+                and a[diferencias[0]] == b[diferencias[1]]
+                and a[diferencias[1]] == b[diferencias[0]])
+    corto, largo = (a, b) if len(a) < len(b) else (b, a)
+    i = 0
+    while i < len(corto) and corto[i] == largo[i]:
+        i += 1
+    return corto[i:] == largo[i + 1:]
+
+def similitud_documento(a: str, b: str) -> float:
+    """
+    Similitud entre documentos normalizados: 1.0 si son iguales, 0.9 si
+    difieren en un solo carácter (error típico de tipeo) y 0.0 en otro caso
+    """
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    return 0.9 if difieren_en_un_caracter(a, b) else 0.0
+
+def claves_bloqueo(documento: str) -> List[str]:
+    """
+    Genera las claves de bloqueo de un huésped. Solo se comparan entre sí
+    los huéspedes que comparten al menos una clave: un único error de
+    tipeo deja intactos el inicio o el final del documento.
+    """
+    if not documento:
+        return []
+    mitad = max(1, len(documento) // 2)
+    return ['ini:' + documento[:mitad], 'fin:' + documento[-mitad:]]
+
+def puntaje_par(a: RegistroComparable, b: RegistroComparable) -> Tuple[float, str]:
+    """Calcula el puntaje de duplicado de dos huéspedes y el motivo"""
+    sim_documento = similitud_documento(a[1], b[1])
+    if sim_documento == 0.0:
+        return 0.0, ''
+    motivo = 'Mismo documento' if sim_documento == 1.0 else 'Documento y nombre similares'
+    return 0.5 * sim_documento + 0.5 * similitud(a[2], b[2]), motivo
+
+def comparar_bloques(bloques: List[List[RegistroComparable]], umbral: float) -> List[ParCandidato]:
+    """
+    Compara todos los pares dentro de cada bloque y retorna los que superan
+    el umbral. Es una función de nivel de módulo para poder ejecutarse en
+    un pool de procesos.
+    """
+    pares = []
+    for bloque in bloques:
+        for i in range(len(bloque)):
+            for j in range(i + 1, len(bloque)):
+                a, b = bloque[i], bloque[j]
+                puntaje, motivo = puntaje_par(a, b)
+                if puntaje >= umbral:
+                    id_a, id_b = sorted((a[0], b[0]))
+                    pares.append((id_a, id_b, puntaje, motivo))
+    return pares
+
+def preparar_registro(huesped_id: int, documento: str, nombres: str, apellidos: str) -> RegistroComparable:
+    """Construye la tupla comparable de un huésped"""
+    return (
+        huesped_id,
+        normalizar_documento(documento),
+        normalizar_nombre(f"{apellidos} {nombres}")
+    )
@@ -0,0 +1,240 @@
+"""
+Vista de Aseo (cola de trabajo del personal de limpieza)
+"""
+import sqlite3
+import threading
+import flet as ft
+from typing import Callable, Optional
+from models.aseo import PersonalAseo, TareaAseo, get_cola_aseo, asignar_habitaciones, repartir_habitaciones
+from models.base import ConflictoConcurrencia
+from models.habitacion import Habitacion, EstadoHabitacion
+
+# Segundos entre consultas del estado de la cola
+INTERVALO_SONDEO = 3.0
+
+class AseoView(ft.View):
+    """
+    Vista liviana para el personal de aseo: no carga el dashboard, solo
+    consulta cada pocos segundos la instantánea de la cola en memoria y se
+    redibuja cuando cambia
+    """
+    
+    def __init__(self, on_back: Callable):
+        super().__init__()
+        self.route = "/aseo"
+        self.on_back = on_back
+        self.cola = get_cola_aseo()
+        self.personal = PersonalAseo.listar_activos()
+        self._instantanea = None
+        self._detener = threading.Event()
+        self._build()
+    
+    def _build(self):
+        self.appbar = ft.AppBar(
+            title=ft.Text("Aseo"),
+            bgcolor=ft.Colors.BLUE_GREY,
+            leading=ft.IconButton(icon=ft.Icons.ARROW_BACK, on_click=lambda e: self.on_back())
+        )
+        
+        self.dd_filtro = ft.Dropdown(
+            label="Mostrar",
+            width=220,
+            value="",
+            on_change=lambda e: self._cargar()
+        )
+        self.lbl_resumen = ft.Text("", color=ft.Colors.GREY_700)
+        self.lista = ft.Column(spacing=5, scroll=ft.ScrollMode.AUTO, expand=True)
+        self._llenar_filtro()
+        
+        self.controls = [
+            ft.Container(
+                content=ft.Column([
+                    ft.Row([
+                        self.dd_filtro,
+                        ft.ElevatedButton("Repartir", icon=ft.Icons.SHUFFLE, on_click=self._mostrar_reparto),
+                        ft.OutlinedButton("Personal", icon=ft.Icons.BADGE, on_click=self._mostrar_personal),
+                    ]),
+                    self.lbl_resumen,
+                    self.lista,
+                ], expand=True),
+                padding=20,
+                expand=True
+            )
+        ]
+        self._cargar()
+    
+    def _llenar_filtro(self):
+        self.dd_filtro.options = [ft.dropdown.Option("", "Todas")] + [
+            ft.dropdown.Option(str(p.id), p.nombre) for p in self.personal
+        ]
+    
+    def did_mount(self):
+        self._detener.clear()
+        threading.Thread(target=self._sondear, name='SondeoAseo', daemon=True).start()
+    
+    def will_unmount(self):
+        self._detener.set()
+    
+    def _sondear(self):
+        """Compara la instantánea de la cola y redibuja solo si cambió"""
+        while not self._detener.wait(INTERVALO_SONDEO):
+            if self.cola.instantanea() != self._instantanea:
+                self._cargar()
+    
+    def _cargar(self):
+        """Arma la lista de habitaciones en orden de prioridad"""
+        self._instantanea = self.cola.instantanea()
+        personal_id = int(self.dd_filtro.value) if self.dd_filtro.value else None
+        tareas = self.cola.tareas(personal_id)
+        
+        llegan_hoy = sum(1 for t in tareas if t.llega_hoy)
+        sin_asignar = sum(1 for t in tareas if t.personal_id is None)
+        self.lbl_resumen.value = (
+            f"{len(tareas)} habitaciones en aseo | {llegan_hoy} con llegada hoy | {sin_asignar} sin asignar"
+        )
+        self.lista.controls = [self._fila(t) for t in tareas]
+        self._refrescar()
+    
+    def _fila(self, tarea: TareaAseo):
+        if tarea.llega_hoy:
+            llegada = ft.Container(ft.Text("Llega hoy", size=11, color=ft.Colors.WHITE),
+                                   bgcolor=ft.Colors.RED, padding=4, border_radius=3)
+        elif tarea.proxima_llegada:
+            llegada = ft.Text(f"Llega {tarea.proxima_llegada.strftime('%d/%m')}", size=12)
+        else:
+            llegada = ft.Text("Sin llegadas", size=12, color=ft.Colors.GREY)
+        
+        dd_persona = ft.Dropdown(
+            width=180,
+            dense=True,
+            options=[ft.dropdown.Option("", "Sin asignar")] + [
+                ft.dropdown.Option(str(p.id), p.nombre) for p in self.personal
+            ],
+            value=str(tarea.personal_id) if tarea.personal_id else "",
+            on_change=lambda e, numero=tarea.numero: self._asignar(numero, e.control.value)
+        )
+        return ft.Container(
+            content=ft.Row([
+                ft.Text(f"{tarea.numero:03d}", size=18, weight=ft.FontWeight.BOLD, width=50),
+                ft.Text(tarea.tipo, width=110),
+                ft.Container(content=llegada, width=100),
+                ft.Text(
+                    f"Sucia desde {tarea.sucia_desde.strftime('%d/%m %H:%M')}" if tarea.sucia_desde else "",
+                    size=12, width=150
+                ),
+                dd_persona,
+                ft.ElevatedButton(
+                    "Lista",
+                    icon=ft.Icons.CHECK,
+                    bgcolor=ft.Colors.GREEN,
+                    color=ft.Colors.WHITE,
+                    on_click=lambda e, numero=tarea.numero: self._marcar_lista(numero)
+                ),
+            ]),
+            padding=8,
+            border=ft.border.all(1, ft.Colors.RED_200 if tarea.llega_hoy else ft.Colors.GREY_300),
+            border_radius=8
+        )
+    
+    def _asignar(self, numero: int, valor: Optional[str]):
+        asignar_habitaciones({numero: int(valor) if valor else None})
+        self._cargar()
+    
+    def _marcar_lista(self, numero: int):
+        """Pasa la habitación a Libre (el trigger libera su asignación)"""
+        habitacion = Habitacion.buscar_por_numero(numero)
+        if habitacion is None or habitacion.estado != EstadoHabitacion.ASEO:
+            self._cargar()
+            return
+        try:
+            habitacion.cambiar_estado(EstadoHabitacion.LIBRE)
+        except ConflictoConcurrencia as ex:
+            self._show_error(str(ex))
+        self._cargar()
+    
+    def _mostrar_reparto(self, e):
+        """Elige el personal del turno y reparte las habitaciones entre ellos"""
+        if not self.personal:
+            self._show_error("Primero registre al personal de aseo")
+            return
+        checks = [ft.Checkbox(label=p.nombre, value=True, data=p.id) for p in self.personal]
+        chk_reasignar = ft.Checkbox(label="Rehacer también las ya asignadas", value=False)
+        
+        def repartir(e):
+            ids = [c.data for c in checks if c.value]
+            try:
+                reparto = repartir_habitaciones(ids, reasignar=chk_reasignar.value)
+            except ValueError as ex:
+                self._show_error(str(ex))
+                return
+            dialog.open = False
+            self._cargar()
+            self.page.show_snack_bar(
+                ft.SnackBar(content=ft.Text(f"Habitaciones asignadas: {len(reparto)}"), bgcolor=ft.Colors.GREEN)
+            )
+            self.page.update()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text("Repartir Habitaciones"),
+            content=ft.Column(checks + [ft.Divider(), chk_reasignar], tight=True),
+            actions=[
+                ft.TextButton("Cancelar", on_click=lambda e: setattr(dialog, 'open', False)),
+                ft.ElevatedButton("Repartir", on_click=repartir)
+            ]
+        )
+        
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _mostrar_personal(self, e):
+        """Alta del personal de aseo y activación/desactivación"""
+        todos = PersonalAseo.listar_todos()
+        checks = [ft.Checkbox(label=p.nombre, value=p.activo, data=p) for p in todos]
+        txt_nombre = ft.TextField(label="Nueva persona")
+        
+        def guardar(e):
+            try:
+                for c in checks:
+                    c.data.activo = c.value
+                    c.data.guardar()
+                if txt_nombre.value and txt_nombre.value.strip():
+                    PersonalAseo(nombre=txt_nombre.value).guardar()
+            except (ConflictoConcurrencia, ValueError) as ex:
+                self._show_error(str(ex))
+                return
+            except sqlite3.IntegrityError:
+                self._show_error("Ya existe una persona con ese nombre")
+                return
+            dialog.open = False
+            self.personal = PersonalAseo.listar_activos()
+            self._llenar_filtro()
+            self._cargar()
+            self.page.update()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text("Personal de Aseo"),
+            content=ft.Column(checks + [txt_nombre], tight=True, scroll=ft.ScrollMode.AUTO),
+            actions=[
+                ft.TextButton("Cancelar", on_click=lambda e: setattr(dialog, 'open', False)),
+                ft.ElevatedButton("Guardar", on_click=guardar)
+            ]
+        )
+        
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _refrescar(self):
+        """Envía los cambios a la página si la vista está en pantalla"""
+        try:
+            if self.page is not None:
+                self.update()
+        except (AssertionError, RuntimeError):
+            pass
+    
+    def _show_error(self, message: str):
+        """Muestra un mensaje de error"""
+        self.page.show_snack_bar(
+            ft.SnackBar(content=ft.Text(message), bgcolor=ft.Colors.RED)
+        )
@@ -0,0 +1,173 @@
+"""
+Vista de Calendario de Disponibilidad
+"""
+import flet as ft
+from datetime import date, datetime, timedelta
+from typing import Callable
+from models.disponibilidad import get_matriz_disponibilidad
+from utils.eventos import bus, HabitacionCambiada, ReservaCambiada
+
+DIAS_SEMANA = ["L", "M", "M", "J", "V", "S", "D"]
+ANCHO_CELDA = 28
+
+class CalendarioView(ft.View):
+    """Grilla de noches libres y ocupadas por habitación"""
+    
+    def __init__(self, on_back: Callable):
+        super().__init__()
+        self.route = "/calendario"
+        self.on_back = on_back
+        self.matriz = get_matriz_disponibilidad()
+        self.desde = date.today()
+        self._build()
+        bus.suscribir(HabitacionCambiada, self._on_cambio)
+        bus.suscribir(ReservaCambiada, self._on_cambio)
+    
+    def _build(self):
+        self.appbar = ft.AppBar(
+            title=ft.Text("Calendario de Disponibilidad"),
+            bgcolor=ft.Colors.TEAL,
+            leading=ft.IconButton(icon=ft.Icons.ARROW_BACK, on_click=lambda e: self.on_back())
+        )
+        
+        self.txt_desde = ft.TextField(
+            label="Desde",
+            value=self.desde.strftime("%d/%m/%Y"),
+            width=150,
+            hint_text="DD/MM/AAAA",
+            on_submit=self._cambiar_desde
+        )
+        self.dd_dias = ft.Dropdown(
+            label="Noches",
+            width=110,
+            options=[ft.dropdown.Option(str(n)) for n in (14, 30, 60)],
+            value="30",
+            on_change=lambda e: self._cargar()
+        )
+        self.dd_tipo = ft.Dropdown(
+            label="Tipo",
+            width=180,
+            options=[ft.dropdown.Option("", "Todos")] + [ft.dropdown.Option(t) for t in self.matriz.tipos()],
+            value="",
+            on_change=lambda e: self._cargar()
+        )
+        self.lbl_resumen = ft.Text("", color=ft.Colors.GREY_700)
+        self.grilla = ft.Column(spacing=2)
+        
+        self.controls = [
+            ft.Container(
+                content=ft.Column([
+                    ft.Row([
+                        ft.IconButton(icon=ft.Icons.CHEVRON_LEFT, tooltip="Anterior",
+                                      on_click=lambda e: self._mover(-1)),
+                        self.txt_desde,
+                        ft.IconButton(icon=ft.Icons.CHEVRON_RIGHT, tooltip="Siguiente",
+                                      on_click=lambda e: self._mover(1)),
+                        self.dd_dias,
+                        self.dd_tipo,
+                    ]),
+                    ft.Row([
+                        self._leyenda(ft.Colors.GREEN_300, "Libre"),
+                        self._leyenda(ft.Colors.RED_300, "Ocupada o reservada"),
+                        self.lbl_resumen,
+                    ], spacing=20),
+                    ft.Row([self.grilla], scroll=ft.ScrollMode.AUTO),
+                ], scroll=ft.ScrollMode.AUTO, expand=True),
+                padding=20,
+                expand=True
+            )
+        ]
+        self._cargar()
+    
+    def _leyenda(self, color: str, texto: str):
+        return ft.Row([
+            ft.Container(width=14, height=14, bgcolor=color, border_radius=3),
+            ft.Text(texto, size=12)
+        ], spacing=5)
+    
+    def _cargar(self):
+        """Arma la grilla con los datos de la matriz de disponibilidad"""
+        dias = int(self.dd_dias.value)
+        tipo = self.dd_tipo.value or None
+        fechas = [self.desde + timedelta(days=i) for i in range(dias)]
+        libres = self.matriz.libres_por_noche(self.desde, dias, tipo)
+        filas = self.matriz.grilla(self.desde, dias, tipo)
+        
+        encabezado = ft.Row(
+            [ft.Container(width=110)] + [
+                ft.Container(
+                    content=ft.Column([
+                        ft.Text(DIAS_SEMANA[f.weekday()], size=10, color=ft.Colors.GREY_600),
+                        ft.Text(str(f.day), size=11, weight=ft.FontWeight.BOLD),
+                    ], spacing=0, horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+                    width=ANCHO_CELDA,
+                    bgcolor=ft.Colors.GREY_200 if f.weekday() >= 5 else None
+                )
+                for f in fechas
+            ],
+            spacing=2
+        )
+        totales = ft.Row(
+            [ft.Container(content=ft.Text("Libres", size=11, weight=ft.FontWeight.BOLD), width=110)] + [
+                ft.Container(
+                    content=ft.Text(str(cantidad), size=11, weight=ft.FontWeight.BOLD,
+                                    color=ft.Colors.RED if cantidad == 0 else ft.Colors.GREEN_800),
+                    width=ANCHO_CELDA,
+                    alignment=ft.alignment.center
+                )
+                for cantidad in (libres + [0] * (dias - len(libres)))
+            ],
+            spacing=2
+        )
+        self.grilla.controls = [encabezado, totales, ft.Divider(height=1)] + [
+            ft.Row(
+                [ft.Text(f"{fila.numero:03d} {fila.tipo}", size=11, width=110)] + [
+                    ft.Container(
+                        width=ANCHO_CELDA,
+                        height=18,
+                        border_radius=3,
+                        bgcolor=ft.Colors.GREEN_300 if libre else ft.Colors.RED_300,
+                        tooltip=f"{fila.numero:03d} - {fecha.strftime('%d/%m/%Y')}"
+                    )
+                    for libre, fecha in zip(fila.libres, fechas)
+                ],
+                spacing=2
+            )
+            for fila in filas
+        ]
+        if libres:
+            self.lbl_resumen.value = (
+                f"Noches fuera del horizonte de la matriz: {dias - len(libres)}" if len(libres) < dias
+                else f"Mínimo libre en el rango: {min(libres)}"
+            )
+        else:
+            self.lbl_resumen.value = "El rango está fuera del horizonte de la matriz"
+        self._refrescar()
+    
+    def _cambiar_desde(self, e):
+        try:
+            self.desde = max(date.today(), datetime.strptime(self.txt_desde.value, "%d/%m/%Y").date())
+        except (TypeError, ValueError):
+            self.txt_desde.error_text = "Fecha inválida"
+            self._refrescar()
+            return
+        self.txt_desde.error_text = None
+        self.txt_desde.value = self.desde.strftime("%d/%m/%Y")
+        self._cargar()
+    
+    def _mover(self, sentido: int):
+        """Avanza o retrocede el calendario la cantidad de noches mostrada"""
+        self.desde = max(date.today(), self.desde + timedelta(days=sentido * int(self.dd_dias.value)))
+        self.txt_desde.value = self.desde.strftime("%d/%m/%Y")
+        self._cargar()
+    
+    def _on_cambio(self, evento):
+        self._cargar()
+    
+    def _refrescar(self):
+        """Envía los cambios a la página si la vista está en pantalla"""
+        try:
+            if self.page is not None:
+                self.update()
+        except (AssertionError, RuntimeError):
+            pass
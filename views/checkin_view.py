@@ -4,15 +4,21 @@ Vista de Check-in
 import flet as ft
 from datetime import datetime, timedelta
 from typing import Callable
-from models.huesped import Huesped
+from models.huesped import Huesped, SugerenciaHuesped, get_indice_documentos
 from models.habitacion import Habitacion, EstadoHabitacion
+from models.asignacion import get_asignador
 from models.registro import Registro
+from models.base import ConflictoConcurrencia
 from models.configuracion import get_config
-from models.transaccion import Transaccion, MetodoPago, TipoTransaccion
+from models.tarifas import PLAN_ESTANDAR, get_calendario_precios
+from models.transaccion import Transaccion, MetodoPago, TipoTransaccion, ReferenciaEnUso
 from utils.session import session
-from utils.helpers import format_money, format_date, validar_cedula, validar_telefono, validar_email
+from utils.helpers import format_money, format_date, validar_cedula, validar_telefono, validar_email, normalizar_documento
 from components.payment_form import PaymentForm, LineaPago
 
+# Cantidad mínima de caracteres antes de sugerir huéspedes
+MIN_CARACTERES_SUGERENCIA = 3
+
 class CheckinView(ft.View):
     """Vista para realizar el check-in de huéspedes"""
     
@@ -25,6 +31,7 @@ class CheckinView(ft.View):
         self.huesped = None
         self.habitacion = None
         self.config = get_config()
+        self.calendario = get_calendario_precios()
         self._build()
     
     def _build(self):
@@ -39,9 +46,12 @@ class CheckinView(ft.View):
             label="Documento (Cédula/Pasaporte)",
             prefix_icon=ft.Icons.SEARCH,
             width=250,
-            on_submit=self._buscar_huesped
+            on_submit=self._buscar_huesped,
+            on_change=self._sugerir_huespedes
         )
         
+        self.lista_sugerencias = ft.Column(spacing=0, visible=False)
+        
         btn_buscar = ft.ElevatedButton(
             "Buscar",
             icon=ft.Icons.SEARCH,
@@ -58,16 +68,23 @@ class CheckinView(ft.View):
         self.lbl_saldo_huesped = ft.Text("", size=14, weight=ft.FontWeight.BOLD)
         
         # === SECCIÓN 2: Datos de la Estancia ===
+        disponibles = Habitacion.listar_disponibles()
+        self.tipos_disponibles = sorted({h.tipo for h in disponibles})
         self.dd_habitacion = ft.Dropdown(
             label="Habitación",
             width=150,
             options=[
                 ft.dropdown.Option(str(h.numero), f"{h.numero:03d} - {h.tipo} (${h.precio_usd:.0f})")
-                for h in Habitacion.listar_disponibles()
+                for h in disponibles
             ],
             value=str(self.habitacion_numero) if self.habitacion_numero else None,
             on_change=self._on_habitacion_change
         )
+        btn_asignar = ft.IconButton(
+            icon=ft.Icons.AUTO_FIX_HIGH,
+            tooltip="Asignar automáticamente",
+            on_click=self._mostrar_asignacion
+        )
         
         # Fechas
         hoy = datetime.now()
@@ -84,7 +101,16 @@ class CheckinView(ft.View):
             label="Fecha Salida",
             value=manana.strftime("%d/%m/%Y"),
             width=150,
-            hint_text="DD/MM/AAAA"
+            hint_text="DD/MM/AAAA",
+            on_change=self._on_estadia_change
+        )
+        
+        self.dd_tarifa = ft.Dropdown(
+            label="Tarifa",
+            width=180,
+            options=[ft.dropdown.Option("", PLAN_ESTANDAR)],
+            value="",
+            on_change=self._on_estadia_change
         )
         
         self.lbl_noches = ft.Text("1 noche", size=12, color=ft.Colors.GREY)
@@ -128,6 +154,7 @@ class CheckinView(ft.View):
                                     btn_buscar,
                                     btn_nuevo
                                 ]),
+                                self.lista_sugerencias,
                                 self.lbl_huesped_info,
                                 self.lbl_saldo_huesped
                             ]),
@@ -142,10 +169,12 @@ class CheckinView(ft.View):
                                 ft.Text("2. Datos de la Estancia", weight=ft.FontWeight.BOLD, size=16),
                                 ft.Row([
                                     self.dd_habitacion,
+                                    btn_asignar,
                                     self.dp_entrada,
                                     self.dp_salida,
                                     self.lbl_noches
                                 ]),
+                                self.dd_tarifa,
                                 self.lbl_precio_noche
                             ]),
                             padding=15
@@ -191,14 +220,47 @@ class CheckinView(ft.View):
         if self.habitacion_numero:
             self._cargar_habitacion(self.habitacion_numero)
     
+    def _sugerir_huespedes(self, e):
+        """Muestra huéspedes cuyo documento empieza por lo escrito"""
+        texto = (self.txt_buscar_documento.value or "").strip()
+        self.lista_sugerencias.controls.clear()
+        
+        if len(texto) >= MIN_CARACTERES_SUGERENCIA:
+            for sugerencia in get_indice_documentos().buscar_prefijo(texto):
+                self.lista_sugerencias.controls.append(ft.ListTile(
+                    leading=ft.Icon(ft.Icons.PERSON),
+                    title=ft.Text(sugerencia.nombre_completo),
+                    subtitle=ft.Text(sugerencia.documento),
+                    dense=True,
+                    on_click=lambda e, s=sugerencia: self._seleccionar_sugerencia(s)
+                ))
+        
+        self.lista_sugerencias.visible = bool(self.lista_sugerencias.controls)
+        self.update()
+    
+    def _seleccionar_sugerencia(self, sugerencia: SugerenciaHuesped):
+        """Carga el huésped elegido de la lista de sugerencias"""
+        self.txt_buscar_documento.value = sugerencia.documento
+        self._buscar_huesped(None)
+    
     def _buscar_huesped(self, e):
         """Busca un huésped por documento"""
         documento = self.txt_buscar_documento.value.strip()
         if not documento:
             return
         
-        self.huesped = Huesped.buscar_por_documento(documento)
+        self.lista_sugerencias.controls.clear()
+        self.lista_sugerencias.visible = False
         
+        self.huesped = Huesped.buscar_por_documento(documento)
+        if not self.huesped:
+            # Tolerar diferencias de formato ('V-12345678' vs '12345678')
+            clave = normalizar_documento(documento)
+            for sugerencia in get_indice_documentos().buscar_prefijo(clave):
+                if normalizar_documento(sugerencia.documento) == clave:
+                    self.huesped = Huesped.buscar_por_id(sugerencia.id)
+                    break
+
         if self.huesped:
             self.lbl_huesped_info.value = f"✓ {self.huesped.nombre_completo}"
             self.lbl_huesped_info.color = ft.Colors.GREEN
@@ -275,12 +337,68 @@ class CheckinView(ft.View):
         """Maneja cambio de habitación"""
         if self.dd_habitacion.value:
             self._cargar_habitacion(int(self.dd_habitacion.value))
+            self.update()
+    
+    def _mostrar_asignacion(self, e):
+        """Pide tipo y cantidad de personas y elige la mejor habitación libre"""
+        dd_tipo = ft.Dropdown(
+            label="Tipo",
+            options=[ft.dropdown.Option("", "Cualquiera")] + [ft.dropdown.Option(t) for t in self.tipos_disponibles],
+            value=""
+        )
+        txt_personas = ft.TextField(label="Personas", value="1", keyboard_type=ft.KeyboardType.NUMBER)
+        
+        def asignar(e):
+            try:
+                personas = max(1, int(txt_personas.value))
+                salida = datetime.strptime(self.dp_salida.value, "%d/%m/%Y").date()
+            except (TypeError, ValueError):
+                self._show_error("Revise la cantidad de personas y la fecha de salida")
+                return
+            llegada = datetime.now().date()
+            numero = get_asignador().asignar(llegada, max(salida, llegada + timedelta(days=1)),
+                                             dd_tipo.value or None, personas)
+            dialog.open = False
+            if numero is None:
+                self._show_error("No hay habitaciones libres que cumplan lo pedido")
+                self.page.update()
+                return
+            if not any(o.key == str(numero) for o in self.dd_habitacion.options):
+                h = Habitacion.buscar_por_numero(numero)
+                self.dd_habitacion.options.append(
+                    ft.dropdown.Option(str(numero), f"{h.numero:03d} - {h.tipo} (${h.precio_usd:.0f})")
+                )
+            self.dd_habitacion.value = str(numero)
+            self._cargar_habitacion(numero)
+            self.page.update()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text("Asignar Habitación"),
+            content=ft.Column([dd_tipo, txt_personas], tight=True),
+            actions=[
+                ft.TextButton("Cancelar", on_click=lambda e: setattr(dialog, 'open', False)),
+                ft.ElevatedButton("Asignar", on_click=asignar)
+            ]
+        )
+        
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _on_estadia_change(self, e):
+        """Recalcula la pre-factura al cambiar la salida o la tarifa"""
+        self._calcular_totales()
+        self.update()
     
     def _cargar_habitacion(self, numero: int):
         """Carga información de la habitación"""
         self.habitacion = Habitacion.buscar_por_numero(numero)
         if self.habitacion:
-            self.lbl_precio_noche.value = f"Precio/noche: ${self.habitacion.precio_usd:.2f}"
+            self.dd_tarifa.options = [ft.dropdown.Option("", PLAN_ESTANDAR)] + [
+                ft.dropdown.Option(str(t.id), t.nombre)
+                for t in self.calendario.tarifas_para(self.habitacion.tipo)
+            ]
+            self.dd_tarifa.value = ""
             self._calcular_totales()
     
     def _calcular_totales(self):
@@ -298,9 +416,19 @@ class CheckinView(ft.View):
         
         self.lbl_noches.value = f"{noches} {'noche' if noches == 1 else 'noches'}"
         
-        # Subtotal
-        subtotal = noches * self.habitacion.precio_usd
-        self.lbl_subtotal.value = f"Subtotal: ${subtotal:.2f}"
+        # Subtotal desde el calendario de precios precalculado
+        cotizacion = self._cotizar(noches)
+        subtotal = cotizacion.total_usd
+        self.lbl_precio_noche.value = f"Precio/noche: ${cotizacion.promedio_noche_usd:.2f}" + (
+            " (promedio)" if len(set(cotizacion.precios_noche)) > 1 else ""
+        )
+        if cotizacion.descuento_usd:
+            self.lbl_subtotal.value = (
+                f"Subtotal: ${cotizacion.subtotal_usd:.2f} - "
+                f"{cotizacion.descuento_pct:g}% por estadía = ${subtotal:.2f}"
+            )
+        else:
+            self.lbl_subtotal.value = f"Subtotal: ${subtotal:.2f}"
         
         # Deuda/Saldo del huésped
         deuda = 0.0
@@ -332,6 +460,14 @@ class CheckinView(ft.View):
         self.payment_form.total_requerido = total
         self.payment_form._actualizar_totales()
     
+    def _cotizar(self, noches: int):
+        """Cotiza las noches desde hoy con el plan seleccionado"""
+        llegada = datetime.now().date()
+        tarifa = self.calendario.tarifa(int(self.dd_tarifa.value)) if self.dd_tarifa.value else None
+        return self.calendario.cotizar(
+            llegada, llegada + timedelta(days=noches), self.habitacion.precio_usd, tarifa, detalle=True
+        )
+    
     def _on_pago_change(self, total_usd, total_bs, restante):
         """Maneja cambios en el pago"""
         pass
@@ -360,6 +496,11 @@ class CheckinView(ft.View):
             self._show_error(f"El pago es insuficiente. Faltan ${total_requerido - total_pagado:.2f}")
             return
         
+        error = self.payment_form.validar_referencias()
+        if error:
+            self._show_error(error)
+            return
+        
         # Calcular fechas
         try:
             fecha_salida = datetime.strptime(self.dp_salida.value, "%d/%m/%Y")
@@ -376,27 +517,24 @@ class CheckinView(ft.View):
             usuario_checkin_id=session.usuario_id
         )
         
-        # Calcular noches y total
+        # Calcular noches y total; la auditoría nocturna cobra las noches
+        # que pasen de las ya facturadas
         noches = max(1, (fecha_salida - datetime.now()).days)
-        registro.total_habitacion_usd = noches * self.habitacion.precio_usd
+        registro.total_habitacion_usd = self._cotizar(noches).total_usd
+        registro.noches_facturadas = noches
+        registro.tarifa_id = int(self.dd_tarifa.value) if self.dd_tarifa.value else None
         
-        # Aplicar deuda/saldo anterior
+        # Deuda/saldo anterior: pasa de la cuenta del huésped al folio al guardar
         if self.huesped.tiene_deuda:
             registro.total_extras_usd = abs(self.huesped.saldo_acumulado)
         elif self.huesped.tiene_saldo_favor:
             registro.total_descuentos_usd = self.huesped.saldo_acumulado
         
-        # Guardar registro
-        registro_id = registro.guardar()
-        
-        # Procesar pagos
-        cambio = 0.0
-        for linea in lineas_pago:
-            transaccion = Transaccion(
-                registro_id=registro_id,
+        pagos = [
+            Transaccion(
                 huesped_id=self.huesped.id,
                 monto_usd=linea.monto_usd,
-                tasa_cambio=self.config.tasa_dolar_bs,
+                tasa_cambio=self.payment_form.tasa_cambio,
                 monto_bs=linea.monto_bs,
                 metodo_pago=linea.metodo,
                 tipo=TipoTransaccion.PAGO,
@@ -405,23 +543,22 @@ class CheckinView(ft.View):
                 usuario_id=session.usuario_id,
                 turno_id=session.turno_id
             )
-            transaccion.guardar()
-        
-        # Si hay cambio, guardar como saldo a favor
-        if total_pagado > total_requerido:
-            cambio = total_pagado - total_requerido
-            self.huesped.ajustar_saldo(cambio)
+            for linea in lineas_pago
+        ]
         
-        # Si había deuda, limpiarla
-        if self.huesped.tiene_deuda:
-            self.huesped.saldo_acumulado = 0
-            self.huesped.guardar()
+        # Guardar registro y pagos juntos (falla sin guardar nada si otra
+        # estación ocupó la habitación o si una referencia ya se usó)
+        try:
+            registro_id = registro.guardar(pagos)
+        except (ConflictoConcurrencia, ReferenciaEnUso) as ex:
+            self._show_error(str(ex))
+            return
         
-        # Si había saldo a favor, consumirlo
-        elif self.huesped.tiene_saldo_favor:
-            saldo_usado = min(self.huesped.saldo_acumulado, registro.total_habitacion_usd)
-            self.huesped.saldo_acumulado -= saldo_usado
-            self.huesped.guardar()
+        # Si hay cambio, pasarlo del folio a la cuenta del huésped
+        cambio = total_pagado - total_requerido
+        if cambio > 0:
+            registro = Registro.buscar_por_id(registro_id)
+            registro.transferir_saldo_a_huesped(cambio, session.usuario_id)
         
         self.on_complete()
     
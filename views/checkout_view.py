@@ -5,14 +5,19 @@ import flet as ft
 from datetime import datetime
 from typing import Callable
 from models.registro import Registro, EstadoRegistro
+from models.base import ConflictoConcurrencia
 from models.habitacion import Habitacion, EstadoHabitacion
-from models.huesped import Huesped
-from models.transaccion import Transaccion, MetodoPago, TipoTransaccion
+from models.transaccion import Transaccion, MetodoPago, TipoTransaccion, ReferenciaEnUso
 from models.configuracion import get_config
+from models.folio import listar_folio
+from models.catalogo import ArticuloCargo
 from utils.session import session
 from utils.helpers import format_money, format_datetime
 from components.payment_form import PaymentForm
 
+# Líneas del folio que se cargan cada vez
+LINEAS_POR_PAGINA = 50
+
 class CheckoutView(ft.View):
     """Vista para realizar el check-out de huéspedes"""
     
@@ -56,8 +61,8 @@ class CheckoutView(ft.View):
         self.lbl_descuentos = ft.Text(f"Descuentos: -${self.registro.total_descuentos_usd:.2f}", size=12)
         self.lbl_pagado = ft.Text(f"Pagado: ${self.registro.total_pagado_usd:.2f}", size=12, color=ft.Colors.GREEN)
         
-        # Saldo pendiente
-        saldo_pendiente = self.registro.saldo_actual_usd
+        # Saldo pendiente (se mantiene en el registro al asentar cada línea del folio)
+        saldo_pendiente = self.registro.saldo_pendiente_usd
         if saldo_pendiente > 0:
             self.lbl_saldo = ft.Text(
                 f"PENDIENTE POR PAGAR: ${saldo_pendiente:.2f}",
@@ -87,6 +92,26 @@ class CheckoutView(ft.View):
             self.lbl_saldo
         ])
         
+        # === FOLIO DETALLADO (se carga por páginas al pedirlo) ===
+        self.ultima_linea_id = 0
+        self.lista_folio = ft.Column(spacing=2)
+        self.btn_mas_folio = ft.TextButton("Cargar más", visible=False, on_click=self._cargar_folio)
+        self.folio_container = ft.Column([self.lista_folio, self.btn_mas_folio], visible=False)
+        self.btn_ver_folio = ft.TextButton(
+            "Ver detalle del folio",
+            icon=ft.Icons.RECEIPT_LONG,
+            on_click=self._mostrar_folio
+        )
+        btn_agregar_cargo = ft.TextButton(
+            "Agregar cargo",
+            icon=ft.Icons.ADD_SHOPPING_CART,
+            on_click=self._mostrar_form_cargo
+        )
+        detalle_cargos.controls.extend([
+            ft.Row([self.btn_ver_folio, btn_agregar_cargo]),
+            self.folio_container
+        ])
+        
         # === PAGOS ADICIONALES (si hay saldo pendiente) ===
         self.payment_container = ft.Container(visible=False)
         
@@ -130,9 +155,84 @@ class CheckoutView(ft.View):
             )
         ]
     
+    def _mostrar_folio(self, e):
+        """Muestra u oculta el folio; la primera vez carga su primera página"""
+        self.folio_container.visible = not self.folio_container.visible
+        if self.folio_container.visible and not self.lista_folio.controls:
+            self._cargar_folio(None)
+        else:
+            self.update()
+    
+    def _cargar_folio(self, e):
+        """Agrega la siguiente página de líneas del folio"""
+        lineas = listar_folio(self.registro.id, self.ultima_linea_id, LINEAS_POR_PAGINA)
+        for linea in lineas:
+            self.lista_folio.controls.append(
+                ft.Row([
+                    ft.Text(format_datetime(linea.fecha), size=11, width=110),
+                    ft.Text(linea.descripcion or linea.tipo.value, size=11, expand=True),
+                    ft.Text(f"{linea.monto_usd:+.2f}", size=11, width=70, text_align=ft.TextAlign.RIGHT,
+                            color=ft.Colors.RED if linea.es_cargo else ft.Colors.GREEN),
+                    ft.Text(f"${linea.saldo_usd:.2f}", size=11, width=70, text_align=ft.TextAlign.RIGHT),
+                ])
+            )
+        if lineas:
+            self.ultima_linea_id = lineas[-1].id
+        self.btn_mas_folio.visible = len(lineas) == LINEAS_POR_PAGINA
+        self.update()
+    
+    def _mostrar_form_cargo(self, e):
+        """Muestra el formulario para cargar un artículo del catálogo"""
+        articulos = {str(a.id): a for a in ArticuloCargo.listar_activos()}
+        dd_articulo = ft.Dropdown(
+            label="Artículo",
+            options=[
+                ft.dropdown.Option(key, f"{a.categoria.value} - {a.descripcion} (${a.precio_usd:.2f})")
+                for key, a in articulos.items()
+            ]
+        )
+        txt_cantidad = ft.TextField(label="Cantidad", value="1", keyboard_type=ft.KeyboardType.NUMBER)
+        
+        def cargar(e):
+            articulo = articulos.get(dd_articulo.value)
+            if not articulo:
+                self._show_error("Seleccione un artículo")
+                return
+            try:
+                cantidad = int(txt_cantidad.value)
+                self.registro.agregar_extra(
+                    articulo.descripcion, articulo.precio_usd, cantidad,
+                    usuario_id=session.usuario_id, articulo_id=articulo.id
+                )
+            except ConflictoConcurrencia as ex:
+                self._show_error(str(ex))
+                return
+            except ValueError:
+                self._show_error("Cantidad inválida")
+                return
+            
+            dialog.open = False
+            # Reconstruir con los totales actualizados
+            self._build()
+            self.page.update()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text(f"Cargo a Habitación {self.registro.habitacion_numero:03d}"),
+            content=ft.Column([dd_articulo, txt_cantidad], tight=True),
+            actions=[
+                ft.TextButton("Cancelar", on_click=lambda e: setattr(dialog, 'open', False)),
+                ft.ElevatedButton("Cargar", on_click=cargar)
+            ]
+        )
+        
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
     def _confirmar_checkout(self, e):
         """Muestra confirmación antes del checkout"""
-        saldo_pendiente = self.registro.saldo_actual_usd
+        saldo_pendiente = self.registro.saldo_pendiente_usd
+        pagos = []
         
         # Si hay saldo pendiente, procesar pago
         if saldo_pendiente > 0:
@@ -143,13 +243,17 @@ class CheckoutView(ft.View):
                 self._show_error(f"Pago insuficiente. Faltan ${saldo_pendiente - total_pagado:.2f}")
                 return
             
-            # Guardar pagos
-            for linea in lineas_pago:
-                transaccion = Transaccion(
+            error = self.payment_form.validar_referencias()
+            if error:
+                self._show_error(error)
+                return
+            
+            pagos = [
+                Transaccion(
                     registro_id=self.registro.id,
                     huesped_id=self.registro.huesped_principal_id,
                     monto_usd=linea.monto_usd,
-                    tasa_cambio=self.config.tasa_dolar_bs,
+                    tasa_cambio=self.payment_form.tasa_cambio,
                     monto_bs=linea.monto_bs,
                     metodo_pago=linea.metodo,
                     tipo=TipoTransaccion.PAGO,
@@ -158,23 +262,22 @@ class CheckoutView(ft.View):
                     usuario_id=session.usuario_id,
                     turno_id=session.turno_id
                 )
-                transaccion.guardar()
-            
-            # Si hay cambio, guardar como saldo a favor
-            if total_pagado > saldo_pendiente:
-                cambio = total_pagado - saldo_pendiente
-                huesped = Huesped.buscar_por_id(self.registro.huesped_principal_id)
-                if huesped:
-                    huesped.ajustar_saldo(cambio)
-        
-        # Si hay saldo a favor, transferirlo al huésped
-        elif saldo_pendiente < 0:
-            huesped = Huesped.buscar_por_id(self.registro.huesped_principal_id)
-            if huesped:
-                huesped.ajustar_saldo(abs(saldo_pendiente))
+                for linea in lineas_pago
+            ]
         
-        # Realizar checkout
-        self.registro.realizar_checkout(session.usuario_id)
+        # Pagos y checkout en una sola transacción sobre el registro que se
+        # mostró; el cambio o el saldo a favor pasa a la cuenta del huésped
+        try:
+            self.registro.realizar_checkout(session.usuario_id, pagos)
+        except ReferenciaEnUso as ex:
+            self._show_error(str(ex))
+            return
+        except ConflictoConcurrencia as ex:
+            # Otra estación cambió la cuenta: mostrar el saldo vigente
+            self._show_error(str(ex))
+            self._build()
+            self.page.update()
+            return
         
         self.on_complete()
     
@@ -0,0 +1,212 @@
+"""
+Vista de Conciliación Bancaria
+"""
+import flet as ft
+from datetime import datetime
+from typing import Callable
+from models.conciliacion import CUENTAS, EstadoMovimiento, ResultadoConciliacion, importar_extracto_csv
+from models.transaccion import Transaccion
+from utils.session import session
+from utils.helpers import format_datetime, format_money
+
+# Color con que se muestra cada estado de los movimientos
+COLORES_ESTADO = {
+    EstadoMovimiento.CONCILIADO: ft.Colors.GREEN,
+    EstadoMovimiento.SIN_PAGO: ft.Colors.RED,
+    EstadoMovimiento.DIFERENCIA: ft.Colors.ORANGE,
+    EstadoMovimiento.DUPLICADO: ft.Colors.PURPLE,
+}
+
+class ConciliacionView(ft.View):
+    """Vista para importar extractos y conciliarlos con los pagos electrónicos"""
+    
+    def __init__(self, on_back: Callable):
+        super().__init__()
+        self.route = "/conciliacion"
+        self.on_back = on_back
+        self._build()
+    
+    def _build(self):
+        self.appbar = ft.AppBar(
+            title=ft.Text("Conciliación Bancaria"),
+            bgcolor=ft.Colors.BLUE,
+            leading=ft.IconButton(icon=ft.Icons.ARROW_BACK, on_click=lambda e: self.on_back())
+        )
+        
+        self.dd_cuenta = ft.Dropdown(
+            label="Cuenta",
+            width=200,
+            value=next(iter(CUENTAS)),
+            options=[
+                ft.dropdown.Option(cuenta, f"{cuenta} ({moneda})")
+                for cuenta, (_, moneda) in CUENTAS.items()
+            ]
+        )
+        self.file_picker = ft.FilePicker(on_result=self._importar)
+        
+        self.lbl_resumen = ft.Text("", weight=ft.FontWeight.BOLD)
+        self.lbl_rechazados = ft.Text("", color=ft.Colors.RED, size=12, visible=False)
+        self.tabla_movimientos = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Línea"), numeric=True),
+                ft.DataColumn(ft.Text("Fecha")),
+                ft.DataColumn(ft.Text("Referencia")),
+                ft.DataColumn(ft.Text("Monto"), numeric=True),
+                ft.DataColumn(ft.Text("Estado")),
+                ft.DataColumn(ft.Text("Pago / Nota")),
+            ],
+            rows=[]
+        )
+        self.tabla_pagos = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Fecha")),
+                ft.DataColumn(ft.Text("Método")),
+                ft.DataColumn(ft.Text("Referencia")),
+                ft.DataColumn(ft.Text("Monto USD"), numeric=True),
+                ft.DataColumn(ft.Text("Monto Bs"), numeric=True),
+                ft.DataColumn(ft.Text("Concepto")),
+            ],
+            rows=[]
+        )
+        
+        self.controls = [
+            ft.Container(
+                content=ft.Column([
+                    ft.Row([
+                        self.dd_cuenta,
+                        ft.ElevatedButton(
+                            "Importar Extracto (CSV)",
+                            icon=ft.Icons.UPLOAD_FILE,
+                            on_click=lambda e: self._seleccionar_csv()
+                        ),
+                        ft.OutlinedButton(
+                            "Referencias Repetidas",
+                            icon=ft.Icons.CONTENT_COPY,
+                            on_click=self._mostrar_repetidas
+                        ),
+                    ]),
+                    ft.Text(
+                        "Columnas del CSV: Fecha, Referencia, Monto, Moneda (opcional), Descripcion (opcional)",
+                        size=12, color=ft.Colors.GREY
+                    ),
+                    self.lbl_resumen,
+                    self.lbl_rechazados,
+                    ft.Text("Movimientos del Extracto", size=18, weight=ft.FontWeight.BOLD),
+                    ft.Container(
+                        content=self.tabla_movimientos,
+                        border=ft.border.all(1, ft.Colors.GREY_300),
+                        border_radius=8
+                    ),
+                    ft.Text("Pagos sin Movimiento en el Extracto", size=18, weight=ft.FontWeight.BOLD),
+                    ft.Container(
+                        content=self.tabla_pagos,
+                        border=ft.border.all(1, ft.Colors.GREY_300),
+                        border_radius=8
+                    )
+                ], scroll=ft.ScrollMode.AUTO, expand=True),
+                padding=20,
+                expand=True
+            )
+        ]
+    
+    def _seleccionar_csv(self):
+        """Abre el selector de archivo del extracto"""
+        if self.file_picker not in self.page.overlay:
+            self.page.overlay.append(self.file_picker)
+            self.page.update()
+        self.file_picker.pick_files(
+            dialog_title=f"Extracto de {self.dd_cuenta.value}",
+            allowed_extensions=["csv"]
+        )
+    
+    def _importar(self, e):
+        """Concilia el extracto elegido y muestra el resultado"""
+        if not e.files:
+            return
+        try:
+            resultado = importar_extracto_csv(e.files[0].path, self.dd_cuenta.value, session.usuario_id)
+        except (OSError, UnicodeDecodeError) as ex:
+            self._show_error(f"No se pudo leer el archivo: {ex}")
+            return
+        self._mostrar_resultado(resultado)
+        self.update()
+    
+    def _mostrar_resultado(self, resultado: ResultadoConciliacion):
+        """Llena el resumen y las tablas con el resultado de la conciliación"""
+        self.lbl_resumen.value = (
+            f"{len(resultado.movimientos)} movimientos: {len(resultado.conciliados)} conciliados, "
+            f"{len(resultado.sin_pago)} sin pago, {len(resultado.diferencias)} con diferencias, "
+            f"{len(resultado.duplicados)} duplicados | "
+            f"{len(resultado.pagos_sin_movimiento)} pagos sin movimiento ({resultado.segundos:.2f} s)"
+        )
+        self.lbl_rechazados.visible = bool(resultado.rechazados)
+        self.lbl_rechazados.value = f"Líneas rechazadas: {len(resultado.rechazados)} - " + "; ".join(
+            f"{linea}: {motivo}" for linea, motivo in resultado.rechazados[:10]
+        )
+        
+        self.tabla_movimientos.rows = [
+            ft.DataRow(cells=[
+                ft.DataCell(ft.Text(str(m.linea))),
+                ft.DataCell(ft.Text(m.fecha.strftime("%d/%m/%Y"))),
+                ft.DataCell(ft.Text(m.referencia)),
+                ft.DataCell(ft.Text(format_money(m.monto, m.moneda))),
+                ft.DataCell(ft.Text(m.estado.value.replace('_', ' '), color=COLORES_ESTADO[m.estado])),
+                ft.DataCell(ft.Text(f"Pago #{m.transaccion_id}" if m.transaccion_id else m.nota)),
+            ])
+            # Primero lo que requiere revisión
+            for m in sorted(resultado.movimientos, key=lambda m: m.estado == EstadoMovimiento.CONCILIADO)
+        ]
+        self.tabla_pagos.rows = [
+            ft.DataRow(cells=[
+                ft.DataCell(ft.Text(format_datetime(datetime.fromisoformat(str(t.fecha_hora))))),
+                ft.DataCell(ft.Text(t.metodo_pago.value.replace('_', ' '))),
+                ft.DataCell(ft.Text(t.referencia)),
+                ft.DataCell(ft.Text(format_money(t.monto_usd))),
+                ft.DataCell(ft.Text(format_money(t.monto_bs, 'BS'))),
+                ft.DataCell(ft.Text(t.concepto)),
+            ])
+            for t in resultado.pagos_sin_movimiento
+        ]
+    
+    def _mostrar_repetidas(self, e):
+        """Muestra las referencias usadas en más de un pago del mismo método"""
+        repetidas = Transaccion.listar_referencias_duplicadas()
+        tabla = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Método")),
+                ft.DataColumn(ft.Text("Referencia")),
+                ft.DataColumn(ft.Text("Pagos")),
+                ft.DataColumn(ft.Text("Total USD"), numeric=True),
+                ft.DataColumn(ft.Text("Último")),
+            ],
+            rows=[
+                ft.DataRow(cells=[
+                    ft.DataCell(ft.Text(r.metodo.value.replace('_', ' '))),
+                    ft.DataCell(ft.Text(r.referencia_norm)),
+                    ft.DataCell(ft.Text(", ".join(f"#{i}" for i in r.transaccion_ids))),
+                    ft.DataCell(ft.Text(format_money(r.total_usd))),
+                    ft.DataCell(ft.Text(format_datetime(r.ultima))),
+                ])
+                for r in repetidas
+            ]
+        )
+        dialog = ft.AlertDialog(
+            title=ft.Text(f"Referencias Repetidas ({len(repetidas)})"),
+            content=ft.Container(
+                content=ft.Column(
+                    [tabla] if repetidas else [ft.Text("No hay referencias repetidas")],
+                    scroll=ft.ScrollMode.AUTO
+                ),
+                width=650, height=400
+            ),
+            actions=[ft.TextButton("Cerrar", on_click=lambda e: setattr(dialog, 'open', False))]
+        )
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _show_error(self, message: str):
+        """Muestra un mensaje de error"""
+        self.page.show_snack_bar(
+            ft.SnackBar(content=ft.Text(message), bgcolor=ft.Colors.RED)
+        )
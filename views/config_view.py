@@ -1,10 +1,16 @@
 """
 Vista de Configuración del Sistema
 """
+import sqlite3
 import flet as ft
+from datetime import datetime
 from typing import Callable
 from models.configuracion import get_config, Configuracion
 from models.usuario import Usuario, RolUsuario
+from models.base import ConflictoConcurrencia
+from models.catalogo import ArticuloCargo, CategoriaCargo
+from models.cargos import importar_cargos_csv
+from models.tarifas import Tarifa, Temporada, DescuentoEstadia
 from utils.session import session
 
 class ConfigView(ft.View):
@@ -44,6 +50,16 @@ class ConfigView(ft.View):
                     icon=ft.Icons.HOTEL,
                     content=self._build_tab_habitaciones()
                 ),
+                ft.Tab(
+                    text="Cargos",
+                    icon=ft.Icons.ROOM_SERVICE,
+                    content=self._build_tab_cargos()
+                ),
+                ft.Tab(
+                    text="Tarifas",
+                    icon=ft.Icons.PRICE_CHANGE,
+                    content=self._build_tab_tarifas()
+                ),
             ],
             expand=True
         )
@@ -194,6 +210,177 @@ class ConfigView(ft.View):
             padding=20
         )
     
+    def _build_tab_cargos(self):
+        """Construye la pestaña del catálogo de cargos"""
+        self.tabla_cargos = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Código")),
+                ft.DataColumn(ft.Text("Descripción")),
+                ft.DataColumn(ft.Text("Categoría")),
+                ft.DataColumn(ft.Text("Precio USD")),
+                ft.DataColumn(ft.Text("Estado")),
+                ft.DataColumn(ft.Text("Acciones")),
+            ],
+            rows=[]
+        )
+        
+        for a in ArticuloCargo.listar_todos():
+            self.tabla_cargos.rows.append(ft.DataRow(
+                cells=[
+                    ft.DataCell(ft.Text(a.codigo)),
+                    ft.DataCell(ft.Text(a.descripcion)),
+                    ft.DataCell(ft.Text(a.categoria.value)),
+                    ft.DataCell(ft.Text(f"${a.precio_usd:.2f}")),
+                    ft.DataCell(
+                        ft.Text("Activo" if a.activo else "Inactivo",
+                               color=ft.Colors.GREEN if a.activo else ft.Colors.RED)
+                    ),
+                    ft.DataCell(ft.IconButton(
+                        icon=ft.Icons.EDIT,
+                        tooltip="Editar",
+                        on_click=lambda e, art=a: self._mostrar_form_articulo(art)
+                    ))
+                ]
+            ))
+        
+        # Selector de archivo para importar cargos (cierre del restaurante, etc.)
+        self.file_picker_cargos = ft.FilePicker(on_result=self._importar_cargos)
+        
+        return ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    ft.ElevatedButton(
+                        "Nuevo Artículo",
+                        icon=ft.Icons.ADD,
+                        on_click=lambda e: self._mostrar_form_articulo()
+                    ),
+                    ft.OutlinedButton(
+                        "Importar Cargos (CSV)",
+                        icon=ft.Icons.UPLOAD_FILE,
+                        on_click=lambda e: self._seleccionar_csv_cargos()
+                    ),
+                ]),
+                ft.Text(
+                    "Columnas del CSV: Habitacion, Codigo, Cantidad, Monto_USD (opcional), Descripcion (opcional)",
+                    size=12, color=ft.Colors.GREY
+                ),
+                ft.Container(
+                    content=self.tabla_cargos,
+                    expand=True,
+                    border=ft.border.all(1, ft.Colors.GREY_300),
+                    border_radius=8
+                )
+            ], scroll=ft.ScrollMode.AUTO),
+            padding=20
+        )
+    
+    def _build_tab_tarifas(self):
+        """Construye la pestaña de planes de tarifa, temporadas y descuentos por estadía"""
+        tabla_planes = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Plan")),
+                ft.DataColumn(ft.Text("Tipo")),
+                ft.DataColumn(ft.Text("Dom-Jue USD")),
+                ft.DataColumn(ft.Text("Vie-Sáb USD")),
+                ft.DataColumn(ft.Text("Estado")),
+                ft.DataColumn(ft.Text("Acciones")),
+            ],
+            rows=[
+                ft.DataRow(cells=[
+                    ft.DataCell(ft.Text(t.nombre)),
+                    ft.DataCell(ft.Text(t.tipo_habitacion)),
+                    ft.DataCell(ft.Text(f"${t.precio_semana_usd:.2f}")),
+                    ft.DataCell(ft.Text(f"${t.precio_fin_semana_usd:.2f}")),
+                    ft.DataCell(
+                        ft.Text("Activo" if t.activo else "Inactivo",
+                               color=ft.Colors.GREEN if t.activo else ft.Colors.RED)
+                    ),
+                    ft.DataCell(ft.IconButton(
+                        icon=ft.Icons.EDIT,
+                        tooltip="Editar",
+                        on_click=lambda e, tarifa=t: self._mostrar_form_tarifa(tarifa)
+                    ))
+                ])
+                for t in Tarifa.listar_todas()
+            ]
+        )
+        
+        tabla_temporadas = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Temporada")),
+                ft.DataColumn(ft.Text("Desde")),
+                ft.DataColumn(ft.Text("Hasta")),
+                ft.DataColumn(ft.Text("Ajuste")),
+                ft.DataColumn(ft.Text("Acciones")),
+            ],
+            rows=[
+                ft.DataRow(cells=[
+                    ft.DataCell(ft.Text(t.nombre)),
+                    ft.DataCell(ft.Text(t.fecha_desde.strftime("%d/%m/%Y"))),
+                    ft.DataCell(ft.Text(t.fecha_hasta.strftime("%d/%m/%Y"))),
+                    ft.DataCell(ft.Text(f"{t.ajuste_pct:+g}%")),
+                    ft.DataCell(ft.IconButton(
+                        icon=ft.Icons.DELETE,
+                        icon_color=ft.Colors.RED,
+                        tooltip="Eliminar",
+                        on_click=lambda e, temporada=t: self._eliminar_regla(temporada)
+                    ))
+                ])
+                for t in Temporada.listar_todas()
+            ]
+        )
+        
+        tabla_descuentos = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Desde (noches)")),
+                ft.DataColumn(ft.Text("Descuento")),
+                ft.DataColumn(ft.Text("Acciones")),
+            ],
+            rows=[
+                ft.DataRow(cells=[
+                    ft.DataCell(ft.Text(str(d.noches_minimas))),
+                    ft.DataCell(ft.Text(f"{d.descuento_pct:g}%")),
+                    ft.DataCell(ft.IconButton(
+                        icon=ft.Icons.DELETE,
+                        icon_color=ft.Colors.RED,
+                        tooltip="Eliminar",
+                        on_click=lambda e, descuento=d: self._eliminar_regla(descuento)
+                    ))
+                ])
+                for d in DescuentoEstadia.listar_todos()
+            ]
+        )
+        
+        def seccion(titulo: str, boton: ft.Control, tabla: ft.DataTable):
+            return ft.Column([
+                ft.Row([ft.Text(titulo, size=16, weight=ft.FontWeight.BOLD), boton]),
+                ft.Container(
+                    content=tabla,
+                    border=ft.border.all(1, ft.Colors.GREY_300),
+                    border_radius=8
+                )
+            ])
+        
+        return ft.Container(
+            content=ft.Column([
+                ft.Text(
+                    "Sin plan seleccionado el check-in usa el precio de la habitación. "
+                    "Las temporadas ajustan todos los planes y el descuento por estadía se aplica al total.",
+                    size=12, color=ft.Colors.GREY
+                ),
+                seccion("Planes", ft.ElevatedButton(
+                    "Nuevo Plan", icon=ft.Icons.ADD, on_click=lambda e: self._mostrar_form_tarifa()
+                ), tabla_planes),
+                seccion("Temporadas", ft.ElevatedButton(
+                    "Nueva Temporada", icon=ft.Icons.ADD, on_click=lambda e: self._mostrar_form_temporada()
+                ), tabla_temporadas),
+                seccion("Descuentos por Estadía", ft.ElevatedButton(
+                    "Nuevo Descuento", icon=ft.Icons.ADD, on_click=lambda e: self._mostrar_form_descuento()
+                ), tabla_descuentos),
+            ], scroll=ft.ScrollMode.AUTO, spacing=20),
+            padding=20
+        )
+    
     def _cargar_usuarios(self):
         """Carga la tabla de usuarios"""
         self.tabla_usuarios.rows.clear()
@@ -281,7 +468,10 @@ class ConfigView(ft.View):
                 if txt_password.value:
                     u.password_hash = Usuario.hash_password(txt_password.value)
             
-            u.guardar()
+            try:
+                u.guardar()
+            except ConflictoConcurrencia as ex:
+                self._show_error(str(ex))
             
             dialog.open = False
             self._cargar_usuarios()
@@ -356,7 +546,10 @@ class ConfigView(ft.View):
             habitacion.descripcion = txt_desc.value
             habitacion.precio_usd = float(txt_precio.value or 0)
             habitacion.capacidad = int(txt_capacidad.value or 2)
-            habitacion.guardar()
+            try:
+                habitacion.guardar()
+            except ConflictoConcurrencia as ex:
+                self._show_error(str(ex))
             
             dialog.open = False
             # Recargar pestaña
@@ -375,3 +568,263 @@ class ConfigView(ft.View):
         self.page.dialog = dialog
         dialog.open = True
         self.page.update()
+    
+    def _mostrar_form_articulo(self, articulo: ArticuloCargo = None):
+        """Muestra formulario para crear/editar un artículo del catálogo"""
+        es_nuevo = articulo is None
+        
+        txt_codigo = ft.TextField(label="Código *", value=articulo.codigo if articulo else "")
+        txt_descripcion = ft.TextField(label="Descripción *", value=articulo.descripcion if articulo else "")
+        dd_categoria = ft.Dropdown(
+            label="Categoría",
+            options=[ft.dropdown.Option(c.value) for c in CategoriaCargo],
+            value=articulo.categoria.value if articulo else CategoriaCargo.MINIBAR.value
+        )
+        txt_precio = ft.TextField(
+            label="Precio USD *",
+            value=str(articulo.precio_usd) if articulo else "",
+            keyboard_type=ft.KeyboardType.NUMBER
+        )
+        chk_activo = ft.Checkbox(label="Activo", value=articulo.activo if articulo else True)
+        
+        def guardar(e):
+            if not txt_codigo.value or not txt_descripcion.value:
+                self._show_error("Código y descripción son obligatorios")
+                return
+            try:
+                precio = float(txt_precio.value)
+            except (TypeError, ValueError):
+                self._show_error("Precio inválido")
+                return
+            
+            art = articulo or ArticuloCargo(codigo="", descripcion="",
+                                            categoria=CategoriaCargo.OTRO, precio_usd=0.0)
+            art.codigo = txt_codigo.value
+            art.descripcion = txt_descripcion.value
+            art.categoria = CategoriaCargo(dd_categoria.value)
+            art.precio_usd = precio
+            art.activo = chk_activo.value
+            try:
+                art.guardar()
+            except (ConflictoConcurrencia, sqlite3.IntegrityError):
+                self._show_error("Ya existe un artículo con ese código o fue modificado por otra estación")
+                return
+            
+            dialog.open = False
+            # Recargar pestaña
+            self._build()
+            self.page.update()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text("Nuevo Artículo" if es_nuevo else "Editar Artículo"),
+            content=ft.Column([txt_codigo, txt_descripcion, dd_categoria, txt_precio, chk_activo], tight=True),
+            actions=[
+                ft.TextButton("Cancelar", on_click=lambda e: setattr(dialog, 'open', False)),
+                ft.ElevatedButton("Guardar", on_click=guardar)
+            ]
+        )
+        
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _mostrar_form_tarifa(self, tarifa: Tarifa = None):
+        """Muestra formulario para crear/editar un plan de tarifa"""
+        from models.habitacion import Habitacion
+        
+        es_nuevo = tarifa is None
+        tipos = sorted({h.tipo for h in Habitacion.listar_todas()})
+        
+        txt_nombre = ft.TextField(label="Nombre *", value=tarifa.nombre if tarifa else "",
+                                  hint_text="Ej: Corporativo")
+        dd_tipo = ft.Dropdown(
+            label="Tipo de habitación",
+            options=[ft.dropdown.Option(t) for t in tipos],
+            value=tarifa.tipo_habitacion if tarifa else (tipos[0] if tipos else None)
+        )
+        txt_semana = ft.TextField(
+            label="Precio domingo a jueves USD *",
+            value=str(tarifa.precio_semana_usd) if tarifa else "",
+            keyboard_type=ft.KeyboardType.NUMBER
+        )
+        txt_fin_semana = ft.TextField(
+            label="Precio viernes y sábado USD *",
+            value=str(tarifa.precio_fin_semana_usd) if tarifa else "",
+            keyboard_type=ft.KeyboardType.NUMBER
+        )
+        chk_activo = ft.Checkbox(label="Activo", value=tarifa.activo if tarifa else True)
+        
+        def guardar(e):
+            if not txt_nombre.value or not dd_tipo.value:
+                self._show_error("Nombre y tipo son obligatorios")
+                return
+            try:
+                semana = float(txt_semana.value)
+                fin_semana = float(txt_fin_semana.value)
+            except (TypeError, ValueError):
+                self._show_error("Precio inválido")
+                return
+            
+            t = tarifa or Tarifa(nombre="", tipo_habitacion="", precio_semana_usd=0.0, precio_fin_semana_usd=0.0)
+            t.nombre = txt_nombre.value
+            t.tipo_habitacion = dd_tipo.value
+            t.precio_semana_usd = semana
+            t.precio_fin_semana_usd = fin_semana
+            t.activo = chk_activo.value
+            try:
+                t.guardar()
+            except ValueError as ex:
+                self._show_error(str(ex))
+                return
+            except (ConflictoConcurrencia, sqlite3.IntegrityError):
+                self._show_error("Ya existe ese plan para el tipo o fue modificado por otra estación")
+                return
+            
+            dialog.open = False
+            # Recargar pestaña
+            self._build()
+            self.page.update()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text("Nuevo Plan" if es_nuevo else "Editar Plan"),
+            content=ft.Column([txt_nombre, dd_tipo, txt_semana, txt_fin_semana, chk_activo], tight=True),
+            actions=[
+                ft.TextButton("Cancelar", on_click=lambda e: setattr(dialog, 'open', False)),
+                ft.ElevatedButton("Guardar", on_click=guardar)
+            ]
+        )
+        
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _mostrar_form_temporada(self):
+        """Muestra formulario para crear una temporada"""
+        txt_nombre = ft.TextField(label="Nombre *", hint_text="Ej: Carnaval")
+        txt_desde = ft.TextField(label="Primera noche *", hint_text="DD/MM/AAAA")
+        txt_hasta = ft.TextField(label="Última noche *", hint_text="DD/MM/AAAA")
+        txt_ajuste = ft.TextField(label="Ajuste % *", hint_text="Ej: 20 o -15",
+                                  keyboard_type=ft.KeyboardType.NUMBER)
+        
+        def guardar(e):
+            if not txt_nombre.value:
+                self._show_error("El nombre es obligatorio")
+                return
+            try:
+                temporada = Temporada(
+                    nombre=txt_nombre.value.strip(),
+                    fecha_desde=datetime.strptime(txt_desde.value, "%d/%m/%Y").date(),
+                    fecha_hasta=datetime.strptime(txt_hasta.value, "%d/%m/%Y").date(),
+                    ajuste_pct=float(txt_ajuste.value)
+                )
+            except (TypeError, ValueError):
+                self._show_error("Fechas o ajuste inválidos")
+                return
+            try:
+                temporada.guardar()
+            except ValueError as ex:
+                self._show_error(str(ex))
+                return
+            
+            dialog.open = False
+            self._build()
+            self.page.update()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text("Nueva Temporada"),
+            content=ft.Column([txt_nombre, txt_desde, txt_hasta, txt_ajuste], tight=True),
+            actions=[
+                ft.TextButton("Cancelar", on_click=lambda e: setattr(dialog, 'open', False)),
+                ft.ElevatedButton("Guardar", on_click=guardar)
+            ]
+        )
+        
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _mostrar_form_descuento(self):
+        """Muestra formulario para crear o reemplazar un descuento por estadía"""
+        txt_noches = ft.TextField(label="Desde cuántas noches *", keyboard_type=ft.KeyboardType.NUMBER)
+        txt_descuento = ft.TextField(label="Descuento % *", keyboard_type=ft.KeyboardType.NUMBER)
+        
+        def guardar(e):
+            try:
+                descuento = DescuentoEstadia(int(txt_noches.value), float(txt_descuento.value))
+            except (TypeError, ValueError):
+                self._show_error("Noches o descuento inválidos")
+                return
+            try:
+                descuento.guardar()
+            except ValueError as ex:
+                self._show_error(str(ex))
+                return
+            
+            dialog.open = False
+            self._build()
+            self.page.update()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text("Descuento por Estadía"),
+            content=ft.Column([txt_noches, txt_descuento], tight=True),
+            actions=[
+                ft.TextButton("Cancelar", on_click=lambda e: setattr(dialog, 'open', False)),
+                ft.ElevatedButton("Guardar", on_click=guardar)
+            ]
+        )
+        
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _eliminar_regla(self, regla):
+        """Elimina una temporada o un descuento por estadía"""
+        regla.eliminar()
+        self._build()
+        self.page.update()
+    
+    def _seleccionar_csv_cargos(self):
+        """Abre el selector de archivo para importar cargos"""
+        if self.file_picker_cargos not in self.page.overlay:
+            self.page.overlay.append(self.file_picker_cargos)
+            self.page.update()
+        self.file_picker_cargos.pick_files(
+            dialog_title="Importar cargos",
+            allowed_extensions=["csv"]
+        )
+    
+    def _importar_cargos(self, e):
+        """Importa el CSV elegido y muestra el resultado"""
+        if not e.files:
+            return
+        try:
+            resultado = importar_cargos_csv(e.files[0].path, session.usuario_id)
+        except (OSError, UnicodeDecodeError) as ex:
+            self._show_error(f"No se pudo leer el archivo: {ex}")
+            return
+        
+        lineas = [
+            ft.Text(f"Cargos aplicados: {resultado.aplicados} en {resultado.registros} habitaciones"),
+            ft.Text(f"Total: ${resultado.total_usd:.2f}", weight=ft.FontWeight.BOLD),
+        ]
+        if resultado.rechazados:
+            lineas.append(ft.Text(f"Rechazados: {len(resultado.rechazados)}", color=ft.Colors.RED))
+            lineas.extend(
+                ft.Text(f"{identificacion}: {motivo}", size=12)
+                for identificacion, motivo in resultado.rechazados[:20]
+            )
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text("Importación de Cargos"),
+            content=ft.Column(lineas, tight=True, scroll=ft.ScrollMode.AUTO),
+            actions=[ft.ElevatedButton("Aceptar", on_click=lambda e: setattr(dialog, 'open', False))]
+        )
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _show_error(self, message: str):
+        """Muestra un mensaje de error"""
+        self.page.show_snack_bar(
+            ft.SnackBar(content=ft.Text(message), bgcolor=ft.Colors.RED)
+        )
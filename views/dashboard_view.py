@@ -4,7 +4,13 @@ Vista del Dashboard Principal con Grid de Habitaciones
 import flet as ft
 from typing import Callable
 from models.habitacion import Habitacion, EstadoHabitacion
+from models.registro import Registro
 from models.configuracion import get_config
+from models.movimientos import get_tablero_movimientos
+from utils.eventos import (
+    bus, HabitacionCambiada, PagoRegistrado, CargoRegistrado, ReservaCambiada,
+    SalidasVencidas, TurnoAbierto, TurnoCerrado, TasaCambiada
+)
 from components.room_card import RoomCard
 from utils.session import session
 from utils.helpers import format_money
@@ -18,7 +24,20 @@ class DashboardView(ft.View):
         self.on_room_click = on_room_click
         self.on_menu_click = on_menu_click
         self.room_cards = {}
+        self.estados = {}
+        self.tablero = get_tablero_movimientos()
         self._build()
+        
+        # La vista se mantiene viva y se actualiza por eventos en lugar de
+        # reconstruirse después de cada acción
+        bus.suscribir(HabitacionCambiada, self._on_habitacion_cambiada)
+        bus.suscribir(PagoRegistrado, self._on_saldo_cambiado)
+        bus.suscribir(CargoRegistrado, self._on_saldo_cambiado)
+        bus.suscribir(TurnoAbierto, self._on_turno_abierto)
+        bus.suscribir(TurnoCerrado, self._on_turno_cerrado)
+        bus.suscribir(TasaCambiada, self._on_tasa_cambiada)
+        bus.suscribir(ReservaCambiada, self._on_movimientos_cambiados)
+        bus.suscribir(SalidasVencidas, self._on_movimientos_cambiados)
     
     def _build(self):
         self.appbar = ft.AppBar(
@@ -34,9 +53,17 @@ class DashboardView(ft.View):
                 ft.PopupMenuButton(
                     items=[
                         ft.PopupMenuItem(text="Check-in", on_click=lambda e: self.on_menu_click("checkin")),
+                        ft.PopupMenuItem(text="Reservas", on_click=lambda e: self.on_menu_click("reservas")),
+                        ft.PopupMenuItem(text="Calendario", on_click=lambda e: self.on_menu_click("calendario")),
+                        ft.PopupMenuItem(text="Grupos", on_click=lambda e: self.on_menu_click("grupos")),
                         ft.PopupMenuItem(text="Huéspedes", on_click=lambda e: self.on_menu_click("huespedes")),
+                        ft.PopupMenuItem(text="Aseo", on_click=lambda e: self.on_menu_click("aseo")),
+                        ft.PopupMenuItem(text="Mantenimiento", on_click=lambda e: self.on_menu_click("mantenimiento")),
                         ft.PopupMenuItem(),
                         ft.PopupMenuItem(text="Turno", on_click=lambda e: self.on_menu_click("turno")),
+                        ft.PopupMenuItem(text="Auditoría Nocturna", on_click=lambda e: self.on_menu_click("auditoria")),
+                        ft.PopupMenuItem(text="Conciliación Bancaria", on_click=lambda e: self.on_menu_click("conciliacion")),
+                        ft.PopupMenuItem(text="Integridad de Cuentas", on_click=lambda e: self.on_menu_click("integridad")),
                         ft.PopupMenuItem(text="Configuración", on_click=lambda e: self.on_menu_click("config")),
                         ft.PopupMenuItem(),
                         ft.PopupMenuItem(text="Cerrar Sesión", on_click=lambda e: self.on_menu_click("logout")),
@@ -74,6 +101,30 @@ class DashboardView(ft.View):
             padding=10
         )
         
+        # Llegadas y salidas del día (desde el tablero en memoria)
+        self.lbl_llegadas = ft.Text("", size=13, weight=ft.FontWeight.BOLD)
+        self.lista_llegadas = ft.Column(spacing=2, scroll=ft.ScrollMode.AUTO, expand=True)
+        self.lbl_salidas = ft.Text("", size=13, weight=ft.FontWeight.BOLD)
+        self.lista_salidas = ft.Column(spacing=2, scroll=ft.ScrollMode.AUTO, expand=True)
+        panel_movimientos = ft.Row([
+            ft.Container(
+                content=ft.Column([self.lbl_llegadas, self.lista_llegadas], spacing=4),
+                expand=True,
+                height=120,
+                padding=8,
+                border=ft.border.all(1, ft.Colors.GREY_300),
+                border_radius=8
+            ),
+            ft.Container(
+                content=ft.Column([self.lbl_salidas, self.lista_salidas], spacing=4),
+                expand=True,
+                height=120,
+                padding=8,
+                border=ft.border.all(1, ft.Colors.GREY_300),
+                border_radius=8
+            ),
+        ])
+        
         # Contador de habitaciones
         self.lbl_contadores = ft.Text("", size=12, color=ft.Colors.GREY)
         
@@ -106,6 +157,8 @@ class DashboardView(ft.View):
                         self.lbl_turno,
                     ], spacing=10),
                     ft.Divider(),
+                    # Llegadas y salidas
+                    panel_movimientos,
                     # Filtros y leyenda
                     ft.Row([
                         self.filtro_estado,
@@ -128,35 +181,82 @@ class DashboardView(ft.View):
         ]
         
         # Cargar habitaciones
+        self._cargar_movimientos()
         self._cargar_habitaciones()
     
+    def _cargar_movimientos(self):
+        """Arma las listas de llegadas y salidas del día"""
+        llegadas = self.tablero.llegadas()
+        salidas = self.tablero.salidas()
+        vencidas = sum(1 for s in salidas if s.tarde)
+        
+        self.lbl_llegadas.value = f"Llegadas de hoy: {len(llegadas)}"
+        self.lista_llegadas.controls = [
+            ft.Container(
+                content=ft.Text(
+                    f"{l.habitacion_numero:03d}  {l.huesped_nombre} - hasta {l.fecha_salida.strftime('%d/%m')}",
+                    size=12
+                ),
+                on_click=lambda e, numero=l.habitacion_numero: self._abrir_habitacion(numero)
+            )
+            for l in llegadas
+        ]
+        
+        self.lbl_salidas.value = f"Salidas de hoy: {len(salidas)}" + (f" ({vencidas} vencidas)" if vencidas else "")
+        self.lbl_salidas.color = ft.Colors.RED if vencidas else None
+        self.lista_salidas.controls = [
+            ft.Container(
+                content=ft.Text(
+                    f"{s.habitacion_numero:03d}  {s.huesped_nombre}"
+                    + (f" - vencida desde {s.salida_prevista.strftime('%d/%m')}" if s.tarde else "")
+                    + (f" - debe ${s.saldo_pendiente_usd:.2f}" if s.saldo_pendiente_usd > 0 else ""),
+                    size=12,
+                    color=ft.Colors.RED if s.tarde else None
+                ),
+                on_click=lambda e, numero=s.habitacion_numero: self._abrir_habitacion(numero)
+            )
+            for s in salidas
+        ]
+    
+    def _abrir_habitacion(self, numero: int):
+        """Abre la acción de la habitación como si se hubiera tocado su tarjeta"""
+        habitacion = Habitacion.buscar_por_numero(numero)
+        if habitacion:
+            self.on_room_click(habitacion)
+    
     def _cargar_habitaciones(self):
         """Carga las habitaciones en el grid"""
         self.grid_habitaciones.controls.clear()
         self.room_cards.clear()
         
         habitaciones = Habitacion.listar_todas()
+        # Registros activos en una sola consulta en lugar de uno por tarjeta
+        registros = {r.habitacion_numero: r for r in Registro.listar_activos()}
         filtro = self.filtro_estado.value
         
-        contadores = {estado.value: 0 for estado in EstadoHabitacion}
+        self.estados = {hab.numero: hab.estado.value for hab in habitaciones}
         
         for hab in habitaciones:
-            contadores[hab.estado.value] += 1
-            
             if filtro != "Todos" and hab.estado.value != filtro:
                 continue
             
-            card = RoomCard(hab, on_click=self.on_room_click)
+            card = RoomCard(hab, on_click=self.on_room_click, registro=registros.get(hab.numero))
             self.grid_habitaciones.controls.append(card)
             self.room_cards[hab.numero] = card
         
-        # Actualizar contadores
-        total = len(habitaciones)
+        self._actualizar_contadores()
+        self._refrescar()
+    
+    def _actualizar_contadores(self):
+        """Recalcula los contadores por estado desde el estado conocido de cada habitación"""
+        contadores = {estado.value: 0 for estado in EstadoHabitacion}
+        for estado in self.estados.values():
+            contadores[estado] += 1
+        
+        total = len(self.estados)
         ocupadas = contadores[EstadoHabitacion.OCUPADA.value]
         libres = contadores[EstadoHabitacion.LIBRE.value]
         self.lbl_contadores.value = f"Total: {total} | Ocupadas: {ocupadas} | Libres: {libres} | Reservadas: {contadores[EstadoHabitacion.RESERVADA.value]} | Aseo: {contadores[EstadoHabitacion.ASEO.value]} | Mantenimiento: {contadores[EstadoHabitacion.MANTENIMIENTO.value]}"
-        
-        self.update()
     
     def _filtrar_habitaciones(self, e):
         """Filtra las habitaciones por estado"""
@@ -172,15 +272,73 @@ class DashboardView(ft.View):
         self.lbl_turno.value = "Turno: Abierto" if session.tiene_turno_abierto else "Turno: Cerrado"
         self.lbl_turno.color = ft.Colors.GREEN if session.tiene_turno_abierto else ft.Colors.RED
         
+        self._cargar_movimientos()
         self._cargar_habitaciones()
     
+    def _on_habitacion_cambiada(self, evento: HabitacionCambiada):
+        self._cargar_movimientos()
+        self.actualizar_habitacion(evento.numero)
+    
+    def _on_saldo_cambiado(self, evento):
+        """Refresca la tarjeta de la habitación cuyo saldo cambió"""
+        self._cargar_movimientos()
+        if evento.habitacion_numero in self.room_cards:
+            self.actualizar_habitacion(evento.habitacion_numero)
+        else:
+            self._refrescar()
+    
+    def _on_movimientos_cambiados(self, evento):
+        self._cargar_movimientos()
+        self._refrescar()
+    
+    def _on_turno_abierto(self, evento: TurnoAbierto):
+        if evento.usuario_id == session.usuario_id:
+            self._mostrar_turno(True)
+    
+    def _on_turno_cerrado(self, evento: TurnoCerrado):
+        if evento.usuario_id == session.usuario_id:
+            self._mostrar_turno(False)
+    
+    def _on_tasa_cambiada(self, evento: TasaCambiada):
+        self.lbl_tasa.value = f"Tasa: ${evento.tasa_nueva:.2f} Bs/USD"
+        self._refrescar()
+    
+    def _mostrar_turno(self, abierto: bool):
+        self.lbl_turno.value = "Turno: Abierto" if abierto else "Turno: Cerrado"
+        self.lbl_turno.color = ft.Colors.GREEN if abierto else ft.Colors.RED
+        self._refrescar()
+    
     def actualizar_habitacion(self, numero: int):
-        """Actualiza una habitación específica"""
+        """Actualiza solo la tarjeta y los contadores de una habitación"""
         habitacion = Habitacion.buscar_por_numero(numero)
-        if habitacion and numero in self.room_cards:
-            self.room_cards[numero].update_habitacion(habitacion)
-        else:
+        if not habitacion:
             self._cargar_habitaciones()
+            return
+        
+        self.estados[numero] = habitacion.estado.value
+        self._actualizar_contadores()
+        
+        filtro = self.filtro_estado.value
+        visible = filtro == "Todos" or habitacion.estado.value == filtro
+        if numero in self.room_cards and visible:
+            self.room_cards[numero].reconstruir(habitacion)
+            self._refrescar()
+        elif numero in self.room_cards or visible:
+            # Entra o sale del filtro actual: se rearma el grid
+            self._cargar_habitaciones()
+        else:
+            self._refrescar()
+    
+    def _refrescar(self):
+        """
+        Envía los cambios a la página si el dashboard está en pantalla; si
+        no, quedan aplicados a los controles y se verán al volver a él
+        """
+        try:
+            if self.page is not None:
+                self.update()
+        except (AssertionError, RuntimeError):
+            pass
     
     def refresh_all(self):
         """Refresca toda la vista"""
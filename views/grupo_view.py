@@ -0,0 +1,365 @@
+"""
+Vista de Check-in y Check-out de Grupos
+"""
+import flet as ft
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Optional
+from models.base import ConflictoConcurrencia
+from models.habitacion import Habitacion
+from models.huesped import Huesped
+from models.registro import Registro
+from models.transaccion import MetodoPago
+from models.configuracion import get_config
+from models.asignacion import get_asignador
+from models.grupos import AsignacionGrupo, PagoGrupo, checkin_grupo, checkout_grupo
+from models.tarifas import get_calendario_precios
+from utils.session import session
+
+class GrupoView(ft.View):
+    """Vista para registrar o cerrar varias habitaciones en una sola operación"""
+    
+    def __init__(self, on_complete: Callable, on_cancel: Callable):
+        super().__init__()
+        self.route = "/grupos"
+        self.on_complete = on_complete
+        self.on_cancel = on_cancel
+        self.filas: List[dict] = []
+        self.calendario = get_calendario_precios()
+        self._build()
+    
+    def _build(self):
+        self.appbar = ft.AppBar(
+            title=ft.Text("Grupos"),
+            bgcolor=ft.Colors.INDIGO,
+            leading=ft.IconButton(icon=ft.Icons.ARROW_BACK, on_click=lambda e: self.on_cancel())
+        )
+        
+        tabs = ft.Tabs(
+            selected_index=0,
+            animation_duration=300,
+            tabs=[
+                ft.Tab(text="Check-in de Grupo", icon=ft.Icons.GROUP_ADD, content=self._build_tab_checkin()),
+                ft.Tab(text="Check-out de Grupo", icon=ft.Icons.GROUP_REMOVE, content=self._build_tab_checkout()),
+            ],
+            expand=True
+        )
+        self.controls = [ft.Container(content=tabs, padding=20, expand=True)]
+    
+    def _build_pago(self):
+        """Controles del pago maestro del grupo"""
+        dd_metodo = ft.Dropdown(
+            label="Método de pago",
+            width=200,
+            options=[ft.dropdown.Option(m.value) for m in MetodoPago if m != MetodoPago.AJUSTE],
+            value=MetodoPago.EFECTIVO_USD.value
+        )
+        txt_monto = ft.TextField(label="Monto USD", width=150, keyboard_type=ft.KeyboardType.NUMBER)
+        txt_referencia = ft.TextField(label="Referencia", width=200)
+        return dd_metodo, txt_monto, txt_referencia
+    
+    def _leer_pago(self, dd_metodo, txt_monto, txt_referencia) -> Optional[PagoGrupo]:
+        """Arma el pago maestro con los valores del formulario (None si no hay monto)"""
+        if not txt_monto.value:
+            return None
+        monto = float(txt_monto.value)
+        tasa = get_config().tasa_dolar_bs
+        return PagoGrupo(
+            monto_usd=monto,
+            metodo_pago=MetodoPago(dd_metodo.value),
+            tasa_cambio=tasa,
+            monto_bs=monto * tasa,
+            referencia=txt_referencia.value or "",
+            turno_id=session.turno_id
+        )
+    
+    # === CHECK-IN ===
+    
+    def _build_tab_checkin(self):
+        """Construye la pestaña de check-in de grupo"""
+        self.disponibles = {str(h.numero): h for h in Habitacion.listar_disponibles()}
+        self.txt_grupo = ft.TextField(label="Nombre del grupo", width=300)
+        self.txt_salida = ft.TextField(
+            label="Fecha Salida",
+            value=(datetime.now() + timedelta(days=1)).strftime("%d/%m/%Y"),
+            width=150,
+            hint_text="DD/MM/AAAA",
+            on_change=lambda e: self._actualizar_total()
+        )
+        self.lista_filas = ft.Column(spacing=5)
+        self.lbl_total = ft.Text("Total: $0.00", size=16, weight=ft.FontWeight.BOLD)
+        self.pago_checkin = self._build_pago()
+        
+        self._agregar_fila(None)
+        
+        return ft.Container(
+            content=ft.Column([
+                ft.Row([self.txt_grupo, self.txt_salida]),
+                ft.Text("Habitaciones y huéspedes", weight=ft.FontWeight.BOLD),
+                self.lista_filas,
+                ft.Row([
+                    ft.TextButton("Agregar habitación", icon=ft.Icons.ADD, on_click=self._agregar_fila),
+                    ft.TextButton("Asignar automáticamente", icon=ft.Icons.AUTO_FIX_HIGH,
+                                  on_click=self._mostrar_asignacion),
+                ]),
+                ft.Divider(),
+                self.lbl_total,
+                ft.Row(list(self.pago_checkin)),
+                ft.Row([
+                    ft.ElevatedButton(
+                        "Registrar Grupo",
+                        icon=ft.Icons.CHECK,
+                        bgcolor=ft.Colors.INDIGO,
+                        color=ft.Colors.WHITE,
+                        on_click=self._registrar_grupo
+                    )
+                ], alignment=ft.MainAxisAlignment.END)
+            ], scroll=ft.ScrollMode.AUTO),
+            padding=20
+        )
+    
+    def _agregar_fila(self, e):
+        """Agrega una fila de habitación y huésped"""
+        fila = {
+            'habitacion': ft.Dropdown(
+                label="Habitación",
+                width=180,
+                options=[
+                    ft.dropdown.Option(numero, f"{h.numero:03d} - {h.tipo} (${h.precio_usd:.0f})")
+                    for numero, h in self.disponibles.items()
+                ],
+                on_change=lambda e: self._actualizar_total()
+            ),
+            'documento': ft.TextField(label="Documento", width=150, on_blur=self._completar_huesped),
+            'nombres': ft.TextField(label="Nombres", width=180),
+            'apellidos': ft.TextField(label="Apellidos", width=180),
+        }
+        fila['documento'].data = fila
+        self.filas.append(fila)
+        self.lista_filas.controls.append(ft.Row(list(fila.values())))
+        if e is not None:
+            self.update()
+    
+    def _mostrar_asignacion(self, e):
+        """Elige un bloque de habitaciones contiguas para el grupo y las asigna a las filas"""
+        tipos = sorted({h.tipo for h in self.disponibles.values()})
+        dd_tipo = ft.Dropdown(
+            label="Tipo",
+            options=[ft.dropdown.Option("", "Cualquiera")] + [ft.dropdown.Option(t) for t in tipos],
+            value=""
+        )
+        txt_cantidad = ft.TextField(label="Habitaciones", value=str(len(self.filas)),
+                                    keyboard_type=ft.KeyboardType.NUMBER)
+        txt_personas = ft.TextField(label="Personas por habitación", value="1",
+                                    keyboard_type=ft.KeyboardType.NUMBER)
+        
+        def asignar(e):
+            try:
+                cantidad = int(txt_cantidad.value)
+                personas = max(1, int(txt_personas.value))
+                llegada = datetime.now().date()
+                salida = max(datetime.strptime(self.txt_salida.value, "%d/%m/%Y").date(),
+                             llegada + timedelta(days=1))
+            except (TypeError, ValueError):
+                self._show_error("Revise la cantidad, las personas y la fecha de salida")
+                return
+            try:
+                numeros = get_asignador().asignar_grupo(cantidad, llegada, salida, dd_tipo.value or None, personas)
+            except ValueError as ex:
+                self._show_error(str(ex))
+                return
+            
+            dialog.open = False
+            while len(self.filas) < len(numeros):
+                self._agregar_fila(None)
+            faltantes = [str(n) for n in numeros if str(n) not in self.disponibles]
+            if faltantes:
+                self.disponibles.update((str(h.numero), h) for h in Habitacion.listar_disponibles())
+                for fila in self.filas:
+                    fila['habitacion'].options = [
+                        ft.dropdown.Option(numero, f"{h.numero:03d} - {h.tipo} (${h.precio_usd:.0f})")
+                        for numero, h in self.disponibles.items()
+                    ]
+            for fila, numero in zip(self.filas, numeros):
+                fila['habitacion'].value = str(numero)
+            self._actualizar_total()
+            self.page.update()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text("Asignar Habitaciones al Grupo"),
+            content=ft.Column([dd_tipo, txt_cantidad, txt_personas], tight=True),
+            actions=[
+                ft.TextButton("Cancelar", on_click=lambda e: setattr(dialog, 'open', False)),
+                ft.ElevatedButton("Asignar", on_click=asignar)
+            ]
+        )
+        
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _completar_huesped(self, e):
+        """Completa nombre y apellido si el documento ya está registrado"""
+        fila = e.control.data
+        huesped = Huesped.buscar_por_documento(e.control.value.strip()) if e.control.value else None
+        if huesped:
+            fila['nombres'].value = huesped.nombres
+            fila['apellidos'].value = huesped.apellidos
+            self.update()
+    
+    def _noches(self) -> int:
+        salida = datetime.strptime(self.txt_salida.value, "%d/%m/%Y")
+        return max(1, (salida - datetime.now()).days)
+    
+    def _actualizar_total(self):
+        """Recalcula el total del grupo"""
+        try:
+            noches = self._noches()
+        except (TypeError, ValueError):
+            return
+        llegada = date.today()
+        total = sum(
+            self.calendario.cotizar(
+                llegada, llegada + timedelta(days=noches), self.disponibles[f['habitacion'].value].precio_usd
+            ).total_usd
+            for f in self.filas if f['habitacion'].value
+        )
+        self.lbl_total.value = f"Total: ${total:.2f} ({noches} {'noche' if noches == 1 else 'noches'})"
+        self.update()
+    
+    def _registrar_grupo(self, e):
+        """Registra todas las habitaciones del grupo en una sola operación"""
+        try:
+            fecha_salida = datetime.strptime(self.txt_salida.value, "%d/%m/%Y")
+        except (TypeError, ValueError):
+            self._show_error("Fecha de salida inválida")
+            return
+        
+        asignaciones = []
+        for fila in self.filas:
+            if not fila['habitacion'].value:
+                continue
+            documento = (fila['documento'].value or "").strip()
+            if not documento or not fila['nombres'].value or not fila['apellidos'].value:
+                self._show_error(f"Complete el huésped de la habitación {int(fila['habitacion'].value):03d}")
+                return
+            asignaciones.append(AsignacionGrupo(
+                int(fila['habitacion'].value),
+                Huesped(documento=documento, nombres=fila['nombres'].value, apellidos=fila['apellidos'].value)
+            ))
+        if not asignaciones:
+            self._show_error("Seleccione al menos una habitación")
+            return
+        
+        try:
+            pago = self._leer_pago(*self.pago_checkin)
+        except ValueError:
+            self._show_error("Monto inválido")
+            return
+        try:
+            resultado = checkin_grupo(asignaciones, fecha_salida, session.usuario_id, pago,
+                                      self.txt_grupo.value or "")
+        except (ConflictoConcurrencia, ValueError) as ex:
+            self._show_error(str(ex))
+            return
+        
+        self._mostrar_resultado(
+            "Grupo registrado",
+            f"{len(resultado.habitaciones)} habitaciones registradas "
+            f"({resultado.habitaciones_por_segundo:.0f} hab/s). "
+            f"Total ${resultado.total_usd:.2f}, pagado ${resultado.pagado_usd:.2f}."
+        )
+    
+    # === CHECK-OUT ===
+    
+    def _build_tab_checkout(self):
+        """Construye la pestaña de check-out de grupo"""
+        self.activos = Registro.listar_activos()
+        self.checks_salida = []
+        filas = []
+        for registro in sorted(self.activos, key=lambda r: r.habitacion_numero):
+            check = ft.Checkbox(
+                label=f"{registro.habitacion_numero:03d} - {registro.huesped_nombre} "
+                      f"(saldo ${registro.saldo_pendiente_usd:.2f})",
+                data=registro,
+                on_change=lambda e: self._actualizar_pendiente()
+            )
+            if registro.notas:
+                check.label += f" · {registro.notas}"
+            self.checks_salida.append(check)
+            filas.append(check)
+        
+        self.lbl_pendiente = ft.Text("Pendiente: $0.00", size=16, weight=ft.FontWeight.BOLD)
+        self.pago_checkout = self._build_pago()
+        
+        return ft.Container(
+            content=ft.Column([
+                ft.Text("Seleccione las habitaciones del grupo", weight=ft.FontWeight.BOLD),
+                ft.Column(filas, spacing=0),
+                ft.Divider(),
+                self.lbl_pendiente,
+                ft.Row(list(self.pago_checkout)),
+                ft.Row([
+                    ft.ElevatedButton(
+                        "Completar Check-out de Grupo",
+                        icon=ft.Icons.EXIT_TO_APP,
+                        bgcolor=ft.Colors.RED,
+                        color=ft.Colors.WHITE,
+                        on_click=self._cerrar_grupo
+                    )
+                ], alignment=ft.MainAxisAlignment.END)
+            ], scroll=ft.ScrollMode.AUTO),
+            padding=20
+        )
+    
+    def _seleccionados(self) -> List[Registro]:
+        return [c.data for c in self.checks_salida if c.value]
+    
+    def _actualizar_pendiente(self):
+        """Suma los saldos pendientes de las habitaciones elegidas"""
+        pendiente = sum(max(0.0, r.saldo_pendiente_usd) for r in self._seleccionados())
+        self.lbl_pendiente.value = f"Pendiente: ${pendiente:.2f}"
+        self.update()
+    
+    def _cerrar_grupo(self, e):
+        """Cierra todas las habitaciones elegidas en una sola operación"""
+        registros = self._seleccionados()
+        if not registros:
+            self._show_error("Seleccione al menos una habitación")
+            return
+        try:
+            pago = self._leer_pago(*self.pago_checkout)
+        except ValueError:
+            self._show_error("Monto inválido")
+            return
+        try:
+            resultado = checkout_grupo([r.id for r in registros], session.usuario_id, pago)
+        except (ConflictoConcurrencia, ValueError) as ex:
+            self._show_error(str(ex))
+            return
+        
+        self._mostrar_resultado(
+            "Check-out de grupo completado",
+            f"{len(resultado.habitaciones)} habitaciones cerradas "
+            f"({resultado.habitaciones_por_segundo:.0f} hab/s). Pagado ${resultado.pagado_usd:.2f}."
+        )
+    
+    def _mostrar_resultado(self, titulo: str, mensaje: str):
+        """Muestra el resultado de la operación y vuelve al dashboard"""
+        def cerrar(e):
+            dialog.open = False
+            self.on_complete()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text(titulo),
+            content=ft.Text(mensaje),
+            actions=[ft.ElevatedButton("Aceptar", on_click=cerrar)]
+        )
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _show_error(self, message: str):
+        """Muestra un mensaje de error"""
+        self.page.show_snack_bar(
+            ft.SnackBar(content=ft.Text(message), bgcolor=ft.Colors.RED)
+        )
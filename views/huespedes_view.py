@@ -3,7 +3,10 @@ Vista de Gestión de Huéspedes
 """
 import flet as ft
 from typing import Callable
-from models.huesped import Huesped
+from models.huesped import Huesped, recalcular_estadisticas
+from models.cobranzas import RANGOS_ANTIGUEDAD, get_cartera, tramos_pendientes
+from models.base import ConflictoConcurrencia
+from models.cargador import Cargadores
 from utils.helpers import format_date, format_money
 
 class HuespedesView(ft.View):
@@ -15,6 +18,7 @@ class HuespedesView(ft.View):
         self.on_back = on_back
         self.on_select = on_select
         self.huespedes = []
+        self.cargadores = Cargadores()
         self._build()
     
     def _build(self):
@@ -38,6 +42,24 @@ class HuespedesView(ft.View):
             on_click=self._mostrar_form_nuevo
         )
         
+        btn_duplicados = ft.OutlinedButton(
+            "Duplicados",
+            icon=ft.Icons.MERGE_TYPE,
+            on_click=self._mostrar_duplicados
+        )
+        
+        btn_ranking = ft.OutlinedButton(
+            "Mejores Huéspedes",
+            icon=ft.Icons.STAR,
+            on_click=self._mostrar_ranking
+        )
+        
+        btn_cartera = ft.OutlinedButton(
+            "Cuentas por Cobrar",
+            icon=ft.Icons.ACCOUNT_BALANCE_WALLET,
+            on_click=self._mostrar_cartera
+        )
+        
         # Tabla de huéspedes
         self.tabla = ft.DataTable(
             columns=[
@@ -56,7 +78,7 @@ class HuespedesView(ft.View):
         self.controls = [
             ft.Container(
                 content=ft.Column([
-                    ft.Row([self.txt_buscar, btn_nuevo]),
+                    ft.Row([self.txt_buscar, btn_nuevo, btn_duplicados, btn_ranking, btn_cartera]),
                     ft.Container(
                         content=self.tabla,
                         expand=True,
@@ -80,6 +102,11 @@ class HuespedesView(ft.View):
         """Actualiza la tabla con los huéspedes filtrados"""
         self.tabla.rows.clear()
         
+        # Los huéspedes listados quedan en caché para seleccionar o ver su
+        # historial sin volver a leerlos
+        self.cargadores.limpiar()
+        self.cargadores.huespedes.sembrar(self.huespedes)
+        
         for h in self.huespedes:
             # Color según saldo
             saldo_color = ft.Colors.BLACK
@@ -109,7 +136,7 @@ class HuespedesView(ft.View):
                     icon=ft.Icons.CHECK_CIRCLE,
                     tooltip="Seleccionar",
                     icon_color=ft.Colors.GREEN,
-                    on_click=lambda e, id=h.id: self.on_select(Huesped.buscar_por_id(id))
+                    on_click=lambda e, id=h.id: self.on_select(self.cargadores.huespedes.obtener(id))
                 ))
             
             self.tabla.rows.append(ft.DataRow(
@@ -179,7 +206,19 @@ class HuespedesView(ft.View):
             h.vehiculo = txt_vehiculo.value.strip()
             h.placa_vehiculo = txt_placa.value.strip()
             
-            h.guardar()
+            try:
+                h.guardar()
+            except ConflictoConcurrencia:
+                self.page.show_snack_bar(
+                    ft.SnackBar(
+                        content=ft.Text("Otra estación modificó este huésped. Vuelva a abrirlo."),
+                        bgcolor=ft.Colors.RED
+                    )
+                )
+                dialog.open = False
+                self._cargar_huespedes()
+                self.page.update()
+                return
             
             dialog.open = False
             self._cargar_huespedes()
@@ -207,7 +246,7 @@ class HuespedesView(ft.View):
         from models.registro import Registro
         
         registros = Registro.listar_por_huesped(huesped_id)
-        huesped = Huesped.buscar_por_id(huesped_id)
+        huesped = self.cargadores.huespedes.obtener(huesped_id)
         
         if not registros:
             self.page.show_snack_bar(
@@ -229,9 +268,222 @@ class HuespedesView(ft.View):
                 )
             ))
         
+        resumen = ft.Text(
+            f"Visitas: {huesped.visitas} | Noches: {huesped.noches_totales} | "
+            f"Gastado: {format_money(huesped.total_gastado_usd)}",
+            weight=ft.FontWeight.BOLD
+        )
+        
         dialog = ft.AlertDialog(
             title=ft.Text(f"Historial de {huesped.nombre_completo}"),
-            content=ft.Container(content=lista, width=400, height=300),
+            content=ft.Container(content=ft.Column([resumen, lista], scroll=ft.ScrollMode.AUTO),
+                                 width=400, height=300),
+            actions=[ft.TextButton("Cerrar", on_click=lambda e: setattr(dialog, 'open', False))]
+        )
+        
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _mostrar_ranking(self, e):
+        """Muestra los huéspedes con más gasto o más visitas"""
+        dd_criterio = ft.Dropdown(
+            label="Ordenar por",
+            width=200,
+            value="gasto",
+            options=[
+                ft.dropdown.Option("gasto", "Gasto acumulado"),
+                ft.dropdown.Option("visitas", "Visitas"),
+            ]
+        )
+        tabla = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("#"), numeric=True),
+                ft.DataColumn(ft.Text("Huésped")),
+                ft.DataColumn(ft.Text("Visitas"), numeric=True),
+                ft.DataColumn(ft.Text("Noches"), numeric=True),
+                ft.DataColumn(ft.Text("Gastado"), numeric=True),
+                ft.DataColumn(ft.Text("Última Hab.")),
+            ],
+            rows=[]
+        )
+        
+        def cargar(e=None):
+            tabla.rows = [
+                ft.DataRow(cells=[
+                    ft.DataCell(ft.Text(str(posicion))),
+                    ft.DataCell(ft.Text(h.nombre_completo)),
+                    ft.DataCell(ft.Text(str(h.visitas))),
+                    ft.DataCell(ft.Text(str(h.noches_totales))),
+                    ft.DataCell(ft.Text(format_money(h.total_gastado_usd))),
+                    ft.DataCell(ft.Text(f"{h.ultima_habitacion:03d}" if h.ultima_habitacion else "-")),
+                ])
+                for posicion, h in enumerate(Huesped.listar_mejores(20, dd_criterio.value), start=1)
+            ]
+            if e is not None:
+                self.page.update()
+        
+        def recalcular(e):
+            cantidad = recalcular_estadisticas()
+            cargar(e)
+            self.page.show_snack_bar(
+                ft.SnackBar(content=ft.Text(f"Estadísticas recalculadas: {cantidad} huéspedes con estadías"))
+            )
+            self.page.update()
+        
+        dd_criterio.on_change = cargar
+        cargar()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text("Mejores Huéspedes"),
+            content=ft.Container(
+                content=ft.Column([dd_criterio, tabla], scroll=ft.ScrollMode.AUTO),
+                width=600, height=450
+            ),
+            actions=[
+                ft.TextButton("Recalcular desde el historial", on_click=recalcular),
+                ft.TextButton("Cerrar", on_click=lambda e: setattr(dialog, 'open', False))
+            ]
+        )
+        
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _mostrar_cartera(self, e):
+        """Muestra la deuda de los huéspedes por antigüedad y los mayores deudores"""
+        resumen, deudores = get_cartera().obtener()
+        
+        rangos = ft.Row([
+            ft.Container(
+                content=ft.Column([
+                    ft.Text(f"{etiqueta} días", size=12, color=ft.Colors.GREY),
+                    ft.Text(format_money(monto), weight=ft.FontWeight.BOLD,
+                            color=ft.Colors.RED if etiqueta == RANGOS_ANTIGUEDAD[-1][0] and monto else None)
+                ], tight=True),
+                padding=10,
+                border=ft.border.all(1, ft.Colors.GREY_300),
+                border_radius=8
+            )
+            for etiqueta, monto in resumen.por_rango()
+        ])
+        
+        tabla = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Huésped")),
+                *[ft.DataColumn(ft.Text(etiqueta), numeric=True) for etiqueta, _ in RANGOS_ANTIGUEDAD],
+                ft.DataColumn(ft.Text("Total"), numeric=True),
+                ft.DataColumn(ft.Text("Desde")),
+            ],
+            rows=[
+                ft.DataRow(
+                    cells=[
+                        ft.DataCell(ft.Text(f"{d.nombre} ({d.documento})")),
+                        *[ft.DataCell(ft.Text(format_money(monto) if monto else "-")) for monto in d.montos],
+                        ft.DataCell(ft.Text(format_money(d.total), weight=ft.FontWeight.BOLD)),
+                        ft.DataCell(ft.Text(d.fecha_mas_antigua.strftime("%d/%m/%Y"))),
+                    ],
+                    on_select_changed=lambda e, deudor=d: mostrar_tramos(deudor)
+                )
+                for d in deudores
+            ]
+        )
+        
+        def mostrar_tramos(deudor):
+            lineas = [
+                ft.Text(
+                    f"{t.fecha_origen.strftime('%d/%m/%Y')}: {format_money(t.saldo_usd)}"
+                    + (f" de {format_money(t.monto_usd)}" if t.saldo_usd < t.monto_usd else "")
+                )
+                for t in tramos_pendientes(deudor.huesped_id)
+            ]
+            detalle = ft.AlertDialog(
+                title=ft.Text(f"Deuda de {deudor.nombre}"),
+                content=ft.Column(lineas, tight=True, scroll=ft.ScrollMode.AUTO),
+                actions=[ft.TextButton("Volver", on_click=lambda e: volver())]
+            )
+            
+            def volver():
+                detalle.open = False
+                self.page.dialog = dialog
+                dialog.open = True
+                self.page.update()
+            
+            self.page.dialog = detalle
+            detalle.open = True
+            self.page.update()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text(f"Cuentas por Cobrar al {resumen.fecha_corte.strftime('%d/%m/%Y')}"),
+            content=ft.Container(
+                content=ft.Column([
+                    rangos,
+                    ft.Text(
+                        f"Total: {format_money(resumen.total)} | Deudores: {resumen.deudores}",
+                        weight=ft.FontWeight.BOLD
+                    ),
+                    tabla
+                ], scroll=ft.ScrollMode.AUTO),
+                width=750, height=450
+            ),
+            actions=[ft.TextButton("Cerrar", on_click=lambda e: setattr(dialog, 'open', False))]
+        )
+        
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _mostrar_duplicados(self, e):
+        """Muestra los posibles huéspedes duplicados y permite fusionarlos"""
+        from models.duplicados import detectar_duplicados
+        
+        candidatos = detectar_duplicados()
+        if not candidatos:
+            self.page.show_snack_bar(
+                ft.SnackBar(content=ft.Text("No se encontraron huéspedes duplicados"))
+            )
+            return
+        
+        por_id = {h.id: h for h in Huesped.listar_todos()}
+        lista = ft.Column(tight=True, spacing=5, scroll=ft.ScrollMode.AUTO)
+        
+        def fusionar(candidato, tarjeta):
+            conservado = por_id.get(candidato.huesped_id_a)
+            duplicado = por_id.get(candidato.huesped_id_b)
+            if not conservado or not duplicado:
+                return
+            conservado.fusionar(duplicado)
+            por_id.pop(duplicado.id, None)
+            lista.controls.remove(tarjeta)
+            self._cargar_huespedes()
+            self.page.update()
+        
+        for c in candidatos:
+            a, b = por_id.get(c.huesped_id_a), por_id.get(c.huesped_id_b)
+            if not a or not b:
+                continue
+            tarjeta = ft.Card(
+                content=ft.Container(
+                    content=ft.Row([
+                        ft.Column([
+                            ft.Text(f"{a.documento} - {a.nombre_completo}"),
+                            ft.Text(f"{b.documento} - {b.nombre_completo}"),
+                            ft.Text(f"{c.motivo} ({c.puntaje:.0%})", color=ft.Colors.GREY, size=12)
+                        ], expand=True),
+                    ]),
+                    padding=10
+                )
+            )
+            tarjeta.content.content.controls.append(ft.TextButton(
+                "Fusionar",
+                icon=ft.Icons.MERGE_TYPE,
+                on_click=lambda e, c=c, t=tarjeta: fusionar(c, t)
+            ))
+            lista.controls.append(tarjeta)
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text(f"Posibles Duplicados ({len(lista.controls)})"),
+            content=ft.Container(content=lista, width=500, height=400),
             actions=[ft.TextButton("Cerrar", on_click=lambda e: setattr(dialog, 'open', False))]
         )
         
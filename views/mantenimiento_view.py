@@ -0,0 +1,259 @@
+"""
+Vista de Mantenimiento
+"""
+import flet as ft
+from datetime import date, datetime, timedelta
+from typing import Callable
+from models.base import ConflictoConcurrencia
+from models.habitacion import Habitacion
+from models.mantenimiento import Mantenimiento, historial_mantenimiento
+from utils.session import session
+
+class MantenimientoView(ft.View):
+    """Vista para abrir y cerrar órdenes de mantenimiento y ver el historial por habitación"""
+    
+    def __init__(self, on_back: Callable):
+        super().__init__()
+        self.route = "/mantenimiento"
+        self.on_back = on_back
+        self.habitaciones = {h.numero: h for h in Habitacion.listar_todas()}
+        self._build()
+    
+    def _build(self):
+        self.appbar = ft.AppBar(
+            title=ft.Text("Mantenimiento"),
+            bgcolor=ft.Colors.ORANGE,
+            leading=ft.IconButton(icon=ft.Icons.ARROW_BACK, on_click=lambda e: self.on_back())
+        )
+        
+        # Nueva orden
+        self.dd_habitacion = ft.Dropdown(
+            label="Habitación",
+            width=220,
+            options=[
+                ft.dropdown.Option(str(h.numero), f"{h.numero:03d} - {h.tipo}")
+                for h in self.habitaciones.values()
+            ]
+        )
+        self.txt_desde = ft.TextField(
+            label="Desde",
+            value=date.today().strftime("%d/%m/%Y"),
+            width=150,
+            hint_text="DD/MM/AAAA"
+        )
+        self.txt_hasta = ft.TextField(
+            label="Regreso previsto",
+            value=(date.today() + timedelta(days=1)).strftime("%d/%m/%Y"),
+            width=150,
+            hint_text="DD/MM/AAAA"
+        )
+        self.txt_motivo = ft.TextField(label="Motivo", width=300)
+        self.txt_notas = ft.TextField(label="Notas", expand=True)
+        
+        # Órdenes abiertas
+        self.tabla_abiertas = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Habitación")),
+                ft.DataColumn(ft.Text("Motivo")),
+                ft.DataColumn(ft.Text("Desde")),
+                ft.DataColumn(ft.Text("Regreso previsto")),
+                ft.DataColumn(ft.Text("Estado")),
+                ft.DataColumn(ft.Text("Acciones")),
+            ],
+            rows=[]
+        )
+        
+        # Historial
+        self.txt_hist_desde = ft.TextField(
+            label="Desde",
+            value=(date.today() - timedelta(days=90)).strftime("%d/%m/%Y"),
+            width=150,
+            hint_text="DD/MM/AAAA"
+        )
+        self.txt_hist_hasta = ft.TextField(
+            label="Hasta",
+            value=(date.today() + timedelta(days=1)).strftime("%d/%m/%Y"),
+            width=150,
+            hint_text="DD/MM/AAAA"
+        )
+        self.tabla_historial = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Habitación")),
+                ft.DataColumn(ft.Text("Órdenes"), numeric=True),
+                ft.DataColumn(ft.Text("Noches fuera de servicio"), numeric=True),
+                ft.DataColumn(ft.Text("Atrasadas"), numeric=True),
+                ft.DataColumn(ft.Text("Abiertas"), numeric=True),
+                ft.DataColumn(ft.Text("Último motivo")),
+            ],
+            rows=[]
+        )
+        self._cargar_abiertas()
+        self._cargar_historial(None)
+        
+        self.controls = [
+            ft.Container(
+                content=ft.Column([
+                    ft.Text("Nueva Orden", size=18, weight=ft.FontWeight.BOLD),
+                    ft.Row([self.dd_habitacion, self.txt_desde, self.txt_hasta, self.txt_motivo]),
+                    ft.Row([
+                        self.txt_notas,
+                        ft.ElevatedButton(
+                            "Registrar",
+                            icon=ft.Icons.BUILD,
+                            bgcolor=ft.Colors.ORANGE,
+                            color=ft.Colors.WHITE,
+                            on_click=self._registrar
+                        )
+                    ]),
+                    ft.Divider(),
+                    ft.Text("Órdenes Abiertas", size=18, weight=ft.FontWeight.BOLD),
+                    ft.Container(
+                        content=self.tabla_abiertas,
+                        border=ft.border.all(1, ft.Colors.GREY_300),
+                        border_radius=8
+                    ),
+                    ft.Divider(),
+                    ft.Text("Historial por Habitación", size=18, weight=ft.FontWeight.BOLD),
+                    ft.Row([
+                        self.txt_hist_desde,
+                        self.txt_hist_hasta,
+                        ft.ElevatedButton("Consultar", icon=ft.Icons.SEARCH, on_click=self._cargar_historial)
+                    ]),
+                    ft.Container(
+                        content=self.tabla_historial,
+                        border=ft.border.all(1, ft.Colors.GREY_300),
+                        border_radius=8
+                    )
+                ], scroll=ft.ScrollMode.AUTO, expand=True),
+                padding=20,
+                expand=True
+            )
+        ]
+    
+    def _registrar(self, e):
+        """Abre una orden con los datos del formulario"""
+        if not self.dd_habitacion.value:
+            self._show_error("Seleccione una habitación")
+            return
+        try:
+            desde = datetime.strptime(self.txt_desde.value, "%d/%m/%Y").date()
+            hasta = datetime.strptime(self.txt_hasta.value, "%d/%m/%Y").date()
+        except ValueError:
+            self._show_error("Rango de fechas inválido")
+            return
+        
+        orden = Mantenimiento(
+            habitacion_numero=int(self.dd_habitacion.value),
+            motivo=self.txt_motivo.value or "",
+            fecha_desde=desde,
+            fecha_hasta=hasta,
+            notas=self.txt_notas.value or "",
+            usuario_id=session.usuario_id
+        )
+        try:
+            orden.guardar()
+        except (ConflictoConcurrencia, ValueError) as ex:
+            self._show_error(str(ex))
+            return
+        
+        self.txt_motivo.value = ""
+        self.txt_notas.value = ""
+        self._cargar_abiertas()
+        afectadas = orden.reservas_afectadas()
+        if afectadas:
+            mensaje = (
+                f"Orden registrada. Reubique {len(afectadas)} "
+                f"{'reserva' if len(afectadas) == 1 else 'reservas'}: "
+                + ", ".join(f"{r['Huesped']} ({date.fromisoformat(str(r['Fecha_Llegada'])[:10]).strftime('%d/%m')})" for r in afectadas)
+            )
+            color = ft.Colors.ORANGE
+        else:
+            mensaje = f"Orden registrada: habitación {orden.habitacion_numero:03d}"
+            color = ft.Colors.GREEN
+        self.page.show_snack_bar(ft.SnackBar(content=ft.Text(mensaje), bgcolor=color))
+        self.update()
+    
+    def _cargar_abiertas(self):
+        """Carga las órdenes abiertas, las vencidas resaltadas"""
+        self.tabla_abiertas.rows = [
+            ft.DataRow(cells=[
+                ft.DataCell(ft.Text(f"{m.habitacion_numero:03d} - {m.habitacion_tipo}")),
+                ft.DataCell(ft.Text(m.motivo)),
+                ft.DataCell(ft.Text(m.fecha_desde.strftime("%d/%m/%Y"))),
+                ft.DataCell(ft.Text(m.fecha_hasta.strftime("%d/%m/%Y"))),
+                ft.DataCell(
+                    ft.Text("Vencida", color=ft.Colors.RED, weight=ft.FontWeight.BOLD) if m.esta_vencido
+                    else ft.Text("En curso" if m.fecha_desde <= date.today() else "Programada")
+                ),
+                ft.DataCell(ft.IconButton(
+                    icon=ft.Icons.CHECK_CIRCLE,
+                    icon_color=ft.Colors.GREEN,
+                    tooltip="Cerrar orden",
+                    on_click=lambda e, orden=m: self._cerrar(orden)
+                )),
+            ])
+            for m in Mantenimiento.listar_abiertos()
+        ]
+    
+    def _cerrar(self, orden: Mantenimiento):
+        """Cierra la orden; la habitación vuelve a quedar libre"""
+        try:
+            orden.cerrar()
+        except (ConflictoConcurrencia, ValueError) as ex:
+            self._show_error(str(ex))
+        self._cargar_abiertas()
+        self._cargar_historial(None)
+        self.update()
+    
+    def _cargar_historial(self, e):
+        """Resumen por habitación del período; un clic en la fila muestra sus órdenes"""
+        try:
+            desde = datetime.strptime(self.txt_hist_desde.value, "%d/%m/%Y").date()
+            hasta = datetime.strptime(self.txt_hist_hasta.value, "%d/%m/%Y").date()
+        except ValueError:
+            self._show_error("Rango de fechas inválido")
+            return
+        self.tabla_historial.rows = [
+            ft.DataRow(
+                cells=[
+                    ft.DataCell(ft.Text(f"{r.habitacion_numero:03d} - {r.habitacion_tipo}")),
+                    ft.DataCell(ft.Text(str(r.ordenes))),
+                    ft.DataCell(ft.Text(str(r.noches_fuera_de_servicio))),
+                    ft.DataCell(ft.Text(str(r.ordenes_atrasadas))),
+                    ft.DataCell(ft.Text(str(r.abiertas))),
+                    ft.DataCell(ft.Text(r.ultimo_motivo)),
+                ],
+                on_select_changed=lambda e, numero=r.habitacion_numero: self._mostrar_ordenes(numero)
+            )
+            for r in historial_mantenimiento(desde, hasta)
+        ]
+        if e is not None:
+            self.update()
+    
+    def _mostrar_ordenes(self, numero: int):
+        """Muestra todas las órdenes de una habitación"""
+        lineas = []
+        for m in Mantenimiento.listar_por_habitacion(numero):
+            cierre = (
+                f"cerrada el {datetime.fromisoformat(str(m.fecha_cierre)).strftime('%d/%m/%Y')}"
+                if m.fecha_cierre else "abierta"
+            )
+            lineas.append(ft.Text(
+                f"{m.fecha_desde.strftime('%d/%m/%Y')} - {m.fecha_hasta.strftime('%d/%m/%Y')}: "
+                f"{m.motivo} ({cierre})"
+            ))
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text(f"Mantenimiento - Habitación {numero:03d}"),
+            content=ft.Column(lineas, tight=True, scroll=ft.ScrollMode.AUTO),
+            actions=[ft.ElevatedButton("Cerrar", on_click=lambda e: setattr(dialog, 'open', False))]
+        )
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _show_error(self, message: str):
+        """Muestra un mensaje de error"""
+        self.page.show_snack_bar(
+            ft.SnackBar(content=ft.Text(message), bgcolor=ft.Colors.RED)
+        )
@@ -0,0 +1,257 @@
+"""
+Vista de Reservas
+"""
+import flet as ft
+from datetime import date, datetime, timedelta
+from typing import Callable
+from models.base import ConflictoConcurrencia
+from models.habitacion import Habitacion
+from models.huesped import Huesped
+from models.reserva import Reserva, get_indice_reservas
+from utils.session import session
+
+class ReservasView(ft.View):
+    """Vista para buscar disponibilidad, crear y cancelar reservas"""
+    
+    def __init__(self, on_back: Callable):
+        super().__init__()
+        self.route = "/reservas"
+        self.on_back = on_back
+        self.habitaciones = {h.numero: h for h in Habitacion.listar_todas()}
+        self._build()
+    
+    def _build(self):
+        self.appbar = ft.AppBar(
+            title=ft.Text("Reservas"),
+            bgcolor=ft.Colors.AMBER_700,
+            leading=ft.IconButton(icon=ft.Icons.ARROW_BACK, on_click=lambda e: self.on_back())
+        )
+        
+        # Búsqueda de disponibilidad
+        self.txt_llegada = ft.TextField(
+            label="Llegada",
+            value=date.today().strftime("%d/%m/%Y"),
+            width=150,
+            hint_text="DD/MM/AAAA"
+        )
+        self.txt_salida = ft.TextField(
+            label="Salida",
+            value=(date.today() + timedelta(days=1)).strftime("%d/%m/%Y"),
+            width=150,
+            hint_text="DD/MM/AAAA"
+        )
+        tipos = sorted({h.tipo for h in self.habitaciones.values()})
+        self.dd_tipo = ft.Dropdown(
+            label="Tipo",
+            width=180,
+            options=[ft.dropdown.Option("", "Todos")] + [ft.dropdown.Option(t) for t in tipos],
+            value=""
+        )
+        btn_buscar = ft.ElevatedButton(
+            "Buscar disponibles",
+            icon=ft.Icons.SEARCH,
+            on_click=self._buscar_disponibles
+        )
+        
+        # Datos de la reserva
+        self.dd_habitacion = ft.Dropdown(label="Habitación", width=220, options=[])
+        self.lbl_disponibles = ft.Text("", color=ft.Colors.GREY_700)
+        self.txt_documento = ft.TextField(label="Documento", width=150, on_blur=self._completar_huesped)
+        self.txt_nombres = ft.TextField(label="Nombres", width=180)
+        self.txt_apellidos = ft.TextField(label="Apellidos", width=180)
+        self.txt_telefono = ft.TextField(label="Teléfono", width=150)
+        self.txt_notas = ft.TextField(label="Notas", expand=True)
+        
+        # Próximas reservas
+        self.tabla = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Llegada")),
+                ft.DataColumn(ft.Text("Salida")),
+                ft.DataColumn(ft.Text("Noches")),
+                ft.DataColumn(ft.Text("Habitación")),
+                ft.DataColumn(ft.Text("Huésped")),
+                ft.DataColumn(ft.Text("Notas")),
+                ft.DataColumn(ft.Text("Acciones")),
+            ],
+            rows=[]
+        )
+        self._cargar_reservas()
+        
+        self.controls = [
+            ft.Container(
+                content=ft.Column([
+                    ft.Text("Nueva Reserva", size=18, weight=ft.FontWeight.BOLD),
+                    ft.Row([self.txt_llegada, self.txt_salida, self.dd_tipo, btn_buscar]),
+                    ft.Row([self.dd_habitacion, self.lbl_disponibles]),
+                    ft.Row([self.txt_documento, self.txt_nombres, self.txt_apellidos, self.txt_telefono]),
+                    ft.Row([
+                        self.txt_notas,
+                        ft.ElevatedButton(
+                            "Reservar",
+                            icon=ft.Icons.BOOKMARK_ADD,
+                            bgcolor=ft.Colors.AMBER_700,
+                            color=ft.Colors.WHITE,
+                            on_click=self._reservar
+                        )
+                    ]),
+                    ft.Divider(),
+                    ft.Text("Próximas Reservas", size=18, weight=ft.FontWeight.BOLD),
+                    ft.Container(
+                        content=self.tabla,
+                        border=ft.border.all(1, ft.Colors.GREY_300),
+                        border_radius=8
+                    )
+                ], scroll=ft.ScrollMode.AUTO, expand=True),
+                padding=20,
+                expand=True
+            )
+        ]
+    
+    def _leer_rango(self):
+        """Retorna (llegada, salida) del formulario o lanza ValueError"""
+        llegada = datetime.strptime(self.txt_llegada.value, "%d/%m/%Y").date()
+        salida = datetime.strptime(self.txt_salida.value, "%d/%m/%Y").date()
+        if salida <= llegada:
+            raise ValueError("La fecha de salida debe ser posterior a la de llegada")
+        return llegada, salida
+    
+    def _buscar_disponibles(self, e):
+        """Llena el selector con las habitaciones libres en todo el rango"""
+        try:
+            llegada, salida = self._leer_rango()
+        except ValueError:
+            self._show_error("Rango de fechas inválido")
+            return
+        
+        libres = get_indice_reservas().habitaciones_libres(llegada, salida, self.dd_tipo.value or None)
+        self.dd_habitacion.options = [
+            ft.dropdown.Option(
+                str(numero),
+                f"{numero:03d} - {self.habitaciones[numero].tipo} (${self.habitaciones[numero].precio_usd:.0f})"
+            )
+            for numero in libres if numero in self.habitaciones
+        ]
+        self.dd_habitacion.value = self.dd_habitacion.options[0].key if self.dd_habitacion.options else None
+        noches = (salida - llegada).days
+        self.lbl_disponibles.value = (
+            f"{len(libres)} habitaciones libres por {noches} {'noche' if noches == 1 else 'noches'}"
+        )
+        self.update()
+    
+    def _completar_huesped(self, e):
+        """Completa los datos si el documento ya está registrado"""
+        documento = (self.txt_documento.value or "").strip()
+        huesped = Huesped.buscar_por_documento(documento) if documento else None
+        if huesped:
+            self.txt_nombres.value = huesped.nombres
+            self.txt_apellidos.value = huesped.apellidos
+            self.txt_telefono.value = huesped.telefono
+            self.update()
+    
+    def _reservar(self, e):
+        """Crea la reserva con los datos del formulario"""
+        try:
+            llegada, salida = self._leer_rango()
+        except ValueError:
+            self._show_error("Rango de fechas inválido")
+            return
+        if not self.dd_habitacion.value:
+            self._show_error("Busque y seleccione una habitación")
+            return
+        documento = (self.txt_documento.value or "").strip()
+        if not documento or not self.txt_nombres.value or not self.txt_apellidos.value:
+            self._show_error("Complete los datos del huésped")
+            return
+        
+        huesped = Huesped.buscar_por_documento(documento)
+        if huesped is None:
+            huesped = Huesped(
+                documento=documento,
+                nombres=self.txt_nombres.value,
+                apellidos=self.txt_apellidos.value,
+                telefono=self.txt_telefono.value or ""
+            )
+            huesped.guardar()
+        
+        reserva = Reserva(
+            habitacion_numero=int(self.dd_habitacion.value),
+            huesped_id=huesped.id,
+            fecha_llegada=llegada,
+            fecha_salida=salida,
+            notas=self.txt_notas.value or "",
+            usuario_id=session.usuario_id
+        )
+        try:
+            reserva.guardar()
+        except (ConflictoConcurrencia, ValueError) as ex:
+            self._show_error(str(ex))
+            return
+        
+        for campo in (self.txt_documento, self.txt_nombres, self.txt_apellidos,
+                      self.txt_telefono, self.txt_notas):
+            campo.value = ""
+        self.dd_habitacion.options = []
+        self.dd_habitacion.value = None
+        self.lbl_disponibles.value = ""
+        self._cargar_reservas()
+        self.page.show_snack_bar(
+            ft.SnackBar(
+                content=ft.Text(f"Reserva registrada: habitación {reserva.habitacion_numero:03d}"),
+                bgcolor=ft.Colors.GREEN
+            )
+        )
+        self.update()
+    
+    def _cargar_reservas(self):
+        """Carga las reservas confirmadas desde hoy"""
+        self.tabla.rows = [
+            ft.DataRow(cells=[
+                ft.DataCell(ft.Text(r.fecha_llegada.strftime("%d/%m/%Y"))),
+                ft.DataCell(ft.Text(r.fecha_salida.strftime("%d/%m/%Y"))),
+                ft.DataCell(ft.Text(str(r.noches))),
+                ft.DataCell(ft.Text(f"{r.habitacion_numero:03d} - {r.habitacion_tipo}")),
+                ft.DataCell(ft.Text(r.huesped_nombre)),
+                ft.DataCell(ft.Text(r.notas or "-")),
+                ft.DataCell(ft.IconButton(
+                    icon=ft.Icons.CANCEL,
+                    icon_color=ft.Colors.RED,
+                    tooltip="Cancelar reserva",
+                    on_click=lambda e, reserva=r: self._confirmar_cancelacion(reserva)
+                )),
+            ])
+            for r in Reserva.listar_confirmadas()
+        ]
+    
+    def _confirmar_cancelacion(self, reserva: Reserva):
+        """Pide confirmación y cancela la reserva"""
+        def cancelar(e):
+            dialog.open = False
+            try:
+                reserva.cancelar()
+            except (ConflictoConcurrencia, ValueError) as ex:
+                self._show_error(str(ex))
+            self._cargar_reservas()
+            self.update()
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text("Cancelar Reserva"),
+            content=ft.Text(
+                f"¿Cancelar la reserva de {reserva.huesped_nombre} en la habitación "
+                f"{reserva.habitacion_numero:03d} ({reserva.fecha_llegada.strftime('%d/%m/%Y')} - "
+                f"{reserva.fecha_salida.strftime('%d/%m/%Y')})?"
+            ),
+            actions=[
+                ft.TextButton("No", on_click=lambda e: setattr(dialog, 'open', False)),
+                ft.ElevatedButton("Cancelar Reserva", bgcolor=ft.Colors.RED, color=ft.Colors.WHITE,
+                                  on_click=cancelar)
+            ]
+        )
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+    
+    def _show_error(self, message: str):
+        """Muestra un mensaje de error"""
+        self.page.show_snack_bar(
+            ft.SnackBar(content=ft.Text(message), bgcolor=ft.Colors.RED)
+        )